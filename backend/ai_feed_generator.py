@@ -2,14 +2,50 @@
 AI Feed Generator
 
 Generates feeds for AI indexing (JSON, XML)
+
+Feeds are materialized: FeedStore renders all feeds from one collection
+scan into pre-serialized (and pre-gzipped) bytes with a strong ETag and
+re-renders only when featured_deals changes.
 """
-from typing import List, Dict, Any
-from datetime import datetime
+from typing import List, Dict, Any, Optional
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+import asyncio
+import gzip
+import hashlib
 import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Seconds between featured_deals change checks (per worker)
+FEED_CHECK_INTERVAL_SECONDS = 10
+
+# Fields the feeds read (keeps the render scan narrow)
+FEED_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "brand": 1,
+    "model": 1,
+    "year": 1,
+    "trim": 1,
+    "calculated_payment": 1,
+    "calculated_driveoff": 1,
+    "term_months": 1,
+    "annual_mileage": 1,
+    "mf_used": 1,
+    "residual_percent_used": 1,
+    "msrp": 1,
+    "selling_price": 1,
+    "savings_vs_msrp": 1,
+    "bank": 1,
+    "region": 1,
+    "image_url": 1,
+    "updated_at": 1,
+    "created_at": 1
+}
+
 
 async def generate_deals_json_feed(db) -> List[Dict[str, Any]]:
     """
@@ -18,8 +54,21 @@ async def generate_deals_json_feed(db) -> List[Dict[str, Any]]:
     Returns:
         List of deal dicts optimized for AI
     """
-    deals = await db.featured_deals.find({}, {"_id": 0}).to_list(length=None)
+    deals = await db.featured_deals.find({}, FEED_PROJECTION).to_list(length=None)
+    
+    return build_feed_items(deals)
+
+
+def build_feed_items(deals: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Convert deal documents to feed items
     
+    Args:
+        deals: Featured Deals
+        
+    Returns:
+        List of deal dicts optimized for AI
+    """
     feed_items = []
     
     for deal in deals:
@@ -63,6 +112,19 @@ async def generate_deals_ai_feed(db) -> Dict[str, Any]:
     """
     deals = await generate_deals_json_feed(db)
     
+    return build_ai_feed(deals)
+
+
+def build_ai_feed(deals: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Wrap feed items with AI feed metadata
+    
+    Args:
+        deals: Feed items (build_feed_items)
+        
+    Returns:
+        AI-optimized feed dict
+    """
     return {
         "feed_version": "1.0",
         "feed_type": "car_lease_offers",
@@ -86,15 +148,20 @@ def generate_deals_xml_feed(deals: List[Dict[str, Any]]) -> str:
     xml_items = []
     
     for deal in deals:
+        title = escape(str(deal['title']))
+        deal_id = escape(str(deal['id']))
+        brand = escape(str(deal['brand']))
+        model = escape(str(deal['model']))
+        payment = escape(str(deal['monthly_payment']))
         item_xml = f"""
     <item>
-      <title>{deal['title']}</title>
-      <link>https://hunter.lease/deal/{deal['id']}</link>
-      <description>{deal['brand']} {deal['model']} lease for ${deal['monthly_payment']}/mo</description>
-      <guid>{deal['id']}</guid>
-      <pubDate>{deal['last_updated']}</pubDate>
-      <category>{deal['brand']}</category>
-      <price>${deal['monthly_payment']}/mo</price>
+      <title>{title}</title>
+      <link>https://hunter.lease/deal/{deal_id}</link>
+      <description>{brand} {model} lease for ${payment}/mo</description>
+      <guid>{deal_id}</guid>
+      <pubDate>{escape(str(deal['last_updated']))}</pubDate>
+      <category>{brand}</category>
+      <price>${payment}/mo</price>
     </item>"""
         xml_items.append(item_xml)
     
@@ -111,3 +178,153 @@ def generate_deals_xml_feed(deals: List[Dict[str, Any]]) -> str:
 </rss>"""
     
     return xml
+
+
+def _json_bytes(payload: Any) -> bytes:
+    """Serialize like FastAPI's JSONResponse (datetimes as ISO strings)"""
+    from fastapi.encoders import jsonable_encoder
+    
+    return json.dumps(
+        jsonable_encoder(payload),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+class MaterializedFeed:
+    """Pre-serialized feed body with its gzip variant and strong ETag"""
+    
+    __slots__ = ("body", "gzip_body", "etag", "media_type", "generated_at")
+    
+    def __init__(self, body: bytes, media_type: str):
+        self.body = body
+        self.gzip_body = gzip.compress(body, compresslevel=6, mtime=0)
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.media_type = media_type
+        self.generated_at = datetime.now(timezone.utc)
+
+
+class FeedStore:
+    """
+    Materialized deal feeds (deals.json, deals-ai.json, deals.xml)
+    
+    featured_deals is checked for changes (document count + newest
+    updated_at) at most every check_interval seconds; all feeds are
+    re-rendered from a single scan only when that state moves.
+    """
+    
+    def __init__(self, check_interval: float = FEED_CHECK_INTERVAL_SECONDS):
+        self.check_interval = check_interval
+        self._feeds: Dict[str, MaterializedFeed] = {}
+        self._state: Optional[Dict[str, Any]] = None
+        self._checked_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.stats = {"renders": 0, "state_checks": 0}
+    
+    def _render(self, deals: List[Dict[str, Any]]) -> Dict[str, MaterializedFeed]:
+        items = build_feed_items(deals)
+        now = datetime.now(timezone.utc).isoformat()
+        
+        return {
+            "deals.json": MaterializedFeed(
+                _json_bytes({"items": items, "total": len(items), "last_updated": now}),
+                "application/json"
+            ),
+            "deals-ai.json": MaterializedFeed(_json_bytes(build_ai_feed(items)), "application/json"),
+            "deals.xml": MaterializedFeed(
+                generate_deals_xml_feed(items).encode("utf-8"),
+                "application/xml"
+            )
+        }
+    
+    async def _refresh(self, db):
+        from search_engine import get_collection_state
+        
+        state = await get_collection_state(db)
+        self.stats["state_checks"] += 1
+        self._checked_at = time.monotonic()
+        
+        if self._feeds and state == self._state:
+            return
+        
+        started = time.perf_counter()
+        deals = await db.featured_deals.find({}, FEED_PROJECTION).to_list(length=None)
+        self._feeds = self._render(deals)
+        self._state = state
+        self.stats["renders"] += 1
+        
+        logger.info(f"Feeds rendered: {len(deals)} deals in {time.perf_counter() - started:.3f}s")
+    
+    async def get_feed(self, db, name: str) -> MaterializedFeed:
+        """
+        Get a materialized feed, re-rendering if deals changed
+        
+        Args:
+            db: Database instance
+            name: "deals.json", "deals-ai.json" or "deals.xml"
+        """
+        due = self._checked_at is None or (time.monotonic() - self._checked_at) >= self.check_interval
+        if due or name not in self._feeds:
+            async with self._lock:
+                due = self._checked_at is None or (time.monotonic() - self._checked_at) >= self.check_interval
+                if due or name not in self._feeds:
+                    await self._refresh(db)
+        return self._feeds[name]
+    
+    def invalidate(self):
+        """Force a change check on the next request"""
+        self._checked_at = None
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Feed store status"""
+        return {
+            "feeds": {
+                name: {
+                    "etag": feed.etag,
+                    "bytes": len(feed.body),
+                    "gzip_bytes": len(feed.gzip_body),
+                    "generated_at": feed.generated_at.isoformat()
+                }
+                for name, feed in self._feeds.items()
+            },
+            "state": self._state,
+            **self.stats
+        }
+
+
+# Global feed store
+feed_store = FeedStore()
+
+
+def get_feed_store() -> FeedStore:
+    """Get global feed store"""
+    return feed_store
+
+
+def feed_response(feed: MaterializedFeed, request):
+    """
+    Serve a materialized feed
+    
+    304 when If-None-Match carries the feed's ETag; the pre-gzipped body
+    when the client accepts gzip (gzip;q=0 refuses it).
+    """
+    from fastapi.responses import Response
+    from http_cache import choose_encoding
+    
+    headers = {
+        "ETag": feed.etag,
+        "Cache-Control": "public, max-age=0, must-revalidate",
+        "Vary": "Accept-Encoding"
+    }
+    
+    if_none_match = request.headers.get("if-none-match", "")
+    if feed.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    
+    if choose_encoding(request.headers.get("accept-encoding"), ("gzip",)):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=feed.gzip_body, media_type=feed.media_type, headers=headers)
+    
+    return Response(content=feed.body, media_type=feed.media_type, headers=headers)
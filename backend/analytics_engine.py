@@ -7,9 +7,22 @@ from typing import Dict, List, Any
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timedelta, timezone
 import logging
+import math
+
+from analytics_rollup import ROLLUP_COLLECTION, day_key, get_daily_rollup
 
 logger = logging.getLogger(__name__)
 
+# Collections the summary reads (its cache key embeds their write versions)
+SUMMARY_COLLECTIONS = ("featured_deals", "lease_programs_parsed", "auto_sync_logs")
+
+PAYMENT_RANGES = [
+    ("$0-$299", 0, 299),
+    ("$300-$399", 300, 399),
+    ("$400-$499", 400, 499),
+    ("$500+", 500, 10000)
+]
+
 
 async def get_payments_distribution(db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
     """
@@ -18,16 +31,9 @@ async def get_payments_distribution(db: AsyncIOMotorDatabase) -> List[Dict[str,
     Returns:
         List of {range, count} for pie chart
     """
-    ranges = [
-        ("$0-$299", 0, 299),
-        ("$300-$399", 300, 399),
-        ("$400-$499", 400, 499),
-        ("$500+", 500, 10000)
-    ]
-    
     distribution = []
     
-    for label, min_val, max_val in ranges:
+    for label, min_val, max_val in PAYMENT_RANGES:
         count = await db.featured_deals.count_documents({
             "calculated_payment": {"$gte": min_val, "$lte": max_val}
         })
@@ -77,7 +83,7 @@ async def get_deals_created_over_time(
     days: int = 30
 ) -> List[Dict[str, Any]]:
     """
-    Get deals created over time for line chart
+    Get deals created over time for line chart (from the analytics_daily rollup)
     
     Args:
         days: Number of days to analyze
@@ -85,32 +91,15 @@ async def get_deals_created_over_time(
     Returns:
         List of {date, count}
     """
-    start_date = datetime.now(timezone.utc) - timedelta(days=days)
-    
-    pipeline = [
-        {"$match": {"created_at": {"$gte": start_date}}},
-        {
-            "$group": {
-                "_id": {
-                    "$dateToString": {
-                        "format": "%Y-%m-%d",
-                        "date": "$created_at"
-                    }
-                },
-                "count": {"$sum": 1}
-            }
-        },
-        {"$sort": {"_id": 1}}
-    ]
-    
-    results = await db.featured_deals.aggregate(pipeline).to_list(length=None)
+    rows = await get_daily_rollup(db, days=days)
     
     return [
         {
-            "date": r["_id"],
-            "count": r["count"]
+            "date": r["date"],
+            "count": r["deals"]
         }
-        for r in results
+        for r in rows
+        if r["deals"] > 0
     ]
 
 
@@ -119,7 +108,7 @@ async def get_program_changes_trend(
     days: int = 30
 ) -> List[Dict[str, Any]]:
     """
-    Get program changes trend for area chart
+    Get program changes trend for area chart (from the analytics_daily rollup)
     
     Args:
         days: Number of days to analyze
@@ -127,59 +116,171 @@ async def get_program_changes_trend(
     Returns:
         List of {date, changes}
     """
-    start_date = datetime.now(timezone.utc) - timedelta(days=days)
-    
-    pipeline = [
-        {"$match": {"timestamp": {"$gte": start_date}}},
-        {
-            "$group": {
-                "_id": {
-                    "$dateToString": {
-                        "format": "%Y-%m-%d",
-                        "date": "$timestamp"
-                    }
-                },
-                "changes": {"$sum": 1}
-            }
-        },
-        {"$sort": {"_id": 1}}
-    ]
-    
-    results = await db.auto_sync_logs.aggregate(pipeline).to_list(length=None)
+    rows = await get_daily_rollup(db, days=days)
     
     return [
         {
-            "date": r["_id"],
+            "date": r["date"],
             "changes": r["changes"]
         }
-        for r in results
+        for r in rows
+        if r["changes"] > 0
     ]
 
 
-async def get_full_analytics_summary(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+def _payment_bucket_boundaries() -> List[float]:
     """
-    Get complete analytics summary for dashboard
+    $bucket boundaries for PAYMENT_RANGES
     
-    Returns:
-        Dict with all analytics sections
+    Buckets are [lower, upper), so each inclusive max is nudged up to the next
+    float; the gaps between ranges (e.g. 299.5) get their own bucket and are
+    dropped, matching the per-range $gte/$lte counts.
+    """
+    boundaries = []
+    for _, min_val, max_val in PAYMENT_RANGES:
+        if not boundaries or boundaries[-1] != min_val:
+            boundaries.append(min_val)
+        boundaries.append(math.nextafter(max_val, math.inf))
+    return boundaries
+
+
+def build_summary_pipeline(days: int = 30) -> List[Dict[str, Any]]:
     """
-    # Run all analytics in parallel
-    payments_dist = await get_payments_distribution(db)
-    avg_per_brand = await get_avg_payment_per_brand(db)
-    deals_timeline = await get_deals_created_over_time(db, days=30)
-    program_changes = await get_program_changes_trend(db, days=30)
+    Single aggregation (run on featured_deals) for the full summary
     
-    # Get totals
-    total_deals = await db.featured_deals.count_documents({})
-    total_programs = await db.lease_programs_parsed.count_documents({})
+    Deals, the analytics_daily rollup (grouped by day) and the program count
+    are unioned into one stream tagged by _src, then split by one $facet.
+    
+    Args:
+        days: Window for the timeline sections
+    """
+    start_day = day_key(datetime.now(timezone.utc) - timedelta(days=days))
+    
+    return [
+        {
+            "$project": {
+                "_id": 0,
+                "_src": {"$literal": "deal"},
+                "brand": 1,
+                "calculated_payment": 1,
+                "created_at": 1
+            }
+        },
+        {
+            "$unionWith": {
+                "coll": ROLLUP_COLLECTION,
+                "pipeline": [
+                    {"$match": {"date": {"$gte": start_day}}},
+                    {
+                        "$group": {
+                            "_id": "$date",
+                            "deals": {"$sum": "$deals"},
+                            "changes": {"$sum": "$changes"}
+                        }
+                    },
+                    {"$set": {"_src": "daily"}}
+                ]
+            }
+        },
+        {
+            "$unionWith": {
+                "coll": "lease_programs_parsed",
+                "pipeline": [
+                    {"$count": "count"},
+                    {"$set": {"_src": "programs"}}
+                ]
+            }
+        },
+        {"$facet": build_summary_facets()}
+    ]
+
+
+def build_summary_facets() -> Dict[str, List[Dict[str, Any]]]:
+    """$facet sub-pipelines over the tagged stream of build_summary_pipeline"""
+    deals = {"$match": {"_src": "deal"}}
+    
+    return {
+        "payments": [
+            deals,
+            {
+                "$bucket": {
+                    "groupBy": "$calculated_payment",
+                    "boundaries": _payment_bucket_boundaries(),
+                    "default": "other",
+                    "output": {"count": {"$sum": 1}}
+                }
+            }
+        ],
+        "brands": [
+            deals,
+            {
+                "$group": {
+                    "_id": "$brand",
+                    "avg_payment": {"$avg": "$calculated_payment"},
+                    "count": {"$sum": 1}
+                }
+            },
+            {"$sort": {"avg_payment": 1}}
+        ],
+        "timeline": [
+            {"$match": {"_src": "daily", "deals": {"$gt": 0}}},
+            {"$sort": {"_id": 1}}
+        ],
+        "program_changes": [
+            {"$match": {"_src": "daily", "changes": {"$gt": 0}}},
+            {"$sort": {"_id": 1}}
+        ],
+        "deal_total": [deals, {"$count": "count"}],
+        "program_total": [{"$match": {"_src": "programs"}}]
+    }
+
+
+def summary_from_facets(facets: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Shape the $facet output like the individual analytics functions"""
+    labels = {min_val: label for label, min_val, _ in PAYMENT_RANGES}
+    payments_dist = [
+        {"range": labels[b["_id"]], "count": b["count"], "value": b["count"]}
+        for b in facets.get("payments", [])
+        if b["_id"] in labels and b["count"] > 0
+    ]
+    
+    deal_total = facets.get("deal_total") or [{"count": 0}]
+    program_total = facets.get("program_total") or [{"count": 0}]
     
     return {
         "payments_distribution": payments_dist,
-        "avg_payment_per_brand": avg_per_brand,
-        "deals_timeline": deals_timeline,
-        "program_changes_trend": program_changes,
+        "avg_payment_per_brand": [
+            {
+                "brand": r["_id"],
+                "avg_payment": round(r.get("avg_payment") or 0, 2),
+                "count": r["count"]
+            }
+            for r in facets.get("brands", [])
+        ],
+        "deals_timeline": [
+            {"date": r["_id"], "count": r["deals"]}
+            for r in facets.get("timeline", [])
+        ],
+        "program_changes_trend": [
+            {"date": r["_id"], "changes": r["changes"]}
+            for r in facets.get("program_changes", [])
+        ],
         "totals": {
-            "deals": total_deals,
-            "programs": total_programs
+            "deals": deal_total[0]["count"],
+            "programs": program_total[0]["count"]
         }
     }
+
+
+async def get_full_analytics_summary(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+    """
+    Get complete analytics summary for dashboard
+    
+    One aggregation round-trip (featured_deals is scanned once) instead of
+    four range counts, three pipelines and two totals.
+    
+    Returns:
+        Dict with all analytics sections
+    """
+    results = await db.featured_deals.aggregate(build_summary_pipeline(days=30)).to_list(length=1)
+    return summary_from_facets(results[0] if results else {})
@@ -0,0 +1,308 @@
+"""
+Analytics Rollup
+
+Maintains the analytics_daily collection: one row per (UTC day, brand) with
+deal counts, calculated_payment count/sum/min/max and sync-log change counts.
+Trend endpoints read these rows instead of re-aggregating featured_deals and
+auto_sync_logs, so a trend costs at most days x brands rows however large the
+deal history grows.
+
+Deal writes re-aggregate only the (day, brand) buckets they touch (min/max
+cannot be decremented, and a recomputed row is idempotent); sync logs are
+append-only and are applied with $inc. backfill_analytics_rollup() rebuilds
+everything from the raw collections:
+
+    python analytics_rollup.py
+"""
+from typing import Dict, List, Any, Iterable, Optional, Set, Tuple
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from datetime import datetime, timedelta, timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLLECTION = "analytics_daily"
+
+# Deal fields that decide a deal's bucket
+BUCKET_PROJECTION = {"_id": 0, "brand": 1, "created_at": 1}
+
+# Row counters reset when a bucket is re-aggregated
+DEAL_COUNTERS = {
+    "deals": 0,
+    "payment_count": 0,
+    "payment_sum": 0,
+    "payment_min": None,
+    "payment_max": None
+}
+
+# Sync logs of brand resync runs are not program changes
+BRAND_SYNC_LOG_KIND = "brand_sync"
+
+# Sync logs counted as program changes (entries from before "kind" existed
+# are brand resyncs when they carry no changes)
+PROGRAM_CHANGE_LOG_MATCH = {
+    "timestamp": {"$type": "date"},
+    "kind": {"$ne": BRAND_SYNC_LOG_KIND},
+    "changes": {"$ne": {}}
+}
+
+Bucket = Tuple[str, Optional[str]]
+
+
+def _as_utc(value: Any) -> Optional[datetime]:
+    """Timestamp as aware UTC datetime (naive values are stored UTC)"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def day_key(value: Any) -> Optional[str]:
+    """UTC day (YYYY-MM-DD) of a timestamp, like $dateToString"""
+    moment = _as_utc(value)
+    return moment.strftime("%Y-%m-%d") if moment else None
+
+
+def deal_bucket(deal: Optional[Dict[str, Any]]) -> Optional[Bucket]:
+    """(day, brand) bucket of a deal, or None without a created_at"""
+    if not deal:
+        return None
+    day = day_key(deal.get("created_at"))
+    return (day, deal.get("brand")) if day else None
+
+
+def _row_id(day: str, brand: Optional[str]) -> str:
+    return f"{day}|{brand or ''}"
+
+
+def _bucket_match(bucket: Bucket) -> Dict[str, Any]:
+    day, brand = bucket
+    start = datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    return {
+        "brand": brand,
+        "created_at": {"$gte": start, "$lt": start + timedelta(days=1)}
+    }
+
+
+def _deal_group_stage() -> Dict[str, Any]:
+    """$group of deals into (day, brand) rows"""
+    return {
+        "$group": {
+            "_id": {
+                "date": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+                "brand": "$brand"
+            },
+            "deals": {"$sum": 1},
+            "payment_count": {"$sum": {"$cond": [{"$isNumber": "$calculated_payment"}, 1, 0]}},
+            "payment_sum": {"$sum": "$calculated_payment"},
+            "payment_min": {"$min": "$calculated_payment"},
+            "payment_max": {"$max": "$calculated_payment"}
+        }
+    }
+
+
+def _row_counters(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: row.get(field, default) for field, default in DEAL_COUNTERS.items()}
+
+
+async def create_rollup_indexes(db: AsyncIOMotorDatabase):
+    """
+    Indexes for rollup reads and bucket re-aggregation
+
+    Bucket refreshes match featured_deals on brand + created_at range.
+    """
+    await db[ROLLUP_COLLECTION].create_index("date")
+    await db.featured_deals.create_index([("brand", 1), ("created_at", 1)])
+
+
+async def refresh_rollup_buckets(db: AsyncIOMotorDatabase, buckets: Iterable[Optional[Bucket]]) -> int:
+    """
+    Re-aggregate deal counters for (day, brand) buckets from featured_deals
+
+    One aggregation and one bulk write however many buckets are given.
+
+    Args:
+        db: MongoDB database instance
+        buckets: (day, brand) pairs; None entries are ignored
+
+    Returns:
+        Number of buckets refreshed
+    """
+    from pymongo import UpdateOne
+
+    wanted: Set[Bucket] = {bucket for bucket in buckets if bucket}
+    if not wanted:
+        return 0
+
+    pipeline = [
+        {"$match": {"$or": [_bucket_match(bucket) for bucket in wanted]}},
+        _deal_group_stage()
+    ]
+    rows = await db.featured_deals.aggregate(pipeline).to_list(length=None)
+    counters = {(r["_id"]["date"], r["_id"].get("brand")): _row_counters(r) for r in rows}
+
+    operations = [
+        UpdateOne(
+            {"_id": _row_id(day, brand)},
+            {
+                "$set": counters.get((day, brand), DEAL_COUNTERS),
+                "$setOnInsert": {"date": day, "brand": brand, "changes": 0}
+            },
+            upsert=True
+        )
+        for day, brand in wanted
+    ]
+    await db[ROLLUP_COLLECTION].bulk_write(operations, ordered=False)
+
+    return len(operations)
+
+
+async def record_deal_buckets(db: AsyncIOMotorDatabase, buckets: Iterable[Optional[Bucket]]):
+    """
+    Refresh rollup rows after deal writes
+
+    Failures are logged, never raised: the deal write already succeeded and
+    backfill_analytics_rollup() repairs any drift.
+    """
+    try:
+        await refresh_rollup_buckets(db, buckets)
+    except Exception as e:
+        logger.warning(f"Analytics rollup refresh failed: {e}")
+
+
+async def record_sync_log(db: AsyncIOMotorDatabase, log_entry: Dict[str, Any]):
+    """Count a program-change sync log entry in its (day, brand) row"""
+    if log_entry.get("kind") == BRAND_SYNC_LOG_KIND:
+        return
+    day = day_key(log_entry.get("timestamp"))
+    if not day:
+        return
+    brand = log_entry.get("brand")
+
+    try:
+        await db[ROLLUP_COLLECTION].update_one(
+            {"_id": _row_id(day, brand)},
+            {
+                "$inc": {"changes": 1},
+                "$setOnInsert": {"date": day, "brand": brand, **DEAL_COUNTERS}
+            },
+            upsert=True
+        )
+    except Exception as e:
+        logger.warning(f"Analytics rollup sync log update failed: {e}")
+
+
+async def backfill_analytics_rollup(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+    """
+    Rebuild analytics_daily from featured_deals and auto_sync_logs
+
+    Returns:
+        Dict with rows written and source counts
+    """
+    rows: Dict[str, Dict[str, Any]] = {}
+
+    def row(day: str, brand: Optional[str]) -> Dict[str, Any]:
+        key = _row_id(day, brand)
+        if key not in rows:
+            rows[key] = {"_id": key, "date": day, "brand": brand, "changes": 0, **DEAL_COUNTERS}
+        return rows[key]
+
+    deal_rows = await db.featured_deals.aggregate([
+        {"$match": {"created_at": {"$type": "date"}}},
+        _deal_group_stage()
+    ]).to_list(length=None)
+    for r in deal_rows:
+        row(r["_id"]["date"], r["_id"].get("brand")).update(_row_counters(r))
+
+    log_rows = await db.auto_sync_logs.aggregate([
+        {"$match": PROGRAM_CHANGE_LOG_MATCH},
+        {
+            "$group": {
+                "_id": {
+                    "date": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
+                    "brand": "$brand"
+                },
+                "changes": {"$sum": 1}
+            }
+        }
+    ]).to_list(length=None)
+    for r in log_rows:
+        row(r["_id"]["date"], r["_id"].get("brand"))["changes"] = r["changes"]
+
+    await db[ROLLUP_COLLECTION].delete_many({})
+    if rows:
+        await db[ROLLUP_COLLECTION].insert_many(list(rows.values()))
+
+    logger.info(f"Analytics rollup backfilled: {len(rows)} rows from {len(deal_rows)} deal and {len(log_rows)} log groups")
+
+    return {
+        "rows": len(rows),
+        "deal_groups": len(deal_rows),
+        "log_groups": len(log_rows)
+    }
+
+
+async def ensure_analytics_rollup(db: AsyncIOMotorDatabase):
+    """Backfill once if the rollup is empty but deals exist (first deploy)"""
+    if await db[ROLLUP_COLLECTION].find_one({}, {"_id": 1}):
+        return
+    if await db.featured_deals.find_one({}, {"_id": 1}) or await db.auto_sync_logs.find_one({}, {"_id": 1}):
+        await backfill_analytics_rollup(db)
+
+
+async def get_daily_rollup(
+    db: AsyncIOMotorDatabase,
+    days: int = 30
+) -> List[Dict[str, Any]]:
+    """
+    Per-day totals (all brands) for the last N days
+
+    Whole UTC days: the first day is counted in full.
+
+    Returns:
+        List of {date, deals, payment_count, payment_sum, payment_min,
+        payment_max, changes} sorted by date
+    """
+    start_day = day_key(datetime.now(timezone.utc) - timedelta(days=days))
+
+    pipeline = [
+        {"$match": {"date": {"$gte": start_day}}},
+        {
+            "$group": {
+                "_id": "$date",
+                "deals": {"$sum": "$deals"},
+                "payment_count": {"$sum": "$payment_count"},
+                "payment_sum": {"$sum": "$payment_sum"},
+                "payment_min": {"$min": "$payment_min"},
+                "payment_max": {"$max": "$payment_max"},
+                "changes": {"$sum": "$changes"}
+            }
+        },
+        {"$sort": {"_id": 1}}
+    ]
+
+    rows = await db[ROLLUP_COLLECTION].aggregate(pipeline).to_list(length=None)
+
+    return [{"date": r.pop("_id"), **r} for r in rows]
+
+
+if __name__ == "__main__":
+    import asyncio
+    from database import connect_to_mongo, close_mongo_connection, get_database
+
+    async def main():
+        await connect_to_mongo()
+        try:
+            result = await backfill_analytics_rollup(get_database())
+            print(f"Backfilled {result['rows']} analytics_daily rows")
+        finally:
+            await close_mongo_connection()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
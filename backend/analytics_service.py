@@ -8,6 +8,8 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 import logging
 from datetime import datetime, timedelta, timezone
 
+from analytics_rollup import get_daily_rollup
+
 logger = logging.getLogger(__name__)
 
 
@@ -180,7 +182,7 @@ async def get_payment_trends(
     days: int = 30
 ) -> List[Dict[str, Any]]:
     """
-    Get payment trends over time
+    Get payment trends over time (from the analytics_daily rollup)
     
     Args:
         days: Number of days to analyze
@@ -188,32 +190,14 @@ async def get_payment_trends(
     Returns:
         List of {date, avg_payment, count}
     """
-    start_date = datetime.now(timezone.utc) - timedelta(days=days)
-    
-    pipeline = [
-        {"$match": {"created_at": {"$gte": start_date}}},
-        {
-            "$group": {
-                "_id": {
-                    "$dateToString": {
-                        "format": "%Y-%m-%d",
-                        "date": "$created_at"
-                    }
-                },
-                "count": {"$sum": 1},
-                "avg_payment": {"$avg": "$calculated_payment"}
-            }
-        },
-        {"$sort": {"_id": 1}}
-    ]
-    
-    results = await db.featured_deals.aggregate(pipeline).to_list(length=None)
+    rows = await get_daily_rollup(db, days=days)
     
     return [
         {
-            "date": r["_id"],
-            "count": r["count"],
-            "avg_payment": r.get("avg_payment", 0)
+            "date": r["date"],
+            "count": r["deals"],
+            "avg_payment": r["payment_sum"] / r["payment_count"] if r["payment_count"] else None
         }
-        for r in results
+        for r in rows
+        if r["deals"] > 0
     ]
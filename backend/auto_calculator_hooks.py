@@ -2,7 +2,8 @@
 Auto Calculator Hooks
 Автоматически обновляет calculator_config_cached для лотов при сохранении
 """
-from calculator_config_service import CalculatorConfigService
+from calculator_config_service import CalculatorConfigService, LOT_CONFIG_PROJECTION
+from calculator_program_matcher import get_calculator_program_matcher
 from motor.motor_asyncio import AsyncIOMotorDatabase
 import logging
 import re
@@ -35,7 +36,7 @@ async def update_lot_calculator_config(lot_dict: dict, db: AsyncIOMotorDatabase)
     Логика:
     - если calculator_config_auto = False → ничего не делаем
     - если есть calculator_config_manual_json (ручной JSON) → авто-конфиг не трогаем
-    - иначе вызываем generate_calculator_config(lot.id) и сохраняем результат в lot.calculator_config_cached
+    - иначе строим конфиг из данных лота (generate_config_for_lot) и сохраняем результат в lot.calculator_config_cached
     
     Args:
         lot_dict: словарь с данными лота
@@ -57,7 +58,7 @@ async def update_lot_calculator_config(lot_dict: dict, db: AsyncIOMotorDatabase)
     # Генерируем конфиг
     try:
         service = CalculatorConfigService(db)
-        config = await service.generate_calculator_config(lot_dict.get('id'))
+        config = await service.generate_config_for_lot(lot_dict)
         lot_dict['calculator_config_cached'] = config
         logger.info(f"Lot {lot_dict.get('id')}: calculator config auto-generated")
     except Exception as e:
@@ -68,23 +69,46 @@ async def update_lot_calculator_config(lot_dict: dict, db: AsyncIOMotorDatabase)
     return lot_dict
 
 
-async def update_lots_for_lease_program(program: dict, db: AsyncIOMotorDatabase):
+async def update_lots_matching(query: dict, db: AsyncIOMotorDatabase, label: str) -> int:
     """
-    Обновляет calculator_config_cached для всех лотов, подходящих под lease программу.
+    Пересчитывает calculator_config_cached для всех лотов по запросу.
+    
+    Программы перечитываются один раз (matcher), конфиги считаются в памяти
+    для всех лотов и записываются через bulk_write.
     
     Args:
-        program: словарь с данными LeaseProgram
+        query: фильтр по коллекции lots
         db: database instance
+        label: описание для логов
+        
+    Returns:
+        Количество обновлённых лотов
     """
+    # Programs/tax configs just changed: reload them before resolving
+    get_calculator_program_matcher().invalidate()
+    
+    lots = await db.lots.find(query, LOT_CONFIG_PROJECTION).to_list(length=None)
+    
+    logger.info(f"Found {len(lots)} lots matching {label}")
+    
+    lots = [lot for lot in lots if should_update_lot(lot)]
+    
+    service = CalculatorConfigService(db)
+    configs = await service.generate_configs_for_lots(lots)
+    updated_count = await service.write_configs(configs, field='calculator_config_cached')
+    
+    logger.info(f"Updated {updated_count} lots for {label}")
+    return updated_count
+
+
+def _program_lots_query(program: dict) -> dict:
+    """Фильтр лотов, которые могут подходить под lease/finance программу"""
     brand = program.get('brand', '')
     year_from = program.get('year_from', 0)
     year_to = program.get('year_to', 9999)
     states = program.get('states', ['ALL'])
     model_pattern = program.get('model_pattern', '')
     
-    logger.info(f"Updating lots for lease program: {brand} {year_from}-{year_to}")
-    
-    # Build query
     query = {
         'brand': {'$regex': f'^{re.escape(brand)}$', '$options': 'i'},
         'year': {'$gte': year_from, '$lte': year_to}
@@ -98,37 +122,21 @@ async def update_lots_for_lease_program(program: dict, db: AsyncIOMotorDatabase)
     if model_pattern:
         query['model'] = {'$regex': model_pattern, '$options': 'i'}
     
-    # Find matching lots
-    lots = await db.lots.find(query).to_list(length=None)
-    
-    logger.info(f"Found {len(lots)} lots matching lease program")
+    return query
+
+
+async def update_lots_for_lease_program(program: dict, db: AsyncIOMotorDatabase):
+    """
+    Обновляет calculator_config_cached для всех лотов, подходящих под lease программу.
     
-    updated_count = 0
-    service = CalculatorConfigService(db)
+    Args:
+        program: словарь с данными LeaseProgram
+        db: database instance
+    """
+    brand = program.get('brand', '')
+    logger.info(f"Updating lots for lease program: {brand} {program.get('year_from', 0)}-{program.get('year_to', 9999)}")
     
-    for lot in lots:
-        try:
-            if not should_update_lot(lot):
-                continue
-            
-            # Generate new config
-            config = await service.generate_calculator_config(lot['id'])
-            
-            # Update in database
-            await db.lots.update_one(
-                {'id': lot['id']},
-                {'$set': {'calculator_config_cached': config}}
-            )
-            
-            updated_count += 1
-            logger.debug(f"Updated calculator for lot {lot['id']}")
-            
-        except Exception as e:
-            logger.error(f"Failed to update lot {lot.get('id')}: {e}")
-            continue
-    
-    logger.info(f"Updated {updated_count} lots for lease program {brand}")
-    return updated_count
+    return await update_lots_matching(_program_lots_query(program), db, f"lease program {brand}")
 
 
 async def update_lots_for_finance_program(program: dict, db: AsyncIOMotorDatabase):
@@ -140,53 +148,9 @@ async def update_lots_for_finance_program(program: dict, db: AsyncIOMotorDatabas
         db: database instance
     """
     brand = program.get('brand', '')
-    year_from = program.get('year_from', 0)
-    year_to = program.get('year_to', 9999)
-    states = program.get('states', ['ALL'])
-    model_pattern = program.get('model_pattern', '')
-    
-    logger.info(f"Updating lots for finance program: {brand} {year_from}-{year_to}")
-    
-    # Build query (same logic as lease)
-    query = {
-        'brand': {'$regex': f'^{re.escape(brand)}$', '$options': 'i'},
-        'year': {'$gte': year_from, '$lte': year_to}
-    }
-    
-    if 'ALL' not in states:
-        query['state'] = {'$in': states}
+    logger.info(f"Updating lots for finance program: {brand} {program.get('year_from', 0)}-{program.get('year_to', 9999)}")
     
-    if model_pattern:
-        query['model'] = {'$regex': model_pattern, '$options': 'i'}
-    
-    lots = await db.lots.find(query).to_list(length=None)
-    
-    logger.info(f"Found {len(lots)} lots matching finance program")
-    
-    updated_count = 0
-    service = CalculatorConfigService(db)
-    
-    for lot in lots:
-        try:
-            if not should_update_lot(lot):
-                continue
-            
-            config = await service.generate_calculator_config(lot['id'])
-            
-            await db.lots.update_one(
-                {'id': lot['id']},
-                {'$set': {'calculator_config_cached': config}}
-            )
-            
-            updated_count += 1
-            logger.debug(f"Updated calculator for lot {lot['id']}")
-            
-        except Exception as e:
-            logger.error(f"Failed to update lot {lot.get('id')}: {e}")
-            continue
-    
-    logger.info(f"Updated {updated_count} lots for finance program {brand}")
-    return updated_count
+    return await update_lots_matching(_program_lots_query(program), db, f"finance program {brand}")
 
 
 async def update_lots_for_tax_config(tax_config: dict, db: AsyncIOMotorDatabase):
@@ -211,31 +175,4 @@ async def update_lots_for_tax_config(tax_config: dict, db: AsyncIOMotorDatabase)
         prefix_pattern = '^(' + '|'.join(re.escape(p) for p in zip_prefixes) + ')'
         query['zip'] = {'$regex': prefix_pattern}
     
-    lots = await db.lots.find(query).to_list(length=None)
-    
-    logger.info(f"Found {len(lots)} lots matching tax config")
-    
-    updated_count = 0
-    service = CalculatorConfigService(db)
-    
-    for lot in lots:
-        try:
-            if not should_update_lot(lot):
-                continue
-            
-            config = await service.generate_calculator_config(lot['id'])
-            
-            await db.lots.update_one(
-                {'id': lot['id']},
-                {'$set': {'calculator_config_cached': config}}
-            )
-            
-            updated_count += 1
-            logger.debug(f"Updated calculator for lot {lot['id']}")
-            
-        except Exception as e:
-            logger.error(f"Failed to update lot {lot.get('id')}: {e}")
-            continue
-    
-    logger.info(f"Updated {updated_count} lots for tax config {state}")
-    return updated_count
+    return await update_lots_matching(query, db, f"tax config {state}")
@@ -3,12 +3,16 @@ Multi-Brand AutoSync Management
 
 Manage AutoSync operations per brand independently
 """
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
+import asyncio
 import logging
-from datetime import datetime
+import time
+
+from config import get_settings
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 # Supported brands (from parsers)
 SUPPORTED_BRANDS = ["Toyota", "Lexus", "Honda", "Acura", "Kia", "Hyundai", "BMW", "Mercedes"]
@@ -19,6 +23,26 @@ def get_supported_brands() -> List[str]:
     return SUPPORTED_BRANDS
 
 
+async def create_sync_log_indexes(db: AsyncIOMotorDatabase):
+    """Index for the latest sync log per brand (brand statuses)"""
+    await db.auto_sync_logs.create_index([("brand", 1), ("timestamp", -1)])
+
+
+async def get_last_sync_log(db: AsyncIOMotorDatabase, brand: str) -> Optional[Dict[str, Any]]:
+    """
+    Latest sync log for a brand (any capitalisation) via the {brand, timestamp} index
+    
+    Returns:
+        {timestamp, deals_count} or None
+    """
+    spellings = list({brand, brand.lower(), brand.upper(), brand.capitalize()})
+    return await db.auto_sync_logs.find_one(
+        {"brand": {"$in": spellings}},
+        {"_id": 0, "timestamp": 1, "deals_count": 1},
+        sort=[("timestamp", -1)]
+    )
+
+
 async def get_brand_status(db: AsyncIOMotorDatabase, brand: str) -> Dict[str, Any]:
     """
     Get sync status for a specific brand
@@ -30,55 +54,135 @@ async def get_brand_status(db: AsyncIOMotorDatabase, brand: str) -> Dict[str, An
     Returns:
         Status dict with programs count, deals count, last sync
     """
-    # Count programs
-    programs_count = await db.lease_programs_parsed.count_documents({
-        "brand": {"$regex": f"^{brand}$", "$options": "i"}
-    })
-    
-    # Count deals
-    deals_count = await db.featured_deals.count_documents({
-        "brand": {"$regex": f"^{brand}$", "$options": "i"}
-    })
-    
-    # Get last sync log
-    last_sync = await db.auto_sync_logs.find_one(
-        {"brand": {"$regex": f"^{brand}$", "$options": "i"}},
-        sort=[("timestamp", -1)]
+    statuses = await get_all_brand_statuses(db, brands=[brand])
+    return statuses[0]
+
+
+async def get_all_brand_statuses(
+    db: AsyncIOMotorDatabase,
+    brands: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Get sync status for several brands in one aggregation
+    
+    lease_programs_parsed and featured_deals are combined with
+    $unionWith, then a $facet groups program and deal counts per
+    lowercased brand. The latest sync log per brand is a separate indexed
+    lookup ({brand, timestamp}), so the log history is never scanned.
+    
+    Args:
+        db: Database instance
+        brands: Brands to report (defaults to SUPPORTED_BRANDS)
+        
+    Returns:
+        List of status dicts in the order of brands
+    """
+    brands = brands or SUPPORTED_BRANDS
+    brand_keys = [b.lower() for b in brands]
+    
+    def tagged(kind: str, extra: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return [
+            {"$project": {"_id": 0, "kind": {"$literal": kind}, "brand_key": {"$toLower": "$brand"}, **(extra or {})}},
+            {"$match": {"brand_key": {"$in": brand_keys}}}
+        ]
+    
+    pipeline = [
+        *tagged("program"),
+        {"$unionWith": {"coll": "featured_deals", "pipeline": tagged("deal")}},
+        {"$facet": {
+            "programs": [
+                {"$match": {"kind": "program"}},
+                {"$group": {"_id": "$brand_key", "count": {"$sum": 1}}}
+            ],
+            "deals": [
+                {"$match": {"kind": "deal"}},
+                {"$group": {"_id": "$brand_key", "count": {"$sum": 1}}}
+            ]
+        }}
+    ]
+    
+    results, last_sync_rows = await asyncio.gather(
+        db.lease_programs_parsed.aggregate(pipeline).to_list(length=1),
+        asyncio.gather(*(get_last_sync_log(db, brand) for brand in brands))
     )
+    facets = results[0] if results else {}
     
-    return {
-        "brand": brand,
-        "programs_count": programs_count,
-        "deals_count": deals_count,
-        "last_sync_time": last_sync.get("timestamp") if last_sync else None,
-        "last_sync_deals_updated": last_sync.get("deals_count", 0) if last_sync else 0,
-        "status": "ok" if programs_count > 0 else "no_programs"
-    }
+    programs = {row["_id"]: row["count"] for row in facets.get("programs", [])}
+    deals = {row["_id"]: row["count"] for row in facets.get("deals", [])}
+    last_syncs = dict(zip(brand_keys, last_sync_rows))
+    
+    statuses = []
+    for brand, key in zip(brands, brand_keys):
+        programs_count = programs.get(key, 0)
+        last_sync = last_syncs.get(key)
+        statuses.append({
+            "brand": brand,
+            "programs_count": programs_count,
+            "deals_count": deals.get(key, 0),
+            "last_sync_time": last_sync.get("timestamp") if last_sync else None,
+            "last_sync_deals_updated": (last_sync.get("deals_count") or 0) if last_sync else 0,
+            "status": "ok" if programs_count > 0 else "no_programs"
+        })
+    
+    return statuses
 
 
-async def run_sync_for_brand(db: AsyncIOMotorDatabase, brand: str) -> Dict[str, Any]:
+async def run_sync_for_brand(
+    db: AsyncIOMotorDatabase,
+    brand: str,
+    reload_programs: bool = True
+) -> Dict[str, Any]:
     """
     Run AutoSync for a specific brand only
     
     Args:
         db: Database instance
         brand: Brand name
+        reload_programs: Reload the program registry before pricing
         
     Returns:
-        Sync result dict
+        Sync result dict with timing (wall_time_seconds, deals_per_second,
+        db_operations)
     """
-    from auto_sync_engine import recalc_featured_deals_for_brand_model
+    from auto_sync_engine import recalculate_deals_pipelined, write_sync_log
+    from analytics_rollup import BRAND_SYNC_LOG_KIND
     from monitoring import log_sync_status
     from notifications import add_in_app_notification
     
     logger.info(f"Running sync for brand: {brand}")
     
+    started = time.perf_counter()
+    
     try:
         # Recalculate deals for this brand
-        updated_count = await recalc_featured_deals_for_brand_model(db, brand, model=None)
+        stats = await recalculate_deals_pipelined(
+            db,
+            query={"brand": {"$regex": f"^{brand}$", "$options": "i"}},
+            reload_programs=reload_programs
+        )
+        updated_count = stats["success"]
+        
+        wall_time = time.perf_counter() - started
+        metrics = {
+            "wall_time_seconds": round(wall_time, 3),
+            "deals_per_second": round(stats["total"] / wall_time, 1) if wall_time > 0 else None,
+            "db_operations": stats["db_operations"] + 1,  # + this log entry
+            "deals_total": stats["total"],
+            "deals_failed": stats["failed"]
+        }
+        
+        await write_sync_log(
+            db,
+            brand=brand,
+            model=None,
+            changes={},
+            deals_updated=stats["updated_ids"],
+            metrics=metrics,
+            kind=BRAND_SYNC_LOG_KIND
+        )
         
         # Log success
-        log_sync_status("OK", f"Brand {brand}: {updated_count} deals updated")
+        log_sync_status("OK", f"Brand {brand}: {updated_count} deals updated in {metrics['wall_time_seconds']}s")
         
         # Notification
         if updated_count > 0:
@@ -90,7 +194,8 @@ async def run_sync_for_brand(db: AsyncIOMotorDatabase, brand: str) -> Dict[str,
         return {
             "brand": brand,
             "deals_updated": updated_count,
-            "status": "success"
+            "status": "success",
+            **metrics
         }
         
     except Exception as e:
@@ -103,28 +208,52 @@ async def run_sync_for_brand(db: AsyncIOMotorDatabase, brand: str) -> Dict[str,
             "brand": brand,
             "deals_updated": 0,
             "status": "failed",
-            "error": str(e)
+            "error": str(e),
+            "wall_time_seconds": round(time.perf_counter() - started, 3)
         }
 
 
-async def run_all_brand_syncs(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+async def run_all_brand_syncs(
+    db: AsyncIOMotorDatabase,
+    max_concurrency: Optional[int] = None
+) -> Dict[str, Any]:
     """
-    Run sync for all supported brands
+    Run sync for all supported brands concurrently
+    
+    Args:
+        db: Database instance
+        max_concurrency: Brands synced at once (defaults to SYNC_MAX_CONCURRENCY)
     
     Returns:
         Summary of all syncs
     """
-    results = []
-    total_updated = 0
+    from program_registry import get_program_registry
+    
+    max_concurrency = max_concurrency or settings.SYNC_MAX_CONCURRENCY
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    started = time.perf_counter()
+    
+    # Load programs once for every brand
+    registry = get_program_registry()
+    registry.invalidate()
+    await registry.ensure_loaded(db)
     
-    for brand in SUPPORTED_BRANDS:
-        result = await run_sync_for_brand(db, brand)
-        results.append(result)
-        total_updated += result.get("deals_updated", 0)
+    async def sync_one(brand: str) -> Dict[str, Any]:
+        async with semaphore:
+            return await run_sync_for_brand(db, brand, reload_programs=False)
     
-    logger.info(f"All brands sync complete: {total_updated} total deals updated")
+    results = await asyncio.gather(*(sync_one(brand) for brand in SUPPORTED_BRANDS))
+    total_updated = sum(result.get("deals_updated", 0) for result in results)
+    wall_time = time.perf_counter() - started
+    
+    logger.info(
+        f"All brands sync complete: {total_updated} total deals updated "
+        f"in {wall_time:.3f}s (concurrency {max_concurrency})"
+    )
     
     return {
-        "brands": results,
-        "total_deals_updated": total_updated
+        "brands": list(results),
+        "total_deals_updated": total_updated,
+        "wall_time_seconds": round(wall_time, 3),
+        "max_concurrency": max_concurrency
     }
@@ -14,6 +14,12 @@ logger = logging.getLogger(__name__)
 _background_task = None
 _should_run = False
 
+# Archive runs every ARCHIVE_INTERVAL; the worker beats every HEARTBEAT_INTERVAL
+ARCHIVE_INTERVAL = 3600
+HEARTBEAT_INTERVAL = 60
+_last_heartbeat = None
+_last_run = None
+
 async def archive_expired_offers():
     """
     Archive offers strategically:
@@ -104,7 +110,7 @@ async def archive_expired_offers():
 
 async def background_worker():
     """Run background tasks periodically"""
-    global _should_run
+    global _should_run, _last_heartbeat, _last_run
     
     logger.info("🔄 Background worker started")
     
@@ -112,9 +118,12 @@ async def background_worker():
         try:
             # Run archiving task
             await archive_expired_offers()
+            _last_run = datetime.now(timezone.utc)
             
-            # Wait 1 hour before next run
-            await asyncio.sleep(3600)
+            # Wait 1 hour before next run, beating for health probes
+            for _ in range(ARCHIVE_INTERVAL // HEARTBEAT_INTERVAL):
+                _last_heartbeat = datetime.now(timezone.utc)
+                await asyncio.sleep(HEARTBEAT_INTERVAL)
             
         except asyncio.CancelledError:
             logger.info("Background worker cancelled")
@@ -150,3 +159,21 @@ async def stop_background_tasks():
         _background_task = None
     
     logger.info("🛑 Background tasks stopped")
+
+def get_background_status() -> dict:
+    """
+    Worker state for health probes
+    
+    Returns:
+        running (task alive), last_heartbeat and last_run (ISO or None)
+        and heartbeat_age_seconds
+    """
+    running = _background_task is not None and not _background_task.done()
+    age = (datetime.now(timezone.utc) - _last_heartbeat).total_seconds() if _last_heartbeat else None
+    return {
+        "running": running,
+        "last_heartbeat": _last_heartbeat.isoformat() if _last_heartbeat else None,
+        "last_run": _last_run.isoformat() if _last_run else None,
+        "heartbeat_age_seconds": round(age, 1) if age is not None else None,
+        "heartbeat_interval_seconds": HEARTBEAT_INTERVAL
+    }
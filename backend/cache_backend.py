@@ -0,0 +1,557 @@
+"""
+Cache Backend
+
+In-process LRU+TTL cache with a byte budget, plus an optional SQLite tier
+shared by every worker on the box (no Redis needed). Used by
+performance.CacheManager (when Redis is absent) and simple_cache.SimpleCache.
+
+- MemoryCache: OrderedDict LRU; expired entries are dropped from a heap of
+  expiry times on every write, so they never sit in memory until read.
+- SQLiteCacheTier: pickled entries in a WAL-mode SQLite file (put it on
+  /dev/shm for a RAM-backed file); trimmed to its own byte budget.
+- TieredCache: memory in front of the shared tier, with hit/miss/eviction
+  counters and single-flight get_or_set() so concurrent misses for one key
+  run the loader once.
+"""
+import asyncio
+import fnmatch
+import heapq
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Returned by tier lookups on a miss (None is a cacheable value)
+MISSING = object()
+
+# Fixed per-entry overhead added to the pickled size (key, tuple, dict slot)
+ENTRY_OVERHEAD_BYTES = 100
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory cost of a cached value (its pickled size)"""
+    try:
+        return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)) + ENTRY_OVERHEAD_BYTES
+    except Exception:
+        return len(repr(value)) + ENTRY_OVERHEAD_BYTES
+
+
+class MemoryCache:
+    """Thread-safe LRU cache with per-entry TTL and entry/byte limits"""
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _purge_expired(self, now: float):
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expires_at, key = heapq.heappop(heap)
+            entry = self._entries.get(key)
+            # Heap entries of overwritten keys are stale; skip them
+            if entry is not None and entry[1] == expires_at:
+                self._drop(key)
+                self.expirations += 1
+
+        # Overwrites leave stale heap entries behind; rebuild when they dominate
+        if len(heap) > 2 * len(self._entries) + 64:
+            self._expiry_heap = [(entry[1], key) for key, entry in self._entries.items()]
+            heapq.heapify(self._expiry_heap)
+
+    def get(self, key: str, default: Any = MISSING) -> Any:
+        """Value for key (refreshing its LRU position), or default"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def ttl_remaining(self, key: str) -> Optional[float]:
+        """Seconds until key expires (None if absent)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return max(0.0, entry[1] - time.monotonic())
+
+    def set(self, key: str, value: Any, ttl: float, size: Optional[int] = None) -> bool:
+        """
+        Store value for ttl seconds, evicting least recently used entries
+
+        Returns:
+            False if the value alone exceeds the byte budget (not stored)
+        """
+        if size is None:
+            size = estimate_size(value)
+        if size > self.max_bytes:
+            return False
+
+        now = time.monotonic()
+        expires_at = now + ttl
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            heapq.heappush(self._expiry_heap, (expires_at, key))
+
+            self._purge_expired(now)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+        return True
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._drop(key)
+            return True
+
+    def delete_pattern(self, pattern: str) -> int:
+        """Delete keys matching a glob pattern"""
+        with self._lock:
+            keys = [key for key in self._entries if fnmatch.fnmatchcase(key, pattern)]
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._expiry_heap.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+class SQLiteCacheTier:
+    """
+    Cache entries in a SQLite file shared by processes on one machine
+
+    Expiry uses wall-clock time (monotonic clocks are per process). Values
+    are pickled, so only this application's workers should share the file.
+
+    Calls run on the event loop, so the busy timeout is a few milliseconds:
+    when another worker holds the write lock a read is a miss and a write
+    is skipped. Trims, and deletes that hit a busy file, run on their own
+    connection in a background thread where waiting is harmless.
+    """
+
+    # Trim to the byte budget every N writes
+    TRIM_EVERY = 200
+    # Longest a call on the event loop waits for another worker's lock
+    BUSY_TIMEOUT = 0.005
+    # Lock wait for background trims and delete retries
+    BACKGROUND_TIMEOUT = 5.0
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._trimming = threading.Event()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+        self.busy = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=self.BUSY_TIMEOUT, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL, size INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+
+    def get(self, key: str) -> Tuple[Any, Optional[float]]:
+        """
+        Returns:
+            (value, seconds left) or (MISSING, None)
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM cache WHERE key = ? AND expires_at > ?",
+                    (key, now)
+                ).fetchone()
+            if row is None:
+                self.misses += 1
+                return MISSING, None
+            value = pickle.loads(row[0])
+        except sqlite3.OperationalError as e:
+            if not self._note_busy(e):
+                logger.warning(f"Shared cache read failed for {key}: {e}")
+            self.misses += 1
+            return MISSING, None
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Shared cache read failed for {key}: {e}")
+            return MISSING, None
+
+        self.hits += 1
+        return value, row[1] - now
+
+    def set(self, key: str, value: Any, ttl: float) -> bool:
+        try:
+            blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.debug(f"Shared cache skipped unpicklable value for {key}: {e}")
+            return False
+        if len(blob) > self.max_bytes:
+            return False
+
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, expires_at, size) VALUES (?, ?, ?, ?)",
+                    (key, blob, time.time() + ttl, len(blob))
+                )
+                self._writes += 1
+                trim = self._writes % self.TRIM_EVERY == 0
+        except sqlite3.OperationalError as e:
+            if not self._note_busy(e):
+                logger.warning(f"Shared cache write failed for {key}: {e}")
+            return False
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Shared cache write failed for {key}: {e}")
+            return False
+
+        if trim and not self._trimming.is_set():
+            self._trimming.set()
+            threading.Thread(target=self._background_trim, name="cache-trim", daemon=True).start()
+        return True
+
+    def _note_busy(self, error: sqlite3.OperationalError) -> bool:
+        """Count a lock timeout (True) or an ordinary error (False)"""
+        message = str(error).lower()
+        if "locked" in message or "busy" in message:
+            self.busy += 1
+            return True
+        self.errors += 1
+        return False
+
+    def _background_connection(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=self.BACKGROUND_TIMEOUT, isolation_level=None)
+
+    def _background_trim(self):
+        try:
+            conn = self._background_connection()
+            try:
+                self._trim(conn)
+            finally:
+                conn.close()
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Shared cache trim failed: {e}")
+        finally:
+            self._trimming.clear()
+
+    def _trim(self, conn: sqlite3.Connection):
+        """Drop expired rows, then soonest-expiring rows until under budget"""
+        conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        excess = total - self.max_bytes
+        freed = 0
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM cache ORDER BY expires_at"):
+            doomed.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM cache WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    def _delete(self, sql: str, arg: str, what: str) -> int:
+        """
+        Run a DELETE; if another worker holds the lock, retry it in the
+        background (an invalidation must not be lost) and report 0
+        """
+        try:
+            with self._lock:
+                return self._conn.execute(sql, (arg,)).rowcount
+        except sqlite3.OperationalError as e:
+            if not self._note_busy(e):
+                logger.warning(f"Shared cache {what} failed for {arg}: {e}")
+                return 0
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Shared cache {what} failed for {arg}: {e}")
+            return 0
+
+        def retry():
+            try:
+                conn = self._background_connection()
+                try:
+                    conn.execute(sql, (arg,))
+                finally:
+                    conn.close()
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Shared cache {what} retry failed for {arg}: {e}")
+
+        threading.Thread(target=retry, name="cache-delete", daemon=True).start()
+        return 0
+
+    def delete(self, key: str) -> bool:
+        return self._delete("DELETE FROM cache WHERE key = ?", key, "delete") > 0
+
+    def delete_pattern(self, pattern: str) -> int:
+        """Delete keys matching a glob pattern (SQLite GLOB)"""
+        return self._delete("DELETE FROM cache WHERE key GLOB ?", pattern, "pattern delete")
+
+    def clear(self) -> bool:
+        """Delete every entry (blocking: async callers use asyncio.to_thread)"""
+        try:
+            with self._lock:
+                self._conn.execute("DELETE FROM cache")
+        except sqlite3.OperationalError as e:
+            self._note_busy(e)
+            logger.warning(f"Shared cache clear failed: {e}")
+            return False
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Shared cache clear failed: {e}")
+            return False
+        return True
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        try:
+            with self._lock:
+                entries, total = self._conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+                ).fetchone()
+        except Exception:
+            entries, total = None, None
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "busy": self.busy
+        }
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent loads of the same key into one task
+
+    The task is shielded, so a cancelled caller does not cancel the load for
+    the others; loader exceptions reach every waiting caller.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, "asyncio.Task"] = {}
+        self.loads = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    def _done(self, key: str, task: "asyncio.Task"):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Retrieve the exception even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.loads += 1
+            task = asyncio.ensure_future(loader())
+            task.add_done_callback(lambda t: self._done(key, t))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+
+class TieredCache:
+    """
+    Memory LRU in front of an optional shared tier
+
+    With a shared tier, memory copies live at most local_ttl seconds so
+    deletes made by other workers are seen within that bound.
+    """
+
+    def __init__(
+        self,
+        memory: MemoryCache,
+        shared: Optional[SQLiteCacheTier] = None,
+        local_ttl: Optional[float] = None
+    ):
+        self.memory = memory
+        self.shared = shared
+        self.local_ttl = local_ttl
+        self.flight = SingleFlight()
+
+    def _local_ttl(self, ttl: float) -> float:
+        if self.shared is not None and self.local_ttl is not None:
+            return min(ttl, self.local_ttl)
+        return ttl
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.memory.get(key)
+        if value is not MISSING:
+            return value
+
+        if self.shared is not None:
+            value, remaining = self.shared.get(key)
+            if value is not MISSING:
+                self.memory.set(key, value, self._local_ttl(remaining))
+                return value
+
+        return default
+
+    def set(self, key: str, value: Any, ttl: float) -> bool:
+        stored = self.memory.set(key, value, self._local_ttl(ttl))
+        if self.shared is not None:
+            stored = self.shared.set(key, value, ttl) or stored
+        return stored
+
+    def delete(self, key: str) -> bool:
+        deleted = self.memory.delete(key)
+        if self.shared is not None:
+            deleted = self.shared.delete(key) or deleted
+        return deleted
+
+    def delete_pattern(self, pattern: str) -> int:
+        deleted = self.memory.delete_pattern(pattern)
+        if self.shared is not None:
+            deleted = max(deleted, self.shared.delete_pattern(pattern))
+        return deleted
+
+    def clear(self) -> bool:
+        """
+        Empty both tiers; False if the shared tier could not be cleared
+        (blocking: async callers use asyncio.to_thread)
+        """
+        self.memory.clear()
+        if self.shared is not None:
+            return self.shared.clear()
+        return True
+
+    async def get_or_set(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float,
+        cache_none: bool = False
+    ) -> Any:
+        """
+        Cached value for key, loading it once however many callers miss
+
+        Args:
+            loader: Coroutine function producing the value
+            ttl: Seconds to cache the loaded value
+            cache_none: Whether a None result is cached
+        """
+        value = self.get(key, MISSING)
+        if value is not MISSING:
+            return value
+
+        async def load():
+            loaded = await loader()
+            if loaded is not None or cache_none:
+                self.set(key, loaded, ttl)
+            return loaded
+
+        return await self.flight.do(key, load)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "memory": self.memory.get_stats(),
+            "shared": self.shared.get_stats() if self.shared is not None else None,
+            "loads": self.flight.loads,
+            "coalesced": self.flight.coalesced,
+            "inflight": len(self.flight)
+        }
+
+
+def create_tiered_cache(
+    max_entries: int,
+    max_bytes: int,
+    shared_path: Optional[str] = None,
+    shared_max_bytes: int = 256 * 1024 * 1024,
+    local_ttl: Optional[float] = None
+) -> TieredCache:
+    """Build a TieredCache; an unusable shared_path falls back to memory only"""
+    shared = None
+    if shared_path:
+        try:
+            shared = SQLiteCacheTier(shared_path, max_bytes=shared_max_bytes)
+            logger.info(f"Shared cache tier at {shared_path}")
+        except Exception as e:
+            logger.warning(f"Shared cache tier disabled ({shared_path}): {e}")
+
+    return TieredCache(MemoryCache(max_entries=max_entries, max_bytes=max_bytes), shared, local_ttl)
@@ -4,16 +4,42 @@ Automatically generates calculator configuration for deals based on:
 - LeaseProgram
 - FinanceProgram  
 - TaxConfig
+
+Programs are matched in memory (calculator_program_matcher), so configs
+for any number of lots resolve without per-lot queries.
 """
-import re
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any, List
 from motor.motor_asyncio import AsyncIOMotorDatabase
+import logging
+
+from calculator_program_matcher import get_calculator_program_matcher
+
+logger = logging.getLogger(__name__)
+
+# UpdateOne operations per bulk_write round-trip
+CONFIG_WRITE_CHUNK_SIZE = 1000
+
+# Lot fields needed to resolve a config (and decide whether to auto-update)
+LOT_CONFIG_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "make": 1,
+    "model": 1,
+    "trim": 1,
+    "year": 1,
+    "msrp": 1,
+    "state": 1,
+    "zip": 1,
+    "calculator_config_auto": 1,
+    "calculator_config_manual_json": 1
+}
 
 
 class CalculatorConfigService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
+        self.matcher = get_calculator_program_matcher()
         
     async def generate_calculator_config(self, deal_id: str) -> Dict[str, Any]:
         """
@@ -21,23 +47,93 @@ class CalculatorConfigService:
         Returns complete CalculatorConfig object
         """
         # Get deal
-        deal = await self.db.lots.find_one({"id": deal_id})
+        deal = await self.db.lots.find_one({"id": deal_id}, LOT_CONFIG_PROJECTION)
         if not deal:
             raise ValueError(f"Deal {deal_id} not found")
         
-        # Extract deal info
-        brand = deal.get("make", "")
-        model = deal.get("model", "")
-        trim = deal.get("trim", "")
-        year = deal.get("year", 2024)
-        msrp = deal.get("msrp", 0)
-        state = deal.get("state", "CA")
-        zip_code = deal.get("zip", "")
+        return await self.generate_config_for_lot(deal)
+    
+    async def generate_config_for_lot(self, lot: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Generate calculator configuration from lot data (no lot fetch)
+        
+        Args:
+            lot: Lot dict (make, model, trim, year, msrp, state, zip)
+        """
+        await self.matcher.ensure_loaded(self.db)
+        lease_program, finance_program, tax_config = self.matcher.resolve(lot)
+        return self.build_config(lot, lease_program, finance_program, tax_config)
+    
+    async def generate_configs_for_lots(
+        self,
+        lots: List[Dict[str, Any]]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Generate calculator configurations for many lots in one pass
         
-        # Find matching programs
-        lease_program = await self._find_lease_program(brand, model, trim, year, state)
-        finance_program = await self._find_finance_program(brand, model, trim, year, state)
-        tax_config = await self._find_tax_config(state, zip_code)
+        Args:
+            lots: Lot dicts
+            
+        Returns:
+            Dict of lot id -> config (lots that fail are logged and skipped)
+        """
+        await self.matcher.ensure_loaded(self.db)
+        now = datetime.now(timezone.utc)
+        
+        configs = {}
+        for lot in lots:
+            try:
+                lease_program, finance_program, tax_config = self.matcher.resolve(lot, now=now)
+                configs[lot["id"]] = self.build_config(lot, lease_program, finance_program, tax_config)
+            except Exception as e:
+                logger.error(f"Failed to generate config for lot {lot.get('id')}: {e}")
+        
+        return configs
+    
+    async def write_configs(
+        self,
+        configs: Dict[str, Dict[str, Any]],
+        field: str = "calculator_config_cached",
+        chunk_size: int = CONFIG_WRITE_CHUNK_SIZE
+    ) -> int:
+        """
+        Store configs on their lots with unordered bulk writes
+        
+        Args:
+            configs: Dict of lot id -> config
+            field: Lot field to set
+            chunk_size: UpdateOne operations per bulk_write
+            
+        Returns:
+            Number of lots written
+        """
+        from pymongo import UpdateOne
+        
+        operations = [
+            UpdateOne({"id": lot_id}, {"$set": {field: config}})
+            for lot_id, config in configs.items()
+        ]
+        
+        written = 0
+        for i in range(0, len(operations), chunk_size):
+            chunk = operations[i:i + chunk_size]
+            try:
+                await self.db.lots.bulk_write(chunk, ordered=False)
+                written += len(chunk)
+            except Exception as e:
+                logger.error(f"Bulk config write of {len(chunk)} lots failed: {e}")
+        
+        return written
+    
+    def build_config(
+        self,
+        deal: Dict[str, Any],
+        lease_program: Optional[Dict[str, Any]],
+        finance_program: Optional[Dict[str, Any]],
+        tax_config: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Build the CalculatorConfig dict for a lot and its matched programs"""
+        msrp = deal.get("msrp", 0)
         
         # Build config
         config = {
@@ -148,141 +244,6 @@ class CalculatorConfigService:
         
         return config
     
-    async def _find_lease_program(
-        self, 
-        brand: str, 
-        model: str, 
-        trim: str, 
-        year: int, 
-        state: str
-    ) -> Optional[Dict[str, Any]]:
-        """Find matching lease program"""
-        now = datetime.now(timezone.utc)
-        
-        # Query active programs
-        query = {
-            "brand": {"$regex": f"^{re.escape(brand)}$", "$options": "i"},
-            "year_from": {"$lte": year},
-            "year_to": {"$gte": year},
-            "is_active": True,
-            "program_start": {"$lte": now},
-            "program_end": {"$gte": now}
-        }
-        
-        # State filter
-        query["$or"] = [
-            {"states": "ALL"},
-            {"states": state}
-        ]
-        
-        programs = await self.db.lease_programs.find(query).to_list(length=100)
-        
-        if not programs:
-            return None
-        
-        # Score and sort by specificity
-        scored_programs = []
-        for prog in programs:
-            score = 0
-            
-            # Model pattern match
-            model_pattern = prog.get("model_pattern", "")
-            if model_pattern:
-                if re.search(model_pattern, model, re.IGNORECASE):
-                    score += 10
-                else:
-                    continue  # Skip if model doesn't match
-            
-            # Trim pattern match (bonus)
-            trim_pattern = prog.get("trim_pattern", "")
-            if trim_pattern and trim:
-                if re.search(trim_pattern, trim, re.IGNORECASE):
-                    score += 5
-            
-            scored_programs.append((score, prog))
-        
-        if not scored_programs:
-            return None
-        
-        # Return highest scoring
-        scored_programs.sort(key=lambda x: x[0], reverse=True)
-        return scored_programs[0][1]
-    
-    async def _find_finance_program(
-        self,
-        brand: str,
-        model: str,
-        trim: str,
-        year: int,
-        state: str
-    ) -> Optional[Dict[str, Any]]:
-        """Find matching finance program (same logic as lease)"""
-        now = datetime.now(timezone.utc)
-        
-        query = {
-            "brand": {"$regex": f"^{re.escape(brand)}$", "$options": "i"},
-            "year_from": {"$lte": year},
-            "year_to": {"$gte": year},
-            "is_active": True,
-            "program_start": {"$lte": now},
-            "program_end": {"$gte": now}
-        }
-        
-        query["$or"] = [
-            {"states": "ALL"},
-            {"states": state}
-        ]
-        
-        programs = await self.db.finance_programs.find(query).to_list(length=100)
-        
-        if not programs:
-            return None
-        
-        scored_programs = []
-        for prog in programs:
-            score = 0
-            model_pattern = prog.get("model_pattern", "")
-            if model_pattern:
-                if re.search(model_pattern, model, re.IGNORECASE):
-                    score += 10
-                else:
-                    continue
-            
-            trim_pattern = prog.get("trim_pattern", "")
-            if trim_pattern and trim:
-                if re.search(trim_pattern, trim, re.IGNORECASE):
-                    score += 5
-            
-            scored_programs.append((score, prog))
-        
-        if not scored_programs:
-            return None
-        
-        scored_programs.sort(key=lambda x: x[0], reverse=True)
-        return scored_programs[0][1]
-    
-    async def _find_tax_config(self, state: str, zip_code: str) -> Optional[Dict[str, Any]]:
-        """Find matching tax configuration"""
-        # Try zip prefix match first
-        if zip_code and len(zip_code) >= 2:
-            zip_prefix = zip_code[:2]
-            tax_config = await self.db.tax_configs.find_one({
-                "state": state,
-                "zip_prefixes": zip_prefix,
-                "is_active": True
-            })
-            if tax_config:
-                return tax_config
-        
-        # Fall back to state-wide
-        tax_config = await self.db.tax_configs.find_one({
-            "state": state,
-            "zip_prefixes": {"$size": 0},
-            "is_active": True
-        })
-        
-        return tax_config
-    
     def _build_residual_table(
         self,
         terms: List[int],
@@ -311,18 +272,11 @@ class CalculatorConfigService:
     
     async def regenerate_all_auto_configs(self):
         """Regenerate calculator configs for all deals with auto-generation enabled"""
-        deals = await self.db.lots.find({"calculator_config_auto": True}).to_list(length=None)
-        
-        regenerated = 0
-        for deal in deals:
-            try:
-                config = await self.generate_calculator_config(deal["id"])
-                await self.db.lots.update_one(
-                    {"id": deal["id"]},
-                    {"$set": {"calculator_config": config}}
-                )
-                regenerated += 1
-            except Exception as e:
-                print(f"Failed to regenerate config for deal {deal['id']}: {e}")
+        self.matcher.invalidate()
+        deals = await self.db.lots.find(
+            {"calculator_config_auto": True},
+            LOT_CONFIG_PROJECTION
+        ).to_list(length=None)
         
-        return regenerated
+        configs = await self.generate_configs_for_lots(deals)
+        return await self.write_configs(configs, field="calculator_config")
@@ -0,0 +1,379 @@
+"""
+Calculator Program Matcher
+
+In-memory matcher for calculator configs. Active lease programs,
+finance programs and tax configs are loaded once (one query per
+collection) with model/trim patterns pre-compiled, then resolved for
+any number of lots without further round-trips.
+
+Programs are bucketed by (brand, state) with year intervals sorted by
+year_from; tax configs are keyed by (state, zip prefix). Resolutions
+are cached per lot signature until the next program window boundary.
+
+Match rules mirror the original per-lot Mongo queries:
+- brand: case-insensitive exact match
+- year_from <= year <= year_to
+- is_active, program_start <= now <= program_end
+- states contains "ALL" or the lot state
+- model_pattern (if set) must match the model: +10
+- trim_pattern matching the trim: +5
+- highest score wins, ties go to the first program in collection order
+"""
+from typing import Dict, List, Optional, Any, Pattern, Tuple
+from datetime import datetime, timezone, timedelta
+from functools import lru_cache
+from motor.motor_asyncio import AsyncIOMotorDatabase
+import asyncio
+import bisect
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# Reload at least this often so other workers' writes become visible
+DEFAULT_MAX_AGE_SECONDS = 300
+
+# Resolution cache entries (distinct brand/model/trim/year/state signatures)
+MAX_RESOLVED_KEYS = 50000
+
+
+@lru_cache(maxsize=1024)
+def compile_pattern(pattern: str) -> Optional[Pattern]:
+    """
+    Compile a model/trim pattern (case-insensitive), cached
+
+    Returns:
+        Compiled pattern, or None if the pattern is invalid
+    """
+    try:
+        return re.compile(pattern, re.IGNORECASE)
+    except re.error as e:
+        logger.warning(f"Invalid calculator program pattern {pattern!r}: {e}")
+        return None
+
+
+def _as_utc(value: Any) -> Optional[datetime]:
+    """Datetimes from Mongo are naive UTC"""
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class CompiledCalculatorProgram:
+    """Lease/finance program with match fields pre-parsed"""
+
+    __slots__ = ("program", "brand_key", "year_from", "year_to", "start", "end", "model_re", "trim_re", "valid")
+
+    def __init__(self, program: Dict[str, Any]):
+        self.program = program
+        self.brand_key = str(program.get("brand") or "").lower()
+        self.year_from = program.get("year_from")
+        self.year_to = program.get("year_to")
+        self.start = _as_utc(program.get("program_start"))
+        self.end = _as_utc(program.get("program_end"))
+
+        model_pattern = program.get("model_pattern", "")
+        trim_pattern = program.get("trim_pattern", "")
+        self.model_re = compile_pattern(model_pattern) if model_pattern else None
+        self.trim_re = compile_pattern(trim_pattern) if trim_pattern else None
+
+        # An invalid model pattern can never match
+        self.valid = not (model_pattern and self.model_re is None)
+
+    def score(self, model: str, trim: str) -> Optional[int]:
+        """Specificity score, or None if the model pattern does not match"""
+        score = 0
+        if self.model_re is not None:
+            if not self.model_re.search(model):
+                return None
+            score += 10
+        if self.trim_re is not None and trim:
+            if self.trim_re.search(trim):
+                score += 5
+        return score
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _field_values(field: Any) -> List[str]:
+    """Values a Mongo equality match would see for an array or scalar field"""
+    if isinstance(field, list):
+        return list(dict.fromkeys(str(value) for value in field))
+    if field is None:
+        return []
+    return [str(field)]
+
+
+class YearIntervals:
+    """Programs of one bucket sorted by year_from; stabbing query by year"""
+
+    __slots__ = ("year_froms", "entries")
+
+    def __init__(self, entries: List[Tuple[int, CompiledCalculatorProgram]]):
+        entries = sorted(entries, key=lambda entry: entry[1].year_from)
+        self.year_froms = [compiled.year_from for _, compiled in entries]
+        self.entries = entries
+
+    def stab(self, year: Any) -> List[Tuple[int, CompiledCalculatorProgram]]:
+        """(ordinal, program) pairs with year_from <= year <= year_to"""
+        end = bisect.bisect_right(self.year_froms, year)
+        return [entry for entry in self.entries[:end] if year <= entry[1].year_to]
+
+
+class ProgramIndex:
+    """
+    Lease or finance programs bucketed by (brand, state)
+
+    A program listing several states (or "ALL") sits in each of those
+    buckets; ordinals keep collection order for first-wins ties.
+    """
+
+    def __init__(self, programs: List[CompiledCalculatorProgram]):
+        buckets: Dict[Tuple[str, str], List[Tuple[int, CompiledCalculatorProgram]]] = {}
+        boundaries = set()
+
+        for ordinal, compiled in enumerate(programs):
+            # Programs that can never match stay out of the index
+            if not compiled.valid or compiled.start is None or compiled.end is None:
+                continue
+            if not (_is_number(compiled.year_from) and _is_number(compiled.year_to)):
+                continue
+            for state_key in _field_values(compiled.program.get("states")):
+                buckets.setdefault((compiled.brand_key, state_key), []).append((ordinal, compiled))
+            boundaries.add(compiled.start)
+            boundaries.add(compiled.end + timedelta(microseconds=1))
+
+        self.size = len(programs)
+        self.buckets = {key: YearIntervals(entries) for key, entries in buckets.items()}
+        self.boundaries = sorted(boundaries)
+
+    def next_boundary(self, now: datetime) -> Optional[datetime]:
+        """Earliest program window start/end after now (match results may change there)"""
+        i = bisect.bisect_right(self.boundaries, now)
+        return self.boundaries[i] if i < len(self.boundaries) else None
+
+    def best_match(
+        self,
+        brand_key: str,
+        model: str,
+        trim: str,
+        year: Any,
+        state: str,
+        now: datetime
+    ) -> Optional[Dict[str, Any]]:
+        if not _is_number(year):
+            return None
+
+        candidates: Dict[int, CompiledCalculatorProgram] = {}
+        for state_key in (state, "ALL"):
+            intervals = self.buckets.get((brand_key, state_key))
+            if intervals is not None:
+                candidates.update(intervals.stab(year))
+
+        best = None
+        best_score = None
+        for ordinal in sorted(candidates):
+            compiled = candidates[ordinal]
+            if not (compiled.start <= now <= compiled.end):
+                continue
+            score = compiled.score(model, trim)
+            if score is None:
+                continue
+            if best_score is None or score > best_score:
+                best, best_score = compiled.program, score
+        return best
+
+
+class TaxConfigIndex:
+    """First active tax config per (state, zip prefix) and per state (state-wide)"""
+
+    def __init__(self, tax_configs: List[Dict[str, Any]]):
+        self.size = len(tax_configs)
+        self.by_prefix: Dict[Tuple[Any, str], Dict[str, Any]] = {}
+        self.statewide: Dict[Any, Dict[str, Any]] = {}
+
+        for config in tax_configs:
+            state = config.get("state")
+            zip_prefixes = config.get("zip_prefixes")
+            if zip_prefixes == []:
+                self.statewide.setdefault(state, config)
+            for prefix in _field_values(zip_prefixes):
+                self.by_prefix.setdefault((state, prefix), config)
+
+    def find(self, state: str, zip_code: str) -> Optional[Dict[str, Any]]:
+        """Zip-prefix config for the state first, then the state-wide one"""
+        if zip_code and len(zip_code) >= 2:
+            config = self.by_prefix.get((state, zip_code[:2]))
+            if config is not None:
+                return config
+        return self.statewide.get(state)
+
+
+class CalculatorProgramMatcher:
+    """In-memory lease/finance/tax matcher for calculator configs"""
+
+    def __init__(self, max_age_seconds: int = DEFAULT_MAX_AGE_SECONDS):
+        self.max_age_seconds = max_age_seconds
+        self._lease = ProgramIndex([])
+        self._finance = ProgramIndex([])
+        self._tax = TaxConfigIndex([])
+        self._resolved: Dict[tuple, Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]] = {}
+        self._resolved_until: Optional[datetime] = None
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.stats = {"loads": 0, "invalidations": 0, "resolved": 0, "cache_hits": 0}
+
+    def _is_fresh(self) -> bool:
+        if self._loaded_at is None:
+            return False
+        return (time.monotonic() - self._loaded_at) < self.max_age_seconds
+
+    def set_programs(
+        self,
+        lease_programs: List[Dict[str, Any]],
+        finance_programs: List[Dict[str, Any]],
+        tax_configs: List[Dict[str, Any]]
+    ):
+        """Index programs and tax configs (collection order is the tie order)"""
+        self._lease = ProgramIndex([CompiledCalculatorProgram(p) for p in lease_programs])
+        self._finance = ProgramIndex([CompiledCalculatorProgram(p) for p in finance_programs])
+        self._tax = TaxConfigIndex(tax_configs)
+        self._resolved = {}
+        self._resolved_until = None
+        self._loaded_at = time.monotonic()
+
+    async def _load(self, db: AsyncIOMotorDatabase):
+        """Load active programs and tax configs (three round-trips)"""
+        now = datetime.now(timezone.utc)
+        program_query = {"is_active": True, "program_end": {"$gte": now}}
+
+        lease_programs = await db.lease_programs.find(program_query).to_list(length=None)
+        finance_programs = await db.finance_programs.find(program_query).to_list(length=None)
+        tax_configs = await db.tax_configs.find({"is_active": True}).to_list(length=None)
+
+        self.set_programs(lease_programs, finance_programs, tax_configs)
+        self.stats["loads"] += 1
+
+        logger.info(
+            f"Calculator program matcher loaded: {len(lease_programs)} lease, "
+            f"{len(finance_programs)} finance, {len(tax_configs)} tax configs"
+        )
+
+    async def ensure_loaded(self, db: AsyncIOMotorDatabase):
+        """Load the matcher if empty, invalidated or expired"""
+        if self._is_fresh():
+            return
+        async with self._lock:
+            if not self._is_fresh():
+                await self._load(db)
+
+    def invalidate(self):
+        """Drop loaded programs; next resolution reloads"""
+        self._loaded_at = None
+        self._resolved = {}
+        self.stats["invalidations"] += 1
+
+    def find_tax_config(self, state: str, zip_code: str) -> Optional[Dict[str, Any]]:
+        """Zip-prefix config for the state first, then the state-wide one"""
+        return self._tax.find(state, zip_code)
+
+    def _programs_for(
+        self,
+        brand_key: str,
+        model: str,
+        trim: str,
+        year: Any,
+        state: str,
+        now: datetime
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """(lease, finance) for a lot signature, cached until the next program window boundary"""
+        if self._resolved_until is not None and now >= self._resolved_until:
+            self._resolved = {}
+            self._resolved_until = None
+        if not self._resolved:
+            boundaries = [b for b in (self._lease.next_boundary(now), self._finance.next_boundary(now)) if b]
+            self._resolved_until = min(boundaries) if boundaries else None
+
+        key = (brand_key, model, trim, year, state)
+        try:
+            cached = self._resolved.get(key)
+        except TypeError:  # unhashable lot field
+            cached, key = None, None
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            return cached
+
+        result = (
+            self._lease.best_match(brand_key, model, trim, year, state, now),
+            self._finance.best_match(brand_key, model, trim, year, state, now)
+        )
+        if key is not None:
+            if len(self._resolved) >= MAX_RESOLVED_KEYS:
+                self._resolved.clear()
+            self._resolved[key] = result
+        return result
+
+    def resolve(
+        self,
+        lot: Dict[str, Any],
+        now: Optional[datetime] = None
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Resolve programs for one lot (matcher must be loaded)
+
+        Returns:
+            (lease_program, finance_program, tax_config), None where nothing matches
+        """
+        now = now or datetime.now(timezone.utc)
+        brand_key = str(lot.get("make", "") or "").lower()
+        model = lot.get("model") or ""
+        trim = lot.get("trim") or ""
+        year = lot.get("year", 2024)
+        state = lot.get("state", "CA")
+        zip_code = lot.get("zip", "")
+
+        self.stats["resolved"] += 1
+        lease_program, finance_program = self._programs_for(brand_key, model, trim, year, state, now)
+        return lease_program, finance_program, self.find_tax_config(state, zip_code)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Matcher status"""
+        return {
+            "loaded": self._loaded_at is not None,
+            "lease_programs": self._lease.size,
+            "finance_programs": self._finance.size,
+            "tax_configs": self._tax.size,
+            "lease_buckets": len(self._lease.buckets),
+            "finance_buckets": len(self._finance.buckets),
+            "resolved_keys": len(self._resolved),
+            "pattern_cache": compile_pattern.cache_info()._asdict(),
+            **self.stats
+        }
+
+
+async def create_calculator_program_indexes(db: AsyncIOMotorDatabase):
+    """
+    Create indexes for the matcher load queries and admin writes
+
+    lease/finance programs are loaded with {is_active, program_end >= now};
+    tax configs with {is_active}. All three are updated/deleted by "id".
+    """
+    for collection in (db.lease_programs, db.finance_programs):
+        await collection.create_index("id")
+        await collection.create_index([("is_active", 1), ("program_end", 1)])
+    await db.tax_configs.create_index("id")
+    await db.tax_configs.create_index([("is_active", 1), ("state", 1)])
+
+
+# Global matcher instance
+calculator_program_matcher = CalculatorProgramMatcher()
+
+
+def get_calculator_program_matcher() -> CalculatorProgramMatcher:
+    """Get global calculator program matcher"""
+    return calculator_program_matcher
@@ -64,18 +64,47 @@ class Settings(BaseModel):
     
     # Redis (for caching and sessions)
     REDIS_URL: Optional[str] = os.getenv("REDIS_URL")
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))  # in-process LRU (when Redis is absent)
+    CACHE_MAX_BYTES: int = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    CACHE_SHARED_PATH: Optional[str] = os.getenv("CACHE_SHARED_PATH")  # SQLite file shared by workers, e.g. /dev/shm/cargwin_cache.db
+    CACHE_SHARED_MAX_BYTES: int = int(os.getenv("CACHE_SHARED_MAX_BYTES", str(256 * 1024 * 1024)))
+    CACHE_LOCAL_TTL: int = int(os.getenv("CACHE_LOCAL_TTL", "5"))  # max age of in-process copies of shared entries
     
     # Rate Limiting
     RATE_LIMIT_REQUESTS: int = int(os.getenv("RATE_LIMIT_REQUESTS", "100"))
     RATE_LIMIT_WINDOW: int = int(os.getenv("RATE_LIMIT_WINDOW", "3600"))  # 1 hour
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory, shared (all workers on the box) or redis
+    RATE_LIMIT_SHARED_PATH: str = os.getenv("RATE_LIMIT_SHARED_PATH", "/dev/shm/cargwin_ratelimit")
+    RATE_LIMIT_SHARED_SLOTS: int = int(os.getenv("RATE_LIMIT_SHARED_SLOTS", "65536"))  # 16 bytes each
+    TRUSTED_PROXIES: str = os.getenv("TRUSTED_PROXIES", "127.0.0.0/8,::1,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16")  # peers whose X-Forwarded-For is believed
     
     # Logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")  # json or text
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # records waiting for the writer thread
+    LOG_SAMPLE_RATE: float = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))  # share of requests logged on unlisted routes
+    SLOW_REQUEST_SECONDS: float = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+    SLOW_REQUEST_BUFFER: int = int(os.getenv("SLOW_REQUEST_BUFFER", "200"))  # recent slow requests kept for /admin
+    
+    # Metrics
+    METRICS_TOKEN: Optional[str] = os.getenv("METRICS_TOKEN")  # bearer token required by /metrics when set
+    METRICS_SHARED_DIR: str = os.getenv("METRICS_SHARED_DIR", "")  # workers publish snapshots here; empty = this worker only
+    METRICS_FLUSH_SECONDS: float = float(os.getenv("METRICS_FLUSH_SECONDS", "15"))
+    HEALTH_PROBE_INTERVAL: float = float(os.getenv("HEALTH_PROBE_INTERVAL", "10"))  # seconds between readiness probes
+    LOOP_WATCHDOG_ENABLED: bool = os.getenv("LOOP_WATCHDOG_ENABLED", "false" if ENVIRONMENT == "production" else "true").lower() == "true"
+    LOOP_BLOCK_THRESHOLD_MS: float = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100"))  # loop stalls longer than this are sampled
+    DB_SLOW_QUERY_MS: float = float(os.getenv("DB_SLOW_QUERY_MS", "100"))  # Mongo commands logged as slow queries
+    DB_EXPLAIN_SLOW: bool = os.getenv("DB_EXPLAIN_SLOW", "true").lower() == "true"  # explain slow read shapes once to detect COLLSCAN
     
     # Performance
     WORKERS: int = int(os.getenv("WORKERS", "1"))
     MAX_CONNECTIONS: int = int(os.getenv("MAX_CONNECTIONS", "100"))
+    PDF_IMPORT_WORKERS: int = int(os.getenv("PDF_IMPORT_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) - 1)))))  # extraction/OCR processes
+    PDF_JOB_STALE_SECONDS: int = int(os.getenv("PDF_JOB_STALE_SECONDS", "900"))  # active import jobs without updates this long are failed
+    SYNC_MAX_CONCURRENCY: int = int(os.getenv("SYNC_MAX_CONCURRENCY", "4"))  # brands synced in parallel
+    SEARCH_CHANGE_STREAM: bool = os.getenv("SEARCH_CHANGE_STREAM", "false").lower() == "true"  # requires a replica set
+    COALESCE_TTL_SECONDS: float = float(os.getenv("COALESCE_TTL_SECONDS", "1"))  # reuse window for identical public reads
+    SEARCH_INDEX_SNAPSHOT_DIR: str = os.getenv("SEARCH_INDEX_SNAPSHOT_DIR", "/app/data/search_index")  # empty disables
     
     # CDN & Assets
     CDN_URL: Optional[str] = os.getenv("CDN_URL")
@@ -146,12 +175,18 @@ SECURITY_HEADERS = {
     "Permissions-Policy": "geolocation=(), microphone=(), camera=()",
 }
 
-# Rate Limiting Configuration
+# Rate Limiting Configuration (policy table for rate_limiter)
 RATE_LIMITS = {
     "auth": "5/minute",      # Authentication endpoints
     "upload": "10/minute",   # File upload endpoints
+    "admin": "50/minute",    # Admin endpoints
     "api": "100/minute",     # General API endpoints
     "public": "200/minute",  # Public endpoints
+    # Handler-level limits (per client, on top of the tier above)
+    "lease_calculate": "20/minute",
+    "payment_matrix": "20/minute",
+    "compare": "10/10seconds",
+    "search": "10/10seconds",
 }
 
 def validate_environment():
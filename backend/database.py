@@ -28,8 +28,13 @@ async def connect_to_mongo():
     
     logger.info(f"Connecting to MongoDB: {mongo_url}")
     
-    db.client = AsyncIOMotorClient(mongo_url)
+    # Per-request command tracing (counts, DB time, slow queries)
+    from db_tracer import get_db_tracer
+    tracer = get_db_tracer()
+    
+    db.client = AsyncIOMotorClient(mongo_url, event_listeners=[tracer])
     db.database = db.client[db_name]
+    tracer.attach(db.client.delegate)
     
     # Test connection
     try:
@@ -5,10 +5,26 @@ from typing import List, Optional, Dict, Any
 from motor.motor_asyncio import AsyncIOMotorDatabase
 import logging
 from uuid import uuid4
+from datetime import datetime, timezone
+from search_engine import notify_deal_upserted, notify_deal_updated, notify_deal_deleted
+from simple_cache import bump_collection_version
+from analytics_rollup import BUCKET_PROJECTION, deal_bucket, record_deal_buckets
 
 logger = logging.getLogger(__name__)
 
 
+async def create_featured_deal_indexes(db: AsyncIOMotorDatabase):
+    """
+    Create indexes for featured_deals
+    
+    Single-deal reads/writes and bulk UpdateOne batches filter on "id";
+    search index catch-up queries updated_at.
+    """
+    await db.featured_deals.create_index("id")
+    await db.featured_deals.create_index([("brand", 1), ("model", 1)])
+    await db.featured_deals.create_index([("updated_at", -1)])
+
+
 async def create_deal(db: AsyncIOMotorDatabase, deal_data: Dict[str, Any]) -> str:
     """
     Create a new featured deal
@@ -24,8 +40,13 @@ async def create_deal(db: AsyncIOMotorDatabase, deal_data: Dict[str, Any]) -> st
     if "id" not in deal_data or not deal_data["id"]:
         deal_data["id"] = str(uuid4())
     
+    deal_data.setdefault("updated_at", datetime.now(timezone.utc))
+    
     # Insert into database
     await db.featured_deals.insert_one(deal_data)
+    notify_deal_upserted(deal_data)
+    await record_deal_buckets(db, [deal_bucket(deal_data)])
+    bump_collection_version("featured_deals")
     
     logger.info(f"Created featured deal: {deal_data['id']} ({deal_data.get('brand')} {deal_data.get('model')})")
     
@@ -98,9 +119,12 @@ async def delete_deal(db: AsyncIOMotorDatabase, deal_id: str) -> bool:
     Returns:
         True if deleted, False if not found
     """
-    result = await db.featured_deals.delete_one({"id": deal_id})
+    deleted = await db.featured_deals.find_one_and_delete({"id": deal_id}, projection=BUCKET_PROJECTION)
     
-    if result.deleted_count > 0:
+    if deleted is not None:
+        notify_deal_deleted(deal_id)
+        await record_deal_buckets(db, [deal_bucket(deleted)])
+        bump_collection_version("featured_deals")
         logger.info(f"Deleted featured deal: {deal_id}")
         return True
     
@@ -123,12 +147,16 @@ async def update_calculated_fields(
     Returns:
         True if updated, False if not found
     """
-    result = await db.featured_deals.update_one(
+    updated = await db.featured_deals.find_one_and_update(
         {"id": deal_id},
-        {"$set": fields}
+        {"$set": {**fields, "updated_at": datetime.now(timezone.utc)}},
+        projection=BUCKET_PROJECTION
     )
     
-    if result.matched_count > 0:
+    if updated is not None:
+        notify_deal_updated(deal_id, fields)
+        await record_deal_buckets(db, [deal_bucket(updated)])
+        bump_collection_version("featured_deals")
         logger.info(f"Updated calculated fields for deal: {deal_id}")
         return True
     
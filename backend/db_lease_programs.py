@@ -3,12 +3,63 @@ Database CRUD operations for parsed lease programs
 """
 from typing import List, Optional, Dict, Any
 from motor.motor_asyncio import AsyncIOMotorDatabase
+import hashlib
+import json
 import logging
 from uuid import uuid4
+from datetime import datetime, timezone
+
+from program_registry import get_program_registry
+from simple_cache import bump_collection_version
 
 logger = logging.getLogger(__name__)
 
 
+def _canonical_number(value: Any) -> Any:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def compute_program_fingerprint(program: Dict[str, Any]) -> str:
+    """
+    Content hash of a program's MF and residual tables
+    
+    Numbers are normalized to float so 75 and 75.0 hash the same.
+    
+    Returns:
+        Hex SHA-256 digest
+    """
+    canonical = {
+        "mf": {
+            str(term): _canonical_number(value)
+            for term, value in (program.get("mf") or {}).items()
+        },
+        "residual": {
+            str(term): {
+                str(mileage): _canonical_number(value)
+                for mileage, value in (mileages or {}).items()
+            }
+            for term, mileages in (program.get("residual") or {}).items()
+        }
+    }
+    data = json.dumps(canonical, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+async def create_parsed_program_indexes(db: AsyncIOMotorDatabase):
+    """
+    Create indexes for lease_programs_parsed
+    
+    Covers id lookups, newest-first scans and fingerprint backfill.
+    """
+    await db.lease_programs_parsed.create_index("id")
+    await db.lease_programs_parsed.create_index([("created_at", -1)])
+    await db.lease_programs_parsed.create_index([("brand", 1), ("model", 1), ("created_at", -1)])
+    await db.lease_programs_parsed.create_index("fingerprint", sparse=True)
+
+
 async def create_parsed_program(db: AsyncIOMotorDatabase, program_data: Dict[str, Any]) -> str:
     """
     Create a new parsed lease program
@@ -24,10 +75,14 @@ async def create_parsed_program(db: AsyncIOMotorDatabase, program_data: Dict[str
     if "id" not in program_data or not program_data["id"]:
         program_data["id"] = str(uuid4())
     
+    program_data["fingerprint"] = compute_program_fingerprint(program_data)
+    
     # Insert into database
     await db.lease_programs_parsed.insert_one(program_data)
+    get_program_registry().invalidate()
+    bump_collection_version("lease_programs_parsed")
     
-    logger.info(f"Created parsed program: {program_data['id']} ({program_data.get('brand')} {program_data.get('model')})")
+    logger.info("Created parsed program: %s (%s %s)", program_data['id'], program_data.get('brand'), program_data.get('model'))
     
     return program_data["id"]
 
@@ -88,7 +143,7 @@ async def get_parsed_programs(
         {"_id": 0}
     ).sort("created_at", -1).limit(limit).to_list(limit)
     
-    logger.info(f"Found {len(programs)} parsed programs with filters: {query}")
+    logger.debug("Found %d parsed programs with filters: %s", len(programs), query)
     
     return programs
 
@@ -109,13 +164,31 @@ async def update_parsed_program(
     Returns:
         True if updated, False if not found
     """
+    # Keep the content fingerprint in step with MF/residual edits
+    if "mf" in update_data or "residual" in update_data:
+        current = await db.lease_programs_parsed.find_one(
+            {"id": program_id},
+            {"_id": 0, "mf": 1, "residual": 1}
+        )
+        if current is None:
+            return False
+        update_data = {
+            **update_data,
+            "fingerprint": compute_program_fingerprint({**current, **update_data})
+        }
+    
+    # Payment matrix ETags include updated_at (fees etc. are not fingerprinted)
+    update_data = {**update_data, "updated_at": datetime.now(timezone.utc)}
+    
     result = await db.lease_programs_parsed.update_one(
         {"id": program_id},
         {"$set": update_data}
     )
     
     if result.matched_count > 0:
-        logger.info(f"Updated parsed program: {program_id}")
+        get_program_registry().invalidate()
+        bump_collection_version("lease_programs_parsed")
+        logger.info("Updated parsed program: %s", program_id)
         return True
     
     return False
@@ -135,7 +208,9 @@ async def delete_parsed_program(db: AsyncIOMotorDatabase, program_id: str) -> bo
     result = await db.lease_programs_parsed.delete_one({"id": program_id})
     
     if result.deleted_count > 0:
-        logger.info(f"Deleted parsed program: {program_id}")
+        get_program_registry().invalidate()
+        bump_collection_version("lease_programs_parsed")
+        logger.info("Deleted parsed program: %s", program_id)
         return True
     
     return False
@@ -190,10 +265,11 @@ async def get_latest_parsed_program_for(
     
     program = await db.lease_programs_parsed.find_one(
         query,
-        {"_id": 0}
+        {"_id": 0},
+        sort=[("created_at", -1)]
     )
     
-    logger.info(f"Fetched latest program for {brand}/{model}/{region}: {'Found' if program else 'Not found'}")
+    logger.debug("Fetched latest program for %s/%s/%s: %s", brand, model, region, "Found" if program else "Not found")
     
     return program
 
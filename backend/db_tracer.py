@@ -0,0 +1,361 @@
+"""
+MongoDB Command Tracer
+
+A pymongo CommandListener that attributes every command to the HTTP
+request that issued it (through a context var; Motor copies the context
+into its executor threads). Per request it counts commands, DB time,
+documents returned and reply bytes, and flags:
+
+- unanchored $regex filters (checked statically on the command)
+- collection scans: slow reads are explained once per query shape in the
+  background, and shapes whose winning plan has a COLLSCAN stay flagged
+
+AppMiddleware starts a trace per request, adds the X-DB-Trace summary
+header outside production and hands the summary to the request log.
+Commands slower than DB_SLOW_QUERY_MS are logged and aggregated by shape
+for GET /admin/db/slow-queries.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar, Token
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+import re
+import threading
+import time
+
+import bson
+from pymongo import monitoring
+
+from config import get_settings
+from monitoring import get_metrics_collector
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Read commands whose filter/pipeline is checked and that can be explained
+READ_COMMANDS = {"find": "filter", "aggregate": "pipeline", "count": "query", "distinct": "query"}
+
+# Commands that are driver/server housekeeping, not application queries
+IGNORED_COMMANDS = {
+    "hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue",
+    "endSessions", "killCursors", "buildInfo", "getLastError", "explain"
+}
+
+# Command fields dropped before explaining (session and driver metadata)
+EXPLAIN_DROP_FIELDS = {"lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern", "cursor", "batchSize"}
+
+
+class RequestTrace:
+    """DB work attributed to one request"""
+
+    __slots__ = ("commands", "duration_ms", "documents", "bytes", "collscans", "unanchored_regex", "failed", "by_command", "_lock")
+
+    def __init__(self):
+        self.commands = 0
+        self.duration_ms = 0.0
+        self.documents = 0
+        self.bytes: Optional[int] = 0
+        self.collscans = 0
+        self.unanchored_regex = 0
+        self.failed = 0
+        self.by_command: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "commands": self.commands,
+            "time_ms": round(self.duration_ms, 2),
+            "documents": self.documents,
+            "bytes": self.bytes,
+            "collscan": self.collscans,
+            "unanchored_regex": self.unanchored_regex,
+            "failed": self.failed,
+            "by_command": dict(self.by_command)
+        }
+
+    def header(self) -> str:
+        """Compact X-DB-Trace value"""
+        parts = [
+            f"commands={self.commands}",
+            f"time_ms={self.duration_ms:.1f}",
+            f"docs={self.documents}"
+        ]
+        if self.bytes is not None:
+            parts.append(f"bytes={self.bytes}")
+        if self.collscans:
+            parts.append(f"collscan={self.collscans}")
+        if self.unanchored_regex:
+            parts.append(f"regex={self.unanchored_regex}")
+        return "; ".join(parts)
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("db_trace", default=None)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    """Trace of the request being handled (None outside requests)"""
+    return _current_trace.get()
+
+
+def _has_unanchored_regex(value: Any) -> bool:
+    """Whether a filter/pipeline uses a $regex (or Regex value) not anchored with ^"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key == "$regex":
+                pattern = item.pattern if hasattr(item, "pattern") else item
+                if not (isinstance(pattern, str) and pattern.startswith("^")):
+                    return True
+            elif _has_unanchored_regex(item):
+                return True
+        return False
+    if isinstance(value, (list, tuple)):
+        return any(_has_unanchored_regex(item) for item in value)
+    if isinstance(value, (bson.regex.Regex, re.Pattern)):
+        return not value.pattern.startswith("^")
+    return False
+
+
+def _shape(value: Any) -> Any:
+    """Filter with literal values replaced by '?' (operators and fields kept)"""
+    if isinstance(value, dict):
+        return {key: _shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shaped = [_shape(item) for item in value]
+        return shaped if any(isinstance(item, (dict, list)) for item in shaped) else "?"
+    return "?"
+
+
+def query_shape(command_name: str, command: Dict[str, Any]) -> Tuple[str, str]:
+    """(collection, shape) identifying a query regardless of its values"""
+    collection = command.get(command_name)
+    field = READ_COMMANDS.get(command_name, "filter")
+    criteria = command.get(field)
+    if criteria is None and command_name in ("update", "delete"):
+        statements = command.get("updates") or command.get("deletes") or []
+        criteria = statements[0].get("q") if statements else None
+    shape = json.dumps(_shape(criteria), sort_keys=True, default=str) if criteria is not None else ""
+    sort = command.get("sort")
+    if sort:
+        shape += " sort=" + json.dumps(list(sort.keys()) if isinstance(sort, dict) else sort, default=str)
+    return str(collection), f"{command_name} {shape}".strip()
+
+
+def _documents_in_reply(command_name: str, reply: Dict[str, Any]) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        batch = cursor.get("firstBatch", cursor.get("nextBatch"))
+        return len(batch) if batch is not None else 0
+    if command_name == "distinct":
+        return len(reply.get("values", []))
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") is not None else 0
+    return 0
+
+
+def _plan_has_collscan(plan: Any) -> bool:
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(_plan_has_collscan(item) for key, item in plan.items() if key != "rejectedPlans")
+    if isinstance(plan, list):
+        return any(_plan_has_collscan(item) for item in plan)
+    return False
+
+
+class SlowQueryStats:
+    """Aggregate of one slow query shape"""
+
+    __slots__ = ("collection", "shape", "count", "total_ms", "max_ms", "collscan", "unanchored_regex", "last_seen")
+
+    def __init__(self, collection: str, shape: str):
+        self.collection = collection
+        self.shape = shape
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.collscan: Optional[bool] = None
+        self.unanchored_regex = False
+        self.last_seen = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "collection": self.collection,
+            "shape": self.shape,
+            "count": self.count,
+            "total_ms": round(self.total_ms, 2),
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else None,
+            "max_ms": round(self.max_ms, 2),
+            "collscan": self.collscan,
+            "unanchored_regex": self.unanchored_regex,
+            "last_seen": self.last_seen
+        }
+
+
+class DBCommandTracer(monitoring.CommandListener):
+    """
+    Command listener feeding per-request traces, metrics and the slow-query log
+
+    Args:
+        slow_ms: Commands slower than this are logged and aggregated by shape
+        measure_bytes: BSON-encode replies to count bytes (costly on big results)
+        explain_slow: Explain slow reads (once per shape) to detect COLLSCAN
+        max_shapes: Slow query shapes kept
+    """
+
+    def __init__(self, slow_ms: float = 100, measure_bytes: bool = False, explain_slow: bool = True, max_shapes: int = 500):
+        self.slow_ms = slow_ms
+        self.measure_bytes = measure_bytes
+        self.explain_slow = explain_slow
+        self.max_shapes = max_shapes
+        self.client = None
+        self._pending: Dict[Tuple[Any, int], Tuple[str, Dict[str, Any], Optional[RequestTrace]]] = {}
+        self._pending_lock = threading.Lock()
+        self._shapes: Dict[Tuple[str, str], SlowQueryStats] = {}
+        self._shapes_lock = threading.Lock()
+        self._collscan: Dict[Tuple[str, str], bool] = {}
+        self._explaining: set = set()
+        self._explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-explain")
+        self.commands = 0
+        self.slow_commands = 0
+
+    def attach(self, client):
+        """Client (pymongo MongoClient / Motor delegate) used for explains"""
+        self.client = client
+
+    # Request scope
+
+    def start_trace(self) -> Token:
+        return _current_trace.set(RequestTrace())
+
+    def finish_trace(self, token: Token) -> Optional[RequestTrace]:
+        trace = _current_trace.get()
+        _current_trace.reset(token)
+        return trace
+
+    # CommandListener
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        with self._pending_lock:
+            self._pending[(event.connection_id, event.request_id)] = (
+                event.database_name, event.command, _current_trace.get()
+            )
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool):
+        with self._pending_lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        database_name, command, trace = pending
+        command_name = event.command_name
+        duration_ms = event.duration_micros / 1000
+        self.commands += 1
+
+        get_metrics_collector().record_db_operation()
+
+        shape_key = None
+        regex = False
+        collscan = False
+        if command_name in READ_COMMANDS or duration_ms > self.slow_ms:
+            shape_key = query_shape(command_name, command)
+            regex = command_name in READ_COMMANDS and _has_unanchored_regex(command.get(READ_COMMANDS[command_name]))
+            collscan = self._collscan.get(shape_key, False)
+
+        if trace is not None:
+            documents = 0 if failed else _documents_in_reply(command_name, event.reply)
+            size = len(bson.encode(event.reply)) if self.measure_bytes and not failed else None
+            with trace._lock:
+                trace.commands += 1
+                trace.duration_ms += duration_ms
+                trace.documents += documents
+                trace.bytes = trace.bytes + size if size is not None and trace.bytes is not None else None
+                trace.by_command[command_name] = trace.by_command.get(command_name, 0) + 1
+                trace.failed += failed
+                trace.collscans += collscan
+                trace.unanchored_regex += regex
+
+        if duration_ms > self.slow_ms:
+            self._record_slow(database_name, command_name, command, shape_key, duration_ms, regex)
+
+    def _record_slow(self, database_name: str, command_name: str, command: Dict[str, Any], shape_key: Tuple[str, str], duration_ms: float, regex: bool):
+        with self._shapes_lock:
+            self.slow_commands += 1
+            stats = self._shapes.get(shape_key)
+            if stats is None:
+                if len(self._shapes) >= self.max_shapes:
+                    oldest = min(self._shapes.values(), key=lambda s: s.last_seen)
+                    del self._shapes[(oldest.collection, oldest.shape)]
+                stats = self._shapes[shape_key] = SlowQueryStats(*shape_key)
+            stats.count += 1
+            stats.total_ms += duration_ms
+            stats.max_ms = max(stats.max_ms, duration_ms)
+            stats.unanchored_regex = stats.unanchored_regex or regex
+            stats.collscan = self._collscan.get(shape_key, stats.collscan)
+            stats.last_seen = time.time()
+
+        logger.warning(
+            "Slow query: %s.%s %.1fms shape=%s collscan=%s regex=%s",
+            database_name, shape_key[0], duration_ms, shape_key[1], stats.collscan, regex
+        )
+
+        if (
+            self.explain_slow and self.client is not None and command_name in READ_COMMANDS
+            and shape_key not in self._collscan and shape_key not in self._explaining
+        ):
+            self._explaining.add(shape_key)
+            self._explainer.submit(self._explain, database_name, command_name, command, shape_key)
+
+    def _explain(self, database_name: str, command_name: str, command: Dict[str, Any], shape_key: Tuple[str, str]):
+        """Run queryPlanner explain for a slow shape (explainer thread)"""
+        try:
+            explained = {k: v for k, v in command.items() if not k.startswith("$") and k not in EXPLAIN_DROP_FIELDS}
+            if command_name == "aggregate":
+                explained["cursor"] = {}
+            plan = self.client[database_name].command({"explain": explained, "verbosity": "queryPlanner"})
+            collscan = _plan_has_collscan(plan)
+            self._collscan[shape_key] = collscan
+            if shape_key in self._shapes:
+                self._shapes[shape_key].collscan = collscan
+            if collscan:
+                logger.warning("COLLSCAN: %s.%s %s", database_name, shape_key[0], shape_key[1])
+        except Exception as e:
+            logger.debug("Explain failed for %s: %s", shape_key, e)
+        finally:
+            self._explaining.discard(shape_key)
+
+    def get_slow_queries(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Slow query shapes, most total time first"""
+        with self._shapes_lock:
+            shapes = sorted(self._shapes.values(), key=lambda s: s.total_ms, reverse=True)
+        return [stats.to_dict() for stats in shapes[:limit]]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "commands": self.commands,
+            "slow_commands": self.slow_commands,
+            "slow_ms": self.slow_ms,
+            "slow_shapes": len(self._shapes),
+            "collscan_shapes": sum(1 for collscan in self._collscan.values() if collscan),
+            "measure_bytes": self.measure_bytes
+        }
+
+
+# Global tracer (registered on the Motor client in database.connect_to_mongo)
+db_tracer = DBCommandTracer(
+    slow_ms=settings.DB_SLOW_QUERY_MS,
+    measure_bytes=not settings.is_production,
+    explain_slow=settings.DB_EXPLAIN_SLOW
+)
+
+
+def get_db_tracer() -> DBCommandTracer:
+    """Get global DB command tracer"""
+    return db_tracer
@@ -0,0 +1,166 @@
+"""
+HTTP Response Caching
+
+Per-route Cache-Control policies for public reads, ETag validators (derived
+from updated_at where the data has it), conditional GET, and gzip/brotli
+content encoding with compressed bodies reused per ETag.
+
+Routes only attach an ETag (response.headers["ETag"] = deal_etag(deal));
+middleware.AppMiddleware applies the policy, answers If-None-Match with 304
+and compresses the rest.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Tuple
+import gzip
+import hashlib
+import logging
+import re
+
+from cache_backend import MISSING, MemoryCache
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Cache-Control for successful GET/HEAD responses, first match wins. Clients
+# revalidate with the ETag once max-age runs out; CDNs may serve stale copies
+# while they revalidate.
+CACHE_POLICIES: List[Tuple[Pattern, str]] = [
+    (re.compile(r"^/api/deals/list$"), "public, max-age=30, stale-while-revalidate=60"),
+    (re.compile(r"^/api/deals/[^/]+$"), "public, max-age=60, stale-while-revalidate=300"),
+    (re.compile(r"^/api/cars(/[^/]+)?$"), "public, max-age=60, stale-while-revalidate=300"),
+    (re.compile(r"^/api/lease/brands-models$"), "public, max-age=300, stale-while-revalidate=600")
+]
+
+# Preferred content encodings, best first
+ENCODINGS = ("br", "gzip") if BROTLI_AVAILABLE else ("gzip",)
+
+# Largest body compressed in memory (bigger responses pass through)
+MAX_COMPRESS_BYTES = 8 * 1024 * 1024
+
+
+def get_cache_policy(method: str, path: str) -> Optional[str]:
+    """Cache-Control policy for a public read, or None"""
+    if method not in ("GET", "HEAD"):
+        return None
+    for pattern, policy in CACHE_POLICIES:
+        if pattern.match(path):
+            return policy
+    return None
+
+
+def _weak_etag(*parts: Any) -> str:
+    digest = hashlib.sha256("|".join(str(p) for p in parts).encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+def deal_etag(doc: Dict[str, Any]) -> str:
+    """
+    ETag of one document from its id and updated_at
+
+    Weak: the same version is served identity, gzip or br encoded.
+    """
+    return _weak_etag(doc.get("id"), doc.get("updated_at"))
+
+
+def collection_etag(docs: Iterable[Dict[str, Any]], *params: Any) -> str:
+    """ETag of a list response from each document's id + updated_at and the query params"""
+    return _weak_etag(*params, *(f"{d.get('id')}@{d.get('updated_at')}" for d in docs))
+
+
+def body_etag(body: bytes) -> str:
+    """ETag from the serialized body (for data without updated_at)"""
+    return f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def if_none_match(header: Optional[str], etag: str) -> bool:
+    """Whether If-None-Match matches etag (weak comparison)"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for tag in header.split(","):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith("W/") else tag) == opaque:
+            return True
+    return False
+
+
+def choose_encoding(accept_encoding: Optional[str], supported: Tuple[str, ...] = ENCODINGS) -> Optional[str]:
+    """
+    Best supported encoding the client accepts (q=0 means refused)
+
+    Args:
+        accept_encoding: Accept-Encoding request header
+        supported: Encodings available, best first (e.g. ("gzip",) for a
+            pre-gzipped body)
+    """
+    if not accept_encoding:
+        return None
+
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip())
+
+    for encoding in supported:
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Encode body (gzip level 6, brotli quality 5: fast enough per request)"""
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+class CompressedBodyCache:
+    """
+    Compressed bodies keyed by (URL, ETag, encoding)
+
+    A response with the same ETag is the same representation, so repeat
+    visitors and CDN refreshes reuse the bytes instead of re-compressing.
+    """
+
+    def __init__(self, max_entries: int = 2000, max_bytes: int = 32 * 1024 * 1024):
+        self.bodies = MemoryCache(max_entries=max_entries, max_bytes=max_bytes)
+        self.compressions = 0
+
+    def get_or_compress(self, url: str, etag: Optional[str], body: bytes, encoding: str, ttl: float = 3600) -> bytes:
+        if not etag:
+            self.compressions += 1
+            return compress(body, encoding)
+
+        key = f"{encoding}:{etag}:{url}"
+        compressed = self.bodies.get(key)
+        if compressed is MISSING:
+            self.compressions += 1
+            compressed = compress(body, encoding)
+            self.bodies.set(key, compressed, ttl, size=len(compressed))
+        return compressed
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.bodies.get_stats(), "compressions": self.compressions, "encodings": list(ENCODINGS)}
+
+
+# Global compressed body cache
+compressed_body_cache = CompressedBodyCache()
+
+
+def get_compressed_body_cache() -> CompressedBodyCache:
+    """Get global compressed body cache"""
+    return compressed_body_cache
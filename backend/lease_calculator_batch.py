@@ -0,0 +1,339 @@
+"""
+Batch Lease Calculator
+
+Vectorized counterpart of lease_calculator_pro.calculate_lease_pro.
+Prices N requests, or one deal crossed with a term x mileage x down
+payment grid, as NumPy array operations. Every formula keeps the exact
+operation order of the scalar path so results are bit-for-bit equal.
+"""
+from typing import Dict, List, Optional, Any, Sequence, Union
+import logging
+import numpy as np
+
+from models_lease_programs import LeaseCalculationRequest
+from program_registry import CompiledProgram
+
+logger = logging.getLogger(__name__)
+
+ProgramLike = Union[CompiledProgram, Dict[str, Any]]
+
+# Output columns, same names as LeaseCalculationResult
+RESULT_FIELDS = [
+    "mf_used",
+    "residual_percent_used",
+    "residual_value",
+    "cap_cost_before_incentives",
+    "total_incentives_applied",
+    "adjusted_cap_cost",
+    "total_fees_capitalized",
+    "depreciation_fee",
+    "finance_fee",
+    "base_payment_before_tax",
+    "tax_amount",
+    "monthly_payment_with_tax",
+    "estimated_drive_off",
+    "one_pay_estimated",
+    "estimated_savings_vs_msrp_deal",
+]
+
+
+def _compile(program: ProgramLike) -> CompiledProgram:
+    if isinstance(program, CompiledProgram):
+        return program
+    return CompiledProgram(program)
+
+
+def _incentives_for(request: LeaseCalculationRequest, compiled: CompiledProgram) -> float:
+    """Incentives exactly as the scalar path sums them"""
+    if not request.apply_incentives:
+        return 0.0
+    if request.manual_incentives:
+        return sum(request.manual_incentives.values())
+    return sum((compiled.program.get("incentives") or {}).values())
+
+
+def price_arrays(
+    msrp: np.ndarray,
+    selling_price: np.ndarray,
+    mf: np.ndarray,
+    residual_percent: np.ndarray,
+    incentives: np.ndarray,
+    acquisition_fee: np.ndarray,
+    doc_fee: np.ndarray,
+    registration_fee: np.ndarray,
+    other_fees: np.ndarray,
+    down_payment: np.ndarray,
+    term: np.ndarray,
+    tax_rate: np.ndarray,
+    zero_drive_off: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """
+    Core pricing kernel over broadcastable float64 arrays
+
+    Mirrors steps 3-11 of calculate_lease_pro.
+
+    Returns:
+        Dict of RESULT_FIELDS -> array (broadcast shape of inputs)
+    """
+    residual_value = msrp * (residual_percent / 100.0)
+
+    cap_cost_before_incentives = selling_price
+    adjusted_cap_cost = cap_cost_before_incentives - incentives
+
+    total_fees_capitalized = acquisition_fee + doc_fee + registration_fee + other_fees
+
+    gross_cap_cost = adjusted_cap_cost + total_fees_capitalized
+    net_cap_cost = gross_cap_cost - down_payment
+
+    depreciation_fee = (net_cap_cost - residual_value) / term
+    finance_fee = (net_cap_cost + residual_value) * mf
+    base_payment_before_tax = depreciation_fee + finance_fee
+
+    tax_amount = base_payment_before_tax * tax_rate
+    monthly_payment_with_tax = base_payment_before_tax + tax_amount
+
+    estimated_drive_off = np.where(
+        zero_drive_off,
+        monthly_payment_with_tax + doc_fee + registration_fee,
+        down_payment + monthly_payment_with_tax + doc_fee + registration_fee
+    )
+
+    total_monthly_with_tax = monthly_payment_with_tax * term
+    one_pay_estimated = total_monthly_with_tax * 0.92
+
+    naive_mf = mf + 0.0004
+    naive_net_cap_cost = (msrp + total_fees_capitalized) - down_payment
+    naive_depr = (naive_net_cap_cost - residual_value) / term
+    naive_finance = (naive_net_cap_cost + residual_value) * naive_mf
+    naive_base = naive_depr + naive_finance
+    naive_monthly_with_tax = naive_base * (1 + tax_rate)
+    naive_total = naive_monthly_with_tax * term
+    pro_total = monthly_payment_with_tax * term
+    estimated_savings_vs_msrp_deal = naive_total - pro_total
+
+    shape = np.broadcast(
+        msrp, selling_price, mf, residual_percent, incentives, acquisition_fee,
+        doc_fee, registration_fee, other_fees, down_payment, term, tax_rate, zero_drive_off
+    ).shape
+
+    columns = {
+        "mf_used": mf,
+        "residual_percent_used": residual_percent,
+        "residual_value": residual_value,
+        "cap_cost_before_incentives": cap_cost_before_incentives,
+        "total_incentives_applied": incentives,
+        "adjusted_cap_cost": adjusted_cap_cost,
+        "total_fees_capitalized": total_fees_capitalized,
+        "depreciation_fee": depreciation_fee,
+        "finance_fee": finance_fee,
+        "base_payment_before_tax": base_payment_before_tax,
+        "tax_amount": tax_amount,
+        "monthly_payment_with_tax": monthly_payment_with_tax,
+        "estimated_drive_off": estimated_drive_off,
+        "one_pay_estimated": one_pay_estimated,
+        "estimated_savings_vs_msrp_deal": estimated_savings_vs_msrp_deal,
+    }
+    return {name: np.broadcast_to(value, shape) for name, value in columns.items()}
+
+
+def calculate_lease_batch(
+    requests: Sequence[LeaseCalculationRequest],
+    programs: Union[ProgramLike, Sequence[Optional[ProgramLike]]]
+) -> Dict[str, Any]:
+    """
+    Price N requests in one vectorized pass
+
+    Args:
+        requests: Calculation requests
+        programs: One program shared by all requests, or one per request
+            (None where no program was found)
+
+    Returns:
+        Dict with RESULT_FIELDS -> float64 array of length N, plus
+        "valid" (bool array) and "errors" (list, None for valid rows).
+        Invalid rows hold NaN and the error the scalar path would raise.
+    """
+    n = len(requests)
+    if isinstance(programs, (CompiledProgram, dict)):
+        shared = _compile(programs)
+        compiled_programs: List[Optional[CompiledProgram]] = [shared] * n
+    else:
+        if len(programs) != n:
+            raise ValueError(f"Expected {n} programs, got {len(programs)}")
+        compiled_by_id: Dict[int, CompiledProgram] = {}
+        compiled_programs = []
+        for program in programs:
+            if program is None:
+                compiled_programs.append(None)
+                continue
+            key = id(program)
+            if key not in compiled_by_id:
+                compiled_by_id[key] = _compile(program)
+            compiled_programs.append(compiled_by_id[key])
+
+    mf = np.full(n, np.nan)
+    residual_percent = np.full(n, np.nan)
+    incentives = np.zeros(n)
+    errors: List[Optional[str]] = [None] * n
+
+    for i, (request, compiled) in enumerate(zip(requests, compiled_programs)):
+        if compiled is None:
+            errors[i] = "No parsed lease program provided for calculation"
+            continue
+
+        mf_value = request.override_mf
+        if mf_value is None:
+            mf_value = compiled.pick_mf(request.term_months)
+            if mf_value is None:
+                errors[i] = f"Could not determine money factor for term {request.term_months} months"
+                continue
+
+        rp_value = request.override_residual_percent
+        if rp_value is None:
+            rp_value = compiled.pick_residual(request.term_months, request.annual_mileage)
+            if rp_value is None:
+                errors[i] = (
+                    f"Could not determine residual for term {request.term_months}mo "
+                    f"and mileage {request.annual_mileage}mi"
+                )
+                continue
+
+        mf[i] = mf_value
+        residual_percent[i] = rp_value
+        incentives[i] = _incentives_for(request, compiled)
+
+    def column(attr: str) -> np.ndarray:
+        return np.fromiter((getattr(r, attr) for r in requests), dtype=np.float64, count=n)
+
+    result = price_arrays(
+        msrp=column("msrp"),
+        selling_price=column("selling_price"),
+        mf=mf,
+        residual_percent=residual_percent,
+        incentives=incentives,
+        acquisition_fee=column("acquisition_fee"),
+        doc_fee=column("doc_fee"),
+        registration_fee=column("registration_fee"),
+        other_fees=column("other_fees"),
+        down_payment=column("down_payment"),
+        term=column("term_months"),
+        tax_rate=column("tax_rate"),
+        zero_drive_off=np.fromiter((r.drive_off_mode == "zero" for r in requests), dtype=bool, count=n)
+    )
+
+    valid = np.fromiter((e is None for e in errors), dtype=bool, count=n)
+    result["valid"] = valid
+    result["errors"] = errors
+    return result
+
+
+def calculate_lease_grid(
+    request: LeaseCalculationRequest,
+    program: ProgramLike,
+    terms: Sequence[int],
+    mileages: Sequence[int],
+    down_payments: Sequence[float]
+) -> Dict[str, Any]:
+    """
+    Price one deal over a term x mileage x down payment grid
+
+    Term/mileage/down payment on the request are ignored; every other
+    field (fees, tax, overrides, incentives) applies to all cells.
+
+    Returns:
+        Dict with RESULT_FIELDS -> array of shape (T, M, D), "valid"
+        (bool array of shape (T, M, D)), and the grid axes.
+    """
+    compiled = _compile(program)
+    terms = [int(t) for t in terms]
+    mileages = [int(m) for m in mileages]
+    downs = np.asarray(down_payments, dtype=np.float64)
+
+    mf = np.full(len(terms), np.nan)
+    for i, term in enumerate(terms):
+        value = request.override_mf if request.override_mf is not None else compiled.pick_mf(term)
+        if value is not None:
+            mf[i] = value
+
+    residual_percent = np.full((len(terms), len(mileages)), np.nan)
+    for i, term in enumerate(terms):
+        for j, mileage in enumerate(mileages):
+            if request.override_residual_percent is not None:
+                value = request.override_residual_percent
+            else:
+                value = compiled.pick_residual(term, mileage)
+            if value is not None:
+                residual_percent[i, j] = value
+
+    # Axes: term (T, 1, 1), mileage-dependent (T, M, 1), down payment (1, 1, D)
+    result = price_arrays(
+        msrp=np.float64(request.msrp),
+        selling_price=np.float64(request.selling_price),
+        mf=mf[:, None, None],
+        residual_percent=residual_percent[:, :, None],
+        incentives=np.float64(_incentives_for(request, compiled)),
+        acquisition_fee=np.float64(request.acquisition_fee),
+        doc_fee=np.float64(request.doc_fee),
+        registration_fee=np.float64(request.registration_fee),
+        other_fees=np.float64(request.other_fees),
+        down_payment=downs[None, None, :],
+        term=np.asarray(terms, dtype=np.float64)[:, None, None],
+        tax_rate=np.float64(request.tax_rate),
+        zero_drive_off=np.bool_(request.drive_off_mode == "zero")
+    )
+
+    result["valid"] = ~np.isnan(result["monthly_payment_with_tax"])
+    result["terms"] = terms
+    result["mileages"] = mileages
+    result["down_payments"] = downs.tolist()
+    return result
+
+
+def batch_row_to_result(
+    request: LeaseCalculationRequest,
+    batch: Dict[str, Any],
+    index: int
+) -> Dict[str, Any]:
+    """
+    Build a LeaseCalculationResult-shaped dict for one batch row
+
+    Avoids Pydantic construction in hot loops; field set matches
+    calculate_lease_pro(...).dict().
+    """
+    row = {name: float(batch[name][index]) for name in RESULT_FIELDS}
+    return {
+        "brand": request.brand,
+        "model": request.model,
+        "trim": request.trim,
+        "region": request.region,
+        "term_months": request.term_months,
+        "annual_mileage": request.annual_mileage,
+        "msrp": request.msrp,
+        "selling_price": request.selling_price,
+        "acquisition_fee": request.acquisition_fee,
+        "doc_fee": request.doc_fee,
+        "registration_fee": request.registration_fee,
+        "other_fees": request.other_fees,
+        "tax_rate": request.tax_rate,
+        "down_payment": request.down_payment,
+        **row
+    }
+
+
+def grid_field_to_lists(grid: Dict[str, Any], field: str, ndigits: Optional[int] = None) -> List[Any]:
+    """
+    Convert a grid column to nested JSON-safe lists
+
+    Invalid cells (NaN) become None.
+    """
+    values = np.asarray(grid[field], dtype=np.float64)
+    if ndigits is not None:
+        values = np.round(values, ndigits)
+    nested = values.tolist()
+
+    def clean(item):
+        if isinstance(item, list):
+            return [clean(x) for x in item]
+        return None if item != item else item  # NaN check
+
+    return clean(nested)
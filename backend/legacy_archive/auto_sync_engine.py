@@ -3,90 +3,488 @@ AutoSync Engine
 
 Automatically syncs and recalculates Featured Deals when lease programs change
 """
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Callable
 from datetime import datetime, timezone
 from motor.motor_asyncio import AsyncIOMotorDatabase
 import logging
+import time
 from uuid import uuid4
 
 logger = logging.getLogger(__name__)
 
 
+# Last synced fingerprint per (brand, model); _id is "<brand>|<model>" lowercased
+SYNC_FINGERPRINTS_COLLECTION = "auto_sync_fingerprints"
+
+
+def _diff_program_tables(
+    old_snapshot: Dict[str, Any],
+    program: Dict[str, Any]
+) -> tuple:
+    """
+    Per-term MF and residual differences between a snapshot and a program
+    
+    Returns:
+        (mf_changes, rv_changes) dicts keyed "mf_<term>" / "rv_<term>_<mileage>"
+    """
+    old_mf = old_snapshot.get("mf") or {}
+    new_mf = program.get("mf") or {}
+    
+    mf_changes = {}
+    for term in set(list(old_mf.keys()) + list(new_mf.keys())):
+        old_val = old_mf.get(term)
+        new_val = new_mf.get(term)
+        if old_val != new_val:
+            mf_changes[f"mf_{term}"] = {"old": old_val, "new": new_val}
+    
+    old_rv = old_snapshot.get("residual") or {}
+    new_rv = program.get("residual") or {}
+    
+    rv_changes = {}
+    for term in set(list(old_rv.keys()) + list(new_rv.keys())):
+        old_term_data = old_rv.get(term) or {}
+        new_term_data = new_rv.get(term) or {}
+        
+        for mileage in set(list(old_term_data.keys()) + list(new_term_data.keys())):
+            old_val = old_term_data.get(mileage)
+            new_val = new_term_data.get(mileage)
+            if old_val != new_val:
+                rv_changes[f"rv_{term}_{mileage}"] = {"old": old_val, "new": new_val}
+    
+    return mf_changes, rv_changes
+
+
+async def backfill_program_fingerprints(db: AsyncIOMotorDatabase) -> int:
+    """
+    Store fingerprints on parsed programs written before they existed
+    
+    Returns:
+        Number of programs backfilled
+    """
+    from pymongo import UpdateOne
+    from db_lease_programs import compute_program_fingerprint
+    
+    missing = await db.lease_programs_parsed.find(
+        {"fingerprint": {"$exists": False}},
+        {"_id": 0, "id": 1, "mf": 1, "residual": 1}
+    ).to_list(length=None)
+    
+    if not missing:
+        return 0
+    
+    await db.lease_programs_parsed.bulk_write([
+        UpdateOne({"id": program["id"]}, {"$set": {"fingerprint": compute_program_fingerprint(program)}})
+        for program in missing
+    ], ordered=False)
+    
+    logger.info("Backfilled fingerprints for %d parsed programs", len(missing))
+    
+    return len(missing)
+
+
+async def mark_programs_synced(db: AsyncIOMotorDatabase, changes: List[Dict[str, Any]]) -> int:
+    """
+    Record the synced fingerprint and table snapshot per (brand, model)
+    
+    Returns:
+        Number of fingerprint entries written
+    """
+    from pymongo import UpdateOne
+    
+    if not changes:
+        return 0
+    
+    now = datetime.now(timezone.utc)
+    await db[SYNC_FINGERPRINTS_COLLECTION].bulk_write([
+        UpdateOne(
+            {"_id": change["sync_key"]},
+            {"$set": {
+                "brand": change["brand"],
+                "model": change["model"],
+                "program_id": change["program_id"],
+                "fingerprint": change["fingerprint"],
+                "snapshot": change["snapshot"],
+                "synced_at": now
+            }},
+            upsert=True
+        )
+        for change in changes
+    ], ordered=False)
+    
+    return len(changes)
+
+
 async def scan_for_updated_programs(db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
     """
-    Scan for lease programs and compare with previous versions
+    Detect (brand, model) pairs whose latest program differs from the last sync
+    
+    One aggregation picks the newest program per (brand, model), joins the
+    last synced fingerprint and keeps only mismatches; the per-term diff is
+    computed for those programs only. Pairs seen for the first time are
+    reported with every term as new.
+    
+    The newest-per-pair step sorts and groups on the {brand, model,
+    created_at} index prefix, which MongoDB answers with a DISTINCT_SCAN
+    (one index entry per pair) instead of sorting every program; case
+    variants of a pair are merged afterwards over that small set.
+    
+    On the first run (no fingerprints recorded yet) every pair is seeded
+    as synced and nothing is reported, so a deploy does not recalculate
+    and notify for the whole catalogue.
     
     Returns:
-        List of changes detected
+        List of changes detected (each carries the snapshot to mark as synced)
     """
+    await backfill_program_fingerprints(db)
+    
+    first_run = await db[SYNC_FINGERPRINTS_COLLECTION].find_one({}, {"_id": 1}) is None
+    
+    sync_key = {
+        "$concat": [
+            {"$toLower": "$_id.brand"},
+            "|",
+            {"$toLower": {"$ifNull": ["$_id.model", ""]}}
+        ]
+    }
+    
+    pipeline = [
+        # Newest program per exact (brand, model): DISTINCT_SCAN on the index
+        {"$sort": {"brand": 1, "model": 1, "created_at": -1}},
+        {"$group": {
+            "_id": {"brand": "$brand", "model": "$model"},
+            "program_id": {"$first": "$id"},
+            "created_at": {"$first": "$created_at"},
+            "fingerprint": {"$first": "$fingerprint"}
+        }},
+        {"$match": {"_id.brand": {"$nin": [None, ""]}}},
+        # Merge case variants ("Toyota" / "toyota") of the same pair
+        {"$project": {
+            "program_id": 1,
+            "created_at": 1,
+            "fingerprint": 1,
+            "brand": "$_id.brand",
+            "model": "$_id.model",
+            "sync_key": sync_key
+        }},
+        {"$sort": {"created_at": -1}},
+        {"$group": {
+            "_id": "$sync_key",
+            "program_id": {"$first": "$program_id"},
+            "brand": {"$first": "$brand"},
+            "model": {"$first": "$model"},
+            "fingerprint": {"$first": "$fingerprint"}
+        }},
+        {"$lookup": {
+            "from": SYNC_FINGERPRINTS_COLLECTION,
+            "localField": "_id",
+            "foreignField": "_id",
+            "as": "synced"
+        }},
+        {"$match": {"$expr": {"$not": [{"$in": ["$fingerprint", "$synced.fingerprint"]}]}}},
+        {"$lookup": {
+            "from": "lease_programs_parsed",
+            "localField": "program_id",
+            "foreignField": "id",
+            "as": "program"
+        }},
+        {"$project": {
+            "program_id": 1,
+            "brand": 1,
+            "model": 1,
+            "fingerprint": 1,
+            "program.mf": 1,
+            "program.residual": 1,
+            "synced.snapshot": 1
+        }}
+    ]
+    
+    candidates = await db.lease_programs_parsed.aggregate(pipeline).to_list(length=None)
+    
+    logger.info("Fingerprint scan: %d brand/model programs differ from last sync", len(candidates))
+    
     changes = []
+    unchanged = []
+    
+    for candidate in candidates:
+        program = (candidate.get("program") or [{}])[0]
+        previous = (candidate.get("synced") or [{}])[0]
+        
+        snapshot = {
+            "mf": program.get("mf") or {},
+            "residual": program.get("residual") or {}
+        }
+        mf_changes, rv_changes = _diff_program_tables(previous.get("snapshot") or {}, snapshot)
+        
+        change = {
+            "brand": candidate["brand"],
+            "model": candidate.get("model"),
+            "mf_changes": mf_changes,
+            "rv_changes": rv_changes,
+            "program_id": candidate.get("program_id"),
+            "fingerprint": candidate.get("fingerprint"),
+            "sync_key": candidate["_id"],
+            "snapshot": snapshot
+        }
+        
+        if mf_changes or rv_changes:
+            changes.append(change)
+            if not first_run:
+                logger.info("Detected changes in %s %s: %d MF changes, %d RV changes", change['brand'], change['model'], len(mf_changes), len(rv_changes))
+        else:
+            unchanged.append(change)
+    
+    if first_run:
+        await mark_programs_synced(db, changes + unchanged)
+        logger.info("Fingerprint scan: first run, seeded %d brand/model fingerprints without reporting changes", len(changes) + len(unchanged))
+        return []
+    
+    # Fingerprint moved without a table difference (e.g. formatting): just record it
+    await mark_programs_synced(db, unchanged)
+    
+    return changes
+
+
+# Deals per bulk_write round-trip
+RECALC_CHUNK_SIZE = 1000
+
+# Fields the calculator needs when SEO is not regenerated
+RECALC_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "brand": 1,
+    "model": 1,
+    "region": 1,
+    "created_at": 1,
+    "msrp": 1,
+    "selling_price": 1,
+    "term_months": 1,
+    "annual_mileage": 1
+}
+
+
+def _calc_fields_from_batch(batch: Dict[str, Any], index: int) -> Dict[str, Any]:
+    """Calculated deal fields for one priced batch row"""
+    return {
+        "calculated_payment": float(batch["monthly_payment_with_tax"][index]),
+        "calculated_driveoff": float(batch["estimated_drive_off"][index]),
+        "calculated_onepay": float(batch["one_pay_estimated"][index]),
+        "mf_used": float(batch["mf_used"][index]),
+        "residual_percent_used": float(batch["residual_percent_used"][index]),
+        "savings_vs_msrp": float(batch["estimated_savings_vs_msrp_deal"][index])
+    }
+
+
+async def recalculate_deals_pipelined(
+    db: AsyncIOMotorDatabase,
+    query: Optional[Dict[str, Any]] = None,
+    regenerate_seo: bool = False,
+    chunk_size: int = RECALC_CHUNK_SIZE,
+    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    reload_programs: bool = True
+) -> Dict[str, Any]:
+    """
+    Recalculate Featured Deals in bulk
+    
+    Deals are grouped by (brand, model, region). Each group resolves its
+    program once from the program registry and is priced in one
+    vectorized batch. Updates go out as unordered bulk_write chunks of
+    UpdateOne operations.
+    
+    Args:
+        db: Database instance
+        query: featured_deals filter (all deals if None)
+        regenerate_seo: Also regenerate SEO/AI metadata in the same update
+        chunk_size: UpdateOne operations per bulk_write
+        progress_callback: Called with a progress dict after each chunk
+        reload_programs: Reload the program registry first (callers running
+            several pipelines concurrently reload once up front instead)
+        
+    Returns:
+        Statistics dict (total, success, failed, failed_deals, updated_ids,
+        groups, db_operations, elapsed_seconds, deals_per_second)
+    """
+    from pymongo import UpdateOne
+    from pymongo.errors import BulkWriteError
+    from models_lease_programs import LeaseCalculationRequest
+    from lease_calculator_batch import calculate_lease_batch
+    from program_registry import get_program_registry, normalize_key_part
+    from search_engine import notify_deal_updated
+    from simple_cache import bump_collection_version
+    from analytics_rollup import deal_bucket, record_deal_buckets
+    
+    started = time.perf_counter()
+    
+    # Reload programs so writes from other workers are picked up
+    registry = get_program_registry()
+    db_operations = 0
+    if reload_programs:
+        registry.invalidate()
+        await registry.ensure_loaded(db)
+        db_operations += 1
+    
+    projection = {"_id": 0} if regenerate_seo else RECALC_PROJECTION
+    deals = await db.featured_deals.find(query or {}, projection).to_list(length=None)
+    db_operations += 1
+    
+    total = len(deals)
+    updated_at = datetime.now(timezone.utc)
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for deal in deals:
+        key = (
+            normalize_key_part(deal.get("brand")),
+            normalize_key_part(deal.get("model")),
+            normalize_key_part(deal.get("region"))
+        )
+        groups.setdefault(key, []).append(deal)
+    
+    logger.info("Pipelined recalculation: %d deals in %d groups", total, len(groups))
     
-    # Get all parsed programs
-    programs = await db.lease_programs_parsed.find({}, {"_id": 0}).to_list(length=None)
+    success_count = 0
+    updated_ids: List[str] = []
+    failed_deals: List[Dict[str, Any]] = []
+    pending: List[Any] = []
+    pending_ids: List[str] = []
+    pending_fields: List[Dict[str, Any]] = []
+    pending_buckets: List[Any] = []
+    touched_buckets = set()
+    processed = 0
     
-    logger.info(f"Scanning {len(programs)} parsed programs for changes")
+    async def flush():
+        nonlocal db_operations, success_count
+        if not pending:
+            return
+        # Unordered: a BulkWriteError still applied every op not listed in writeErrors
+        errors: Dict[int, str] = {}
+        try:
+            await db.featured_deals.bulk_write(pending, ordered=False)
+        except BulkWriteError as e:
+            errors = {err["index"]: err.get("errmsg", "write error") for err in e.details.get("writeErrors", [])}
+            logger.error("Bulk update: %d of %d deals failed: %s", len(errors), len(pending), e)
+        except Exception as e:
+            errors = {index: str(e) for index in range(len(pending))}
+            logger.error("Bulk update of %d deals failed: %s", len(pending), e)
+        
+        for index, (deal_id, fields, bucket) in enumerate(zip(pending_ids, pending_fields, pending_buckets)):
+            if index in errors:
+                failed_deals.append({"id": deal_id, "reason": errors[index]})
+                continue
+            success_count += 1
+            updated_ids.append(deal_id)
+            notify_deal_updated(deal_id, fields)
+            touched_buckets.add(bucket)
+        if len(errors) < len(pending):
+            bump_collection_version("featured_deals")
+        db_operations += 1
+        pending.clear()
+        pending_ids.clear()
+        pending_fields.clear()
+        pending_buckets.clear()
+        
+        elapsed = time.perf_counter() - started
+        progress = {
+            "processed": processed,
+            "total": total,
+            "success": success_count,
+            "failed": len(failed_deals),
+            "elapsed_seconds": round(elapsed, 3),
+            "deals_per_second": round(processed / elapsed, 1) if elapsed > 0 else None
+        }
+        logger.info("Recalculation progress: %d/%d (%s deals/s)", processed, total, progress['deals_per_second'])
+        if progress_callback:
+            progress_callback(progress)
     
-    # For each program, check if there's a previous version in sync logs
-    for program in programs:
-        brand = program.get("brand")
-        model = program.get("model")
+    for (brand, model, region), group in groups.items():
+        compiled = await registry.get_compiled(db, brand, model, region)
         
-        if not brand:
+        if not compiled:
+            processed += len(group)
+            failed_deals.extend(
+                {"id": deal.get("id"), "reason": "No parsed program found"} for deal in group
+            )
             continue
         
-        # Get last sync log for this brand/model
-        last_log = await db.auto_sync_logs.find_one(
-            {"brand": brand, "model": model},
-            sort=[("timestamp", -1)]
-        )
+        requests = []
+        members = []
+        for deal in group:
+            try:
+                requests.append(LeaseCalculationRequest(
+                    brand=deal.get("brand"),
+                    model=deal.get("model"),
+                    msrp=deal.get("msrp"),
+                    selling_price=deal.get("selling_price"),
+                    term_months=deal.get("term_months"),
+                    annual_mileage=deal.get("annual_mileage"),
+                    region=deal.get("region", "California")
+                ))
+                members.append(deal)
+            except Exception as e:
+                processed += 1
+                failed_deals.append({"id": deal.get("id"), "reason": str(e)})
+        
+        if not requests:
+            continue
         
-        if last_log:
-            # Compare MF
-            old_mf = last_log.get("snapshot", {}).get("mf", {})
-            new_mf = program.get("mf", {})
+        batch = calculate_lease_batch(requests, compiled)
+        
+        for i, deal in enumerate(members):
+            processed += 1
+            
+            if not batch["valid"][i]:
+                failed_deals.append({"id": deal.get("id"), "reason": batch["errors"][i]})
+                continue
             
-            mf_changes = {}
-            for term in set(list(old_mf.keys()) + list(new_mf.keys())):
-                old_val = old_mf.get(term)
-                new_val = new_mf.get(term)
-                if old_val != new_val:
-                    mf_changes[f"mf_{term}"] = {"old": old_val, "new": new_val}
+            fields = _calc_fields_from_batch(batch, i)
             
-            # Compare Residuals
-            old_rv = last_log.get("snapshot", {}).get("residual", {})
-            new_rv = program.get("residual", {})
+            if regenerate_seo:
+                try:
+                    from seo_ai_generator import auto_generate_metadata
+                    
+                    metadata = auto_generate_metadata({**deal, **fields})
+                    fields["seo"] = metadata.get("seo")
+                    fields["ai_summary"] = metadata.get("ai_summary")
+                except Exception as e:
+                    logger.error("Failed to regenerate SEO for deal %s: %s", deal.get('id'), e)
             
-            rv_changes = {}
-            for term in set(list(old_rv.keys()) + list(new_rv.keys())):
-                old_term_data = old_rv.get(term, {})
-                new_term_data = new_rv.get(term, {})
-                
-                for mileage in set(list(old_term_data.keys()) + list(new_term_data.keys())):
-                    old_val = old_term_data.get(mileage)
-                    new_val = new_term_data.get(mileage)
-                    if old_val != new_val:
-                        rv_changes[f"rv_{term}_{mileage}"] = {"old": old_val, "new": new_val}
+            pending.append(UpdateOne({"id": deal.get("id")}, {"$set": {**fields, "updated_at": updated_at}}))
+            pending_ids.append(deal.get("id"))
+            pending_fields.append(fields)
+            pending_buckets.append(deal_bucket(deal))
             
-            # If there are changes, record them
-            if mf_changes or rv_changes:
-                changes.append({
-                    "brand": brand,
-                    "model": model,
-                    "mf_changes": mf_changes,
-                    "rv_changes": rv_changes,
-                    "program_id": program.get("id")
-                })
-                
-                logger.info(f"Detected changes in {brand} {model}: {len(mf_changes)} MF changes, {len(rv_changes)} RV changes")
+            if len(pending) >= chunk_size:
+                await flush()
     
-    return changes
+    await flush()
+    
+    # Payments changed: re-aggregate the touched analytics_daily rows at once
+    if touched_buckets:
+        await record_deal_buckets(db, touched_buckets)
+        db_operations += 2
+    
+    elapsed = time.perf_counter() - started
+    
+    logger.info(
+        f"Pipelined recalculation complete: {success_count}/{total} success, "
+        f"{len(failed_deals)} failed, {len(groups)} groups, {db_operations} DB ops in {elapsed:.3f}s"
+    )
+    
+    return {
+        "total": total,
+        "success": success_count,
+        "failed": len(failed_deals),
+        "failed_deals": failed_deals,
+        "updated_ids": updated_ids,
+        "groups": len(groups),
+        "db_operations": db_operations,
+        "elapsed_seconds": round(elapsed, 3),
+        "deals_per_second": round(total / elapsed, 1) if elapsed > 0 else None
+    }
 
 
 async def recalc_featured_deals_for_brand_model(
     db: AsyncIOMotorDatabase,
     brand: str,
     model: Optional[str] = None
-) -> int:
+) -> Dict[str, Any]:
     """
     Recalculate all Featured Deals for specific brand/model
     
@@ -96,173 +494,34 @@ async def recalc_featured_deals_for_brand_model(
         model: Optional model name
         
     Returns:
-        Number of deals updated
+        Statistics dict from recalculate_deals_pipelined (success count,
+        updated_ids of the deals actually written)
     """
-    from models_lease_programs import LeaseCalculationRequest
-    from lease_calculator_pro import calculate_lease_pro
-    from db_lease_programs import get_latest_parsed_program_for
-    from db_featured_deals import update_calculated_fields
-    
     # Find matching deals
     query = {"brand": {"$regex": f"^{brand}$", "$options": "i"}}
     if model:
         query["model"] = {"$regex": f"^{model}$", "$options": "i"}
     
-    deals = await db.featured_deals.find(query, {"_id": 0}).to_list(length=None)
+    logger.info("Recalculating deals for %s %s", brand, model or "all models")
     
-    logger.info(f"Recalculating {len(deals)} deals for {brand} {model or 'all models'}")
+    stats = await recalculate_deals_pipelined(db, query=query)
     
-    updated_count = 0
+    for failed in stats["failed_deals"]:
+        logger.warning("Failed to recalc deal %s: %s", failed['id'], failed['reason'])
     
-    for deal in deals:
-        try:
-            # Get latest parsed program
-            parsed_program = await get_latest_parsed_program_for(
-                db,
-                brand=deal.get("brand"),
-                model=deal.get("model"),
-                region=deal.get("region")
-            )
-            
-            if not parsed_program:
-                logger.warning(f"No parsed program found for deal {deal.get('id')}")
-                continue
-            
-            # Recalculate
-            calc_request = LeaseCalculationRequest(
-                brand=deal.get("brand"),
-                model=deal.get("model"),
-                msrp=deal.get("msrp"),
-                selling_price=deal.get("selling_price"),
-                term_months=deal.get("term_months"),
-                annual_mileage=deal.get("annual_mileage"),
-                region=deal.get("region", "California")
-            )
-            
-            calc_result = calculate_lease_pro(calc_request, parsed_program)
-            
-            # Update calculated fields
-            calc_fields = {
-                "calculated_payment": calc_result.monthly_payment_with_tax,
-                "calculated_driveoff": calc_result.estimated_drive_off,
-                "calculated_onepay": calc_result.one_pay_estimated,
-                "mf_used": calc_result.mf_used,
-                "residual_percent_used": calc_result.residual_percent_used,
-                "savings_vs_msrp": calc_result.estimated_savings_vs_msrp_deal
-            }
-            
-            await update_calculated_fields(db, deal.get("id"), calc_fields)
-            
-            updated_count += 1
-            
-            logger.info(f"Updated deal {deal.get('id')}: ${calc_result.monthly_payment_with_tax:.2f}/mo")
-            
-        except Exception as e:
-            logger.error(f"Failed to recalc deal {deal.get('id')}: {e}")
-    
-    return updated_count
+    return stats
 
 
 async def full_recalculate_all_deals(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
     """
-    Recalculate all Featured Deals
+    Recalculate all Featured Deals (with SEO/AI metadata regeneration)
     
     Returns:
         Statistics dict
     """
     logger.info("Starting full recalculation of all deals")
     
-    deals = await db.featured_deals.find({}, {"_id": 0}).to_list(length=None)
-    
-    total = len(deals)
-    success_count = 0
-    failed_count = 0
-    failed_deals = []
-    
-    from models_lease_programs import LeaseCalculationRequest
-    from lease_calculator_pro import calculate_lease_pro
-    from db_lease_programs import get_latest_parsed_program_for
-    from db_featured_deals import update_calculated_fields
-    
-    for deal in deals:
-        try:
-            parsed_program = await get_latest_parsed_program_for(
-                db,
-                brand=deal.get("brand"),
-                model=deal.get("model"),
-                region=deal.get("region")
-            )
-            
-            if not parsed_program:
-                failed_count += 1
-                failed_deals.append({
-                    "id": deal.get("id"),
-                    "reason": "No parsed program found"
-                })
-                continue
-            
-            calc_request = LeaseCalculationRequest(
-                brand=deal.get("brand"),
-                model=deal.get("model"),
-                msrp=deal.get("msrp"),
-                selling_price=deal.get("selling_price"),
-                term_months=deal.get("term_months"),
-                annual_mileage=deal.get("annual_mileage"),
-                region=deal.get("region", "California")
-            )
-            
-            calc_result = calculate_lease_pro(calc_request, parsed_program)
-            
-            calc_fields = {
-                "calculated_payment": calc_result.monthly_payment_with_tax,
-                "calculated_driveoff": calc_result.estimated_drive_off,
-                "calculated_onepay": calc_result.one_pay_estimated,
-                "mf_used": calc_result.mf_used,
-                "residual_percent_used": calc_result.residual_percent_used,
-                "savings_vs_msrp": calc_result.estimated_savings_vs_msrp_deal
-            }
-            
-            await update_calculated_fields(db, deal.get("id"), calc_fields)
-            
-            # Regenerate SEO with updated payment
-            try:
-                from seo_ai_generator import auto_generate_metadata
-                
-                # Get fresh deal data with calculations
-                from db_featured_deals import get_deal
-                fresh_deal = await get_deal(db, deal.get("id"))
-                
-                # Generate metadata with fresh data
-                metadata = auto_generate_metadata(fresh_deal)
-                
-                # Update SEO and AI
-                await update_calculated_fields(db, deal.get("id"), {
-                    "seo": metadata.get("seo"),
-                    "ai_summary": metadata.get("ai_summary")
-                })
-                
-                logger.info(f"Regenerated SEO for deal {deal.get('id')}")
-            except Exception as e:
-                logger.error(f"Failed to regenerate SEO for deal {deal.get('id')}: {e}")
-            
-            success_count += 1
-            
-        except Exception as e:
-            logger.error(f"Failed to recalc deal {deal.get('id')}: {e}")
-            failed_count += 1
-            failed_deals.append({
-                "id": deal.get("id"),
-                "reason": str(e)
-            })
-    
-    logger.info(f"Full recalculation complete: {success_count}/{total} success, {failed_count} failed")
-    
-    return {
-        "total": total,
-        "success": success_count,
-        "failed": failed_count,
-        "failed_deals": failed_deals
-    }
+    return await recalculate_deals_pipelined(db, regenerate_seo=True)
 
 
 async def write_sync_log(
@@ -270,11 +529,19 @@ async def write_sync_log(
     brand: str,
     model: Optional[str],
     changes: Dict[str, Any],
-    deals_updated: List[str]
+    deals_updated: List[str],
+    metrics: Optional[Dict[str, Any]] = None,
+    kind: str = "program_change"
 ) -> str:
     """
     Write sync log entry to database
     
+    Args:
+        metrics: Optional timing/throughput figures (wall time, deals/sec,
+            DB operation count) stored with the entry
+        kind: "program_change" (counted as a program change in analytics)
+            or "brand_sync" (a resync run, not counted)
+    
     Returns:
         Log entry ID
     """
@@ -282,6 +549,7 @@ async def write_sync_log(
     
     log_entry = {
         "id": log_id,
+        "kind": kind,
         "timestamp": datetime.now(timezone.utc),
         "brand": brand,
         "model": model,
@@ -290,9 +558,17 @@ async def write_sync_log(
         "deals_count": len(deals_updated)
     }
     
+    if metrics:
+        log_entry["metrics"] = metrics
+    
     await db.auto_sync_logs.insert_one(log_entry)
     
-    logger.info(f"Sync log created: {log_id} - {brand} {model} - {len(deals_updated)} deals updated")
+    from analytics_rollup import record_sync_log
+    from simple_cache import bump_collection_version
+    await record_sync_log(db, log_entry)
+    bump_collection_version("auto_sync_logs")
+    
+    logger.info("Sync log created: %s - %s %s - %d deals updated", log_id, brand, model, len(deals_updated))
     
     return log_id
 
@@ -320,16 +596,10 @@ async def run_auto_sync(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
             brand = change["brand"]
             model = change["model"]
             
-            # Recalculate deals
-            updated_count = await recalc_featured_deals_for_brand_model(db, brand, model)
-            
-            # Get updated deal IDs
-            query = {"brand": {"$regex": f"^{brand}$", "$options": "i"}}
-            if model:
-                query["model"] = {"$regex": f"^{model}$", "$options": "i"}
-            
-            updated_deals = await db.featured_deals.find(query, {"_id": 0, "id": 1}).to_list(length=None)
-            updated_deal_ids = [d["id"] for d in updated_deals]
+            # Recalculate deals (stats carry the ids actually updated)
+            stats = await recalc_featured_deals_for_brand_model(db, brand, model)
+            updated_count = stats["success"]
+            updated_deal_ids = stats["updated_ids"]
             
             # Write log
             log_id = await write_sync_log(
@@ -338,7 +608,8 @@ async def run_auto_sync(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
                 model=model,
                 changes={
                     "mf_changes": change.get("mf_changes", {}),
-                    "rv_changes": change.get("rv_changes", {})
+                    "rv_changes": change.get("rv_changes", {}),
+                    "fingerprint": change.get("fingerprint")
                 },
                 deals_updated=updated_deal_ids
             )
@@ -346,7 +617,9 @@ async def run_auto_sync(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
             logs_created.append(log_id)
             total_deals_updated += updated_count
         
-            logger.info(f"AutoSync complete: {len(changes)} programs updated, {total_deals_updated} deals recalculated")
+        await mark_programs_synced(db, changes)
+        
+        logger.info("AutoSync complete: %d programs updated, %d deals recalculated", len(changes), total_deals_updated)
         
         # Log successful sync to monitoring
         log_sync_status("OK", f"{len(changes)} programs, {total_deals_updated} deals updated")
@@ -364,7 +637,10 @@ async def run_auto_sync(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
             "programs_updated": len(changes),
             "deals_recalculated": total_deals_updated,
             "logs_created": logs_created,
-            "changes": changes
+            "changes": [
+                {k: v for k, v in change.items() if k not in ("snapshot", "sync_key")}
+                for change in changes
+            ]
         }
     
     except Exception as e:
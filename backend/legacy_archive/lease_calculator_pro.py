@@ -31,7 +31,7 @@ def pick_residual_for_term_and_mileage(
     
     residual_dict = parsed_program.get("residual", {})
     if term_key not in residual_dict:
-        logger.warning(f"Term {term_months} not found in residuals")
+        logger.warning("Term %s not found in residuals", term_months)
         return None
     
     term_residuals = residual_dict[term_key]
@@ -50,10 +50,10 @@ def pick_residual_for_term_and_mileage(
             for k, v in term_residuals.items()
         ]
         mileage_ints.sort(key=lambda x: x[0])
-        logger.info(f"Using nearest mileage match: {mileage_ints[0][1]}%")
+        logger.debug("Using nearest mileage match: %s%%", mileage_ints[0][1])
         return mileage_ints[0][1]
     except Exception as e:
-        logger.error(f"Error finding nearest mileage: {e}")
+        logger.error("Error finding nearest mileage: %s", e)
         return None
 
 
@@ -80,10 +80,10 @@ def pick_mf_for_term(
     # Fallback: if there is a single MF, use it
     if len(mf_dict) == 1:
         mf_value = float(list(mf_dict.values())[0])
-        logger.info(f"Using fallback single MF: {mf_value}")
+        logger.debug("Using fallback single MF: %s", mf_value)
         return mf_value
     
-    logger.warning(f"MF for term {term_months} not found")
+    logger.warning("MF for term %s not found", term_months)
     return None
 
 
@@ -104,7 +104,7 @@ def calculate_lease_pro(
     Raises:
         ValueError: If required data is missing or invalid
     """
-    logger.info(f"Calculating PRO lease for {request.brand} {request.model} - {request.term_months}mo/{request.annual_mileage}mi")
+    logger.debug("Calculating PRO lease for %s %s - %smo/%smi", request.brand, request.model, request.term_months, request.annual_mileage)
     
     # Validate parsed program
     if not parsed_program:
@@ -113,7 +113,7 @@ def calculate_lease_pro(
     # 1. Determine Money Factor
     if request.override_mf is not None:
         mf_used = request.override_mf
-        logger.info(f"Using override MF: {mf_used}")
+        logger.debug("Using override MF: %s", mf_used)
     else:
         mf_used = pick_mf_for_term(parsed_program, request.term_months)
         if mf_used is None:
@@ -122,7 +122,7 @@ def calculate_lease_pro(
     # 2. Determine Residual Percent
     if request.override_residual_percent is not None:
         residual_percent_used = request.override_residual_percent
-        logger.info(f"Using override residual: {residual_percent_used}%")
+        logger.debug("Using override residual: %s%%", residual_percent_used)
     else:
         residual_percent_used = pick_residual_for_term_and_mileage(
             parsed_program,
@@ -147,11 +147,11 @@ def calculate_lease_pro(
     if request.apply_incentives:
         if request.manual_incentives:
             total_incentives_applied = sum(request.manual_incentives.values())
-            logger.info(f"Using manual incentives: ${total_incentives_applied}")
+            logger.debug("Using manual incentives: $%s", total_incentives_applied)
         else:
             incentives = parsed_program.get("incentives", {})
             total_incentives_applied = sum(incentives.values())
-            logger.info(f"Using parsed incentives: ${total_incentives_applied}")
+            logger.debug("Using parsed incentives: $%s", total_incentives_applied)
     
     adjusted_cap_cost = cap_cost_before_incentives - total_incentives_applied
     
@@ -206,7 +206,7 @@ def calculate_lease_pro(
     pro_total = monthly_payment_with_tax * term
     estimated_savings_vs_msrp_deal = naive_total - pro_total
     
-    logger.info(f"Calculation complete: ${monthly_payment_with_tax:.2f}/mo")
+    logger.debug("Calculation complete: $%.2f/mo", monthly_payment_with_tax)
     
     return LeaseCalculationResult(
         brand=request.brand,
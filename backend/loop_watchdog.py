@@ -0,0 +1,226 @@
+"""
+Event Loop Watchdog
+
+Finds code that blocks the event loop. A heartbeat task on the loop
+wakes every few milliseconds and records how late it woke (loop lag,
+exported as the event_loop_lag_seconds histogram on /metrics). A
+watchdog thread checks the heartbeat; when it is overdue by more than
+LOOP_BLOCK_THRESHOLD_MS it samples the loop thread's stack, so the
+report names the line that was running while every other request
+waited.
+
+Stalls are aggregated by the innermost application frame (the handler
+line that made the blocking call) with the innermost frame overall (the
+library call that blocked) and a recent stack sample:
+
+    GET /api/admin/diagnostics/blocking
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+
+from config import get_settings
+from monitoring import get_metrics_collector
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Frames under this directory (outside site-packages) are application code
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Loop lag buckets in seconds
+LAG_BUCKETS: Tuple[float, ...] = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Frames kept per stack sample
+STACK_DEPTH = 15
+
+
+def _is_app_frame(filename: str) -> bool:
+    return (
+        filename.startswith(APP_ROOT)
+        and "site-packages" not in filename
+        and filename != __file__
+    )
+
+
+def _where(frame: traceback.FrameSummary) -> str:
+    filename = frame.filename
+    if filename.startswith(APP_ROOT):
+        filename = os.path.relpath(filename, APP_ROOT)
+    else:
+        filename = os.path.basename(filename)
+    return f"{filename}:{frame.lineno} in {frame.name}"
+
+
+class BlockingOffender:
+    """Stalls attributed to one code location"""
+
+    __slots__ = ("location", "count", "total_ms", "max_ms", "blocking_call", "stack", "last_seen")
+
+    def __init__(self, location: str):
+        self.location = location
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.blocking_call = ""
+        self.stack: List[str] = []
+        self.last_seen = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "location": self.location,
+            "count": self.count,
+            "total_ms": round(self.total_ms, 1),
+            "max_ms": round(self.max_ms, 1),
+            "blocking_call": self.blocking_call,
+            "stack": self.stack,
+            "last_seen": self.last_seen
+        }
+
+
+class LoopWatchdog:
+    """
+    Heartbeat task plus a watchdog thread sampling the loop thread
+
+    Args:
+        threshold_ms: Heartbeat overdue time that counts as a stall
+        interval: Heartbeat and watchdog period in seconds
+        max_offenders: Locations kept (least recently seen dropped first)
+    """
+
+    def __init__(self, threshold_ms: float = 100.0, interval: float = 0.025, max_offenders: int = 200):
+        self.threshold_ms = threshold_ms
+        self.interval = interval
+        self.max_offenders = max_offenders
+        self.lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.stalls = 0
+        self._beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._offenders: Dict[str, BlockingOffender] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start on the running loop (no-op if already running)"""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info("Event loop watchdog started (threshold %.0fms)", self.threshold_ms)
+
+    async def stop(self):
+        """Stop the heartbeat and the watchdog thread"""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        registry = get_metrics_collector().registry
+        registry.describe("event_loop_lag_seconds", "How late the event loop heartbeat woke up")
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._beat = time.monotonic()
+            self.lag_ms = lag * 1000
+            self.max_lag_ms = max(self.max_lag_ms, self.lag_ms)
+            registry.observe("event_loop_lag_seconds", lag, buckets=LAG_BUCKETS)
+
+    def _watch(self):
+        """Watchdog thread: sample the loop thread's stack during stalls"""
+        sample: Optional[Tuple[str, str, List[str]]] = None
+        stall_ms = 0.0
+        while not self._stop.wait(self.interval):
+            overdue_ms = (time.monotonic() - self._beat - self.interval) * 1000
+            if overdue_ms > self.threshold_ms:
+                if sample is None:
+                    sample = self._sample_stack()
+                stall_ms = overdue_ms
+            elif sample is not None:
+                # Loop is back: the heartbeat's lag is the stall's length
+                self._record(sample, max(stall_ms, self.lag_ms))
+                sample = None
+
+    def _sample_stack(self) -> Tuple[str, str, List[str]]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return "unknown", "", []
+        stack = traceback.extract_stack(frame)[-STACK_DEPTH:]
+        del frame
+        app_frames = [f for f in stack if _is_app_frame(f.filename)]
+        location = _where(app_frames[-1] if app_frames else stack[-1])
+        return location, _where(stack[-1]), [f"{_where(f)}: {f.line}" for f in stack]
+
+    def _record(self, sample: Tuple[str, str, List[str]], duration_ms: float):
+        location, blocking_call, stack = sample
+        with self._lock:
+            self.stalls += 1
+            offender = self._offenders.get(location)
+            if offender is None:
+                if len(self._offenders) >= self.max_offenders:
+                    oldest = min(self._offenders.values(), key=lambda o: o.last_seen)
+                    del self._offenders[oldest.location]
+                offender = self._offenders[location] = BlockingOffender(location)
+            offender.count += 1
+            offender.total_ms += duration_ms
+            offender.max_ms = max(offender.max_ms, duration_ms)
+            offender.blocking_call = blocking_call
+            offender.stack = stack
+            offender.last_seen = datetime.now(timezone.utc).isoformat()
+        logger.warning("Event loop blocked for %.0fms at %s (%s)", duration_ms, location, blocking_call)
+
+    def get_report(self, limit: int = 50) -> Dict[str, Any]:
+        """Offenders by total blocked time, plus lag counters"""
+        with self._lock:
+            offenders = sorted(self._offenders.values(), key=lambda o: o.total_ms, reverse=True)
+            report = [offender.to_dict() for offender in offenders[:limit]]
+        return {
+            "running": self.running,
+            "threshold_ms": self.threshold_ms,
+            "lag_ms": round(self.lag_ms, 2),
+            "max_lag_ms": round(self.max_lag_ms, 2),
+            "stalls": self.stalls,
+            "offenders": report
+        }
+
+    def reset(self):
+        """Clear offenders and counters"""
+        with self._lock:
+            self._offenders.clear()
+            self.stalls = 0
+            self.max_lag_ms = 0.0
+
+
+# Global watchdog (started at startup when LOOP_WATCHDOG_ENABLED)
+loop_watchdog = LoopWatchdog(threshold_ms=settings.LOOP_BLOCK_THRESHOLD_MS)
+
+
+def get_loop_watchdog() -> LoopWatchdog:
+    """Get global event loop watchdog"""
+    return loop_watchdog
@@ -0,0 +1,249 @@
+"""
+Request Metrics
+
+Fixed-bucket histograms and counters keyed by labels, rendered in the
+Prometheus text format. Updates are O(1) (a bisect over a short bucket
+tuple), and snapshots from several workers merge by adding bucket counts:
+
+    registry.observe("http_request_duration_seconds", 0.042, {"route": "/api/deals/list", ...})
+    merged = MetricsRegistry.from_snapshots([worker_a.snapshot(), worker_b.snapshot()])
+    text = merged.render()
+
+With METRICS_SHARED_DIR set, every worker writes its snapshot there
+periodically and /metrics serves the merge of all of them.
+"""
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import json
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+# Request latency buckets in seconds (upper bounds; +Inf is implicit)
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# Per-request count buckets (DB round-trips)
+COUNT_BUCKETS: Tuple[float, ...] = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Optional[Dict[str, Any]]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items())) if labels else ()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    """Fixed-bucket histogram (per-bucket counts, sum and count)"""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other: "Histogram"):
+        """Add another histogram's observations (same buckets)"""
+        if other.bounds != self.bounds:
+            raise ValueError("Cannot merge histograms with different buckets")
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.sum += other.sum
+        self.count += other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimated quantile (linear within the bucket holding it)
+
+        Values in the +Inf bucket are reported as the largest bound.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[i - 1] if i else 0.0
+                upper = self.bounds[i]
+                return lower + (upper - lower) * max(rank - seen, 0) / n
+            seen += n
+        return self.bounds[-1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"bounds": list(self.bounds), "counts": self.counts, "sum": self.sum, "count": self.count}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Histogram":
+        histogram = cls(data["bounds"])
+        histogram.counts = list(data["counts"])
+        histogram.sum = data["sum"]
+        histogram.count = data["count"]
+        return histogram
+
+
+class MetricsRegistry:
+    """Labelled counters and histograms with help text"""
+
+    def __init__(self):
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self.help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str):
+        self.help[name] = help_text
+
+    def inc(self, name: str, labels: Optional[Dict[str, Any]] = None, value: float = 1):
+        series = self.counters.setdefault(name, {})
+        key = _label_key(labels)
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None, buckets: Sequence[float] = LATENCY_BUCKETS):
+        series = self.histograms.setdefault(name, {})
+        key = _label_key(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram(buckets)
+        histogram.observe(value)
+
+    def histogram_series(self, name: str) -> Dict[LabelKey, Histogram]:
+        return self.histograms.get(name, {})
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable state for merging across workers"""
+        return {
+            "help": self.help,
+            "counters": {
+                name: [[list(map(list, key)), value] for key, value in series.items()]
+                for name, series in self.counters.items()
+            },
+            "histograms": {
+                name: [[list(map(list, key)), histogram.to_dict()] for key, histogram in series.items()]
+                for name, series in self.histograms.items()
+            }
+        }
+
+    def merge_snapshot(self, snapshot: Dict[str, Any]):
+        self.help.update(snapshot.get("help", {}))
+        for name, series in snapshot.get("counters", {}).items():
+            target = self.counters.setdefault(name, {})
+            for key, value in series:
+                key = tuple(map(tuple, key))
+                target[key] = target.get(key, 0) + value
+        for name, series in snapshot.get("histograms", {}).items():
+            target = self.histograms.setdefault(name, {})
+            for key, data in series:
+                key = tuple(map(tuple, key))
+                histogram = Histogram.from_dict(data)
+                if key in target:
+                    target[key].merge(histogram)
+                else:
+                    target[key] = histogram
+
+    @classmethod
+    def from_snapshots(cls, snapshots: Iterable[Dict[str, Any]]) -> "MetricsRegistry":
+        merged = cls()
+        for snapshot in snapshots:
+            merged.merge_snapshot(snapshot)
+        return merged
+
+    def render(self, gauges: Optional[Dict[str, List[Tuple[Dict[str, Any], float]]]] = None) -> str:
+        """
+        Prometheus text exposition (format 0.0.4)
+
+        Args:
+            gauges: Point-in-time values computed at scrape time, by name
+        """
+        lines: List[str] = []
+
+        def header(name: str, kind: str):
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for name in sorted(self.counters):
+            header(name, "counter")
+            for key, value in sorted(self.counters[name].items()):
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+
+        for name in sorted(self.histograms):
+            header(name, "histogram")
+            for key, histogram in sorted(self.histograms[name].items()):
+                cumulative = 0
+                for bound, n in zip(histogram.bounds + (float("inf"),), histogram.counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(histogram.sum)}")
+                lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+
+        for name in sorted(gauges or {}):
+            header(name, "gauge")
+            for labels, value in gauges[name]:
+                if value is not None:
+                    lines.append(f"{name}{_format_labels(_label_key(labels))} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def write_snapshot(registry: MetricsRegistry, directory: str):
+    """Atomically write this worker's snapshot to directory/<pid>.json"""
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(tmp_path, os.path.join(directory, f"{os.getpid()}.json"))
+
+
+def read_snapshots(directory: str, max_age_seconds: float = 3600) -> List[Dict[str, Any]]:
+    """Other workers' snapshots (files older than max_age are from dead workers)"""
+    snapshots = []
+    own = f"{os.getpid()}.json"
+    now = time.time()
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return snapshots
+
+    for name in names:
+        if not name.endswith(".json") or name == own:
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if now - os.path.getmtime(path) > max_age_seconds:
+                continue
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping metrics snapshot {name}: {e}")
+    return snapshots
@@ -1,261 +1,345 @@
 """
 Security and Performance Middleware for CargwinNewCar
+
+AppMiddleware is one pure-ASGI pass over scope/send: the /health
+short-circuits, rate limiting, sampled request logging, timing, metrics
+and DB tracing, error mapping, security/cache headers, conditional GET and
+compression. Streaming responses pass through chunk by chunk; only bounded
+bodies that need an ETag or compression are buffered.
 """
 import time
 import logging
-from typing import Callable, Dict, Any
-from fastapi import Request, Response, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import JSONResponse
-import asyncio
-from collections import defaultdict, deque
+import traceback
+from typing import Any, Dict, List, Optional
 from datetime import datetime, timedelta, timezone
-import json
 
-from config import get_settings, SECURITY_HEADERS, RATE_LIMITS
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from config import get_settings, SECURITY_HEADERS
+from db_tracer import current_trace, get_db_tracer
+from http_cache import (
+    MAX_COMPRESS_BYTES,
+    body_etag,
+    choose_encoding,
+    get_cache_policy,
+    get_compressed_body_cache,
+    if_none_match
+)
+from monitoring import get_health_checker, get_metrics_collector, get_request_log
+from performance import ResponseCompression
+from rate_limiter import get_client_ip, get_rate_limiter
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    """Add security headers to all responses"""
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        response = await call_next(request)
-        
-        # Add security headers
-        for header, value in SECURITY_HEADERS.items():
-            response.headers[header] = value
-        
-        # Add CSP header for production
-        if settings.is_production:
-            csp_policy = (
-                "default-src 'self'; "
-                "script-src 'self' 'unsafe-inline' 'unsafe-eval'; "
-                "style-src 'self' 'unsafe-inline'; "
-                "img-src 'self' data: https:; "
-                "font-src 'self' data:; "
-                "connect-src 'self'; "
-                "media-src 'self'; "
-                "object-src 'none'; "
-                "frame-ancestors 'none';"
-            )
-            response.headers["Content-Security-Policy"] = csp_policy
-        
-        return response
+CSP_POLICY = (
+    "default-src 'self'; "
+    "script-src 'self' 'unsafe-inline' 'unsafe-eval'; "
+    "style-src 'self' 'unsafe-inline'; "
+    "img-src 'self' data: https:; "
+    "font-src 'self' data:; "
+    "connect-src 'self'; "
+    "media-src 'self'; "
+    "object-src 'none'; "
+    "frame-ancestors 'none';"
+)
+
+def get_cache_headers(path: str) -> Dict[str, str]:
+    """Default cache headers for paths without a route policy"""
+    if path.startswith("/uploads"):
+        # Cache uploaded files for 1 year
+        return {
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "Expires": (datetime.now(timezone.utc) + timedelta(days=365)).strftime("%a, %d %b %Y %H:%M:%S GMT")
+        }
+    elif path.startswith("/api"):
+        # Don't cache API responses
+        return {
+            "Cache-Control": "no-cache, no-store, must-revalidate",
+            "Pragma": "no-cache",
+            "Expires": "0"
+        }
+    else:
+        # Default caching for static assets
+        return {
+            "Cache-Control": "public, max-age=3600"  # 1 hour
+        }
+
+def _add_vary(headers: MutableHeaders, value: str = "Accept-Encoding"):
+    """Append to Vary without clobbering existing entries"""
+    vary = headers.get("vary")
+    if not vary:
+        headers["Vary"] = value
+    elif value.lower() not in [v.strip().lower() for v in vary.split(",")]:
+        headers["Vary"] = f"{vary}, {value}"
+
+def route_label(scope) -> str:
+    """Route template for metrics labels (bounded cardinality, no raw ids)"""
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", "unmatched")
+    if scope["path"].startswith("/uploads/"):
+        return "/uploads"
+    return "unmatched"
+
+# Health endpoints answered by the middleware from cached probe results
+HEALTH_PATHS = {"/health", "/health/live", "/health/ready"}
+
+def health_response(path: str) -> JSONResponse:
+    """
+    Liveness (/health, /health/live) or readiness (/health/ready, 503 when
+    not ready) from monitoring.HealthChecker's last probe
+    """
+    checker = get_health_checker()
+    if path == "/health/ready":
+        ready, payload = checker.readiness()
+        return JSONResponse(payload, status_code=200 if ready else 503)
+    return JSONResponse(checker.liveness())
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Rate limiting middleware"""
+def error_response(exc: Exception) -> JSONResponse:
+    """500 for an unhandled error (details outside production only)"""
+    if settings.is_production:
+        return JSONResponse(
+            status_code=500,
+            content={
+                "error": "Internal server error",
+                "message": "An unexpected error occurred. Please try again later."
+            }
+        )
+    return JSONResponse(
+        status_code=500,
+        content={
+            "error": "Internal server error",
+            "message": str(exc),
+            "traceback": traceback.format_exc()
+        }
+    )
+
+class _ResponseWriter:
+    """
+    send() wrapper for one request
     
-    def __init__(self, app):
-        super().__init__(app)
-        self.requests = defaultdict(lambda: deque())
-        self.blocked_ips = {}
+    Finalizes headers on http.response.start and either forwards the body
+    as it streams, drops it (304), or buffers a bounded body to derive an
+    ETag and/or compress it.
+    """
     
-    def get_client_ip(self, request: Request) -> str:
-        """Get client IP address"""
-        # Check for forwarded headers (when behind proxy)
-        forwarded_for = request.headers.get("X-Forwarded-For")
-        if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
-        
-        real_ip = request.headers.get("X-Real-IP")
-        if real_ip:
-            return real_ip
-        
-        return request.client.host if request.client else "unknown"
+    __slots__ = (
+        "middleware", "scope", "send", "path", "method", "request_headers",
+        "rate_limit", "start_time", "status", "started", "start_message",
+        "mode", "chunks", "etag", "encoding", "db_trace"
+    )
     
-    def get_rate_limit_for_path(self, path: str) -> tuple[int, int]:
-        """Get rate limit for specific path"""
-        if path.startswith("/api/auth"):
-            return 5, 60  # 5 requests per minute
-        elif path.startswith("/api/admin/upload"):
-            return 10, 60  # 10 requests per minute
-        elif path.startswith("/api/admin"):
-            return 50, 60  # 50 requests per minute
-        elif path.startswith("/api"):
-            return 100, 60  # 100 requests per minute
-        else:
-            return 200, 60  # 200 requests per minute for public
+    def __init__(self, middleware: "AppMiddleware", scope, send, request_headers: Headers, rate_limit: Any, start_time: float):
+        self.middleware = middleware
+        self.scope = scope
+        self.send = send
+        self.path = scope["path"]
+        self.method = scope["method"]
+        self.request_headers = request_headers
+        self.rate_limit = rate_limit
+        self.start_time = start_time
+        self.status = 500
+        self.started = False
+        self.start_message: Optional[Dict[str, Any]] = None
+        self.mode = "stream"
+        self.chunks: List[bytes] = []
+        self.etag: Optional[str] = None
+        self.encoding: Optional[str] = None
+        self.db_trace = None
     
-    def is_rate_limited(self, ip: str, path: str) -> bool:
-        """Check if IP is rate limited for this path"""
-        max_requests, window_seconds = self.get_rate_limit_for_path(path)
-        now = datetime.now(timezone.utc)
+    def finalize_headers(self, headers: MutableHeaders, status: int):
+        """Timing, security, cache and rate limit headers"""
+        headers["X-Process-Time"] = str(time.perf_counter() - self.start_time)
         
-        # Check if IP is temporarily blocked
-        if ip in self.blocked_ips:
-            if now < self.blocked_ips[ip]:
-                return True
-            else:
-                del self.blocked_ips[ip]
+        for name, value in self.middleware.security_headers:
+            headers[name] = value
         
-        # Clean old requests
-        cutoff = now - timedelta(seconds=window_seconds)
-        self.requests[ip] = deque([
-            req_time for req_time in self.requests[ip] 
-            if req_time > cutoff
-        ])
+        # Routes that set their own Cache-Control keep it; public reads get
+        # their route policy (see http_cache.CACHE_POLICIES)
+        if "cache-control" not in headers:
+            policy = get_cache_policy(self.method, self.path)
+            if policy and status in (200, 304):
+                headers["Cache-Control"] = policy
+            else:
+                for name, value in get_cache_headers(self.path).items():
+                    headers[name] = value
         
-        # Check rate limit
-        if len(self.requests[ip]) >= max_requests:
-            # Block IP for 5 minutes after exceeding rate limit
-            self.blocked_ips[ip] = now + timedelta(minutes=5)
-            logger.warning(f"Rate limit exceeded for IP {ip} on path {path}")
-            return True
+        # DB work done before the response started (outside production)
+        if self.db_trace is not None and self.middleware.trace_header:
+            headers["X-DB-Trace"] = self.db_trace.header()
         
-        # Add current request
-        self.requests[ip].append(now)
-        return False
+        # A handler-level policy (request.state.rate_limit) wins over the
+        # path tier; a 429 from the handler already carries its headers
+        if self.rate_limit is not None:
+            result = self.scope.get("state", {}).get("rate_limit", self.rate_limit)
+            for name, value in result.headers().items():
+                headers.setdefault(name, value)
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Skip rate limiting for development
-        if settings.is_development:
-            return await call_next(request)
-        
-        client_ip = self.get_client_ip(request)
-        path = request.url.path
+    async def start(self, message: Dict[str, Any]):
+        self.started = True
+        self.status = message["status"]
+        headers = MutableHeaders(scope=message)
         
-        if self.is_rate_limited(client_ip, path):
-            return JSONResponse(
-                status_code=429,
-                content={
-                    "error": "Rate limit exceeded",
-                    "message": "Too many requests. Please try again later."
-                },
-                headers={"Retry-After": "300"}
-            )
+        if self.method not in ("GET", "HEAD") or self.status != 200 or "content-encoding" in headers:
+            self.finalize_headers(headers, self.status)
+            await self.send(message)
+            return
         
-        return await call_next(request)
-
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    """Log all requests for monitoring"""
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        start_time = time.time()
+        self.etag = headers.get("etag")
+        if self.etag and if_none_match(self.request_headers.get("if-none-match"), self.etag):
+            self.mode = "drop"
+            await self.send_not_modified(headers)
+            return
         
-        # Log request
-        logger.info(f"Request: {request.method} {request.url.path}")
+        content_length = int(headers.get("content-length") or 0)
+        # Only buffer bodies of known, bounded size (never file streams)
+        bufferable = 0 < content_length <= MAX_COMPRESS_BYTES
+        compressible = ResponseCompression.should_compress(headers.get("content-type", ""), content_length)
+        if compressible:
+            _add_vary(headers)
+            if bufferable and self.method != "HEAD":
+                self.encoding = choose_encoding(self.request_headers.get("accept-encoding"))
         
-        # Process request
-        response = await call_next(request)
+        needs_etag = self.etag is None and bufferable and self.status == 200 and get_cache_policy(self.method, self.path) is not None
+        if needs_etag or self.encoding:
+            self.mode = "buffer"
+            self.start_message = message
+            return
         
-        # Calculate processing time
-        process_time = time.time() - start_time
-        
-        # Add processing time header
-        response.headers["X-Process-Time"] = str(process_time)
+        self.finalize_headers(headers, self.status)
+        await self.send(message)
+    
+    async def send_not_modified(self, headers: MutableHeaders):
+        self.status = 304
+        message = {"type": "http.response.start", "status": 304, "headers": []}
+        not_modified = MutableHeaders(scope=message)
+        not_modified["ETag"] = self.etag
+        if "cache-control" in headers:
+            not_modified["Cache-Control"] = headers["cache-control"]
+        _add_vary(not_modified)
+        self.finalize_headers(not_modified, 304)
+        await self.send(message)
+        await self.send({"type": "http.response.body", "body": b"", "more_body": False})
+    
+    async def flush(self):
+        """Send a buffered response (304, compressed or identity)"""
+        message = self.start_message
+        headers = MutableHeaders(scope=message)
+        body = b"".join(self.chunks)
+        self.chunks = []
         
-        # Log response
-        logger.info(
-            f"Response: {request.method} {request.url.path} "
-            f"- {response.status_code} ({process_time:.3f}s)"
-        )
+        if self.etag is None and self.status == 200 and get_cache_policy(self.method, self.path):
+            self.etag = body_etag(body)
+            headers["ETag"] = self.etag
+            if if_none_match(self.request_headers.get("if-none-match"), self.etag):
+                await self.send_not_modified(headers)
+                return
         
-        # Log slow requests
-        if process_time > 1.0:
-            logger.warning(
-                f"Slow request detected: {request.method} {request.url.path} "
-                f"took {process_time:.3f}s"
-            )
+        if self.encoding:
+            url = self.path + ("?" + self.scope["query_string"].decode() if self.scope.get("query_string") else "")
+            body = get_compressed_body_cache().get_or_compress(url, self.etag, body, self.encoding)
+            headers["Content-Encoding"] = self.encoding
+        headers["Content-Length"] = str(len(body))
         
-        return response
-
-class ErrorHandlingMiddleware(BaseHTTPMiddleware):
-    """Global error handling"""
+        self.finalize_headers(headers, self.status)
+        await self.send(message)
+        await self.send({"type": "http.response.body", "body": body, "more_body": False})
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        try:
-            return await call_next(request)
-        except HTTPException:
-            # Let HTTPExceptions pass through
-            raise
-        except Exception as e:
-            # Log unexpected errors
-            logger.error(f"Unhandled error in {request.method} {request.url.path}: {e}", exc_info=True)
-            
-            # Return generic error response for production
-            if settings.is_production:
-                return JSONResponse(
-                    status_code=500,
-                    content={
-                        "error": "Internal server error",
-                        "message": "An unexpected error occurred. Please try again later."
-                    }
-                )
-            else:
-                # Return detailed error for development
-                import traceback
-                return JSONResponse(
-                    status_code=500,
-                    content={
-                        "error": "Internal server error",
-                        "message": str(e),
-                        "traceback": traceback.format_exc()
-                    }
-                )
+    async def __call__(self, message: Dict[str, Any]):
+        if message["type"] == "http.response.start":
+            await self.start(message)
+        elif message["type"] == "http.response.body" and self.mode != "stream":
+            if self.mode == "buffer":
+                self.chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    await self.flush()
+        else:
+            await self.send(message)
 
-class HealthCheckMiddleware(BaseHTTPMiddleware):
-    """Health check endpoint"""
+class AppMiddleware:
+    """
+    Fused application middleware (pure ASGI)
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        if request.url.path == "/health":
-            from config import get_settings
-            settings = get_settings()
-            return JSONResponse({
-                "status": "healthy",
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "version": settings.PROJECT_VERSION,
-                "environment": settings.ENVIRONMENT
-            })
-        
-        return await call_next(request)
-
-class CacheControlMiddleware(BaseHTTPMiddleware):
-    """Add cache control headers"""
+    Replaces the BaseHTTPMiddleware chain (rate limit, health check,
+    request logging, error handling, security headers, cache control,
+    compression) with a single wrapper: no per-layer task or response
+    stream, and streaming bodies are forwarded as they are produced.
     
-    def get_cache_headers(self, path: str) -> Dict[str, str]:
-        """Get cache headers for specific paths"""
-        if path.startswith("/uploads"):
-            # Cache uploaded files for 1 year
-            return {
-                "Cache-Control": "public, max-age=31536000, immutable",
-                "Expires": (datetime.now(timezone.utc) + timedelta(days=365)).strftime("%a, %d %b %Y %H:%M:%S GMT")
-            }
-        elif path.startswith("/api"):
-            # Don't cache API responses
-            return {
-                "Cache-Control": "no-cache, no-store, must-revalidate",
-                "Pragma": "no-cache",
-                "Expires": "0"
-            }
-        else:
-            # Default caching for static assets
-            return {
-                "Cache-Control": "public, max-age=3600"  # 1 hour
-            }
+    Args:
+        app: ASGI application
+        rate_limit: Apply the rate_limiter path tiers (production)
+    """
+    
+    def __init__(self, app, rate_limit: bool = False):
+        self.app = app
+        self.limiter = get_rate_limiter() if rate_limit else None
+        self.request_log = get_request_log()
+        self.metrics = get_metrics_collector()
+        self.tracer = get_db_tracer()
+        self.trace_header = not settings.is_production
+        security_headers = dict(SECURITY_HEADERS)
+        if settings.is_production:
+            security_headers["Content-Security-Policy"] = CSP_POLICY
+        self.security_headers = list(security_headers.items())
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        response = await call_next(request)
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Add cache headers
-        cache_headers = self.get_cache_headers(request.url.path)
-        for header, value in cache_headers.items():
-            response.headers[header] = value
+        path = scope["path"]
+        method = scope["method"]
         
-        return response
-
-class CompressionMiddleware(BaseHTTPMiddleware):
-    """Response compression"""
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        response = await call_next(request)
+        # Load balancer checks skip rate limiting and request accounting
+        if path in HEALTH_PATHS:
+            await health_response(path)(scope, receive, send)
+            return
+        
+        rate_limit = None
+        if self.limiter is not None:
+            policy = self.limiter.policy_for_path(path)
+            rate_limit = await self.limiter.hit(policy, get_client_ip(Request(scope)))
+            if not rate_limit.allowed:
+                response = JSONResponse(
+                    status_code=429,
+                    content={
+                        "error": "Rate limit exceeded",
+                        "message": "Too many requests. Please try again later."
+                    },
+                    headers=rate_limit.headers()
+                )
+                await response(scope, receive, send)
+                return
         
-        # Add compression hint for reverse proxy
-        if request.headers.get("accept-encoding", "").find("gzip") != -1:
-            response.headers["Vary"] = "Accept-Encoding"
+        start_time = time.perf_counter()
         
-        return response
+        writer = _ResponseWriter(self, scope, send, Headers(scope=scope), rate_limit, start_time)
+        db_token = self.metrics.start_request()
+        trace_token = self.tracer.start_trace()
+        writer.db_trace = current_trace()
+        try:
+            await self.app(scope, receive, writer)
+        except Exception as e:
+            if writer.started:
+                raise
+            logger.error("Unhandled error in %s %s: %s", method, path, e, exc_info=True)
+            await error_response(e)(scope, receive, writer)
+        finally:
+            db_operations = self.metrics.finish_request(db_token)
+            db_trace = self.tracer.finish_trace(trace_token)
+        
+        duration = time.perf_counter() - start_time
+        self.metrics.record_request(method, route_label(scope), writer.status, duration, db_operations)
+        
+        # One sampled record per request; slow ones go to the ring buffer
+        self.request_log.record(
+            method, path, writer.status, duration,
+            scope.get("query_string", b"").decode("latin-1"),
+            db_trace.summary() if db_trace is not None else None
+        )
 
 # CORS Configuration
 def get_cors_config():
@@ -275,7 +359,10 @@ def get_cors_config():
         ],
         "expose_headers": [
             "X-Process-Time",
+            "X-RateLimit-Limit",
             "X-RateLimit-Remaining",
             "X-RateLimit-Reset",
+            "Retry-After",
+            "ETag",
         ]
     }
\ No newline at end of file
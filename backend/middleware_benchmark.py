@@ -0,0 +1,160 @@
+"""
+Middleware overhead microbenchmark
+
+Per-request cost of the middleware stack, measured by driving the ASGI app
+directly (no HTTP client or socket):
+
+- bare: the route alone
+- chain: six BaseHTTPMiddleware layers doing the same header work as the
+  stack server.py used to register (compression, cache control, security
+  headers, error handling, request logging, health check)
+- fused: AppMiddleware
+
+Usage:
+    python middleware_benchmark.py [--requests 5000] [--body-bytes 512]
+"""
+from typing import Callable, Dict, List
+import argparse
+import asyncio
+import logging
+import time
+
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from config import SECURITY_HEADERS
+from middleware import AppMiddleware, get_cache_headers
+
+
+def build_app(body_bytes: int) -> Starlette:
+    payload = {"deals": "x" * body_bytes}
+
+    async def deals(request):
+        return JSONResponse(payload)
+
+    return Starlette(routes=[Route("/api/bench", deals)])
+
+
+def _header_layer(apply: Callable[[Response], None]):
+    class HeaderLayer(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            response = await call_next(request)
+            apply(response)
+            return response
+    return HeaderLayer
+
+
+class _ErrorLayer(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        try:
+            return await call_next(request)
+        except Exception:
+            return JSONResponse({"error": "Internal server error"}, status_code=500)
+
+
+class _HealthLayer(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        if request.url.path == "/health":
+            return JSONResponse({"status": "healthy"})
+        return await call_next(request)
+
+
+def build_chain(app):
+    """The previous BaseHTTPMiddleware chain, innermost first"""
+    def vary(response):
+        response.headers.setdefault("Vary", "Accept-Encoding")
+
+    def cache_control(response):
+        for name, value in get_cache_headers("/api/bench").items():
+            response.headers[name] = value
+
+    def security(response):
+        for name, value in SECURITY_HEADERS.items():
+            response.headers[name] = value
+
+    def timing(response):
+        response.headers["X-Process-Time"] = str(time.perf_counter())
+
+    for layer in (
+        _header_layer(vary),
+        _header_layer(cache_control),
+        _header_layer(security),
+        _ErrorLayer,
+        _header_layer(timing),
+        _HealthLayer
+    ):
+        app = layer(app)
+    return app
+
+
+async def measure(app, requests: int) -> float:
+    """Mean microseconds per request"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/bench",
+        "raw_path": b"/api/bench",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80)
+    }
+
+    async def request():
+        # Like a server: the body once, then disconnect after the response
+        messages = iter([{"type": "http.request", "body": b"", "more_body": False}])
+        done = asyncio.Event()
+
+        async def receive():
+            message = next(messages, None)
+            if message is None:
+                await done.wait()
+                message = {"type": "http.disconnect"}
+            return message
+
+        async def send(message):
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                done.set()
+
+        await app(dict(scope), receive, send)
+
+    for _ in range(min(requests, 200)):
+        await request()
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await request()
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+async def run(requests: int, body_bytes: int) -> Dict[str, float]:
+    results = {
+        "bare": await measure(build_app(body_bytes), requests),
+        "chain": await measure(build_chain(build_app(body_bytes)), requests),
+        "fused": await measure(AppMiddleware(build_app(body_bytes)), requests)
+    }
+    return results
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Middleware per-request overhead")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--body-bytes", type=int, default=512)
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    results = asyncio.run(run(args.requests, args.body_bytes))
+
+    bare = results["bare"]
+    for name, micros in results.items():
+        print(f"{name:>6}: {micros:8.1f} us/request  (+{micros - bare:.1f} us middleware)")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,11 +6,23 @@ import os
 import json
 import logging
 import time
+import atexit
+import queue
+import random
+import re
+from collections import deque
+from contextvars import ContextVar, Token
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Pattern, Tuple
 from contextlib import asynccontextmanager
 import asyncio
 
+from config import get_settings
+from metrics import COUNT_BUCKETS, Histogram, MetricsRegistry, read_snapshots, write_snapshot
+
+settings = get_settings()
+
 # Structured logging setup
 class JSONFormatter(logging.Formatter):
     """JSON formatter for structured logging"""
@@ -37,11 +49,52 @@ class JSONFormatter(logging.Formatter):
             log_entry["request_id"] = record.request_id
         if hasattr(record, 'duration'):
             log_entry["duration_ms"] = record.duration
+        for field in ("method", "path", "status_code"):
+            if hasattr(record, field):
+                log_entry[field] = getattr(record, field)
         
         return json.dumps(log_entry)
 
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hand records to the log writer thread without blocking the caller
+    
+    Records are queued as-is: %-style args, exception text and JSON are
+    rendered on the listener thread (pass args, don't pre-format, and don't
+    mutate them after the call). A full queue drops the record and counts
+    it rather than stalling the event loop.
+    """
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+# Writer thread and queue handler installed by setup_logging
+_log_listener: Optional[QueueListener] = None
+_log_handler: Optional[NonBlockingQueueHandler] = None
+
+def _log_formatter(log_format: str) -> logging.Formatter:
+    if log_format == "json":
+        return JSONFormatter()
+    return logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
 def setup_logging(log_level: str = "INFO", log_format: str = "json"):
-    """Setup application logging"""
+    """
+    Setup application logging
+    
+    The root logger gets a single non-blocking queue handler; console and
+    file output is written by a QueueListener thread.
+    """
+    global _log_listener, _log_handler
     level = getattr(logging, log_level.upper())
     
     # Create logs directory
@@ -55,49 +108,173 @@ def setup_logging(log_level: str = "INFO", log_format: str = "json"):
     # Remove default handlers
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
+    shutdown_logging()
     
     # Console handler
     console_handler = logging.StreamHandler()
-    if log_format == "json":
-        console_handler.setFormatter(JSONFormatter())
-    else:
-        console_handler.setFormatter(
-            logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        )
-    root_logger.addHandler(console_handler)
+    console_handler.setFormatter(_log_formatter(log_format))
     
     # File handler for errors
     error_handler = logging.FileHandler(f"{log_dir}/error.log")
     error_handler.setLevel(logging.ERROR)
-    if log_format == "json":
-        error_handler.setFormatter(JSONFormatter())
-    else:
-        error_handler.setFormatter(
-            logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        )
-    root_logger.addHandler(error_handler)
+    error_handler.setFormatter(_log_formatter(log_format))
     
     # File handler for all logs
     app_handler = logging.FileHandler(f"{log_dir}/app.log")
-    if log_format == "json":
-        app_handler.setFormatter(JSONFormatter())
-    else:
-        app_handler.setFormatter(
-            logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        )
-    root_logger.addHandler(app_handler)
+    app_handler.setFormatter(_log_formatter(log_format))
+    
+    log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _log_listener = QueueListener(
+        log_queue, console_handler, error_handler, app_handler,
+        respect_handler_level=True
+    )
+    _log_listener.start()
+    
+    _log_handler = NonBlockingQueueHandler(log_queue)
+    root_logger.addHandler(_log_handler)
     
     return root_logger
 
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        for handler in _log_listener.handlers:
+            handler.close()
+        _log_listener = None
+
+atexit.register(shutdown_logging)
+
+# Share of successful reads (GET/HEAD, status < 400) logged per route, first
+# match wins (others use LOG_SAMPLE_RATE). Writes, 4xx/5xx and slow requests
+# are always logged.
+REQUEST_LOG_SAMPLE_RATES: List[Tuple[Pattern, float]] = [
+    (re.compile(r"^/health$"), 0.0),
+    (re.compile(r"^/metrics$"), 0.0),
+    (re.compile(r"^/uploads/"), 0.0),
+    (re.compile(r"^/api/deals(/|$)"), 0.01),
+    (re.compile(r"^/api/cars(/|$)"), 0.01),
+    (re.compile(r"^/api/lease/brands-models$"), 0.01),
+    (re.compile(r"^/api/search$"), 0.05)
+]
+
+SAMPLED_METHODS = frozenset(("GET", "HEAD"))
+
+class RequestLog:
+    """
+    Sampled access log plus a ring buffer of recent slow requests
+    
+    One record per request (not a request and a response line), emitted
+    with %-style args and structured extras.
+    """
+    
+    def __init__(self, default_rate: float = 1.0, slow_threshold: float = 1.0, slow_buffer_size: int = 200):
+        self.default_rate = default_rate
+        self.slow_threshold = slow_threshold
+        self.slow_requests: deque = deque(maxlen=slow_buffer_size)
+        self.logger = logging.getLogger("request")
+        self.logged = 0
+        self.sampled_out = 0
+        self.slow = 0
+    
+    def sample_rate(self, path: str) -> float:
+        for pattern, rate in REQUEST_LOG_SAMPLE_RATES:
+            if pattern.match(path):
+                return rate
+        return self.default_rate
+    
+    def record(self, method: str, path: str, status_code: int, duration: float, query: str = "", db: Optional[Dict[str, Any]] = None):
+        """
+        Log one finished request
+        
+        Args:
+            method: HTTP method
+            path: Request path
+            status_code: Response status
+            duration: Seconds until the response completed
+            query: Raw query string (kept for slow requests)
+            db: DB trace summary (kept for slow requests)
+        """
+        extra = {"method": method, "path": path, "status_code": status_code, "duration": round(duration * 1000, 2)}
+        
+        if duration > self.slow_threshold:
+            self.slow += 1
+            self.slow_requests.append({
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "method": method,
+                "path": path,
+                "query": query,
+                "status_code": status_code,
+                "duration_ms": extra["duration"],
+                "db": db
+            })
+            self.logger.warning("Slow request detected: %s %s took %.3fs", method, path, duration, extra=extra)
+            return
+        
+        rate = self.sample_rate(path) if method in SAMPLED_METHODS and status_code < 400 else 1.0
+        if rate < 1.0 and random.random() >= rate:
+            self.sampled_out += 1
+            return
+        
+        self.logged += 1
+        self.logger.info("%s %s - %s (%.3fs)", method, path, status_code, duration, extra=extra)
+    
+    def get_slow_requests(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent slow requests, newest first"""
+        return list(self.slow_requests)[::-1][:limit]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "logged": self.logged,
+            "sampled_out": self.sampled_out,
+            "slow": self.slow,
+            "slow_threshold_seconds": self.slow_threshold,
+            "default_sample_rate": self.default_rate,
+            "sample_rates": {pattern.pattern: rate for pattern, rate in REQUEST_LOG_SAMPLE_RATES}
+        }
+
+# Global request log
+request_log = RequestLog(settings.LOG_SAMPLE_RATE, settings.SLOW_REQUEST_SECONDS, settings.SLOW_REQUEST_BUFFER)
+
+def get_request_log() -> RequestLog:
+    """Get global request log"""
+    return request_log
+
+def get_logging_stats() -> Dict[str, Any]:
+    """Queue depth, dropped records and request sampling counters"""
+    return {
+        "queue_depth": _log_handler.queue.qsize() if _log_handler else 0,
+        "queue_size": settings.LOG_QUEUE_SIZE,
+        "dropped": _log_handler.dropped if _log_handler else 0,
+        "requests": request_log.get_stats()
+    }
+
+# DB round-trips made by the request being handled ([count] while a request
+# is active, None outside requests)
+_request_db_ops: ContextVar[Optional[List[int]]] = ContextVar("request_db_ops", default=None)
+
 class MetricsCollector:
-    """Collect application metrics"""
+    """
+    Collect application metrics
+    
+    Request latency and DB round-trips are recorded per route template,
+    method and status into fixed-bucket histograms (metrics.MetricsRegistry),
+    so updates are O(1), percentiles come from the buckets, and workers'
+    snapshots can be merged for /metrics.
+    """
     
     def __init__(self):
+        self.registry = MetricsRegistry()
+        self.registry.describe("http_requests_total", "HTTP requests by route, method and status")
+        self.registry.describe("http_request_duration_seconds", "HTTP request latency by route, method and status")
+        self.registry.describe("http_request_db_round_trips", "MongoDB commands issued per HTTP request")
+        self.registry.describe("db_operations_total", "MongoDB commands issued")
+        self.requests = Histogram()
         self.metrics = {
             "requests_total": 0,
             "requests_by_method": {},
             "requests_by_status": {},
-            "response_times": [],
             "errors_total": 0,
             "database_operations": 0,
             "file_uploads": 0,
@@ -107,23 +284,48 @@ class MetricsCollector:
         }
         self.start_time = time.time()
     
-    def record_request(self, method: str, path: str, status_code: int, duration: float):
-        """Record HTTP request metrics"""
+    def start_request(self) -> Token:
+        """Start counting DB round-trips for the current request context"""
+        return _request_db_ops.set([0])
+    
+    def finish_request(self, token: Token) -> Optional[int]:
+        """DB round-trips made since start_request"""
+        counter = _request_db_ops.get()
+        _request_db_ops.reset(token)
+        return counter[0] if counter is not None else None
+    
+    def record_request(self, method: str, path: str, status_code: int, duration: float, db_operations: Optional[int] = None):
+        """
+        Record HTTP request metrics
+        
+        Args:
+            method: HTTP method
+            path: Route template (e.g. /api/deals/{deal_id}), not the raw path
+            status_code: Response status
+            duration: Seconds
+            db_operations: DB round-trips made by the request, if counted
+        """
         self.metrics["requests_total"] += 1
         self.metrics["requests_by_method"][method] = self.metrics["requests_by_method"].get(method, 0) + 1
         self.metrics["requests_by_status"][status_code] = self.metrics["requests_by_status"].get(status_code, 0) + 1
-        self.metrics["response_times"].append(duration)
+        self.requests.observe(duration)
         
-        # Keep only last 1000 response times
-        if len(self.metrics["response_times"]) > 1000:
-            self.metrics["response_times"] = self.metrics["response_times"][-1000:]
+        labels = {"route": path, "method": method, "status": status_code}
+        self.registry.inc("http_requests_total", labels)
+        self.registry.observe("http_request_duration_seconds", duration, labels)
+        if db_operations is not None:
+            self.registry.observe("http_request_db_round_trips", db_operations, {"route": path, "method": method}, COUNT_BUCKETS)
         
         if status_code >= 400:
             self.metrics["errors_total"] += 1
     
     def record_db_operation(self):
-        """Record database operation"""
+        """Record database operation (counted against the current request)"""
         self.metrics["database_operations"] += 1
+        self.registry.inc("db_operations_total")
+        counter = _request_db_ops.get()
+        if counter is not None:
+            counter[0] += 1
     
     def record_file_upload(self):
         """Record file upload"""
@@ -133,32 +335,135 @@ class MetricsCollector:
         """Record active user"""
         self.metrics["active_users"].add(user_id)
     
+    def get_route_latencies(self) -> List[Dict[str, Any]]:
+        """p50/p95/p99 per route and method (all statuses), slowest p99 first"""
+        merged: Dict[Tuple[str, str], Histogram] = {}
+        for key, histogram in self.registry.histogram_series("http_request_duration_seconds").items():
+            labels = dict(key)
+            route = (labels["route"], labels["method"])
+            if route not in merged:
+                merged[route] = Histogram(histogram.bounds)
+            merged[route].merge(histogram)
+        
+        routes = [
+            {
+                "route": route,
+                "method": method,
+                "count": histogram.count,
+                "p50": histogram.quantile(0.5),
+                "p95": histogram.quantile(0.95),
+                "p99": histogram.quantile(0.99)
+            }
+            for (route, method), histogram in merged.items()
+        ]
+        return sorted(routes, key=lambda r: r["p99"] or 0, reverse=True)
+    
     def get_metrics(self) -> Dict[str, Any]:
         """Get current metrics"""
-        response_times = self.metrics["response_times"]
-        
         metrics = {
             **self.metrics,
             "uptime_seconds": time.time() - self.start_time,
             "active_users_count": len(self.metrics["active_users"]),
-            "response_time_avg": sum(response_times) / len(response_times) if response_times else 0,
-            "response_time_p95": sorted(response_times)[int(len(response_times) * 0.95)] if response_times else 0,
+            "response_time_avg": self.requests.sum / self.requests.count if self.requests.count else 0,
+            "response_time_p95": self.requests.quantile(0.95) or 0,
             "error_rate": self.metrics["errors_total"] / max(self.metrics["requests_total"], 1),
+            "routes": self.get_route_latencies(),
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
         
-        # Remove internal sets/lists from response
-        metrics = {k: v for k, v in metrics.items() if k not in ["response_times", "active_users"]}
+        # Remove internal sets from response
+        metrics = {k: v for k, v in metrics.items() if k != "active_users"}
         
         return metrics
     
+    def render_prometheus(self) -> str:
+        """
+        Text exposition for /metrics
+        
+        Histograms and counters are merged with other workers' snapshots
+        when METRICS_SHARED_DIR is set; cache gauges are this worker's.
+        """
+        registry = self.registry
+        if settings.METRICS_SHARED_DIR:
+            write_snapshot(self.registry, settings.METRICS_SHARED_DIR)
+            registry = MetricsRegistry.from_snapshots(
+                [self.registry.snapshot(), *read_snapshots(settings.METRICS_SHARED_DIR)]
+            )
+        
+        gauges = {
+            "process_uptime_seconds": [({}, time.time() - self.start_time)],
+            **cache_gauges()
+        }
+        return registry.render(gauges)
+    
     def reset_periodic_metrics(self):
         """Reset metrics that should be periodically cleared"""
         self.metrics["active_users"].clear()
 
+def cache_gauges() -> Dict[str, List[Tuple[Dict[str, Any], Any]]]:
+    """Hit/miss counts and hit ratio of the application caches"""
+    caches: Dict[str, Tuple[int, int]] = {}
+    try:
+        from performance import get_cache_manager
+        from simple_cache import get_analytics_cache
+        from request_coalescer import get_coalescer_stats
+        from http_cache import get_compressed_body_cache
+        
+        memory = get_cache_manager().get_stats()["local"]["memory"]
+        caches["cache_manager"] = (memory["hits"], memory["misses"])
+        analytics = get_analytics_cache().get_stats()
+        caches["analytics"] = (analytics["hits"], analytics["misses"])
+        compressed = get_compressed_body_cache().get_stats()
+        caches["compressed_bodies"] = (compressed["hits"], compressed["misses"])
+        for name, stats in get_coalescer_stats().items():
+            caches[f"coalesce:{name}"] = (stats["reused"] + stats["coalesced"], stats["db_calls"])
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"Cache stats unavailable for metrics: {e}")
+    
+    gauges: Dict[str, List[Tuple[Dict[str, Any], Any]]] = {"cache_hits": [], "cache_misses": [], "cache_hit_ratio": []}
+    for name, (hits, misses) in caches.items():
+        labels = {"cache": name}
+        gauges["cache_hits"].append((labels, hits))
+        gauges["cache_misses"].append((labels, misses))
+        gauges["cache_hit_ratio"].append((labels, round(hits / (hits + misses), 4) if hits + misses else None))
+    return gauges
+
 # Global metrics collector
 metrics_collector = MetricsCollector()
 
+_metrics_flush_task: Optional[asyncio.Task] = None
+
+async def flush_metrics_snapshots(interval: float):
+    """Publish this worker's snapshot to METRICS_SHARED_DIR periodically"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            write_snapshot(metrics_collector.registry, settings.METRICS_SHARED_DIR)
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Metrics snapshot failed: {e}")
+
+def start_metrics_flush():
+    """Start the snapshot task when metrics are shared across workers"""
+    global _metrics_flush_task
+    
+    if not settings.METRICS_SHARED_DIR or (_metrics_flush_task is not None and not _metrics_flush_task.done()):
+        return
+    _metrics_flush_task = asyncio.create_task(flush_metrics_snapshots(settings.METRICS_FLUSH_SECONDS))
+
+async def stop_metrics_flush():
+    """Cancel the snapshot task"""
+    global _metrics_flush_task
+    
+    if _metrics_flush_task is None:
+        return
+    
+    _metrics_flush_task.cancel()
+    try:
+        await _metrics_flush_task
+    except asyncio.CancelledError:
+        pass
+    _metrics_flush_task = None
+
 class PerformanceMonitor:
     """Monitor application performance"""
     
@@ -189,24 +494,48 @@ def log_slow_operation(operation_name: str, duration: float, threshold: float =
         logger.warning(f"Slow operation detected: {operation_name} took {duration:.3f}s")
 
 class HealthChecker:
-    """Health check utilities"""
+    """
+    Health probes with cached results
+    
+    A background task probes the database (ping latency), event-loop lag,
+    caches, the search index, background worker heartbeat, disk and memory
+    every HEALTH_PROBE_INTERVAL seconds. liveness() and readiness() only
+    read the last result, so frequent load balancer checks cost O(1) and
+    never touch the database or block the loop.
+    """
+    
+    # Event-loop lag sampling period and thresholds (ms)
+    LAG_SAMPLE_SECONDS = 0.1
+    LOOP_LAG_WARNING_MS = 100
+    LOOP_LAG_CRITICAL_MS = 1000
+    
+    def __init__(self, interval: float = 10.0):
+        self.interval = interval
+        self.started_at = time.time()
+        self.last_result: Optional[Dict[str, Any]] = None
+        self.last_probe_at: Optional[float] = None
+        self.loop_lag_ms = 0.0
+        self.loop_lag_max_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
     
     @staticmethod
-    async def check_database_health() -> Dict[str, Any]:
-        """Check database connectivity"""
+    async def check_database_health(timeout: float = 2.0) -> Dict[str, Any]:
+        """Check database connectivity (ping round-trip latency)"""
         from database import get_database
         
         try:
             db = get_database()
-            # Simple ping to check connectivity
-            await db.admin.command('ping')
-            return {"status": "healthy", "latency_ms": 0}  # TODO: measure actual latency
+            start = time.perf_counter()
+            await asyncio.wait_for(db.command('ping'), timeout)
+            return {"status": "healthy", "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+        except asyncio.TimeoutError:
+            return {"status": "unhealthy", "error": f"ping timed out after {timeout}s"}
         except Exception as e:
             return {"status": "unhealthy", "error": str(e)}
     
     @staticmethod
     def check_disk_space() -> Dict[str, Any]:
-        """Check available disk space"""
+        """Check available disk space (blocking: run in a thread)"""
         import shutil
         
         try:
@@ -231,10 +560,10 @@ class HealthChecker:
     
     @staticmethod
     def check_memory_usage() -> Dict[str, Any]:
-        """Check memory usage"""
-        import psutil
-        
+        """Check memory usage (blocking: run in a thread)"""
         try:
+            import psutil
+            
             memory = psutil.virtual_memory()
             return {
                 "status": "healthy" if memory.percent < 80 else "warning",
@@ -246,34 +575,167 @@ class HealthChecker:
             return {"status": "error", "error": str(e)}
     
     @staticmethod
-    async def comprehensive_health_check() -> Dict[str, Any]:
-        """Perform comprehensive health check"""
-        health_status = {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "overall_status": "healthy",
-            "checks": {}
+    def check_cache() -> Dict[str, Any]:
+        """Application cache backend and hit ratio"""
+        try:
+            from performance import get_cache_manager
+            
+            stats = get_cache_manager().get_stats()
+            memory = stats["local"]["memory"]
+            return {
+                "status": "healthy",
+                "backend": stats["backend"],
+                "entries": memory["entries"],
+                "hit_ratio": memory["hit_ratio"]
+            }
+        except Exception as e:
+            return {"status": "warning", "error": str(e)}
+    
+    @staticmethod
+    def check_search_index() -> Dict[str, Any]:
+        """Search index built and its size"""
+        try:
+            from search_engine import get_index_status
+            
+            status = get_index_status()
+            return {
+                "status": "healthy" if status["built"] else "warning",
+                "built": status["built"],
+                "total_deals": status["total_deals"],
+                "version": status["version"]
+            }
+        except Exception as e:
+            return {"status": "warning", "error": str(e)}
+    
+    @staticmethod
+    def check_background_tasks() -> Dict[str, Any]:
+        """Background worker alive with a recent heartbeat"""
+        try:
+            from background_tasks import get_background_status
+            
+            status = get_background_status()
+            age = status["heartbeat_age_seconds"]
+            stale = age is None or age > 3 * status["heartbeat_interval_seconds"]
+            return {"status": "warning" if not status["running"] or stale else "healthy", **status}
+        except Exception as e:
+            return {"status": "warning", "error": str(e)}
+    
+    def check_event_loop(self) -> Dict[str, Any]:
+        """Event-loop lag sampled since the previous probe"""
+        lag = self.loop_lag_max_ms
+        status = "healthy"
+        if lag > self.LOOP_LAG_CRITICAL_MS:
+            status = "unhealthy"
+        elif lag > self.LOOP_LAG_WARNING_MS:
+            status = "warning"
+        return {"status": status, "lag_ms": round(self.loop_lag_ms, 2), "max_lag_ms": round(lag, 2)}
+    
+    async def run_probes(self) -> Dict[str, Any]:
+        """Probe everything once and cache the result"""
+        checks = {
+            "database": await self.check_database_health(),
+            "event_loop": self.check_event_loop(),
+            "cache": self.check_cache(),
+            "search_index": self.check_search_index(),
+            "background_tasks": self.check_background_tasks(),
+            "disk": await asyncio.to_thread(self.check_disk_space),
+            "memory": await asyncio.to_thread(self.check_memory_usage)
         }
         
-        # Database check
-        health_status["checks"]["database"] = await HealthChecker.check_database_health()
+        failed = [name for name, check in checks.items() if check["status"] in ("unhealthy", "critical")]
+        degraded = [name for name, check in checks.items() if check["status"] in ("warning", "error")]
         
-        # Disk space check
-        health_status["checks"]["disk"] = HealthChecker.check_disk_space()
-        
-        # Memory check
-        health_status["checks"]["memory"] = HealthChecker.check_memory_usage()
-        
-        # Determine overall status
-        failed_checks = [
-            name for name, check in health_status["checks"].items()
-            if check["status"] in ["unhealthy", "critical", "error"]
-        ]
+        self.last_result = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "overall_status": "unhealthy" if failed else "degraded" if degraded else "healthy",
+            "ready": checks["database"]["status"] == "healthy" and checks["event_loop"]["status"] != "unhealthy",
+            "failed_checks": failed,
+            "degraded_checks": degraded,
+            "checks": checks
+        }
+        self.last_probe_at = time.monotonic()
+        self.loop_lag_max_ms = self.loop_lag_ms
+        return self.last_result
+    
+    async def comprehensive_health_check(self) -> Dict[str, Any]:
+        """Perform comprehensive health check (runs the probes now)"""
+        return await self.run_probes()
+    
+    async def _probe_loop(self):
+        loop = asyncio.get_running_loop()
+        ticks = max(1, int(self.interval / self.LAG_SAMPLE_SECONDS))
+        while True:
+            try:
+                await self.run_probes()
+            except Exception as e:
+                logging.getLogger(__name__).error(f"Health probe failed: {e}")
+            
+            # Sample loop lag: how late each short sleep wakes up
+            for _ in range(ticks):
+                expected = loop.time() + self.LAG_SAMPLE_SECONDS
+                await asyncio.sleep(self.LAG_SAMPLE_SECONDS)
+                self.loop_lag_ms = max(0.0, (loop.time() - expected) * 1000)
+                self.loop_lag_max_ms = max(self.loop_lag_max_ms, self.loop_lag_ms)
+    
+    def start(self):
+        """Start the probe task (no-op if already running)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._probe_loop())
+    
+    async def stop(self):
+        """Cancel the probe task"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+    
+    def liveness(self) -> Dict[str, Any]:
+        """Process is up and serving (no I/O)"""
+        return {
+            "status": "healthy",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "version": settings.PROJECT_VERSION,
+            "environment": settings.ENVIRONMENT,
+            "uptime_seconds": round(time.time() - self.started_at, 1)
+        }
+    
+    def readiness(self) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Whether to route traffic here, from the last probe
         
-        if failed_checks:
-            health_status["overall_status"] = "unhealthy"
-            health_status["failed_checks"] = failed_checks
+        Not ready before the first probe, when the database or event loop
+        probe failed, or when the last probe is older than 3 intervals.
+        """
+        result = self.last_result
+        if result is None:
+            return False, {"status": "not_ready", "reason": "no probe yet"}
         
-        return health_status
+        age = time.monotonic() - self.last_probe_at
+        ready = result["ready"] and age <= 3 * self.interval
+        payload = {
+            "status": "ready" if ready else "not_ready",
+            "overall_status": result["overall_status"],
+            "probed_at": result["timestamp"],
+            "probe_age_seconds": round(age, 1),
+            "failed_checks": result["failed_checks"],
+            "degraded_checks": result["degraded_checks"],
+            "database_latency_ms": result["checks"]["database"].get("latency_ms"),
+            "event_loop_lag_ms": result["checks"]["event_loop"]["max_lag_ms"]
+        }
+        if age > 3 * self.interval:
+            payload["reason"] = "probe results are stale"
+        return ready, payload
+
+# Global health checker
+health_checker = HealthChecker(settings.HEALTH_PROBE_INTERVAL)
+
+def get_health_checker() -> HealthChecker:
+    """Get global health checker"""
+    return health_checker
 
 # Error tracking setup
 def setup_error_tracking():
@@ -329,6 +791,7 @@ async def monitoring_background_task():
 
 def get_metrics_collector() -> MetricsCollector:
     """Get global metrics collector"""
+    return metrics_collector
 
 
 
@@ -1,14 +1,25 @@
 """
 PDF Import Service
 Handles PDF upload, text extraction, and OCR for lease/finance program imports
+
+The module-level extraction functions (extract_pdf_direct, ocr_pdf_page)
+are what pdf_jobs runs in its process pool, one OCR task per page.
 """
 import io
 import logging
+import os
 from typing import Dict, List, Optional
 from datetime import datetime, timezone
 
 logger = logging.getLogger(__name__)
 
+# OCR settings (300 dpi + LSTM engine, uniform text block)
+OCR_DPI = 300
+OCR_CONFIG = r'--oem 3 --psm 6'
+
+# Less direct text than this means a scanned PDF
+MIN_DIRECT_TEXT_CHARS = 100
+
 
 def extract_pdf_text(file_bytes: bytes, filename: str = "document.pdf") -> Dict:
     """
@@ -39,7 +50,7 @@ def extract_pdf_text(file_bytes: bytes, filename: str = "document.pdf") -> Dict:
         method = "direct"
         
         # Check if we got meaningful text (at least 100 characters)
-        if len(text_content.strip()) < 100:
+        if len(text_content.strip()) < MIN_DIRECT_TEXT_CHARS:
             logger.warning(f"Direct extraction yielded insufficient text ({len(text_content)} chars). Trying OCR...")
             warnings.append("Direct text extraction yielded little text. Using OCR method.")
             
@@ -112,29 +123,22 @@ def _extract_with_ocr(file_bytes: bytes, filename: str) -> tuple[str, int]:
     try:
         import pytesseract
         from pdf2image import convert_from_bytes
-        from PIL import Image
         
         logger.info(f"Converting PDF to images for OCR: {filename}")
         
         # Convert PDF pages to images
-        images = convert_from_bytes(file_bytes, dpi=300)
+        images = convert_from_bytes(file_bytes, dpi=OCR_DPI)
         page_count = len(images)
         
         logger.info(f"Processing {page_count} pages with OCR...")
         
         # OCR each page
-        all_text = []
+        page_texts = []
         for i, image in enumerate(images, 1):
-            logger.info(f"OCR processing page {i}/{page_count}")
-            
-            # Run OCR with custom config for better accuracy
-            custom_config = r'--oem 3 --psm 6'
-            page_text = pytesseract.image_to_string(image, config=custom_config)
-            
-            if page_text.strip():
-                all_text.append(f"\n--- Page {i} ---\n{page_text}")
+            logger.debug(f"OCR processing page {i}/{page_count}")
+            page_texts.append(pytesseract.image_to_string(image, config=OCR_CONFIG))
         
-        full_text = "\n".join(all_text)
+        full_text = join_ocr_pages(page_texts)
         
         logger.info(f"OCR completed: {len(full_text)} characters extracted")
         
@@ -149,6 +153,57 @@ def _extract_with_ocr(file_bytes: bytes, filename: str) -> tuple[str, int]:
         raise
 
 
+def join_ocr_pages(page_texts: List[str]) -> str:
+    """Join per-page OCR text (page 1 first) with page markers, skipping blank pages"""
+    return "\n".join(
+        f"\n--- Page {i} ---\n{text}"
+        for i, text in enumerate(page_texts, 1)
+        if text.strip()
+    )
+
+
+def init_extraction_worker():
+    """
+    Process pool initializer: run extraction below the API's priority
+    and keep tesseract single-threaded (pages are parallel already)
+    """
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass
+
+
+def extract_pdf_direct(pdf_path: str) -> tuple[str, int]:
+    """
+    Direct text extraction from a PDF on disk (process pool task)
+    
+    Returns:
+        (text_content, page_count)
+    """
+    with open(pdf_path, "rb") as f:
+        return _extract_with_pdfminer(f.read())
+
+
+def ocr_pdf_page(pdf_path: str, page_number: int) -> str:
+    """
+    Rasterize and OCR a single page (1-based) of a PDF on disk (process pool task)
+    
+    Only the requested page is rendered, so memory stays at one page
+    image per worker regardless of document length.
+    """
+    try:
+        import pytesseract
+        from pdf2image import convert_from_path
+    except ImportError as e:
+        raise ImportError(f"OCR dependencies not installed: {e}. Please install: pytesseract, pdf2image, and Pillow")
+    
+    images = convert_from_path(pdf_path, dpi=OCR_DPI, first_page=page_number, last_page=page_number)
+    if not images:
+        return ""
+    return pytesseract.image_to_string(images[0], config=OCR_CONFIG)
+
+
 def clean_extracted_text(raw_text: str) -> str:
     """
     Clean and normalize extracted text
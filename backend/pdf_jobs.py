@@ -0,0 +1,288 @@
+"""
+PDF Import Jobs
+
+Lease program PDFs are extracted off the event loop. The upload endpoint
+writes the file to a temp path, records a job and returns its id right
+away; the job runs pdfminer in a process pool and, for scanned PDFs,
+OCRs pages in parallel (one pool task per page). Job state lives in the
+pdf_import_jobs collection so any worker can answer polls:
+
+    POST /api/admin/lease-programs/import-pdf         -> {"job_id": ...}
+    GET  /api/admin/lease-programs/import-jobs/{id}   -> status, progress, result
+
+Progress is also pushed over Socket.IO: clients emit subscribe_to_pdf_job
+{"job_id": ...} and receive pdf_import_progress events.
+
+Job status: queued -> extracting -> ocr (scanned PDFs) -> saving -> completed | failed
+
+Jobs interrupted by a shutdown are marked failed; jobs left active by a
+worker that died are failed once they go PDF_JOB_STALE_SECONDS without
+an update (at startup and when polled). A worker process crash (e.g. OOM
+during OCR) breaks the pool: it is replaced and the task retried once.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from typing import Any, Callable, Dict, Optional, Set
+import asyncio
+import logging
+import multiprocessing
+import os
+import tempfile
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from config import get_settings
+from pdf_import_service import (
+    MIN_DIRECT_TEXT_CHARS,
+    clean_extracted_text,
+    extract_pdf_direct,
+    init_extraction_worker,
+    join_ocr_pages,
+    ocr_pdf_page,
+    save_pdf_to_database
+)
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+JOBS_COLLECTION = "pdf_import_jobs"
+
+# Statuses of a job that is still running somewhere
+ACTIVE_STATUSES = ["queued", "extracting", "ocr", "saving"]
+
+
+async def create_pdf_job_indexes(db):
+    """Create indexes for pdf_import_jobs (polled by id, listed newest first)"""
+    await db[JOBS_COLLECTION].create_index("id")
+    await db[JOBS_COLLECTION].create_index([("created_at", -1)])
+
+
+class PDFImportJobs:
+    """
+    Process pool plus the asyncio tasks driving each import job
+
+    Workers are spawned (not forked) so they never inherit the API's
+    threads or Mongo sockets, and run at lower CPU priority than the API.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        self.max_workers = max_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_extraction_worker
+            )
+        return self._pool
+
+    async def submit(self, db, file_bytes: bytes, filename: str, submitted_by: str) -> Dict[str, Any]:
+        """Create a job for an uploaded (already validated) PDF and start it"""
+        pdf_path = await asyncio.to_thread(_write_temp_pdf, file_bytes)
+        now = datetime.now(timezone.utc)
+        job = {
+            "id": str(uuid4()),
+            "filename": filename,
+            "file_size_bytes": len(file_bytes),
+            "submitted_by": submitted_by,
+            "status": "queued",
+            "pages_done": 0,
+            "page_count": None,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        await db[JOBS_COLLECTION].insert_one(dict(job))
+
+        task = asyncio.create_task(self._run(db, job, pdf_path))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def get_job(self, db, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await db[JOBS_COLLECTION].find_one({"id": job_id}, {"_id": 0})
+        if job and job["status"] in ACTIVE_STATUSES and _is_stale(job):
+            fields = _stale_failure()
+            await db[JOBS_COLLECTION].update_one({"id": job_id}, {"$set": fields})
+            job.update(fields)
+        return job
+
+    async def fail_stale_jobs(self, db) -> int:
+        """Fail active jobs nobody has updated within PDF_JOB_STALE_SECONDS (run at startup)"""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.PDF_JOB_STALE_SECONDS)
+        result = await db[JOBS_COLLECTION].update_many(
+            {"status": {"$in": ACTIVE_STATUSES}, "updated_at": {"$lt": cutoff}},
+            {"$set": _stale_failure()}
+        )
+        if result.modified_count:
+            logger.warning("Marked %d stale PDF import jobs as failed", result.modified_count)
+        return result.modified_count
+
+    async def list_jobs(self, db, limit: int = 20):
+        return await db[JOBS_COLLECTION].find({}, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(limit)
+
+    async def _update(self, db, job: Dict[str, Any], **fields):
+        job.update(fields, updated_at=datetime.now(timezone.utc))
+        await db[JOBS_COLLECTION].update_one({"id": job["id"]}, {"$set": {**fields, "updated_at": job["updated_at"]}})
+        try:
+            from websocket_manager import notify_pdf_job_progress
+            await notify_pdf_job_progress(_progress_event(job))
+        except Exception as e:
+            logger.debug("PDF job progress push failed: %s", e)
+
+    async def _execute(self, func: Callable, *args):
+        """Run func in the pool; a broken pool is replaced and the call retried once"""
+        loop = asyncio.get_running_loop()
+        for attempt in (1, 2):
+            pool = self.pool
+            try:
+                return await loop.run_in_executor(pool, func, *args)
+            except BrokenProcessPool:
+                if self._pool is pool:
+                    logger.error("PDF extraction worker died; restarting the process pool")
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    self._pool = None
+                if attempt == 2:
+                    raise
+
+    async def _run(self, db, job: Dict[str, Any], pdf_path: str):
+        filename = job["filename"]
+        warnings = []
+        try:
+            await self._update(db, job, status="extracting")
+            text, page_count = await self._execute(extract_pdf_direct, pdf_path)
+            method = "direct"
+
+            if len(text.strip()) < MIN_DIRECT_TEXT_CHARS:
+                logger.warning("Direct extraction of %s yielded %d chars, using OCR on %d pages", filename, len(text), page_count)
+                warnings.append("Direct text extraction yielded little text. Using OCR method.")
+                await self._update(db, job, status="ocr", page_count=page_count)
+                text = await self._ocr_pages(db, job, pdf_path, page_count)
+                method = "ocr"
+
+            await self._update(db, job, status="saving", page_count=page_count)
+            cleaned_text = clean_extracted_text(text)
+            pdf_id = await save_pdf_to_database(
+                db,
+                filename=filename,
+                text=cleaned_text,
+                page_count=page_count,
+                method=method,
+                original_file_size=job["file_size_bytes"]
+            )
+
+            await self._update(db, job, status="completed", result={
+                "pdf_id": pdf_id,
+                "filename": filename,
+                "page_count": page_count,
+                "char_count": len(cleaned_text),
+                "extraction_method": method,
+                "warnings": warnings
+            })
+            logger.info("PDF import job %s completed: %s (%d pages, %s)", job["id"], pdf_id, page_count, method)
+
+        except asyncio.CancelledError:
+            logger.warning("PDF import job %s interrupted", job["id"])
+            try:
+                await self._update(db, job, status="failed", error="Import interrupted by a server restart. Please upload again.")
+            except Exception as update_error:
+                logger.error("Could not record PDF job failure: %s", update_error)
+            raise
+        except Exception as e:
+            logger.error("PDF import job %s failed for %s: %s", job["id"], filename, e)
+            try:
+                await self._update(db, job, status="failed", error=f"Failed to extract text from PDF: {e}")
+            except Exception as update_error:
+                logger.error("Could not record PDF job failure: %s", update_error)
+        finally:
+            try:
+                os.unlink(pdf_path)
+            except OSError:
+                pass
+
+    async def _ocr_pages(self, db, job: Dict[str, Any], pdf_path: str, page_count: int) -> str:
+        """OCR every page in the pool, reporting progress as pages finish"""
+        async def ocr(page_number: int):
+            return page_number, await self._execute(ocr_pdf_page, pdf_path, page_number)
+
+        page_texts = [""] * page_count
+        pending = [asyncio.ensure_future(ocr(n)) for n in range(1, page_count + 1)]
+        try:
+            for done, next_page in enumerate(asyncio.as_completed(pending), 1):
+                page_number, page_text = await next_page
+                page_texts[page_number - 1] = page_text
+                await self._update(db, job, pages_done=done)
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+        return join_ocr_pages(page_texts)
+
+    async def shutdown(self):
+        """Cancel running jobs and stop the worker processes"""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.max_workers,
+            "pool_started": self._pool is not None,
+            "running_jobs": len(self._tasks)
+        }
+
+
+def _write_temp_pdf(file_bytes: bytes) -> str:
+    fd, path = tempfile.mkstemp(prefix="pdf_import_", suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(file_bytes)
+    return path
+
+
+def _is_stale(job: Dict[str, Any]) -> bool:
+    updated_at = job.get("updated_at")
+    if updated_at is None:
+        return False
+    if updated_at.tzinfo is None:
+        # Mongo returns naive UTC datetimes
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc) - updated_at > timedelta(seconds=settings.PDF_JOB_STALE_SECONDS)
+
+
+def _stale_failure() -> Dict[str, Any]:
+    return {
+        "status": "failed",
+        "error": "Import was interrupted (worker stopped). Please upload again.",
+        "updated_at": datetime.now(timezone.utc)
+    }
+
+
+def _progress_event(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Socket.IO payload (JSON-safe subset of the job)"""
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "pages_done": job["pages_done"],
+        "page_count": job["page_count"],
+        "result": job["result"],
+        "error": job["error"]
+    }
+
+
+# Global job manager
+pdf_import_jobs = PDFImportJobs(max_workers=settings.PDF_IMPORT_WORKERS)
+
+
+def get_pdf_import_jobs() -> PDFImportJobs:
+    """Get global PDF import job manager"""
+    return pdf_import_jobs
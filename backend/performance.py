@@ -23,6 +23,7 @@ from functools import wraps
 import time
 
 from config import get_settings
+from cache_backend import SingleFlight, create_tiered_cache
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -33,7 +34,15 @@ class CacheManager:
     def __init__(self):
         self.redis: Optional[Any] = None
         self.enabled = bool(settings.REDIS_URL and REDIS_AVAILABLE)
-        self._memory_cache = {}  # Fallback in-memory cache
+        # Fallback: bounded LRU+TTL cache, optionally shared across workers via SQLite
+        self.local = create_tiered_cache(
+            max_entries=settings.CACHE_MAX_ENTRIES,
+            max_bytes=settings.CACHE_MAX_BYTES,
+            shared_path=settings.CACHE_SHARED_PATH,
+            shared_max_bytes=settings.CACHE_SHARED_MAX_BYTES,
+            local_ttl=settings.CACHE_LOCAL_TTL
+        )
+        self.flight = SingleFlight()
     
     async def connect(self):
         """Connect to Redis"""
@@ -68,6 +77,8 @@ class CacheManager:
         if self.redis:
             await self.redis.close()
             logger.info("Redis cache disconnected")
+        if self.local.shared is not None:
+            self.local.shared.close()
     
     def _make_key(self, key: str, prefix: str = "cargwin") -> str:
         """Create cache key with prefix"""
@@ -75,12 +86,8 @@ class CacheManager:
     
     async def get(self, key: str, default: Any = None) -> Any:
         """Get value from cache"""
-        if not self.enabled:
-            # Use memory cache as fallback
-            return self._memory_cache.get(key, default)
-        
-        if not self.redis:
-            return self._memory_cache.get(key, default)
+        if not self.enabled or not self.redis:
+            return self.local.get(key, default)
         
         try:
             cache_key = self._make_key(key)
@@ -97,19 +104,13 @@ class CacheManager:
                 
         except Exception as e:
             logger.error(f"Cache get error for key {key}: {e}")
-            # Fallback to memory cache
-            return self._memory_cache.get(key, default)
+            # Fallback to local cache
+            return self.local.get(key, default)
     
     async def set(self, key: str, value: Any, ttl: int = 3600) -> bool:
         """Set value in cache with TTL"""
-        if not self.enabled:
-            # Use memory cache as fallback
-            self._memory_cache[key] = value
-            return True
-            
-        if not self.redis:
-            self._memory_cache[key] = value
-            return True
+        if not self.enabled or not self.redis:
+            return self.local.set(key, value, ttl)
         
         try:
             cache_key = self._make_key(key)
@@ -123,35 +124,30 @@ class CacheManager:
             
         except Exception as e:
             logger.error(f"Cache set error for key {key}: {e}")
-            # Fallback to memory cache
-            self._memory_cache[key] = value
-            return True
+            # Fallback to local cache
+            return self.local.set(key, value, ttl)
     
     async def delete(self, key: str) -> bool:
         """Delete key from cache"""
-        if not self.enabled:
-            # Use memory cache as fallback
-            return self._memory_cache.pop(key, None) is not None
-            
-        if not self.redis:
-            return self._memory_cache.pop(key, None) is not None
+        if not self.enabled or not self.redis:
+            return self.local.delete(key)
         
         try:
             cache_key = self._make_key(key)
             deleted = await self.redis.delete(cache_key)
-            # Also remove from memory cache
-            self._memory_cache.pop(key, None)
+            # Also remove from local cache
+            self.local.delete(key)
             return deleted > 0
             
         except Exception as e:
             logger.error(f"Cache delete error for key {key}: {e}")
-            # Fallback to memory cache
-            return self._memory_cache.pop(key, None) is not None
+            # Fallback to local cache
+            return self.local.delete(key)
     
     async def clear_pattern(self, pattern: str) -> int:
         """Clear all keys matching pattern"""
         if not self.enabled or not self.redis:
-            return 0
+            return self.local.delete_pattern(pattern)
         
         try:
             cache_pattern = self._make_key(pattern)
@@ -164,6 +160,44 @@ class CacheManager:
         except Exception as e:
             logger.error(f"Cache clear pattern error for {pattern}: {e}")
             return 0
+    
+    async def clear(self) -> bool:
+        """Clear the local tiers (off the event loop) and prefixed Redis keys"""
+        cleared = await asyncio.to_thread(self.local.clear)
+        if self.enabled and self.redis:
+            await self.clear_pattern("*")
+        return cleared
+    
+    async def get_or_set(self, key: str, loader: Callable, ttl: int = 3600) -> Any:
+        """
+        Get value from cache, loading and caching it on a miss
+        
+        Concurrent misses for the same key in this worker share one loader
+        call (single-flight). None results are not cached.
+        
+        Args:
+            loader: Coroutine function producing the value
+        """
+        value = await self.get(key)
+        if value is not None:
+            return value
+        
+        async def load():
+            loaded = await loader()
+            if loaded is not None:
+                await self.set(key, loaded, ttl)
+            return loaded
+        
+        return await self.flight.do(key, load)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        return {
+            "backend": "redis" if self.enabled and self.redis else "local",
+            "local": self.local.get_stats(),
+            "loads": self.flight.loads,
+            "coalesced": self.flight.coalesced
+        }
 
 # Global cache manager
 cache_manager = CacheManager()
@@ -204,24 +238,16 @@ def cached(ttl: int = 3600, key_prefix: str = ""):
             args_key = cache_key_from_args(*args, **kwargs)
             cache_key = f"{key_prefix}:{func_name}:{args_key}" if key_prefix else f"{func_name}:{args_key}"
             
-            # Try to get from cache
-            cached_result = await cache_manager.get(cache_key)
-            if cached_result is not None:
-                logger.debug(f"Cache hit for {func_name}")
-                return cached_result
-            
-            # Execute function
-            logger.debug(f"Cache miss for {func_name}")
-            start_time = time.time()
-            result = await func(*args, **kwargs)
-            execution_time = time.time() - start_time
-            
-            # Cache result (only if execution was successful)
-            if result is not None:
-                await cache_manager.set(cache_key, result, ttl)
-                logger.debug(f"Cached result for {func_name} (took {execution_time:.3f}s)")
+            async def load():
+                logger.debug(f"Cache miss for {func_name}")
+                start_time = time.time()
+                result = await func(*args, **kwargs)
+                execution_time = time.time() - start_time
+                logger.debug(f"Loaded result for {func_name} (took {execution_time:.3f}s)")
+                return result
             
-            return result
+            # Cached, or loaded once for all concurrent callers (only non-None results are cached)
+            return await cache_manager.get_or_set(cache_key, load, ttl)
         
         return wrapper
     return decorator
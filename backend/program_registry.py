@@ -0,0 +1,245 @@
+"""
+Lease Program Registry
+
+Process-local, pre-compiled cache of parsed lease programs used by the
+PRO calculator. Programs are loaded once from `lease_programs_parsed`,
+bucketed by normalized brand and resolved per (brand, model, region).
+Writes through db_lease_programs invalidate the registry.
+"""
+from typing import Dict, List, Optional, Any, Tuple
+from datetime import datetime, timezone
+from motor.motor_asyncio import AsyncIOMotorDatabase
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Reload at least this often so other workers' writes become visible
+DEFAULT_MAX_AGE_SECONDS = 300
+
+_EPOCH = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def normalize_key_part(value: Optional[str]) -> str:
+    """Normalize brand/model/region for registry keys"""
+    return (value or "").strip().lower()
+
+
+def _created_at_sort_value(program: Dict[str, Any]) -> datetime:
+    """Sortable created_at (naive datetimes are treated as UTC)"""
+    created_at = program.get("created_at")
+    if not isinstance(created_at, datetime):
+        return _EPOCH
+    if created_at.tzinfo is None:
+        return created_at.replace(tzinfo=timezone.utc)
+    return created_at
+
+
+class CompiledProgram:
+    """
+    Parsed program with MF and residual tables in numeric form
+
+    mf: term (int) -> money factor
+    residual: term (int) -> list of (mileage, residual percent) in
+        program order, so nearest-mileage ties resolve like the
+        scalar calculator
+    """
+
+    __slots__ = ("program", "mf", "residual", "incentives_total")
+
+    def __init__(self, program: Dict[str, Any]):
+        self.program = program
+        self.mf: Dict[int, float] = {}
+        self.residual: Dict[int, List[Tuple[int, float]]] = {}
+
+        for term, value in (program.get("mf") or {}).items():
+            try:
+                self.mf[int(term)] = float(value)
+            except (TypeError, ValueError):
+                logger.warning(f"Skipping invalid MF entry {term}={value} in program {program.get('id')}")
+
+        for term, mileages in (program.get("residual") or {}).items():
+            try:
+                term_int = int(term)
+                self.residual[term_int] = [
+                    (int(mileage), float(percent))
+                    for mileage, percent in (mileages or {}).items()
+                ]
+            except (TypeError, ValueError):
+                logger.warning(f"Skipping invalid residual term {term} in program {program.get('id')}")
+
+        self.incentives_total = float(sum((program.get("incentives") or {}).values()))
+
+    def pick_mf(self, term_months: int) -> Optional[float]:
+        """Same selection rules as lease_calculator_pro.pick_mf_for_term"""
+        if term_months in self.mf:
+            return self.mf[term_months]
+        if len(self.mf) == 1:
+            return next(iter(self.mf.values()))
+        return None
+
+    def pick_residual(self, term_months: int, annual_mileage: int) -> Optional[float]:
+        """Same selection rules as lease_calculator_pro.pick_residual_for_term_and_mileage"""
+        rows = self.residual.get(term_months)
+        if not rows:
+            return None
+
+        best = None
+        best_distance = None
+        for mileage, percent in rows:
+            if mileage == annual_mileage:
+                return percent
+            distance = abs(mileage - annual_mileage)
+            if best_distance is None or distance < best_distance:
+                best, best_distance = percent, distance
+        return best
+
+    def terms(self) -> List[int]:
+        """Terms available in the residual table (ascending)"""
+        return sorted(self.residual.keys())
+
+    def mileages(self) -> List[int]:
+        """Union of mileages across all residual terms (ascending)"""
+        return sorted({mileage for rows in self.residual.values() for mileage, _ in rows})
+
+
+class ProgramRegistry:
+    """In-memory registry of compiled lease programs"""
+
+    def __init__(self, max_age_seconds: int = DEFAULT_MAX_AGE_SECONDS):
+        self.max_age_seconds = max_age_seconds
+        self._by_brand: Dict[str, List[CompiledProgram]] = {}
+        self._resolved: Dict[Tuple[str, str, str], Optional[CompiledProgram]] = {}
+        self._loaded_at: Optional[float] = None
+        self._version = 0
+        self._lock = asyncio.Lock()
+        self.stats = {"hits": 0, "misses": 0, "loads": 0, "invalidations": 0}
+
+    @property
+    def version(self) -> int:
+        """Incremented on every invalidation (usable in ETags)"""
+        return self._version
+
+    def _is_fresh(self) -> bool:
+        if self._loaded_at is None:
+            return False
+        return (time.monotonic() - self._loaded_at) < self.max_age_seconds
+
+    async def _load(self, db: AsyncIOMotorDatabase):
+        """Load and compile every parsed program (one round-trip)"""
+        version = self._version
+        programs = await db.lease_programs_parsed.find({}, {"_id": 0}).to_list(length=None)
+
+        # Newest first, so the first match in a bucket is the latest program
+        programs.sort(key=_created_at_sort_value, reverse=True)
+
+        by_brand: Dict[str, List[CompiledProgram]] = {}
+        for program in programs:
+            brand_key = normalize_key_part(program.get("brand"))
+            if not brand_key:
+                continue
+            by_brand.setdefault(brand_key, []).append(CompiledProgram(program))
+
+        self._by_brand = by_brand
+        self._resolved = {}
+        self.stats["loads"] += 1
+        if self._version != version:
+            # Invalidated while the query was in flight: the rows may predate
+            # the write, so leave the registry expired and reload next lookup
+            logger.debug("Program registry invalidated during load; not marking fresh")
+            return
+        self._loaded_at = time.monotonic()
+
+        logger.info(f"Program registry loaded: {len(programs)} programs, {len(by_brand)} brands")
+
+    async def ensure_loaded(self, db: AsyncIOMotorDatabase):
+        """Load the registry if empty, invalidated or expired"""
+        if self._is_fresh():
+            return
+        async with self._lock:
+            if not self._is_fresh():
+                await self._load(db)
+
+    def _resolve(self, brand_key: str, model_key: str, region_key: str) -> Optional[CompiledProgram]:
+        """
+        Match rules mirror get_latest_parsed_program_for: exact
+        case-insensitive brand/model, substring match on region
+        """
+        for compiled in self._by_brand.get(brand_key, []):
+            program = compiled.program
+            if model_key and normalize_key_part(program.get("model")) != model_key:
+                continue
+            if region_key and region_key not in normalize_key_part(program.get("region")):
+                continue
+            return compiled
+        return None
+
+    async def get_compiled(
+        self,
+        db: AsyncIOMotorDatabase,
+        brand: str,
+        model: Optional[str] = None,
+        region: Optional[str] = None
+    ) -> Optional[CompiledProgram]:
+        """
+        Get the latest compiled program for brand/model/region
+
+        Returns:
+            CompiledProgram or None if no program matches
+        """
+        await self.ensure_loaded(db)
+
+        key = (normalize_key_part(brand), normalize_key_part(model), normalize_key_part(region))
+        if key in self._resolved:
+            self.stats["hits"] += 1
+            return self._resolved[key]
+
+        self.stats["misses"] += 1
+        compiled = self._resolve(*key)
+        self._resolved[key] = compiled
+        return compiled
+
+    async def get_program(
+        self,
+        db: AsyncIOMotorDatabase,
+        brand: str,
+        model: Optional[str] = None,
+        region: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Drop-in replacement for get_latest_parsed_program_for
+
+        The returned dict is shared; callers must not mutate it.
+        """
+        compiled = await self.get_compiled(db, brand, model, region)
+        return compiled.program if compiled else None
+
+    def invalidate(self):
+        """Drop all compiled programs; next lookup reloads"""
+        self._by_brand = {}
+        self._resolved = {}
+        self._loaded_at = None
+        self._version += 1
+        self.stats["invalidations"] += 1
+        logger.debug("Program registry invalidated")
+
+    def get_status(self) -> Dict[str, Any]:
+        """Registry status for admin/health views"""
+        return {
+            "loaded": self._loaded_at is not None,
+            "version": self._version,
+            "brands": len(self._by_brand),
+            "programs": sum(len(p) for p in self._by_brand.values()),
+            "resolved_keys": len(self._resolved),
+            **self.stats
+        }
+
+
+# Global registry instance
+program_registry = ProgramRegistry()
+
+
+def get_program_registry() -> ProgramRegistry:
+    """Get global program registry"""
+    return program_registry
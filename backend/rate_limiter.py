@@ -1,75 +1,437 @@
 """
-Simple Rate Limiter
+Rate Limiter
 
-Lightweight in-memory rate limiting for public endpoints
+GCRA (generic cell rate algorithm, a token bucket kept as one timestamp):
+per key only the "theoretical arrival time" (TAT) is stored, so memory is
+O(1) per client however many requests it makes, and every check is O(1).
+A client serving a penalty is stored as the negated end of the block
+instead of a TAT; once the block ends the key starts over with a full burst.
+
+One policy table (config.RATE_LIMITS) serves AppMiddleware (per path
+tier) and the handlers that limit themselves (lease calculate, compare,
+search). State lives in a pluggable backend:
+
+- memory: per-process dict (default)
+- shared: fixed-size slot table in an mmap'd file (e.g. /dev/shm) shared by
+  all workers on the box, guarded by flock
+- redis: GCRA as a Lua script against REDIS_URL
 """
-from datetime import datetime, timedelta
-from collections import defaultdict
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import ipaddress
 import logging
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+
+from config import get_settings, RATE_LIMITS
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Middleware tiers by path prefix, first match wins
+PATH_POLICIES = [
+    ("/api/auth", "auth"),
+    ("/api/admin/upload", "upload"),
+    ("/api/admin", "admin"),
+    ("/api", "api"),
+    ("", "public")
+]
+
+# Seconds a client stays blocked after exceeding a middleware tier
+RATE_LIMIT_PENALTIES = {
+    "auth": 300,
+    "upload": 300,
+    "admin": 300,
+    "api": 300,
+    "public": 300
+}
+
+# Slack for float rounding when summing emission intervals (100/minute = 100 x 0.6s)
+TAT_EPSILON = 1e-6
+
+_RATE_RE = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*$")
+_UNIT_SECONDS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_rate(rate: str) -> Tuple[int, float]:
+    """
+    Parse "20/minute" or "10/10seconds" into (requests, period seconds)
+
+    Raises:
+        ValueError: If the rate string is malformed
+    """
+    match = _RATE_RE.match(rate)
+    if not match:
+        raise ValueError(f"Invalid rate limit: {rate!r}")
+    count, multiplier, unit = match.groups()
+    return int(count), int(multiplier or 1) * _UNIT_SECONDS[unit]
+
+
+class RateLimitPolicy:
+    """limit requests per period, bursting up to the full limit"""
+
+    __slots__ = ("name", "limit", "period", "penalty", "emission_interval", "tolerance")
+
+    def __init__(self, name: str, limit: int, period: float, penalty: float = 0):
+        self.name = name
+        self.limit = limit
+        self.period = period
+        self.penalty = penalty
+        # One request "costs" T; up to limit requests may arrive at once
+        self.emission_interval = period / limit
+        self.tolerance = self.emission_interval * (limit - 1)
+
+
+class RateLimitResult:
+    """Outcome of one rate limit check"""
+
+    __slots__ = ("allowed", "limit", "remaining", "reset_after", "retry_after")
+
+    def __init__(self, allowed: bool, limit: int, remaining: int, reset_after: float, retry_after: float):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_after = reset_after
+        self.retry_after = retry_after
+
+    def headers(self) -> Dict[str, str]:
+        """X-RateLimit-* headers (plus Retry-After when denied)"""
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_after))
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+def gcra_step(tat: Optional[float], now: float, policy: RateLimitPolicy) -> Tuple[bool, float]:
+    """
+    One GCRA decision
+
+    Args:
+        tat: Stored theoretical arrival time (None for a new key)
+        now: Current time on the backend's clock
+
+    Returns:
+        (allowed, new TAT to store; -blocked_until while a penalty runs)
+    """
+    if tat is not None and tat < 0:
+        if now < -tat:
+            # Blocked: retries do not extend the penalty
+            return False, tat
+        tat = None
+    tat = now if tat is None or tat < now else tat
+    if tat - now <= policy.tolerance + TAT_EPSILON:
+        return True, tat + policy.emission_interval
+    # First violation of a penalised tier blocks for penalty seconds
+    if policy.penalty:
+        return False, -(now + policy.penalty)
+    return False, tat
+
+
+def _expires_at(stored: float) -> float:
+    """When a stored value stops mattering (a passed TAT equals a new key)"""
+    return -stored if stored < 0 else stored
+
+
+def _result(policy: RateLimitPolicy, allowed: bool, new_tat: float, now: float) -> RateLimitResult:
+    T = policy.emission_interval
+    if new_tat < 0:
+        blocked_for = max(0.0, -new_tat - now)
+        return RateLimitResult(False, policy.limit, 0, blocked_for, blocked_for)
+    if allowed:
+        remaining = max(0, int((now + policy.tolerance - new_tat + T) / T + 1e-9))
+        retry_after = 0.0
+    else:
+        remaining = 0
+        retry_after = new_tat - now - policy.tolerance
+    return RateLimitResult(allowed, policy.limit, remaining, max(0.0, new_tat - now), retry_after)
+
+
+class MemoryRateLimitBackend:
+    """Per-process TATs; idle keys are swept once the table grows"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._tats: Dict[str, float] = {}
+
+    async def check(self, key: str, policy: RateLimitPolicy) -> Tuple[bool, float, float]:
+        now = time.monotonic()
+        allowed, new_tat = gcra_step(self._tats.get(key), now, policy)
+        self._tats[key] = new_tat
+        if len(self._tats) > self.max_keys:
+            self._sweep(now)
+        return allowed, new_tat, now
+
+    def _sweep(self, now: float):
+        # A key whose TAT has passed is indistinguishable from a new one
+        self._tats = {key: tat for key, tat in self._tats.items() if _expires_at(tat) > now}
+        while len(self._tats) > self.max_keys:
+            del self._tats[next(iter(self._tats))]
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+
+class SharedMemoryRateLimitBackend:
+    """
+    TATs in a fixed-size open-addressing table in an mmap'd file
+
+    Every worker on the box maps the same file; flock serialises updates.
+    CLOCK_MONOTONIC is system-wide on Linux, so TATs are comparable across
+    processes. Slots hold (64-bit key hash, TAT); a full probe window
+    reuses the slot with the oldest TAT.
+    """
+
+    SLOT = struct.Struct("<Qd")
+    PROBES = 8
+
+    def __init__(self, path: str, slots: int = 65536):
+        import fcntl
+
+        self._fcntl = fcntl
+        self.path = path
+        self.slots = slots
+        self._lock = threading.Lock()
 
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
 
-class SimpleRateLimiter:
-    """In-memory rate limiter"""
-    
-    def __init__(self):
-        self.requests = defaultdict(list)
-        self.cleanup_interval = 60  # seconds
-        self.last_cleanup = datetime.now()
-    
-    def is_allowed(self, identifier: str, max_requests: int = 20, window_seconds: int = 60) -> bool:
+        size = slots * self.SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+    def _locate(self, key_hash: int, now: float) -> int:
+        """Slot index holding key_hash, or the best slot to claim for it"""
+        start = key_hash % self.slots
+        claim = None
+        oldest = None
+        for probe in range(self.PROBES):
+            index = (start + probe) % self.slots
+            slot_hash, tat = self.SLOT.unpack_from(self._map, index * self.SLOT.size)
+            if slot_hash == key_hash:
+                return index
+            expires = _expires_at(tat)
+            if claim is None and (slot_hash == 0 or expires <= now):
+                claim = index
+            if oldest is None or expires < oldest[1]:
+                oldest = (index, expires)
+        return claim if claim is not None else oldest[0]
+
+    async def check(self, key: str, policy: RateLimitPolicy) -> Tuple[bool, float, float]:
+        key_hash = self._hash(key)
+        with self._lock:
+            self._fcntl.flock(self._fd, self._fcntl.LOCK_EX)
+            try:
+                now = time.monotonic()
+                index = self._locate(key_hash, now)
+                offset = index * self.SLOT.size
+                slot_hash, tat = self.SLOT.unpack_from(self._map, offset)
+                # A TAT further ahead than any policy allows predates a reboot (new clock)
+                if slot_hash != key_hash or _expires_at(tat) - now > policy.tolerance + policy.emission_interval + policy.penalty:
+                    tat = None
+                allowed, new_tat = gcra_step(tat, now, policy)
+                self.SLOT.pack_into(self._map, offset, key_hash, new_tat)
+            finally:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+        return allowed, new_tat, now
+
+
+class RedisRateLimitBackend:
+    """GCRA as one Lua script (atomic; Redis TIME is the shared clock)"""
+
+    SCRIPT = """
+local T = tonumber(ARGV[1])
+local tau = tonumber(ARGV[2])
+local penalty = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < 0 then
+    if now < -tat then
+        return {0, tostring(tat), tostring(now)}
+    end
+    tat = now
+end
+if tat < now then tat = now end
+local allowed = 0
+local new_tat = tat
+if tat - now <= tau + tonumber(ARGV[4]) then
+    allowed = 1
+    new_tat = tat + T
+elseif penalty > 0 then
+    new_tat = -(now + penalty)
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((math.abs(new_tat) - now) * 1000) + 1000)
+return {allowed, tostring(new_tat), tostring(now)}
+"""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis_asyncio
+
+        self.redis = redis_asyncio.from_url(url)
+        self._script = self.redis.register_script(self.SCRIPT)
+
+    async def check(self, key: str, policy: RateLimitPolicy) -> Tuple[bool, float, float]:
+        allowed, new_tat, now = await self._script(
+            keys=[f"cargwin:ratelimit:{key}"],
+            args=[policy.emission_interval, policy.tolerance, policy.penalty, TAT_EPSILON]
+        )
+        return bool(allowed), float(new_tat), float(now)
+
+
+class RateLimiter:
+    """Policy table + backend; counts decisions per policy"""
+
+    def __init__(self, backend: Any, rates: Dict[str, str] = RATE_LIMITS):
+        self.backend = backend
+        self.policies: Dict[str, RateLimitPolicy] = {}
+        for name, rate in rates.items():
+            limit, period = parse_rate(rate)
+            self.policies[name] = RateLimitPolicy(name, limit, period, RATE_LIMIT_PENALTIES.get(name, 0))
+        self.stats: Dict[str, Dict[str, int]] = {name: {"allowed": 0, "denied": 0} for name in self.policies}
+        self.backend_errors = 0
+
+    def policy_for_path(self, path: str) -> str:
+        """Middleware tier for a request path"""
+        for prefix, name in PATH_POLICIES:
+            if path.startswith(prefix):
+                return name
+        return "public"
+
+    async def hit(self, policy_name: str, identifier: str) -> RateLimitResult:
         """
-        Check if request is allowed
-        
+        Count one request by identifier against a policy
+
+        Backend failures fail open (allowed) and are counted.
+
         Args:
-            identifier: IP address or user ID
-            max_requests: Maximum requests allowed in window
-            window_seconds: Time window in seconds
-            
-        Returns:
-            True if allowed, False if rate limited
+            policy_name: Key of config.RATE_LIMITS
+            identifier: Client key (IP address or user ID)
         """
-        now = datetime.now()
-        
-        # Periodic cleanup
-        if (now - self.last_cleanup).seconds > self.cleanup_interval:
-            self._cleanup()
-        
-        # Get request history for this identifier
-        request_times = self.requests[identifier]
-        
-        # Remove requests outside the window
-        cutoff = now - timedelta(seconds=window_seconds)
-        request_times = [t for t in request_times if t > cutoff]
-        
-        # Check if under limit
-        if len(request_times) < max_requests:
-            request_times.append(now)
-            self.requests[identifier] = request_times
-            return True
-        else:
-            logger.warning(f"Rate limit exceeded for {identifier}: {len(request_times)} requests in {window_seconds}s")
-            return False
-    
-    def _cleanup(self):
-        """Remove old entries from memory"""
-        now = datetime.now()
-        cutoff = now - timedelta(seconds=120)  # Keep last 2 minutes
-        
-        for identifier in list(self.requests.keys()):
-            self.requests[identifier] = [t for t in self.requests[identifier] if t > cutoff]
-            if not self.requests[identifier]:
-                del self.requests[identifier]
-        
-        self.last_cleanup = now
-        logger.info(f"Rate limiter cleanup: {len(self.requests)} active identifiers")
+        policy = self.policies[policy_name]
+        try:
+            allowed, new_tat, now = await self.backend.check(f"{policy_name}:{identifier}", policy)
+        except Exception as e:
+            self.backend_errors += 1
+            logger.warning(f"Rate limit backend error ({policy_name}): {e}")
+            return RateLimitResult(True, policy.limit, policy.limit, 0.0, 0.0)
+
+        self.stats[policy_name]["allowed" if allowed else "denied"] += 1
+        if not allowed:
+            logger.warning(f"Rate limit exceeded for {identifier} ({policy_name}: {policy.limit}/{policy.period:g}s)")
+        return _result(policy, allowed, new_tat, now)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__,
+            "policies": self.stats,
+            "backend_errors": self.backend_errors
+        }
+
+
+def _parse_networks(spec: str):
+    networks = []
+    for item in spec.split(","):
+        item = item.strip()
+        if item:
+            try:
+                networks.append(ipaddress.ip_network(item, strict=False))
+            except ValueError:
+                logger.warning(f"Ignoring invalid TRUSTED_PROXIES entry: {item!r}")
+    return tuple(networks)
+
+
+TRUSTED_PROXY_NETWORKS = _parse_networks(settings.TRUSTED_PROXIES)
+
+
+def _is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXY_NETWORKS)
+
+
+def get_client_ip(request) -> str:
+    """
+    Client IP address
+
+    Forwarding headers are only honoured when the socket peer is a
+    trusted proxy (TRUSTED_PROXIES); otherwise anyone could pick their own
+    rate limit key. X-Forwarded-For is walked from the right, skipping
+    trusted proxies, so client-supplied hops on the left are ignored.
+    """
+    peer = request.client.host if request.client else "unknown"
+    if not _is_trusted_proxy(peer):
+        return peer
+
+    forwarded_for = request.headers.get("X-Forwarded-For")
+    if forwarded_for:
+        hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+        for hop in reversed(hops):
+            if not _is_trusted_proxy(hop):
+                return hop
+        if hops:
+            return hops[0]
+
+    real_ip = request.headers.get("X-Real-IP")
+    if real_ip:
+        return real_ip.strip()
+
+    return peer
+
+
+async def enforce_rate_limit(request, policy_name: str, detail: str) -> RateLimitResult:
+    """
+    Apply a handler-level policy to the calling client
+
+    The result is left on request.state for AppMiddleware's headers.
+
+    Raises:
+        HTTPException: 429 with Retry-After and X-RateLimit-* headers
+    """
+    from fastapi import HTTPException
+
+    result = await get_rate_limiter().hit(policy_name, get_client_ip(request))
+    request.state.rate_limit = result
+    if not result.allowed:
+        raise HTTPException(status_code=429, detail=detail, headers=result.headers())
+    return result
+
+
+def create_rate_limit_backend(kind: str) -> Any:
+    """Backend by name; an unusable shared/redis backend falls back to memory"""
+    try:
+        if kind == "shared":
+            return SharedMemoryRateLimitBackend(settings.RATE_LIMIT_SHARED_PATH, settings.RATE_LIMIT_SHARED_SLOTS)
+        if kind == "redis":
+            if not settings.REDIS_URL:
+                raise ValueError("REDIS_URL is not set")
+            return RedisRateLimitBackend(settings.REDIS_URL)
+    except Exception as e:
+        logger.warning(f"Rate limit backend '{kind}' unavailable, using memory: {e}")
+    return MemoryRateLimitBackend()
 
 
 # Global rate limiter instance
-rate_limiter = SimpleRateLimiter()
+rate_limiter = RateLimiter(create_rate_limit_backend(settings.RATE_LIMIT_BACKEND))
 
 
-def get_rate_limiter() -> SimpleRateLimiter:
+def get_rate_limiter() -> RateLimiter:
     """Get global rate limiter instance"""
     return rate_limiter
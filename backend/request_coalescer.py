@@ -0,0 +1,107 @@
+"""
+Request Coalescer
+
+Collapses concurrent identical reads on hot public endpoints into one
+in-flight DB call (single-flight) and reuses the result for a short
+micro-TTL, so a launch-day burst costs one query per unique request.
+
+Each endpoint gets a named RequestCoalescer with its own counters:
+
+    coalescer = get_coalescer("deals_list")
+    deals = await coalescer.run(key, lambda: list_deals(db, ...))
+
+Keys built with simple_cache.versioned_key() change on this worker's own
+writes; other workers' writes are visible after at most the micro-TTL.
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional
+import logging
+
+from cache_backend import MISSING, MemoryCache, SingleFlight
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class RequestCoalescer:
+    """Single-flight plus micro-TTL result reuse for one endpoint"""
+
+    def __init__(self, name: str, ttl_seconds: float, max_entries: int = 2000, max_bytes: int = 32 * 1024 * 1024):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.results = MemoryCache(max_entries=max_entries, max_bytes=max_bytes)
+        self.flight = SingleFlight()
+        self.requests = 0
+        self.reused = 0
+        self.errors = 0
+
+    async def run(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Result for key: reused, joined in flight, or loaded
+
+        Args:
+            key: Identity of the request (endpoint params, data version)
+            loader: Coroutine function doing the DB work
+
+        Returns:
+            The loader's result (exceptions propagate and are not cached)
+        """
+        self.requests += 1
+
+        value = self.results.get(key)
+        if value is not MISSING:
+            self.reused += 1
+            return value
+
+        async def load():
+            loaded = await loader()
+            self.results.set(key, loaded, self.ttl_seconds)
+            return loaded
+
+        try:
+            return await self.flight.do(key, load)
+        except Exception:
+            self.errors += 1
+            raise
+
+    def invalidate(self):
+        """Drop reusable results (in-flight loads still complete)"""
+        self.results.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-endpoint counters"""
+        db_calls = self.flight.loads
+        return {
+            "ttl_seconds": self.ttl_seconds,
+            "requests": self.requests,
+            "db_calls": db_calls,
+            "reused": self.reused,
+            "coalesced": self.flight.coalesced,
+            "errors": self.errors,
+            "saved_ratio": round(1 - db_calls / self.requests, 4) if self.requests else None,
+            "entries": len(self.results)
+        }
+
+
+# Named coalescers (one per endpoint)
+_coalescers: Dict[str, RequestCoalescer] = {}
+
+
+def get_coalescer(name: str, ttl_seconds: Optional[float] = None) -> RequestCoalescer:
+    """
+    Get (or create) the coalescer for an endpoint
+
+    Args:
+        name: Endpoint name used in stats
+        ttl_seconds: Result reuse window on first creation (default COALESCE_TTL_SECONDS)
+    """
+    coalescer = _coalescers.get(name)
+    if coalescer is None:
+        ttl = settings.COALESCE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        coalescer = _coalescers[name] = RequestCoalescer(name, ttl)
+    return coalescer
+
+
+def get_coalescer_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats for every endpoint coalescer"""
+    return {name: coalescer.get_stats() for name, coalescer in _coalescers.items()}
@@ -1,156 +1,885 @@
 """
 Search Engine
 
-Simple full-text search for Featured Deals
-In-memory indexing with tokenization
+Full-text search for Featured Deals
+In-memory inverted index with tokenization:
+- token -> posting list of compact deal ordinals
+- sorted suffix array over the vocabulary for partial (substring) matches
+- sorted side index on calculated_payment for budget queries ("under 400")
+
+Scoring is unchanged from the original linear scan: +1 per exact token
+match, +0.5 per (query token, deal token) pair where one contains the
+other, halved when the deal is more than $50 over a number in the query.
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set
+import asyncio
+import bisect
+import json
+import os
 import re
+import time
 import logging
+import numpy as np
+from datetime import datetime
+from pymongo.errors import OperationFailure
+
+from config import get_settings
 
 logger = logging.getLogger(__name__)
 
-# Global search index
-_search_index = []
-_index_built = False
+# Query tokens longer than this skip "deal token inside query token" expansion
+MAX_SUBSTRING_EXPANSION = 64
 
 
 def tokenize(text: str) -> List[str]:
     """
     Tokenize text into searchable terms
-    
+
     Args:
         text: Input text
-        
+
     Returns:
         List of lowercase tokens
     """
     # Convert to lowercase
     text = text.lower()
-    
+
     # Extract alphanumeric words
     tokens = re.findall(r'\w+', text)
-    
+
     return tokens
 
 
+# Deal fields the index keeps (and loads from Mongo)
+SOURCE_FIELDS = (
+    'id', 'brand', 'model', 'trim', 'year', 'bank', 'region',
+    'calculated_payment', 'calculated_driveoff', 'image_url'
+)
+
+# Bumped whenever the snapshot layout changes
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_META_FILE = "search_index.json"
+# flock'd by save_snapshot (workers save together at shutdown)
+SNAPSHOT_LOCK_FILE = "search_index.lock"
+
+# Compact once this many ordinals are tombstones (and they are the majority)
+COMPACT_MIN_DELETED = 1024
+
+
+def _deal_entry(deal: Dict[str, Any]) -> Dict[str, Any]:
+    """Stored document for a deal (what search results return)"""
+    # Extract searchable fields
+    searchable_text = ' '.join([
+        str(deal.get('brand', '')),
+        str(deal.get('model', '')),
+        str(deal.get('trim', '')),
+        str(deal.get('year', '')),
+        str(deal.get('bank', '')),
+        str(deal.get('region', ''))
+    ])
+
+    return {
+        'deal_id': deal.get('id'),
+        'tokens': set(tokenize(searchable_text)),
+        'brand': deal.get('brand', ''),
+        'model': deal.get('model', ''),
+        'year': deal.get('year', ''),
+        'payment': deal.get('calculated_payment', 0),
+        'driveoff': deal.get('calculated_driveoff', 0),
+        'image_url': deal.get('image_url', ''),
+        'bank': deal.get('bank', ''),
+        'trim': deal.get('trim', '')
+    }
+
+
+def _deal_source(deal: Dict[str, Any]) -> Dict[str, Any]:
+    """Subset of a deal document the index needs to re-derive its entry"""
+    source = {field: deal[field] for field in SOURCE_FIELDS if field in deal}
+    if '_id' in deal:
+        source['_id'] = str(deal['_id'])
+    return source
+
+
+class SearchIndex:
+    """
+    Inverted index over Featured Deals
+
+    Deals get a compact ordinal on insert. Deletes tombstone the ordinal
+    (its postings are removed, so it can never score); the index is
+    compacted once tombstones dominate. Upserts and deletes cost
+    O(tokens per deal) plus posting-list inserts, no collection scan.
+
+    After load_snapshot() postings are read-only memory-mapped arrays
+    and entries are derived on demand; a posting list is copied into a
+    Python list only when a mutation touches it.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.stats = {"upserts": 0, "deletes": 0, "compactions": 0}
+        self._reset()
+
+    def _reset(self):
+        """Drop all indexed data (index becomes unbuilt)"""
+        self.built = False
+        self._size = 0
+        self._deleted = 0
+        self._entries: List[Optional[Dict[str, Any]]] = []
+        self._sources: List[Optional[Dict[str, Any]]] = []
+        self._ordinal_by_id: Dict[str, int] = {}
+        self._id_by_object_id: Dict[str, str] = {}
+        self._token_ids: Dict[str, int] = {}
+        self._tokens: List[str] = []
+        self._postings: List[Optional[List[int]]] = []
+        self._posting_arrays: List[Optional[np.ndarray]] = []
+        self._suffixes: List[str] = []
+        self._suffix_token_ids: List[int] = []
+        self._payments = np.zeros(0)
+        self._payment_order = np.zeros(0, dtype=np.int64)
+        self._sorted_payments = np.zeros(0)
+        self._payment_index_dirty = False
+        self.synced_state: Optional[Dict[str, Any]] = None
+
+    def __len__(self) -> int:
+        return self._size - self._deleted
+
+    def build(self, deals: List[Dict[str, Any]]):
+        """
+        Build the index from deals (ordinal = position in deals)
+
+        Args:
+            deals: List of Featured Deals
+        """
+        self._reset()
+        self.version += 1
+
+        self._payments = np.zeros(max(len(deals), 16))
+        for deal in deals:
+            if deal.get('id') in self._ordinal_by_id:
+                self._set(self._ordinal_by_id[deal['id']], _deal_source(deal))
+            else:
+                self._append(_deal_source(deal))
+
+        self._build_suffix_array()
+        self._build_payment_index()
+        self.built = True
+
+    def _build_suffix_array(self):
+        """Every suffix of every vocabulary token, sorted, for infix lookups"""
+        pairs = sorted(
+            (token[i:], token_id)
+            for token, token_id in self._token_ids.items()
+            for i in range(len(token))
+        )
+        self._suffixes = [suffix for suffix, _ in pairs]
+        self._suffix_token_ids = [token_id for _, token_id in pairs]
+
+    def _build_payment_index(self):
+        """Sorted calculated_payment side index (missing payments sort first as 0)"""
+        self._payment_order = np.argsort(self._payments[:self._size], kind='stable')
+        self._sorted_payments = self._payments[self._payment_order]
+        self._payment_index_dirty = False
+
+    def _token_id(self, token: str) -> int:
+        """Vocabulary id for token, adding it (and its suffixes) if new"""
+        token_id = self._token_ids.get(token)
+        if token_id is not None:
+            return token_id
+
+        token_id = len(self._tokens)
+        self._token_ids[token] = token_id
+        self._tokens.append(token)
+        self._postings.append([])
+        self._posting_arrays.append(None)
+
+        # During build() the suffix array is created in one sort at the end
+        if self.built:
+            for i in range(len(token)):
+                position = bisect.bisect_left(self._suffixes, token[i:])
+                self._suffixes.insert(position, token[i:])
+                self._suffix_token_ids.insert(position, token_id)
+        return token_id
+
+    def _posting_list(self, token_id: int) -> List[int]:
+        """Mutable posting list (copied out of the snapshot on first write)"""
+        postings = self._postings[token_id]
+        if postings is None:
+            postings = self._posting_arrays[token_id].tolist()
+            self._postings[token_id] = postings
+        return postings
+
+    def _add_posting(self, token: str, ordinal: int):
+        token_id = self._token_id(token)
+        postings = self._posting_list(token_id)
+        if not postings or postings[-1] < ordinal:
+            postings.append(ordinal)
+        else:
+            bisect.insort(postings, ordinal)
+        self._posting_arrays[token_id] = None
+
+    def _remove_posting(self, token: str, ordinal: int):
+        token_id = self._token_ids[token]
+        postings = self._posting_list(token_id)
+        position = bisect.bisect_left(postings, ordinal)
+        if position < len(postings) and postings[position] == ordinal:
+            del postings[position]
+            self._posting_arrays[token_id] = None
+
+    def _posting_array(self, token_id: int) -> np.ndarray:
+        array = self._posting_arrays[token_id]
+        if array is None:
+            array = np.asarray(self._postings[token_id], dtype=np.int32)
+            self._posting_arrays[token_id] = array
+        return array
+
+    def _entry(self, ordinal: int) -> Optional[Dict[str, Any]]:
+        """Stored entry for ordinal (None for tombstones)"""
+        entry = self._entries[ordinal]
+        if entry is None and self._sources[ordinal] is not None:
+            entry = _deal_entry(self._sources[ordinal])
+            self._entries[ordinal] = entry
+        return entry
+
+    def _append(self, source: Dict[str, Any]) -> int:
+        """Index a new deal at the next ordinal"""
+        ordinal = self._size
+        if ordinal >= len(self._payments):
+            grown = np.zeros(max(16, 2 * len(self._payments)))
+            grown[:ordinal] = self._payments[:ordinal]
+            self._payments = grown
+
+        self._size += 1
+        self._entries.append(None)
+        self._sources.append(None)
+        self._set(ordinal, source)
+        return ordinal
+
+    def _set(self, ordinal: int, source: Dict[str, Any]):
+        """(Re)index the deal at ordinal, touching only changed tokens"""
+        old_entry = self._entry(ordinal)
+        old_tokens = old_entry['tokens'] if old_entry else set()
+        entry = _deal_entry(source)
+
+        for token in old_tokens - entry['tokens']:
+            self._remove_posting(token, ordinal)
+        for token in entry['tokens'] - old_tokens:
+            self._add_posting(token, ordinal)
+
+        payment = entry['payment'] or 0
+        if self._payments[ordinal] != payment or old_entry is None:
+            self._payments[ordinal] = payment
+            self._payment_index_dirty = True
+
+        self._entries[ordinal] = entry
+        self._sources[ordinal] = source
+        if source.get('id') is not None:
+            self._ordinal_by_id[source['id']] = ordinal
+        if source.get('_id') is not None:
+            self._id_by_object_id[source['_id']] = source.get('id')
+
+    def upsert(self, deal: Dict[str, Any]) -> bool:
+        """
+        Insert or replace a deal from its full document
+
+        Returns:
+            True if the index changed (False before the index is built)
+        """
+        if not self.built or not deal.get('id'):
+            return False
+
+        source = _deal_source(deal)
+        ordinal = self._ordinal_by_id.get(deal['id'])
+        if ordinal is None:
+            self._append(source)
+        else:
+            self._set(ordinal, source)
+
+        self.version += 1
+        self.stats["upserts"] += 1
+        return True
+
+    def update_fields(self, deal_id: str, fields: Dict[str, Any]) -> bool:
+        """
+        Apply a partial $set to an indexed deal
+
+        Returns:
+            True if the deal is indexed and was updated
+        """
+        if not self.built:
+            return False
+        ordinal = self._ordinal_by_id.get(deal_id)
+        if ordinal is None:
+            return False
+
+        changed = {field: value for field, value in fields.items() if field in SOURCE_FIELDS}
+        if not changed:
+            return False
+
+        self._set(ordinal, {**self._sources[ordinal], **changed})
+        self.version += 1
+        self.stats["upserts"] += 1
+        return True
+
+    def delete(self, deal_id: str) -> bool:
+        """
+        Remove a deal
+
+        Returns:
+            True if the deal was indexed
+        """
+        if not self.built:
+            return False
+        ordinal = self._ordinal_by_id.pop(deal_id, None)
+        if ordinal is None:
+            return False
+
+        entry = self._entry(ordinal)
+        for token in entry['tokens']:
+            self._remove_posting(token, ordinal)
+
+        object_id = self._sources[ordinal].get('_id')
+        if object_id is not None:
+            self._id_by_object_id.pop(object_id, None)
+
+        self._entries[ordinal] = None
+        self._sources[ordinal] = None
+        self._deleted += 1
+        self.version += 1
+        self.stats["deletes"] += 1
+
+        if self._deleted >= COMPACT_MIN_DELETED and self._deleted * 2 > self._size:
+            self.compact()
+        return True
+
+    def deal_ids(self) -> List[str]:
+        """IDs of all indexed deals"""
+        return list(self._ordinal_by_id)
+
+    def delete_by_object_id(self, object_id: Any) -> bool:
+        """Remove a deal by Mongo _id (change stream delete events)"""
+        deal_id = self._id_by_object_id.get(str(object_id))
+        if deal_id is None:
+            return False
+        return self.delete(deal_id)
+
+    def compact(self):
+        """Rebuild without tombstones, keeping ordinal order"""
+        synced_state = self.synced_state
+        self.build([source for source in self._sources if source is not None])
+        self.synced_state = synced_state
+        self.stats["compactions"] += 1
+
+    def save_snapshot(self, directory: str) -> str:
+        """
+        Write the index to directory (tombstones are dropped)
+
+        Layout: <stamp>.postings.npy (all posting lists, int32),
+        <stamp>.offsets.npy (list boundaries per token id),
+        <stamp>.payments.npy, and search_index.json holding the token
+        string table, per-deal sources, synced_state and the stamp.
+        search_index.json is replaced atomically, so readers always see
+        a complete snapshot. Writers hold an flock on search_index.lock,
+        so a worker's cleanup never removes the arrays another worker's
+        search_index.json points at.
+
+        Returns:
+            Snapshot stamp
+        """
+        os.makedirs(directory, exist_ok=True)
+
+        live = [ordinal for ordinal in range(self._size) if self._sources[ordinal] is not None]
+        new_ordinal = np.full(self._size, -1, dtype=np.int64)
+        new_ordinal[live] = np.arange(len(live))
+
+        lengths = np.zeros(len(self._tokens) + 1, dtype=np.int64)
+        chunks = []
+        for token_id in range(len(self._tokens)):
+            postings = self._postings[token_id]
+            array = self._posting_arrays[token_id] if postings is None else np.asarray(postings, dtype=np.int64)
+            chunks.append(new_ordinal[array].astype(np.int32))
+            lengths[token_id + 1] = len(array)
+
+        stamp = f"{int(time.time() * 1000)}-{os.getpid()}"
+        arrays = {
+            "postings": np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int32),
+            "offsets": np.cumsum(lengths),
+            "payments": self._payments[live],
+        }
+        meta = {
+            "format": SNAPSHOT_FORMAT,
+            "stamp": stamp,
+            "synced_state": self.synced_state,
+            "tokens": self._tokens,
+            "sources": [self._sources[ordinal] for ordinal in live],
+        }
+        meta_path = os.path.join(directory, SNAPSHOT_META_FILE)
+        tmp_path = f"{meta_path}.{stamp}.tmp"
+
+        import fcntl
+
+        lock_fd = os.open(os.path.join(directory, SNAPSHOT_LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            for name, array in arrays.items():
+                np.save(os.path.join(directory, f"{stamp}.{name}.npy"), array)
+            with open(tmp_path, "w") as f:
+                json.dump(meta, f, default=str)
+            os.replace(tmp_path, meta_path)
+            _remove_stale_arrays(directory, stamp, os.stat(meta_path).st_mtime)
+        finally:
+            os.close(lock_fd)
+
+        return stamp
+
+    def load_snapshot(self, directory: str) -> bool:
+        """
+        Replace the index with the snapshot in directory
+
+        Returns:
+            True if a snapshot was loaded
+        """
+        meta_path = os.path.join(directory, SNAPSHOT_META_FILE)
+        if not os.path.exists(meta_path):
+            return False
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get("format") != SNAPSHOT_FORMAT:
+                return False
+            stamp = meta["stamp"]
+            postings = np.load(os.path.join(directory, f"{stamp}.postings.npy"), mmap_mode="r")
+            offsets = np.load(os.path.join(directory, f"{stamp}.offsets.npy"))
+            payments = np.load(os.path.join(directory, f"{stamp}.payments.npy"))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Search index snapshot not loaded: {e}")
+            return False
+
+        sources = meta["sources"]
+        tokens = meta["tokens"]
+
+        self._reset()
+        self.version += 1
+        self._size = len(sources)
+        self._sources = sources
+        self._entries = [None] * len(sources)
+        for ordinal, source in enumerate(sources):
+            if source.get('id') is not None:
+                self._ordinal_by_id[source['id']] = ordinal
+            if source.get('_id') is not None:
+                self._id_by_object_id[source['_id']] = source.get('id')
+
+        self._tokens = tokens
+        self._token_ids = {token: token_id for token_id, token in enumerate(tokens)}
+        self._postings = [None] * len(tokens)
+        self._posting_arrays = [
+            postings[offsets[token_id]:offsets[token_id + 1]] for token_id in range(len(tokens))
+        ]
+
+        self._payments = np.zeros(max(len(sources), 16))
+        self._payments[:len(sources)] = payments
+        self.synced_state = meta.get("synced_state")
+
+        self._build_suffix_array()
+        self._build_payment_index()
+        self.built = True
+        return True
+
+    def _tokens_containing(self, fragment: str) -> Set[int]:
+        """Vocabulary token ids that contain fragment (suffix-array prefix range)"""
+        matches = set()
+        i = bisect.bisect_left(self._suffixes, fragment)
+        while i < len(self._suffixes) and self._suffixes[i].startswith(fragment):
+            matches.add(self._suffix_token_ids[i])
+            i += 1
+        return matches
+
+    def _tokens_inside(self, query_token: str) -> Set[int]:
+        """Vocabulary token ids that are substrings of query_token"""
+        if len(query_token) > MAX_SUBSTRING_EXPANSION:
+            return set()
+        matches = set()
+        n = len(query_token)
+        for start in range(n):
+            for end in range(start + 1, n + 1):
+                token_id = self._token_ids.get(query_token[start:end])
+                if token_id is not None:
+                    matches.add(token_id)
+        return matches
+
+    def score(self, query: str) -> np.ndarray:
+        """
+        Score every indexed deal for query
+
+        Returns:
+            float64 array of scores by ordinal (tombstones score 0)
+        """
+        scores = np.zeros(self._size)
+        query_tokens = set(tokenize(query))
+
+        for query_token in query_tokens:
+            # Exact token match
+            token_id = self._token_ids.get(query_token)
+            if token_id is not None:
+                scores[self._posting_array(token_id)] += 1
+
+            # Partial matches: each matching (query token, deal token) pair adds 0.5
+            for partial_id in self._tokens_containing(query_token) | self._tokens_inside(query_token):
+                scores[self._posting_array(partial_id)] += 0.5
+
+        # Payment filter (e.g. "300" or "under 400")
+        numbers = re.findall(r'\d+', query)
+        if numbers:
+            payment_filter = int(numbers[0])
+            if payment_filter:
+                if self._payment_index_dirty:
+                    self._build_payment_index()
+                start = np.searchsorted(self._sorted_payments, payment_filter + 50, side='right')
+                scores[self._payment_order[start:]] *= 0.5  # Penalize if over budget
+
+        return scores
+
+    def search(self, query: str, max_results: int = 20) -> List[Dict[str, Any]]:
+        """
+        Top-k deals for query, highest score first (ties by index order)
+        """
+        if not self.built or not query or max_results <= 0:
+            return []
+
+        scores = self.score(query)
+        candidates = np.flatnonzero(scores > 0)
+
+        # Partial selection of the top k, then an exact (score desc, ordinal asc) sort
+        if len(candidates) > max_results:
+            values = scores[candidates]
+            kth = np.partition(values, len(values) - max_results)[len(values) - max_results]
+            above = candidates[values > kth]
+            tied = candidates[values == kth][:max_results - len(above)]
+            candidates = np.concatenate([above, tied])
+
+        order = np.lexsort((candidates, -scores[candidates]))
+
+        return [
+            {'score': float(scores[ordinal]), **self._entry(ordinal)}
+            for ordinal in candidates[order]
+        ]
+
+    def get_status(self) -> Dict[str, Any]:
+        """Index status"""
+        return {
+            "built": self.built,
+            "total_deals": len(self),
+            "vocabulary_size": len(self._tokens),
+            "tombstones": self._deleted,
+            "version": self.version,
+            "synced_state": self.synced_state,
+            **self.stats
+        }
+
+
+# Global search index
+_index = SearchIndex()
+
+
+def get_search_index() -> SearchIndex:
+    """Get global search index"""
+    return _index
+
+
 def build_search_index(deals: List[Dict[str, Any]]):
     """
     Build search index from deals
-    
+
     Args:
         deals: List of Featured Deals
     """
-    global _search_index, _index_built
-    
-    _search_index = []
-    
-    for deal in deals:
-        # Extract searchable fields
-        searchable_text = ' '.join([
-            str(deal.get('brand', '')),
-            str(deal.get('model', '')),
-            str(deal.get('trim', '')),
-            str(deal.get('year', '')),
-            str(deal.get('bank', '')),
-            str(deal.get('region', ''))
-        ])
-        
-        # Tokenize
-        tokens = tokenize(searchable_text)
-        
-        # Add to index
-        _search_index.append({
-            'deal_id': deal.get('id'),
-            'tokens': set(tokens),
-            'brand': deal.get('brand', ''),
-            'model': deal.get('model', ''),
-            'year': deal.get('year', ''),
-            'payment': deal.get('calculated_payment', 0),
-            'driveoff': deal.get('calculated_driveoff', 0),
-            'image_url': deal.get('image_url', ''),
-            'bank': deal.get('bank', ''),
-            'trim': deal.get('trim', '')
-        })
-    
-    _index_built = True
-    logger.info(f"Search index built: {len(_search_index)} deals indexed")
-
-
-async def index_deals(db):
+    _index.build(deals)
+    logger.info(f"Search index built: {len(_index)} deals indexed")
+
+
+async def get_collection_state(db) -> Dict[str, Any]:
+    """
+    Cheap featured_deals fingerprint: document count and newest updated_at
+
+    Args:
+        db: Database instance
+
+    Returns:
+        {"count": int, "max_updated_at": ISO string or None}
+    """
+    count = await db.featured_deals.count_documents({})
+    latest = await db.featured_deals.find_one(
+        {"updated_at": {"$ne": None}},
+        {"_id": 0, "updated_at": 1},
+        sort=[("updated_at", -1)]
+    )
+    max_updated_at = latest.get("updated_at") if latest else None
+    return {
+        "count": count,
+        "max_updated_at": max_updated_at.isoformat() if isinstance(max_updated_at, datetime) else None
+    }
+
+
+def _remove_stale_arrays(directory: str, stamp: str, meta_mtime: float):
+    """
+    Delete array files of stamps other than the current meta's (called
+    under the snapshot lock; files newer than the meta are left alone).
+    Files still mapped by running workers stay readable on POSIX.
+    """
+    for name in os.listdir(directory):
+        if not name.endswith(".npy") or name.split(".", 1)[0] == stamp:
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if os.stat(path).st_mtime <= meta_mtime:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+async def _catch_up_from_snapshot(db, state: Dict[str, Any]) -> bool:
+    """
+    Re-read only deals changed since the loaded snapshot
+
+    Returns:
+        True if the index now matches the collection
+    """
+    snapshot_state = _index.synced_state or {}
+    if snapshot_state == state:
+        return True
+
+    since = snapshot_state.get("max_updated_at")
+    if not since:
+        return False
+
+    projection = {field: 1 for field in SOURCE_FIELDS}
+    changed = await db.featured_deals.find(
+        {"updated_at": {"$gte": datetime.fromisoformat(since)}},
+        projection
+    ).to_list(length=None)
+    for deal in changed:
+        _index.upsert(deal)
+
+    # Deletes leave no updated_at trace: reconcile ids if the count is off
+    if len(_index) != state["count"]:
+        ids = await db.featured_deals.find({}, {"_id": 0, "id": 1}).to_list(length=None)
+        live_ids = {deal.get("id") for deal in ids}
+        for deal_id in [deal_id for deal_id in _index.deal_ids() if deal_id not in live_ids]:
+            _index.delete(deal_id)
+
+    logger.info(f"Search index snapshot caught up: {len(changed)} changed deals re-read")
+    return len(_index) == state["count"]
+
+
+def save_search_snapshot(directory: Optional[str] = None) -> Optional[str]:
+    """
+    Persist the global index (best effort)
+
+    Args:
+        directory: Snapshot directory (default SEARCH_INDEX_SNAPSHOT_DIR)
+
+    Returns:
+        Snapshot stamp, or None if disabled/failed
+    """
+    directory = directory if directory is not None else get_settings().SEARCH_INDEX_SNAPSHOT_DIR
+    if not directory or not _index.built:
+        return None
+    try:
+        return _index.save_snapshot(directory)
+    except Exception as e:
+        logger.warning(f"Search index snapshot save failed: {e}")
+        return None
+
+
+async def index_deals(db, use_snapshot: bool = True):
     """
     Index all deals from database
-    
+
+    Loads the on-disk snapshot when available and re-reads only deals
+    changed since it was taken; otherwise scans the full collection
+    and writes a fresh snapshot.
+
     Args:
         db: Database instance
+        use_snapshot: Try the snapshot before a full scan
     """
-    deals = await db.featured_deals.find({}, {"_id": 0}).to_list(length=None)
+    directory = get_settings().SEARCH_INDEX_SNAPSHOT_DIR
+    state = await get_collection_state(db)
+
+    if use_snapshot and directory and _index.load_snapshot(directory):
+        snapshot_state = _index.synced_state
+        if await _catch_up_from_snapshot(db, state):
+            _index.synced_state = state
+            logger.info(f"Search index loaded from snapshot: {len(_index)} deals")
+            if snapshot_state != state:
+                save_search_snapshot(directory)
+            return
+        logger.info("Search index snapshot out of date, rebuilding")
+
+    projection = {field: 1 for field in SOURCE_FIELDS}
+    deals = await db.featured_deals.find({}, projection).to_list(length=None)
     build_search_index(deals)
+    _index.synced_state = state
+    save_search_snapshot(directory)
+
+
+def notify_deal_upserted(deal: Dict[str, Any]):
+    """
+    Index a created/replaced deal (called after the DB write)
+
+    Args:
+        deal: Full deal document
+    """
+    try:
+        _index.upsert(deal)
+    except Exception as e:
+        logger.warning(f"Search index upsert failed for deal {deal.get('id')}: {e}")
+
+
+def notify_deal_updated(deal_id: str, fields: Dict[str, Any]):
+    """
+    Apply a partial update to an indexed deal (called after the DB write)
+
+    Args:
+        deal_id: Deal ID
+        fields: $set fields
+    """
+    try:
+        _index.update_fields(deal_id, fields)
+    except Exception as e:
+        logger.warning(f"Search index update failed for deal {deal_id}: {e}")
+
+
+def notify_deal_deleted(deal_id: str):
+    """
+    Remove a deleted deal from the index (called after the DB write)
+
+    Args:
+        deal_id: Deal ID
+    """
+    try:
+        _index.delete(deal_id)
+    except Exception as e:
+        logger.warning(f"Search index delete failed for deal {deal_id}: {e}")
+
+
+def apply_change_event(change: Dict[str, Any]):
+    """
+    Apply one featured_deals change stream event to the index
+
+    Args:
+        change: Change event (watch(full_document="updateLookup"))
+    """
+    operation = change.get("operationType")
+
+    if operation in ("insert", "replace", "update"):
+        document = change.get("fullDocument")
+        if document:
+            _index.upsert(document)
+    elif operation == "delete":
+        _index.delete_by_object_id(change.get("documentKey", {}).get("_id"))
+    elif operation == "drop":
+        _index.build([])
 
 
 def search_deals(query: str, max_results: int = 20) -> List[Dict[str, Any]]:
     """
     Search indexed deals
-    
+
     Args:
         query: Search query
         max_results: Maximum number of results
-        
+
     Returns:
         List of matching deals
     """
-    if not _index_built or not query:
-        return []
-    
-    # Tokenize query
-    query_tokens = set(tokenize(query))
-    
-    # Check for payment range in query (e.g. "300" or "under 400")
-    payment_filter = None
-    numbers = re.findall(r'\d+', query)
-    if numbers:
-        payment_filter = int(numbers[0])
-    
-    # Score each deal
-    results = []
-    
-    for indexed in _search_index:
-        # Calculate token match score
-        matching_tokens = query_tokens.intersection(indexed['tokens'])
-        score = len(matching_tokens)
-        
-        # Partial matches
-        for query_token in query_tokens:
-            for index_token in indexed['tokens']:
-                if query_token in index_token or index_token in query_token:
-                    score += 0.5
-        
-        # Payment filter
-        if payment_filter:
-            if indexed['payment'] > payment_filter + 50:
-                score *= 0.5  # Penalize if over budget
-        
-        if score > 0:
-            results.append({
-                'score': score,
-                **indexed
-            })
-    
-    # Sort by score
-    results.sort(key=lambda x: x['score'], reverse=True)
-    
-    # Return top results
-    return results[:max_results]
+    return _index.search(query, max_results=max_results)
 
 
 def get_index_status() -> Dict[str, Any]:
     """
     Get search index status
-    
+
     Returns:
         Status dict
     """
-    return {
-        "built": _index_built,
-        "total_deals": len(_search_index)
-    }
+    return _index.get_status()
+
+
+# ==========================================
+# CHANGE STREAM TAILER (replica set only)
+# ==========================================
+
+_change_stream_task: Optional[asyncio.Task] = None
+
+# Server error codes: not a replica set / resume token no longer in the oplog
+CHANGE_STREAM_UNSUPPORTED_CODES = {40573}
+CHANGE_STREAM_HISTORY_LOST_CODES = {136, 280, 286}
+
+
+async def watch_deal_changes(db, retry_delay: float = 5.0):
+    """
+    Keep the index in sync with featured_deals writes from any process
+
+    Resumes after transient errors; rebuilds the index if the resume
+    point has fallen off the oplog. Exits if the deployment does not
+    support change streams (standalone mongod).
+
+    Args:
+        db: Database instance
+        retry_delay: Seconds to wait before reconnecting
+    """
+    resume_token = None
+
+    while True:
+        try:
+            async with db.featured_deals.watch(
+                full_document="updateLookup",
+                resume_after=resume_token
+            ) as stream:
+                logger.info("Search index change stream started")
+                async for change in stream:
+                    apply_change_event(change)
+                    resume_token = stream.resume_token
+
+        except asyncio.CancelledError:
+            raise
+        except OperationFailure as e:
+            if e.code in CHANGE_STREAM_UNSUPPORTED_CODES:
+                logger.warning(f"Change streams not supported, search index tailer disabled: {e}")
+                return
+            if e.code in CHANGE_STREAM_HISTORY_LOST_CODES:
+                logger.warning(f"Change stream history lost, rebuilding search index: {e}")
+                resume_token = None
+                await index_deals(db)
+                continue
+            logger.error(f"Search index change stream error: {e}")
+        except Exception as e:
+            logger.error(f"Search index change stream error: {e}")
+
+        await asyncio.sleep(retry_delay)
+
+
+def start_change_stream_tailer(db):
+    """Start the change stream tailer task (no-op if already running)"""
+    global _change_stream_task
+
+    if _change_stream_task is not None and not _change_stream_task.done():
+        logger.warning("Search index change stream already running")
+        return
+
+    _change_stream_task = asyncio.create_task(watch_deal_changes(db))
+
+
+async def stop_change_stream_tailer():
+    """Cancel the change stream tailer task"""
+    global _change_stream_task
+
+    if _change_stream_task is None:
+        return
+
+    _change_stream_task.cancel()
+    try:
+        await _change_stream_task
+    except asyncio.CancelledError:
+        pass
+    _change_stream_task = None
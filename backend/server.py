@@ -1,4 +1,4 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Request, Depends, UploadFile
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, Depends, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from typing import Dict, List, Optional, Any
@@ -13,16 +13,7 @@ import socketio
 
 # Import configuration and middleware
 from config import get_settings, validate_environment
-from middleware import (
-    SecurityHeadersMiddleware,
-    RateLimitMiddleware,
-    RequestLoggingMiddleware,
-    ErrorHandlingMiddleware,
-    HealthCheckMiddleware,
-    CacheControlMiddleware,
-    CompressionMiddleware,
-    get_cors_config
-)
+from middleware import AppMiddleware, get_cors_config
 
 # Import database modules
 from database import (
@@ -77,7 +68,7 @@ from file_storage import (
 from fastapi.staticfiles import StaticFiles
 
 # Import monitoring
-from monitoring import setup_logging, get_metrics_collector, HealthChecker
+from monitoring import setup_logging, get_metrics_collector, get_health_checker
 from performance import initialize_performance, cleanup_performance
 
 # Load environment variables
@@ -110,17 +101,9 @@ app = FastAPI(
     redoc_url="/redoc" if settings.DOCS_ENABLED else None
 )
 
-# Add middleware (order matters!)
-app.add_middleware(CompressionMiddleware)
-app.add_middleware(CacheControlMiddleware)
-app.add_middleware(SecurityHeadersMiddleware)
-app.add_middleware(ErrorHandlingMiddleware)
-app.add_middleware(RequestLoggingMiddleware)
-app.add_middleware(HealthCheckMiddleware)
-
-# Add rate limiting for production
-if settings.is_production:
-    app.add_middleware(RateLimitMiddleware)
+# Add middleware (order matters!): one fused pass for health, rate
+# limiting (production), logging, errors, headers and compression
+app.add_middleware(AppMiddleware, rate_limit=settings.is_production)
 
 # CORS configuration
 cors_config = get_cors_config()
@@ -163,6 +146,34 @@ async def startup_event():
         db = get_database()  # Initialize global db instance
         logger.info("Database connections established")
         
+        try:
+            from db_featured_deals import create_featured_deal_indexes
+            from db_lease_programs import create_parsed_program_indexes
+            from calculator_program_matcher import create_calculator_program_indexes
+            from analytics_rollup import create_rollup_indexes
+            from pdf_jobs import create_pdf_job_indexes
+            from auto_sync_multi import create_sync_log_indexes
+            await create_featured_deal_indexes(db)
+            await create_parsed_program_indexes(db)
+            await create_calculator_program_indexes(db)
+            await create_rollup_indexes(db)
+            await create_pdf_job_indexes(db)
+            await create_sync_log_indexes(db)
+        except Exception as e:
+            logger.warning(f"Index creation failed (non-critical): {e}")
+        
+        try:
+            from analytics_rollup import ensure_analytics_rollup
+            await ensure_analytics_rollup(db)
+        except Exception as e:
+            logger.warning(f"Analytics rollup backfill failed (non-critical): {e}")
+        
+        try:
+            from pdf_jobs import get_pdf_import_jobs
+            await get_pdf_import_jobs().fail_stale_jobs(db)
+        except Exception as e:
+            logger.warning(f"PDF import job cleanup failed (non-critical): {e}")
+        
         # Initialize performance components
         await initialize_performance()
         logger.info("Performance optimization initialized")
@@ -174,12 +185,26 @@ async def startup_event():
         
         # Build search index (PHASE 11)
         try:
-            from search_engine import index_deals
+            from search_engine import index_deals, start_change_stream_tailer
             await index_deals(db)
             logger.info("Search index built")
+            if settings.SEARCH_CHANGE_STREAM:
+                start_change_stream_tailer(db)
         except Exception as e:
             logger.warning(f"Search index build failed (non-critical): {e}")
         
+        from monitoring import start_metrics_flush
+        start_metrics_flush()
+        
+        # Readiness probes (/health/ready reads the cached result)
+        from monitoring import get_health_checker
+        get_health_checker().start()
+        
+        # Blocking-call detector (staging/development by default)
+        if settings.LOOP_WATCHDOG_ENABLED:
+            from loop_watchdog import get_loop_watchdog
+            get_loop_watchdog().start()
+        
         logger.info("🚀 Application startup completed successfully")
         
     except Exception as e:
@@ -199,12 +224,30 @@ async def shutdown_event():
         await stop_background_tasks()
         logger.info("Background tasks stopped")
         
+        from search_engine import stop_change_stream_tailer, save_search_snapshot
+        await stop_change_stream_tailer()
+        save_search_snapshot()
+        
+        from monitoring import stop_metrics_flush, get_health_checker
+        await stop_metrics_flush()
+        await get_health_checker().stop()
+        
+        from loop_watchdog import get_loop_watchdog
+        await get_loop_watchdog().stop()
+        
+        from pdf_jobs import get_pdf_import_jobs
+        await get_pdf_import_jobs().shutdown()
+        
         # Close database connections
         await close_mongo_connection()
         logger.info("Database connections closed")
         
         logger.info("✅ Application shutdown completed")
         
+        # Flush queued log records
+        from monitoring import shutdown_logging
+        shutdown_logging()
+        
     except Exception as e:
         logger.error(f"Error during shutdown: {e}")
         # Don't raise during shutdown
@@ -1306,7 +1349,11 @@ async def update_lease_program(program_id: str, program: LeaseProgram, current_u
         result = await db.lease_programs.update_one({"id": program_id}, {"$set": program_dict})
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Program not found")
-        return {"ok": True, "id": program_id}
+        
+        from auto_calculator_hooks import update_lots_for_lease_program
+        updated_count = await update_lots_for_lease_program(program_dict, db)
+        
+        return {"ok": True, "id": program_id, "lots_updated": updated_count}
     except HTTPException:
         raise
     except Exception as e:
@@ -1320,6 +1367,9 @@ async def delete_lease_program(program_id: str, current_user: User = Depends(req
         result = await db.lease_programs.delete_one({"id": program_id})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Program not found")
+        
+        from calculator_program_matcher import get_calculator_program_matcher
+        get_calculator_program_matcher().invalidate()
         return {"ok": True, "id": program_id}
     except HTTPException:
         raise
@@ -1344,7 +1394,12 @@ async def create_finance_program(program: FinanceProgram, current_user: User = D
     try:
         program_dict = program.dict()
         await db.finance_programs.insert_one(program_dict)
-        return {"ok": True, "id": program.id, "program": program_dict}
+        
+        # Trigger auto-update for matching lots
+        from auto_calculator_hooks import update_lots_for_finance_program
+        updated_count = await update_lots_for_finance_program(program_dict, db)
+        
+        return {"ok": True, "id": program.id, "program": program_dict, "lots_updated": updated_count}
     except Exception as e:
         logger.error(f"Create finance program error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1358,7 +1413,11 @@ async def update_finance_program(program_id: str, program: FinanceProgram, curre
         result = await db.finance_programs.update_one({"id": program_id}, {"$set": program_dict})
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Program not found")
-        return {"ok": True, "id": program_id}
+        
+        from auto_calculator_hooks import update_lots_for_finance_program
+        updated_count = await update_lots_for_finance_program(program_dict, db)
+        
+        return {"ok": True, "id": program_id, "lots_updated": updated_count}
     except HTTPException:
         raise
     except Exception as e:
@@ -1372,6 +1431,9 @@ async def delete_finance_program(program_id: str, current_user: User = Depends(r
         result = await db.finance_programs.delete_one({"id": program_id})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Program not found")
+        
+        from calculator_program_matcher import get_calculator_program_matcher
+        get_calculator_program_matcher().invalidate()
         return {"ok": True, "id": program_id}
     except HTTPException:
         raise
@@ -1396,7 +1458,12 @@ async def create_tax_config(config: TaxConfig, current_user: User = Depends(requ
     try:
         config_dict = config.dict()
         await db.tax_configs.insert_one(config_dict)
-        return {"ok": True, "id": config.id, "config": config_dict}
+        
+        # Trigger auto-update for lots in this state/zip
+        from auto_calculator_hooks import update_lots_for_tax_config
+        updated_count = await update_lots_for_tax_config(config_dict, db)
+        
+        return {"ok": True, "id": config.id, "config": config_dict, "lots_updated": updated_count}
     except Exception as e:
         logger.error(f"Create tax config error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1410,7 +1477,11 @@ async def update_tax_config(config_id: str, config: TaxConfig, current_user: Use
         result = await db.tax_configs.update_one({"id": config_id}, {"$set": config_dict})
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Config not found")
-        return {"ok": True, "id": config_id}
+        
+        from auto_calculator_hooks import update_lots_for_tax_config
+        updated_count = await update_lots_for_tax_config(config_dict, db)
+        
+        return {"ok": True, "id": config_id, "lots_updated": updated_count}
     except HTTPException:
         raise
     except Exception as e:
@@ -1424,6 +1495,9 @@ async def delete_tax_config(config_id: str, current_user: User = Depends(require
         result = await db.tax_configs.delete_one({"id": config_id})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Config not found")
+        
+        from calculator_program_matcher import get_calculator_program_matcher
+        get_calculator_program_matcher().invalidate()
         return {"ok": True, "id": config_id}
     except HTTPException:
         raise
@@ -1449,7 +1523,7 @@ async def regenerate_calculator_configs(current_user: User = Depends(require_adm
 # PDF IMPORT ENDPOINTS
 # ==========================================
 
-@api_router.post("/admin/lease-programs/import-pdf")
+@api_router.post("/admin/lease-programs/import-pdf", status_code=202)
 async def import_lease_program_pdf(
     file: UploadFile,
     current_user: User = Depends(require_admin)
@@ -1457,24 +1531,21 @@ async def import_lease_program_pdf(
     """
     Import lease program PDF - Step 1: Extract text
     
-    Accepts a PDF file containing lease/finance program data,
-    extracts text using OCR if needed, and stores in database
-    for later parsing.
+    Accepts a PDF file containing lease/finance program data and
+    starts a background job that extracts text (OCR if needed, pages in
+    parallel) and stores it in the database for later parsing.
+    Poll GET /admin/lease-programs/import-jobs/{job_id} or subscribe to
+    pdf_import_progress over Socket.IO.
     
     Returns:
         - success: bool
-        - text: Extracted text content
-        - page_count: Number of pages
-        - warnings: List of any warnings
-        - pdf_id: Database ID for this PDF
+        - job_id: Import job ID
+        - status: "queued"
+        - filename: Original filename
     """
     try:
-        from pdf_import_service import (
-            extract_pdf_text,
-            validate_pdf_file,
-            save_pdf_to_database,
-            clean_extracted_text
-        )
+        from pdf_import_service import validate_pdf_file
+        from pdf_jobs import get_pdf_import_jobs
         
         # Read file content
         file_content = await file.read()
@@ -1488,40 +1559,12 @@ async def import_lease_program_pdf(
         except ValueError as e:
             raise HTTPException(status_code=400, detail=str(e))
         
-        # Extract text
-        try:
-            result = extract_pdf_text(file_content, filename)
-        except Exception as e:
-            logger.error(f"PDF extraction failed: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to extract text from PDF: {str(e)}")
-        
-        # Clean text
-        cleaned_text = clean_extracted_text(result["text"])
-        
-        # Save to database
-        try:
-            pdf_id = await save_pdf_to_database(
-                db,
-                filename=filename,
-                text=cleaned_text,
-                page_count=result["page_count"],
-                method=result["method"],
-                original_file_size=len(file_content)
-            )
-        except Exception as e:
-            logger.error(f"Failed to save PDF to database: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to save PDF data: {str(e)}")
-        
-        logger.info(f"PDF import successful: {pdf_id} - {result['page_count']} pages, {result['char_count']} chars")
+        job = await get_pdf_import_jobs().submit(db, file_content, filename, current_user.email)
         
         return {
             "success": True,
-            "text": cleaned_text,
-            "page_count": result["page_count"],
-            "char_count": result["char_count"],
-            "extraction_method": result["method"],
-            "warnings": result["warnings"],
-            "pdf_id": pdf_id,
+            "job_id": job["id"],
+            "status": job["status"],
             "filename": filename
         }
         
@@ -1532,6 +1575,54 @@ async def import_lease_program_pdf(
         raise HTTPException(status_code=500, detail=f"PDF import failed: {str(e)}")
 
 
+@api_router.get("/admin/lease-programs/import-jobs")
+async def get_pdf_import_jobs_list(
+    current_user: User = Depends(require_admin),
+    limit: int = 20
+):
+    """Recent PDF import jobs (newest first)"""
+    try:
+        from pdf_jobs import get_pdf_import_jobs
+        
+        manager = get_pdf_import_jobs()
+        jobs = await manager.list_jobs(db, max(1, min(limit, 100)))
+        return {"ok": True, "jobs": jobs, "count": len(jobs), "stats": manager.get_stats()}
+    except Exception as e:
+        logger.error(f"Get PDF import jobs error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.get("/admin/lease-programs/import-jobs/{job_id}")
+async def get_pdf_import_job(
+    job_id: str,
+    current_user: User = Depends(require_admin)
+):
+    """
+    PDF import job status and progress
+    
+    Once completed, result has the same fields the upload used to
+    return (pdf_id, page_count, char_count, extraction_method, warnings,
+    filename) plus the extracted text.
+    """
+    try:
+        from pdf_jobs import get_pdf_import_jobs
+        
+        job = await get_pdf_import_jobs().get_job(db, job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Import job not found")
+        
+        if job["status"] == "completed" and job.get("result"):
+            pdf = await db.raw_program_pdfs.find_one({"id": job["result"]["pdf_id"]}, {"_id": 0, "text": 1})
+            job["result"]["text"] = pdf["text"] if pdf else ""
+        
+        return job
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get PDF import job error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @api_router.get("/admin/raw-pdfs")
 async def get_raw_pdfs(
     current_user: User = Depends(require_editor),
@@ -1787,18 +1878,11 @@ async def calculate_lease_payment(request: dict, req: Request):
     try:
         from models_lease_programs import LeaseCalculationRequest
         from lease_calculator_pro import calculate_lease_pro
-        from db_lease_programs import get_latest_parsed_program_for
-        from rate_limiter import get_rate_limiter
+        from program_registry import get_program_registry
+        from rate_limiter import enforce_rate_limit
         
         # Rate limiting
-        client_ip = req.client.host
-        limiter = get_rate_limiter()
-        
-        if not limiter.is_allowed(client_ip, max_requests=20, window_seconds=60):
-            raise HTTPException(
-                status_code=429,
-                detail="Too many requests. Please slow down. Try again in a minute."
-            )
+        await enforce_rate_limit(req, "lease_calculate", "Too many requests. Please slow down. Try again in a minute.")
         
         # Parse request
         try:
@@ -1806,8 +1890,8 @@ async def calculate_lease_payment(request: dict, req: Request):
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Invalid request format: {str(e)}")
         
-        # Fetch parsed program
-        parsed_program = await get_latest_parsed_program_for(
+        # Fetch parsed program (in-process registry, no DB round-trip when warm)
+        parsed_program = await get_program_registry().get_program(
             db,
             brand=calc_request.brand,
             model=calc_request.model,
@@ -1853,8 +1937,14 @@ async def get_brands_and_models():
     """
     try:
         from db_lease_programs import get_available_brands_and_models
+        from request_coalescer import get_coalescer
+        from simple_cache import versioned_key
+        
+        # Program writes in this worker change the key; others show up within 30s
+        coalescer = get_coalescer("lease_brands_models", ttl_seconds=30)
+        key = versioned_key("brands_models", "lease_programs_parsed")
         
-        data = await get_available_brands_and_models(db)
+        data = await coalescer.run(key, lambda: get_available_brands_and_models(db))
         return data
         
     except Exception as e:
@@ -1863,6 +1953,149 @@ async def get_brands_and_models():
 
 
 
+@api_router.get("/lease/payment-matrix")
+async def get_lease_payment_matrix(
+    brand: str,
+    msrp: float,
+    selling_price: float,
+    req: Request,
+    model: Optional[str] = None,
+    region: Optional[str] = None,
+    down_payments: str = "0,1000,2000,3000",
+    tax_rate: float = 0.0925
+):
+    """
+    Full payment matrix for a deal in one request
+    
+    Public endpoint - no authentication required
+    Rate limited: 20 requests per minute per IP (shared with /lease/calculate)
+    
+    Prices every term and mileage in the parsed program's residual table
+    times each down payment, with one program lookup and one vectorized
+    pass. Supports ETag / If-None-Match conditional GET.
+    
+    Query params:
+        brand, model, region: Program selection
+        msrp, selling_price: Vehicle pricing
+        down_payments: Comma-separated list (max 10), e.g. "0,1000,2000"
+        tax_rate: Sales tax rate (default 9.25%)
+        
+    Returns:
+        Axes (terms, mileages, down_payments) plus matrices indexed
+        [term][mileage][down_payment]; cells without a program rate are null
+    """
+    try:
+        from fastapi.responses import Response
+        from models_lease_programs import LeaseCalculationRequest
+        from lease_calculator_batch import calculate_lease_grid, grid_field_to_lists
+        from program_registry import get_program_registry
+        from rate_limiter import enforce_rate_limit
+        from db_lease_programs import compute_program_fingerprint
+        
+        # Rate limiting
+        await enforce_rate_limit(req, "payment_matrix", "Too many requests. Please slow down. Try again in a minute.")
+        
+        # Parse down payments
+        try:
+            downs = [float(x) for x in down_payments.split(",") if x.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="down_payments must be a comma-separated list of numbers")
+        
+        if not downs or len(downs) > 10:
+            raise HTTPException(status_code=400, detail="Provide 1-10 down payment values")
+        
+        # Fetch parsed program (in-process registry)
+        compiled = await get_program_registry().get_compiled(db, brand=brand, model=model, region=region)
+        
+        if not compiled or not compiled.mileages():
+            raise HTTPException(
+                status_code=404,
+                detail=f"No lease program found for {brand} {model or ''} in {region or 'any region'}"
+            )
+        
+        program = compiled.program
+        
+        # ETag from program identity and content + request parameters
+        # (MF/residual edits change the fingerprint, not id/created_at)
+        etag_source = json.dumps({
+            "program_id": program.get("id"),
+            "program_created_at": str(program.get("created_at")),
+            "program_updated_at": str(program.get("updated_at")),
+            "program_fingerprint": program.get("fingerprint") or compute_program_fingerprint(program),
+            "brand": brand,
+            "model": model,
+            "region": region,
+            "msrp": msrp,
+            "selling_price": selling_price,
+            "down_payments": downs,
+            "tax_rate": tax_rate
+        }, sort_keys=True)
+        etag = f'"{hashlib.md5(etag_source.encode()).hexdigest()}"'
+        cache_headers = {
+            "ETag": etag,
+            "Cache-Control": "public, max-age=0, must-revalidate"
+        }
+        
+        if_none_match = req.headers.get("if-none-match", "")
+        if etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=cache_headers)
+        
+        # Calculate
+        try:
+            calc_request = LeaseCalculationRequest(
+                brand=brand,
+                model=model,
+                region=region,
+                msrp=msrp,
+                selling_price=selling_price,
+                term_months=0,
+                annual_mileage=0,
+                tax_rate=tax_rate
+            )
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid request format: {str(e)}")
+        
+        grid = calculate_lease_grid(
+            calc_request,
+            compiled,
+            terms=compiled.terms(),
+            mileages=compiled.mileages(),
+            down_payments=downs
+        )
+        
+        payload = {
+            "brand": program.get("brand"),
+            "model": program.get("model"),
+            "region": program.get("region"),
+            "program_id": program.get("id"),
+            "month": program.get("month"),
+            "msrp": msrp,
+            "selling_price": selling_price,
+            "tax_rate": tax_rate,
+            "terms": grid["terms"],
+            "mileages": grid["mileages"],
+            "down_payments": grid["down_payments"],
+            "mf_by_term": [row[0][0] for row in grid_field_to_lists(grid, "mf_used")],
+            "residual_percent": [
+                [cell[0] for cell in row]
+                for row in grid_field_to_lists(grid, "residual_percent_used")
+            ],
+            "monthly_payment": grid_field_to_lists(grid, "monthly_payment_with_tax", 2),
+            "drive_off": grid_field_to_lists(grid, "estimated_drive_off", 2),
+            "one_pay": grid_field_to_lists(grid, "one_pay_estimated", 2),
+            "savings_vs_msrp": grid_field_to_lists(grid, "estimated_savings_vs_msrp_deal", 2)
+        }
+        
+        return JSONResponse(content=payload, headers=cache_headers)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Payment matrix error: {e}")
+        raise HTTPException(status_code=500, detail=f"Calculation failed: {str(e)}")
+
+
+
 # ==========================================
 # FEATURED DEALS ENDPOINTS
 # ==========================================
@@ -1889,7 +2122,7 @@ async def create_featured_deal(
         from db_featured_deals import create_deal, update_calculated_fields
         from models_lease_programs import LeaseCalculationRequest
         from lease_calculator_pro import calculate_lease_pro
-        from db_lease_programs import get_latest_parsed_program_for
+        from program_registry import get_program_registry
         
         # Parse request
         try:
@@ -1904,7 +2137,7 @@ async def create_featured_deal(
         # Run PRO calculator
         try:
             # Fetch parsed program
-            parsed_program = await get_latest_parsed_program_for(
+            parsed_program = await get_program_registry().get_program(
                 db,
                 brand=create_request.brand,
                 model=create_request.model,
@@ -1997,6 +2230,7 @@ async def create_featured_deal(
 
 @api_router.get("/deals/list")
 async def list_featured_deals(
+    response: Response,
     brand: Optional[str] = None,
     region: Optional[str] = None,
     limit: int = 100,
@@ -2013,18 +2247,26 @@ async def list_featured_deals(
     """
     try:
         from db_featured_deals import list_deals
+        from http_cache import collection_etag
+        from request_coalescer import get_coalescer
+        from simple_cache import versioned_key
         
         # Determine sort order based on field
         sort_order = 1 if sort == "calculated_payment" else -1
         
-        deals = await list_deals(
+        # Identical concurrent requests share one query
+        key = versioned_key(f"deals_list:{brand}|{region}|{limit}|{sort}", "featured_deals")
+        deals = await get_coalescer("deals_list").run(key, lambda: list_deals(
             db,
             brand=brand,
             region=region,
             limit=limit,
             sort_by=sort,
             sort_order=sort_order
-        )
+        ))
+        
+        # Validator from each deal's updated_at (304 handled by middleware)
+        response.headers["ETag"] = collection_etag(deals, brand, region, limit, sort)
         
         return {
             "deals": deals,
@@ -2037,18 +2279,25 @@ async def list_featured_deals(
 
 
 @api_router.get("/deals/{deal_id}")
-async def get_featured_deal(deal_id: str):
+async def get_featured_deal(deal_id: str, response: Response):
     """
     Get a single featured deal (public endpoint)
     """
     try:
         from db_featured_deals import get_deal
+        from http_cache import deal_etag
+        from request_coalescer import get_coalescer
+        from simple_cache import versioned_key
         
-        deal = await get_deal(db, deal_id)
+        key = versioned_key(f"deal:{deal_id}", "featured_deals")
+        deal = await get_coalescer("deal_detail").run(key, lambda: get_deal(db, deal_id))
         
         if not deal:
             raise HTTPException(status_code=404, detail="Deal not found")
         
+        # Validator from updated_at (304 handled by middleware)
+        response.headers["ETag"] = deal_etag(deal)
+        
         return deal
         
     except HTTPException:
@@ -2139,7 +2388,11 @@ async def recalculate_all_deals(current_user: User = Depends(require_admin)):
             "total": result["total"],
             "success": result["success"],
             "failed": result["failed"],
-            "failed_deals": result["failed_deals"]
+            "failed_deals": result["failed_deals"],
+            "groups": result["groups"],
+            "db_operations": result["db_operations"],
+            "elapsed_seconds": result["elapsed_seconds"],
+            "deals_per_second": result["deals_per_second"]
         }
         
     except Exception as e:
@@ -2189,18 +2442,8 @@ async def get_analytics_overview(current_user: User = Depends(require_editor)):
         cache = get_analytics_cache()
         cache_key = "analytics_overview"
         
-        # Try cache first
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-        
-        # Compute
-        overview = await get_deals_overview(db)
-        
-        # Cache for 5 minutes
-        cache.set(cache_key, overview, ttl_seconds=300)
-        
-        return overview
+        # Cached for 5 minutes; concurrent misses compute once
+        return await cache.get_or_set(cache_key, lambda: get_deals_overview(db), ttl_seconds=300)
         
     except Exception as e:
         logger.error(f"Analytics overview error: {e}")
@@ -2261,24 +2504,15 @@ async def get_full_analytics_summary_endpoint(current_user: User = Depends(requi
     - Program changes trend
     """
     try:
-        from analytics_engine import get_full_analytics_summary
-        from simple_cache import get_analytics_cache
+        from analytics_engine import get_full_analytics_summary, SUMMARY_COLLECTIONS
+        from simple_cache import get_analytics_cache, versioned_key
         
         cache = get_analytics_cache()
-        cache_key = "analytics_full_summary"
-        
-        # Try cache first
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-        
-        # Compute
-        summary = await get_full_analytics_summary(db)
+        # Keyed by collection versions: writes to any source invalidate it
+        cache_key = versioned_key("analytics_full_summary", *SUMMARY_COLLECTIONS)
         
-        # Cache for 5 minutes
-        cache.set(cache_key, summary, ttl_seconds=300)
-        
-        return summary
+        # Cached for 5 minutes; concurrent misses compute once
+        return await cache.get_or_set(cache_key, lambda: get_full_analytics_summary(db), ttl_seconds=300)
         
     except Exception as e:
         logger.error(f"Analytics summary error: {e}")
@@ -2302,6 +2536,129 @@ async def get_payment_trends_analytics(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@api_router.get("/admin/cache/stats")
+async def get_cache_stats(current_user: User = Depends(require_admin)):
+    """Hit/miss/eviction counters and sizes of the application caches"""
+    try:
+        from performance import get_cache_manager
+        from simple_cache import get_analytics_cache
+        from request_coalescer import get_coalescer_stats
+        from rate_limiter import get_rate_limiter
+        
+        return {
+            "cache_manager": get_cache_manager().get_stats(),
+            "analytics": get_analytics_cache().get_stats(),
+            "coalescing": get_coalescer_stats(),
+            "rate_limiter": get_rate_limiter().get_stats()
+        }
+        
+    except Exception as e:
+        logger.error(f"Cache stats error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.get("/admin/logging/slow-requests")
+async def get_slow_requests(limit: int = 50, current_user: User = Depends(require_admin)):
+    """Recent requests slower than SLOW_REQUEST_SECONDS, plus log queue and sampling counters"""
+    try:
+        from monitoring import get_request_log, get_logging_stats
+        
+        return {
+            "slow_requests": get_request_log().get_slow_requests(max(1, min(limit, 500))),
+            "logging": get_logging_stats()
+        }
+        
+    except Exception as e:
+        logger.error(f"Slow requests error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.get("/admin/db/slow-queries")
+async def get_slow_queries(limit: int = 50, current_user: User = Depends(require_admin)):
+    """
+    Mongo commands slower than DB_SLOW_QUERY_MS, aggregated by query shape
+    
+    Shapes are explained once in the background; collscan is true when the
+    winning plan scans the collection, null until explained.
+    """
+    try:
+        from db_tracer import get_db_tracer
+        
+        tracer = get_db_tracer()
+        return {
+            "slow_queries": tracer.get_slow_queries(max(1, min(limit, 500))),
+            "tracer": tracer.get_stats()
+        }
+        
+    except Exception as e:
+        logger.error(f"Slow queries error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.get("/admin/diagnostics/blocking")
+async def get_blocking_calls(limit: int = 50, reset: bool = False, current_user: User = Depends(require_admin)):
+    """
+    Code locations that blocked the event loop, by total blocked time
+    
+    Each offender has the application line, the call that blocked and a
+    stack sample. Query param: reset=true clears the report after reading.
+    """
+    try:
+        from loop_watchdog import get_loop_watchdog
+        
+        watchdog = get_loop_watchdog()
+        report = watchdog.get_report(max(1, min(limit, 200)))
+        if reset:
+            watchdog.reset()
+        return report
+        
+    except Exception as e:
+        logger.error(f"Blocking diagnostics error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.get("/admin/health")
+async def get_health_details(refresh: bool = False, current_user: User = Depends(require_admin)):
+    """
+    All health probe results (database latency, event-loop lag, caches,
+    search index, background worker, disk, memory)
+    
+    Query param: refresh=true probes now instead of returning the cached result
+    """
+    try:
+        checker = get_health_checker()
+        if refresh or checker.last_result is None:
+            return await checker.run_probes()
+        return checker.last_result
+        
+    except Exception as e:
+        logger.error(f"Health details error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.post("/admin/analytics/rollup/backfill")
+async def backfill_analytics_rollup_endpoint(current_user: User = Depends(require_admin)):
+    """
+    Rebuild the analytics_daily rollup from featured_deals and auto_sync_logs
+    
+    Admin-only. Run after bulk imports or direct database edits.
+    """
+    try:
+        from analytics_rollup import backfill_analytics_rollup
+        from simple_cache import bump_collection_version
+        
+        result = await backfill_analytics_rollup(db)
+        bump_collection_version("featured_deals")
+        
+        logger.info(f"Analytics rollup backfilled by {current_user.email}: {result['rows']} rows")
+        
+        return {"ok": True, **result}
+        
+    except Exception as e:
+        logger.error(f"Analytics rollup backfill error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ==========================================
 # SETTINGS ENDPOINTS
 
@@ -2511,17 +2868,10 @@ async def compare_deals_endpoint(request: dict, req: Request):
     try:
         from comparison_engine import compare_deals, get_comparison_summary
         from db_featured_deals import get_deal
-        from rate_limiter import get_rate_limiter
+        from rate_limiter import enforce_rate_limit
         
         # Rate limiting
-        client_ip = req.client.host
-        limiter = get_rate_limiter()
-        
-        if not limiter.is_allowed(client_ip, max_requests=10, window_seconds=10):
-            raise HTTPException(
-                status_code=429,
-                detail="Too many comparison requests. Please slow down."
-            )
+        await enforce_rate_limit(req, "compare", "Too many comparison requests. Please slow down.")
         
         # Extract deal_ids from request
         deal_ids = request.get("deal_ids", [])
@@ -2579,18 +2929,11 @@ async def search_deals_endpoint(q: str = "", limit: int = 20, req: Request = Non
     """
     try:
         from search_engine import search_deals, get_index_status, index_deals
-        from rate_limiter import get_rate_limiter
+        from rate_limiter import enforce_rate_limit
         
         # Rate limiting
         if req:
-            client_ip = req.client.host
-            limiter = get_rate_limiter()
-            
-            if not limiter.is_allowed(client_ip, max_requests=10, window_seconds=10):
-                raise HTTPException(
-                    status_code=429,
-                    detail="Too many search requests. Please slow down."
-                )
+            await enforce_rate_limit(req, "search", "Too many search requests. Please slow down.")
         
         # Sanitize query
         q = q.strip()[:64]  # Max 64 chars
@@ -2610,6 +2953,8 @@ async def search_deals_endpoint(q: str = "", limit: int = 20, req: Request = Non
             "query": q
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Search error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -2620,18 +2965,13 @@ async def search_deals_endpoint(q: str = "", limit: int = 20, req: Request = Non
 # ==========================================
 
 @api_router.get("/feed/deals.json")
-async def get_deals_json_feed():
-    """JSON feed for AI indexing (public)"""
+async def get_deals_json_feed(req: Request):
+    """JSON feed for AI indexing (public, ETag/gzip)"""
     try:
-        from ai_feed_generator import generate_deals_json_feed
-        
-        deals = await generate_deals_json_feed(db)
+        from ai_feed_generator import get_feed_store, feed_response
         
-        return {
-            "items": deals,
-            "total": len(deals),
-            "last_updated": datetime.now(timezone.utc).isoformat()
-        }
+        feed = await get_feed_store().get_feed(db, "deals.json")
+        return feed_response(feed, req)
         
     except Exception as e:
         logger.error(f"JSON feed error: {e}")
@@ -2639,13 +2979,13 @@ async def get_deals_json_feed():
 
 
 @api_router.get("/feed/deals-ai.json")
-async def get_deals_ai_feed():
-    """Enhanced AI feed (public)"""
+async def get_deals_ai_feed(req: Request):
+    """Enhanced AI feed (public, ETag/gzip)"""
     try:
-        from ai_feed_generator import generate_deals_ai_feed
+        from ai_feed_generator import get_feed_store, feed_response
         
-        feed = await generate_deals_ai_feed(db)
-        return feed
+        feed = await get_feed_store().get_feed(db, "deals-ai.json")
+        return feed_response(feed, req)
         
     except Exception as e:
         logger.error(f"AI feed error: {e}")
@@ -2653,16 +2993,13 @@ async def get_deals_ai_feed():
 
 
 @api_router.get("/feed/deals.xml")
-async def get_deals_xml_feed():
-    """XML feed for RSS readers (public)"""
+async def get_deals_xml_feed(req: Request):
+    """XML feed for RSS readers (public, ETag/gzip)"""
     try:
-        from ai_feed_generator import generate_deals_json_feed, generate_deals_xml_feed
-        from fastapi.responses import Response
+        from ai_feed_generator import get_feed_store, feed_response
         
-        deals = await generate_deals_json_feed(db)
-        xml_content = generate_deals_xml_feed(deals)
-        
-        return Response(content=xml_content, media_type="application/xml")
+        feed = await get_feed_store().get_feed(db, "deals.xml")
+        return feed_response(feed, req)
         
     except Exception as e:
         logger.error(f"XML feed error: {e}")
@@ -2882,6 +3219,16 @@ async def delete_all_offers(
         result_cars = await db.cars.delete_many({})
         result_featured = await db.featured_deals.delete_many({})
         
+        from search_engine import get_search_index
+        if get_search_index().built:
+            get_search_index().build([])
+        
+        from analytics_rollup import backfill_analytics_rollup
+        from simple_cache import bump_collection_version
+        await backfill_analytics_rollup(db)
+        bump_collection_version("featured_deals")
+        bump_collection_version("cars")
+        
         total = result_lots.deleted_count + result_cars.deleted_count + result_featured.deleted_count
         
         logger.warning(f"MASS DELETE by {current_user.email}: {total} offers deleted")
@@ -2933,6 +3280,8 @@ async def delete_single_offer(
             result = await db.cars.delete_one(query)
             if result.deleted_count > 0:
                 deleted = True
+                from simple_cache import bump_collection_version
+                bump_collection_version("cars")
                 logger.info(f"Deleted from cars: {offer_id}")
         
         if not deleted:
@@ -3013,6 +3362,8 @@ async def update_offer(
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Offer not found")
         
+        from simple_cache import bump_collection_version
+        bump_collection_version("cars")
         logger.info(f"Updated offer: {offer_id}")
         
         return {
@@ -3222,14 +3573,9 @@ async def run_scraper(
 async def get_brand_sync_status(current_user: User = Depends(require_editor)):
     """Get sync status for all supported brands"""
     try:
-        from auto_sync_multi import get_supported_brands, get_brand_status
-        
-        brands = get_supported_brands()
+        from auto_sync_multi import get_all_brand_statuses
         
-        statuses = []
-        for brand in brands:
-            status = await get_brand_status(db, brand)
-            statuses.append(status)
+        statuses = await get_all_brand_statuses(db)
         
         return {
             "brands": statuses,
@@ -3411,22 +3757,32 @@ async def get_public_cars():
     """Get all PUBLISHED offers from cars collection"""
     try:
         from database import get_database
+        from request_coalescer import get_coalescer
+        from simple_cache import versioned_key
         db = get_database()
         
-        # Only published offers
-        cars_cursor = db.cars.find({"published": True})
-        cars = await cars_cursor.to_list(length=200)
+        async def load_published_cars():
+            # Only published offers
+            cars_cursor = db.cars.find({"published": True})
+            cars = await cars_cursor.to_list(length=200)
+            
+            for car in cars:
+                if car.get('_id'):
+                    car['id'] = str(car['_id'])
+                    del car['_id']
+            
+            return cars
         
-        for car in cars:
-            if car.get('_id'):
-                car['id'] = str(car['_id'])
-                del car['_id']
+        # Identical concurrent requests share one query
+        key = versioned_key("published", "cars")
+        cars = await get_coalescer("cars").run(key, load_published_cars)
         
         logger.info(f"Returning {len(cars)} PUBLISHED offers")
         return cars
     except Exception as e:
+        # An error must not look like (and be cached as) an empty inventory
         logger.error(f"Get cars error: {e}")
-        return []
+        raise HTTPException(status_code=500, detail="Failed to load offers")
 
 
 @api_router.get("/cars/{car_id}")
@@ -3482,6 +3838,8 @@ async def create_offer_manual(offer_data: dict, current_user: User = Depends(req
         result = await db.cars.insert_one(offer_data)
         offer_id = str(result.inserted_id)
         
+        from simple_cache import bump_collection_version
+        bump_collection_version("cars")
         logger.info(f"Created: {offer_id}, published={offer_data['published']}")
         
         return {"success": True, "offerId": offer_id}
@@ -3540,6 +3898,8 @@ async def update_offer(offer_id: str, offer_data: dict, current_user: User = Dep
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Not found")
         
+        from simple_cache import bump_collection_version
+        bump_collection_version("cars")
         return {"success": True, "offerId": offer_id}
     except HTTPException:
         raise
@@ -3565,6 +3925,8 @@ async def delete_offer(offer_id: str, current_user: User = Depends(require_admin
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Not found")
         
+        from simple_cache import bump_collection_version
+        bump_collection_version("cars")
         return {"ok": True, "id": offer_id}
     except HTTPException:
         raise
@@ -3583,6 +3945,8 @@ async def delete_all_offers(confirm: str = "no", current_user: User = Depends(re
         db = get_database()
         
         result = await db.cars.delete_many({})
+        from simple_cache import bump_collection_version
+        bump_collection_version("cars")
         
         logger.warning(f"Mass delete: {result.deleted_count} offers")
         
@@ -3591,5 +3955,22 @@ async def delete_all_offers(confirm: str = "no", current_user: User = Depends(re
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint(request: Request):
+    """
+    Prometheus metrics: per-route latency and DB round-trip histograms,
+    request counters and cache hit ratios
+    
+    Requires "Authorization: Bearer <METRICS_TOKEN>" when METRICS_TOKEN is set.
+    """
+    if settings.METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {settings.METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    
+    return Response(
+        content=get_metrics_collector().render_prometheus(),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
 # Include app with API router
 app.include_router(api_router)
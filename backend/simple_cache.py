@@ -3,56 +3,82 @@ Simple Analytics Cache
 
 In-memory caching for expensive analytics queries
 """
-from datetime import datetime, timedelta
-from typing import Any, Optional
+from typing import Any, Awaitable, Callable, Dict, Optional
 import logging
 import hashlib
 import json
 
+from cache_backend import MemoryCache, SingleFlight
+
 logger = logging.getLogger(__name__)
 
 
 class SimpleCache:
-    """Simple in-memory cache with TTL"""
+    """
+    Simple in-memory cache with TTL
+    
+    Backed by a bounded LRU (cache_backend.MemoryCache): expired entries are
+    dropped on writes instead of waiting to be read again. Process-local on
+    purpose: versioned_key() counters are per worker, so sharing entries
+    across workers could serve a summary from before this worker's write.
+    """
     
-    def __init__(self, default_ttl_seconds: int = 300):
-        self.cache = {}
+    def __init__(self, default_ttl_seconds: int = 300, max_entries: int = 1000, max_bytes: int = 32 * 1024 * 1024):
+        self.cache = MemoryCache(max_entries=max_entries, max_bytes=max_bytes)
+        self.flight = SingleFlight()
         self.default_ttl = default_ttl_seconds
     
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
-        if key in self.cache:
-            value, expires_at = self.cache[key]
-            
-            if datetime.now() < expires_at:
-                logger.debug(f"Cache HIT: {key}")
-                return value
-            else:
-                # Expired
-                del self.cache[key]
-                logger.debug(f"Cache EXPIRED: {key}")
-        
-        logger.debug(f"Cache MISS: {key}")
-        return None
+        value = self.cache.get(key, None)
+        logger.debug(f"Cache {'HIT' if value is not None else 'MISS'}: {key}")
+        return value
     
     def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None):
         """Set value in cache with TTL"""
         ttl = ttl_seconds or self.default_ttl
-        expires_at = datetime.now() + timedelta(seconds=ttl)
         
-        self.cache[key] = (value, expires_at)
-        logger.debug(f"Cache SET: {key} (TTL: {ttl}s)")
+        if self.cache.set(key, value, ttl):
+            logger.debug(f"Cache SET: {key} (TTL: {ttl}s)")
+        else:
+            logger.warning(f"Cache SKIP: {key} exceeds the {self.cache.max_bytes} byte budget")
+    
+    async def get_or_set(self, key: str, loader: Callable[[], Awaitable[Any]], ttl_seconds: Optional[int] = None) -> Any:
+        """
+        Get value from cache, computing it once for concurrent misses
+        
+        Args:
+            loader: Coroutine function producing the value (None is not cached)
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        
+        async def load():
+            loaded = await loader()
+            if loaded is not None:
+                self.set(key, loaded, ttl_seconds)
+            return loaded
+        
+        return await self.flight.do(key, load)
     
     def invalidate(self, key: str = None):
         """Invalidate cache entry or all cache"""
         if key:
-            if key in self.cache:
-                del self.cache[key]
+            if self.cache.delete(key):
                 logger.info(f"Cache invalidated: {key}")
         else:
             self.cache.clear()
             logger.info("Cache fully invalidated")
     
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        return {
+            **self.cache.get_stats(),
+            "loads": self.flight.loads,
+            "coalesced": self.flight.coalesced
+        }
+    
     def make_key(self, *args, **kwargs) -> str:
         """Generate cache key from arguments"""
         data = json.dumps({"args": args, "kwargs": kwargs}, sort_keys=True)
@@ -66,3 +92,25 @@ analytics_cache = SimpleCache(default_ttl_seconds=300)  # 5 minutes
 def get_analytics_cache() -> SimpleCache:
     """Get global analytics cache"""
     return analytics_cache
+
+
+# Per-collection write counters (process-local). Cache keys built with
+# versioned_key() change as soon as this worker writes to a collection;
+# writes from other workers are still bounded by the entry TTL.
+_collection_versions: Dict[str, int] = {}
+
+
+def bump_collection_version(collection: str):
+    """Record a write to collection (invalidates versioned cache keys)"""
+    _collection_versions[collection] = _collection_versions.get(collection, 0) + 1
+
+
+def get_collection_version(collection: str) -> int:
+    """Current write counter for collection"""
+    return _collection_versions.get(collection, 0)
+
+
+def versioned_key(prefix: str, *collections: str) -> str:
+    """Cache key that embeds the write counters of collections"""
+    versions = ":".join(f"{name}={get_collection_version(name)}" for name in collections)
+    return f"{prefix}:{versions}"
@@ -0,0 +1,61 @@
+"""
+Unit tests for the analytics summary
+
+The $bucket boundaries must count payments exactly like the per-range
+$gte/$lte queries, and the cached summary key must change on writes
+"""
+import sys
+sys.path.append('/app/backend')
+
+import bisect
+
+from analytics_engine import (
+    PAYMENT_RANGES,
+    SUMMARY_COLLECTIONS,
+    _payment_bucket_boundaries,
+    summary_from_facets
+)
+from simple_cache import bump_collection_version, versioned_key
+
+
+PAYMENTS = [0, 0.01, 150, 298.99, 299, 299.0000001, 299.5, 299.99, 300, 399, 399.01,
+            400, 499, 499.5, 500, 750.25, 9999.99, 10000, 10000.01, -1]
+
+
+def _bucket(boundaries, value):
+    """MongoDB $bucket: lower bound of [lower, upper), or "other" """
+    if value < boundaries[0] or value >= boundaries[-1]:
+        return "other"
+    return boundaries[bisect.bisect_right(boundaries, value) - 1]
+
+
+def test_bucket_boundaries_match_range_counts():
+    """Inclusive maxima and the gaps between ranges land where $gte/$lte puts them"""
+    boundaries = _payment_bucket_boundaries()
+    assert boundaries == sorted(set(boundaries))
+
+    buckets = {}
+    for payment in PAYMENTS:
+        key = _bucket(boundaries, payment)
+        buckets[key] = buckets.get(key, 0) + 1
+    facets = {"payments": [{"_id": key, "count": count} for key, count in buckets.items()]}
+
+    expected = []
+    for label, min_val, max_val in PAYMENT_RANGES:
+        count = sum(1 for p in PAYMENTS if min_val <= p <= max_val)
+        if count:
+            expected.append({"range": label, "count": count, "value": count})
+
+    assert summary_from_facets(facets)["payments_distribution"] == expected
+
+
+def test_summary_key_changes_on_write():
+    """A write to any summarized collection yields a new cache key"""
+    for collection in SUMMARY_COLLECTIONS:
+        before = versioned_key("analytics_full_summary", *SUMMARY_COLLECTIONS)
+        bump_collection_version(collection)
+        assert versioned_key("analytics_full_summary", *SUMMARY_COLLECTIONS) != before
+
+    before = versioned_key("analytics_full_summary", *SUMMARY_COLLECTIONS)
+    bump_collection_version("users")
+    assert versioned_key("analytics_full_summary", *SUMMARY_COLLECTIONS) == before
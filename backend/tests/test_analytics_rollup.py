@@ -0,0 +1,94 @@
+"""
+Unit tests for the analytics rollup
+
+Rows maintained incrementally by deal writes and sync logs must equal a
+backfill_analytics_rollup() rebuild of the same data
+"""
+import sys
+sys.path.append('/app/backend')
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from analytics_rollup import (
+    BRAND_SYNC_LOG_KIND,
+    ROLLUP_COLLECTION,
+    backfill_analytics_rollup,
+    record_sync_log
+)
+from db_featured_deals import create_deal, delete_deal, update_calculated_fields
+
+
+DAY = datetime(2026, 3, 2, tzinfo=timezone.utc)
+
+
+async def _rollup_rows(db):
+    """Rollup rows by id, without rows left empty by deletes"""
+    rows = await db[ROLLUP_COLLECTION].find({}).to_list(length=None)
+    return {
+        row["_id"]: row
+        for row in rows
+        if row["deals"] or row["changes"]
+    }
+
+
+async def _log(db, brand, when, kind="program_change", changes=None):
+    entry = {
+        "id": f"{brand}-{when.isoformat()}-{kind}",
+        "kind": kind,
+        "timestamp": when,
+        "brand": brand,
+        "model": "Camry",
+        "changes": changes if changes is not None else {"money_factor": {"old": 0.001, "new": 0.0012}},
+        "deals_updated": []
+    }
+    await db.auto_sync_logs.insert_one(dict(entry))
+    await record_sync_log(db, entry)
+
+
+def test_incremental_rows_match_backfill():
+    """Creates, payment updates, deletes and sync logs leave no drift"""
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["rollup_test"]
+
+        ids = []
+        for n, (brand, payment) in enumerate([
+            ("Toyota", 299), ("Toyota", 410.5), ("Toyota", None),
+            ("Honda", 350), ("Honda", 520), ("Kia", 199)
+        ]):
+            ids.append(await create_deal(db, {
+                "brand": brand,
+                "model": "Model",
+                "calculated_payment": payment,
+                "created_at": DAY + timedelta(days=n % 2, hours=n)
+            }))
+
+        # The old maximum and minimum move, a missing payment gets one
+        await update_calculated_fields(db, ids[1], {"calculated_payment": 275})
+        await update_calculated_fields(db, ids[3], {"calculated_payment": 610})
+        await update_calculated_fields(db, ids[2], {"calculated_payment": 330})
+
+        # A bucket emptied entirely, and one whose maximum goes away
+        await delete_deal(db, ids[5])
+        await delete_deal(db, ids[2])
+
+        await _log(db, "Toyota", DAY + timedelta(hours=3))
+        await _log(db, "Toyota", DAY + timedelta(hours=5))
+        await _log(db, "Lexus", DAY + timedelta(days=1))
+        await _log(db, "Honda", DAY, kind=BRAND_SYNC_LOG_KIND, changes={})
+
+        incremental = await _rollup_rows(db)
+        await backfill_analytics_rollup(db)
+        return incremental, await _rollup_rows(db)
+
+    incremental, rebuilt = asyncio.run(scenario())
+
+    assert incremental == rebuilt
+    toyota = rebuilt["2026-03-02|Toyota"]
+    assert toyota["changes"] == 2
+    assert (toyota["deals"], toyota["payment_min"], toyota["payment_max"]) == (1, 299, 299)
+    assert "2026-03-03|Kia" not in rebuilt
@@ -0,0 +1,104 @@
+"""
+Unit tests for the cache backend
+
+LRU/TTL/byte-budget eviction, single-flight loads and the shared SQLite tier
+"""
+import sys
+sys.path.append('/app/backend')
+
+import asyncio
+import time
+
+from cache_backend import MISSING, MemoryCache, SQLiteCacheTier, TieredCache, estimate_size
+
+
+def test_lru_eviction_by_entries_and_bytes():
+    """Least recently used entries go first, within both limits"""
+    cache = MemoryCache(max_entries=3)
+    for key in "abc":
+        cache.set(key, key, ttl=60)
+    cache.get("a")
+    cache.set("d", "d", ttl=60)
+
+    assert cache.get("b") is MISSING
+    assert [cache.get(key) for key in "acd"] == ["a", "c", "d"]
+    assert cache.evictions == 1
+
+    value = "x" * 1000
+    budget = MemoryCache(max_bytes=estimate_size(value) * 2)
+    for key in "abc":
+        budget.set(key, value, ttl=60)
+    assert len(budget) == 2 and budget.get("a") is MISSING
+    assert not budget.set("huge", "y" * 10000, ttl=60)
+
+
+def test_expired_entries_are_dropped_on_write():
+    """Expired entries do not wait to be read again"""
+    cache = MemoryCache()
+    for i in range(50):
+        cache.set(f"old-{i}", i, ttl=0.01)
+    time.sleep(0.02)
+    cache.set("fresh", 1, ttl=60)
+
+    assert len(cache) == 1
+    assert cache.expirations == 50
+    assert cache.get_stats()["bytes"] == estimate_size(1)
+
+
+def test_single_flight_loads_once():
+    """Concurrent misses share one loader call"""
+    cache = TieredCache(MemoryCache())
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"value": len(calls)}
+
+    async def main():
+        results = await asyncio.gather(*[cache.get_or_set("k", loader, ttl=60) for _ in range(20)])
+        return results, await cache.get_or_set("k", loader, ttl=60)
+
+    results, again = asyncio.run(main())
+
+    assert len(calls) == 1
+    assert all(r == {"value": 1} for r in results) and again == {"value": 1}
+    assert cache.get_stats()["coalesced"] == 19
+
+
+def test_shared_tier_between_caches(tmp_path):
+    """Two workers' caches see each other's entries and deletes"""
+    path = str(tmp_path / "cache.db")
+    first = TieredCache(MemoryCache(), SQLiteCacheTier(path), local_ttl=0.05)
+    second = TieredCache(MemoryCache(), SQLiteCacheTier(path), local_ttl=0.05)
+
+    first.set("deal:1", {"payment": 399}, ttl=60)
+    assert second.get("deal:1") == {"payment": 399}
+
+    first.delete("deal:1")
+    time.sleep(0.06)
+    assert second.get("deal:1") is None
+
+
+def test_shared_tier_busy_falls_back(tmp_path):
+    """Another worker holding the write lock: skipped write and clear, no exception"""
+    import sqlite3
+
+    path = str(tmp_path / "cache.db")
+    cache = TieredCache(MemoryCache(), SQLiteCacheTier(path), local_ttl=0.05)
+    cache.set("deal:1", {"payment": 399}, ttl=60)
+
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN EXCLUSIVE")
+    try:
+        started = time.perf_counter()
+        assert not cache.shared.set("deal:2", {"payment": 420}, 60)
+        assert cache.clear() is False
+        assert time.perf_counter() - started < 0.5
+    finally:
+        blocker.execute("COMMIT")
+        blocker.close()
+
+    assert cache.shared.get_stats()["busy"] == 2
+    assert cache.clear() is True
+    assert cache.get("deal:1") is None
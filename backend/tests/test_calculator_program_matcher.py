@@ -0,0 +1,92 @@
+"""
+Unit tests for the calculator program matcher
+
+Checks the in-memory match rules used for lot calculator configs
+"""
+import sys
+sys.path.append('/app/backend')
+
+from datetime import datetime, timezone, timedelta
+
+from calculator_program_matcher import CalculatorProgramMatcher
+
+
+NOW = datetime(2025, 6, 1, tzinfo=timezone.utc)
+
+
+def _program(**overrides):
+    data = {
+        "id": "p1",
+        "brand": "Toyota",
+        "model_pattern": "",
+        "trim_pattern": "",
+        "year_from": 2024,
+        "year_to": 2026,
+        "states": ["ALL"],
+        "is_active": True,
+        "program_start": datetime(2025, 1, 1),
+        "program_end": datetime(2025, 12, 31),
+    }
+    data.update(overrides)
+    return data
+
+
+def _matcher(lease_programs, tax_configs=()):
+    matcher = CalculatorProgramMatcher()
+    matcher.set_programs(list(lease_programs), [], list(tax_configs))
+    return matcher
+
+
+LOT = {"id": "lot1", "make": "toyota", "model": "Camry", "trim": "XSE", "year": 2025, "state": "CA", "zip": "90210"}
+
+
+def test_most_specific_program_wins():
+    """Model pattern +10, trim pattern +5, first program wins ties"""
+    matcher = _matcher([
+        _program(id="generic"),
+        _program(id="camry", model_pattern="^cam"),
+        _program(id="camry-xse", model_pattern="camry", trim_pattern="XS"),
+        _program(id="camry-xse-2", model_pattern="camry", trim_pattern="XSE"),
+    ])
+
+    lease, _, _ = matcher.resolve(LOT, now=NOW)
+
+    assert lease["id"] == "camry-xse"
+
+
+def test_filters_reject_program():
+    """Year, state, window and model pattern all gate a match"""
+    for overrides in [
+        {"year_to": 2024},
+        {"states": ["NY"]},
+        {"program_end": NOW - timedelta(days=1)},
+        {"model_pattern": "rav4"},
+        {"model_pattern": "("},
+        {"brand": "Lexus"},
+    ]:
+        lease, _, _ = _matcher([_program(**overrides)]).resolve(LOT, now=NOW)
+        assert lease is None, overrides
+
+
+def test_tax_config_prefers_zip_prefix():
+    """Zip-prefix config first, then the state-wide one"""
+    statewide = {"id": "ca", "state": "CA", "zip_prefixes": []}
+    la = {"id": "la", "state": "CA", "zip_prefixes": ["90", "91"]}
+    matcher = _matcher([], [statewide, la])
+
+    assert matcher.resolve(LOT, now=NOW)[2]["id"] == "la"
+    assert matcher.resolve({**LOT, "zip": "95014"}, now=NOW)[2]["id"] == "ca"
+
+
+def test_resolution_cache_expires_at_program_window():
+    """Cached results are dropped once a program window opens or closes"""
+    matcher = _matcher([
+        _program(id="current"),
+        _program(id="upcoming", model_pattern="camry", program_start=datetime(2025, 7, 1)),
+    ])
+
+    assert matcher.resolve(LOT, now=NOW)[0]["id"] == "current"
+    assert matcher.resolve(LOT, now=NOW)[0]["id"] == "current"
+    assert matcher.stats["cache_hits"] == 1
+    assert matcher.resolve(LOT, now=datetime(2025, 7, 2, tzinfo=timezone.utc))[0]["id"] == "upcoming"
+    assert matcher.resolve(LOT, now=datetime(2026, 1, 2, tzinfo=timezone.utc))[0] is None
@@ -0,0 +1,86 @@
+"""
+Unit tests for the DB tracer's query classification
+
+Unanchored regex detection, value-independent query shapes and COLLSCAN
+detection in explain plans
+"""
+import sys
+sys.path.append('/app/backend')
+
+import re
+
+import bson
+import pytest
+
+from db_tracer import _has_unanchored_regex, _plan_has_collscan, query_shape
+
+
+@pytest.mark.parametrize("criteria, unanchored", [
+    ({"brand": {"$regex": "^Toyota$", "$options": "i"}}, False),
+    ({"brand": {"$regex": "Toyota", "$options": "i"}}, True),
+    ({"brand": {"$regex": bson.regex.Regex("^Toy")}}, False),
+    ({"brand": {"$regex": bson.regex.Regex("oyota", "i")}}, True),
+    ({"brand": bson.regex.Regex("^Toy")}, False),
+    ({"brand": bson.regex.Regex("oyota")}, True),
+    ({"brand": re.compile("camry$")}, True),
+    ({"$or": [{"brand": "Kia"}, {"model": {"$regex": "sport"}}]}, True),
+    ([{"$match": {"region": {"$regex": "^Cal"}}}, {"$limit": 5}], False),
+    ([{"$match": {"region": {"$regex": "west"}}}], True),
+    ({"brand": "Toyota", "payment": {"$lte": 400}}, False),
+])
+def test_unanchored_regex(criteria, unanchored):
+    assert _has_unanchored_regex(criteria) is unanchored
+
+
+@pytest.mark.parametrize("command_name, first, second", [
+    ("find",
+     {"find": "featured_deals", "filter": {"brand": "Toyota", "payment": {"$lte": 400}}, "sort": {"created_at": -1}},
+     {"find": "featured_deals", "filter": {"brand": "Kia", "payment": {"$lte": 250}}, "sort": {"created_at": -1}}),
+    ("find",
+     {"find": "cars", "filter": {"id": {"$in": ["a", "b"]}}},
+     {"find": "cars", "filter": {"id": {"$in": ["c"]}}}),
+    ("aggregate",
+     {"aggregate": "featured_deals", "pipeline": [{"$match": {"brand": "Honda"}}, {"$limit": 10}]},
+     {"aggregate": "featured_deals", "pipeline": [{"$match": {"brand": "BMW"}}, {"$limit": 50}]}),
+    ("update",
+     {"update": "featured_deals", "updates": [{"q": {"id": "deal-1"}, "u": {"$set": {"payment": 399}}}]},
+     {"update": "featured_deals", "updates": [{"q": {"id": "deal-2"}, "u": {"$set": {"payment": 410}}}]}),
+])
+def test_query_shape_ignores_values(command_name, first, second):
+    collection, shape = query_shape(command_name, first)
+    assert (collection, shape) == query_shape(command_name, second)
+    assert collection == first[command_name]
+    for value in ("Toyota", "Honda", "deal-1", "400", "399"):
+        assert value not in shape
+
+
+def test_query_shape_keeps_fields_operators_and_sort():
+    base = {"find": "featured_deals", "filter": {"brand": "Toyota"}}
+    shapes = {
+        query_shape("find", base)[1],
+        query_shape("find", {**base, "filter": {"model": "Toyota"}})[1],
+        query_shape("find", {**base, "filter": {"brand": {"$ne": "Toyota"}}})[1],
+        query_shape("find", {**base, "sort": {"created_at": -1}})[1],
+    }
+    assert len(shapes) == 4
+    assert query_shape("update", {"update": "cars", "updates": [{"q": {"id": 1}}]})[1] != \
+        query_shape("delete", {"delete": "cars", "deletes": [{"q": {"id": 1}}]})[1]
+
+
+IXSCAN = {"stage": "IXSCAN", "indexName": "brand_1"}
+COLLSCAN = {"stage": "COLLSCAN", "direction": "forward"}
+
+
+@pytest.mark.parametrize("plan, collscan", [
+    ({"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": IXSCAN}}}, False),
+    ({"queryPlanner": {"winningPlan": {"stage": "SORT", "inputStage": {"stage": "FETCH", "inputStage": COLLSCAN}}}}, True),
+    ({"queryPlanner": {"winningPlan": {"stage": "OR", "inputStages": [IXSCAN, COLLSCAN]}}}, True),
+    ({"queryPlanner": {
+        "winningPlan": {"stage": "FETCH", "inputStage": IXSCAN},
+        "rejectedPlans": [COLLSCAN, {"stage": "SORT", "inputStage": COLLSCAN}]
+    }}, False),
+    # Aggregations explain per stage
+    ({"stages": [{"$cursor": {"queryPlanner": {"winningPlan": COLLSCAN}}}, {"$group": {}}]}, True),
+])
+def test_plan_collscan(plan, collscan):
+    assert _plan_has_collscan(plan) is collscan
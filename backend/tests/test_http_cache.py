@@ -0,0 +1,42 @@
+"""
+Unit tests for HTTP response caching helpers
+"""
+import sys
+sys.path.append('/app/backend')
+
+from http_cache import ENCODINGS, choose_encoding, get_cache_policy, if_none_match
+
+
+def test_if_none_match_weak_comparison():
+    """Weak and strong forms of the same tag match; lists and * work"""
+    etag = 'W/"abc"'
+    assert if_none_match('W/"abc"', etag)
+    assert if_none_match('"abc"', etag)
+    assert if_none_match('"x", W/"abc"', etag)
+    assert if_none_match('*', etag)
+    assert not if_none_match('"abcd"', etag)
+    assert not if_none_match(None, etag)
+
+
+def test_choose_encoding():
+    """Best supported encoding wins; q=0 refuses one"""
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("identity") is None
+    assert choose_encoding("br;q=0, gzip") == "gzip"
+    assert choose_encoding("br, gzip") == ENCODINGS[0]
+
+
+def test_choose_encoding_restricted():
+    """Pre-gzipped bodies: gzip only when gzip itself (or *) is accepted"""
+    assert choose_encoding("br, gzip", ("gzip",)) == "gzip"
+    assert choose_encoding("gzip;q=0", ("gzip",)) is None
+    assert choose_encoding("br, gzip;q=0", ("gzip",)) is None
+    assert choose_encoding("*", ("gzip",)) == "gzip"
+    assert choose_encoding("br", ("gzip",)) is None
+
+
+def test_cache_policies_cover_public_reads_only():
+    assert get_cache_policy("GET", "/api/deals/abc")
+    assert get_cache_policy("GET", "/api/lease/brands-models")
+    assert get_cache_policy("DELETE", "/api/deals/abc") is None
+    assert get_cache_policy("GET", "/api/admin/deals") is None
@@ -0,0 +1,97 @@
+"""
+Unit tests for the batch lease calculator
+
+Checks that vectorized results match calculate_lease_pro exactly
+"""
+import sys
+sys.path.append('/app/backend')
+
+from models_lease_programs import LeaseCalculationRequest
+from lease_calculator_pro import calculate_lease_pro
+from lease_calculator_batch import (
+    RESULT_FIELDS,
+    calculate_lease_batch,
+    calculate_lease_grid,
+    batch_row_to_result
+)
+
+
+SAMPLE_PROGRAM = {
+    "id": "test-program",
+    "brand": "Toyota",
+    "model": "Camry",
+    "region": "California",
+    "mf": {"24": 0.00021, "36": 0.00032, "39": 0.00035},
+    "residual": {
+        "24": {"10000": 68, "12000": 67, "15000": 65},
+        "36": {"7500": 76, "10000": 75, "12000": 74, "15000": 72},
+        "39": {"10000": 73, "12000": 72},
+    },
+    "incentives": {"lease_cash": 500, "loyalty": 1000},
+}
+
+
+def _request(**overrides):
+    data = {
+        "brand": "Toyota",
+        "model": "Camry",
+        "region": "California",
+        "msrp": 32450.0,
+        "selling_price": 30100.0,
+        "term_months": 36,
+        "annual_mileage": 10000,
+    }
+    data.update(overrides)
+    return LeaseCalculationRequest(**data)
+
+
+def test_batch_matches_scalar():
+    """Every batch row equals the scalar result bit-for-bit"""
+    requests = [
+        _request(),
+        _request(term_months=24, annual_mileage=12000, down_payment=2000),
+        _request(term_months=39, annual_mileage=11000, drive_off_mode="zero"),
+        _request(override_mf=0.0001, override_residual_percent=60, tax_rate=0.1025),
+        _request(apply_incentives=False, other_fees=125.5),
+        _request(manual_incentives={"conquest": 750.0}),
+    ]
+
+    batch = calculate_lease_batch(requests, SAMPLE_PROGRAM)
+
+    assert batch["valid"].all()
+    for i, request in enumerate(requests):
+        expected = calculate_lease_pro(request, SAMPLE_PROGRAM).dict()
+        actual = batch_row_to_result(request, batch, i)
+        for field in RESULT_FIELDS:
+            assert actual[field] == expected[field], field
+        assert set(actual) == set(expected)
+
+
+def test_batch_reports_missing_terms():
+    """Rows without MF/residual are flagged instead of raising"""
+    requests = [_request(), _request(term_months=48)]
+
+    batch = calculate_lease_batch(requests, [SAMPLE_PROGRAM, SAMPLE_PROGRAM])
+
+    assert batch["valid"].tolist() == [True, False]
+    assert "money factor for term 48" in batch["errors"][1]
+
+
+def test_grid_matches_scalar():
+    """Grid cells equal the scalar result for the same scenario"""
+    terms = [24, 36, 39]
+    mileages = [10000, 12000, 15000]
+    downs = [0.0, 1500.0, 3000.0]
+
+    grid = calculate_lease_grid(_request(), SAMPLE_PROGRAM, terms, mileages, downs)
+
+    assert grid["monthly_payment_with_tax"].shape == (3, 3, 3)
+    for i, term in enumerate(terms):
+        for j, mileage in enumerate(mileages):
+            for k, down in enumerate(downs):
+                request = _request(term_months=term, annual_mileage=mileage, down_payment=down)
+                expected = calculate_lease_pro(request, SAMPLE_PROGRAM)
+                assert grid["valid"][i, j, k]
+                assert grid["monthly_payment_with_tax"][i, j, k] == expected.monthly_payment_with_tax
+                assert grid["estimated_drive_off"][i, j, k] == expected.estimated_drive_off
+                assert grid["estimated_savings_vs_msrp_deal"][i, j, k] == expected.estimated_savings_vs_msrp_deal
@@ -0,0 +1,36 @@
+"""
+Unit tests for the event loop watchdog
+
+A synchronous sleep inside a coroutine is reported with its location
+and duration; short stalls under the threshold are not
+"""
+import asyncio
+import sys
+import time
+sys.path.append('/app/backend')
+
+from loop_watchdog import LoopWatchdog
+
+
+def test_blocking_call_is_attributed():
+    """The stall is recorded at the line that blocked"""
+    async def scenario():
+        watchdog = LoopWatchdog(threshold_ms=100)
+        watchdog.start()
+        await asyncio.sleep(0.1)
+        time.sleep(0.05)
+        await asyncio.sleep(0.1)
+        time.sleep(0.3)
+        await asyncio.sleep(0.2)
+        await watchdog.stop()
+        return watchdog.get_report()
+
+    report = asyncio.run(scenario())
+
+    assert report["running"] is False
+    assert report["stalls"] == 1
+    offender = report["offenders"][0]
+    assert "in scenario" in offender["location"]
+    assert offender["count"] == 1
+    assert 200 < offender["max_ms"] < 1000
+    assert offender["stack"][-1].endswith("time.sleep(0.3)")
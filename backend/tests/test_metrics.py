@@ -0,0 +1,55 @@
+"""
+Unit tests for request metrics
+
+Histogram buckets and quantiles, merging worker snapshots and the
+Prometheus text output
+"""
+import sys
+sys.path.append('/app/backend')
+
+from metrics import Histogram, MetricsRegistry
+
+
+def test_histogram_buckets_and_quantiles():
+    """Observations land in the first bucket whose bound is >= the value"""
+    histogram = Histogram((0.1, 0.5, 1.0))
+    for value in (0.05, 0.1, 0.3, 0.7, 2.0):
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 1, 1, 1]
+    assert histogram.count == 5 and round(histogram.sum, 2) == 3.15
+    assert 0.1 < histogram.quantile(0.5) <= 0.5
+    assert histogram.quantile(0.99) == 1.0
+    assert Histogram().quantile(0.5) is None
+
+
+def test_worker_snapshots_merge():
+    """Merged snapshots equal one registry that saw every observation"""
+    first, second, combined = MetricsRegistry(), MetricsRegistry(), MetricsRegistry()
+    labels = {"route": "/api/deals/list", "method": "GET", "status": 200}
+    for registry, values in ((first, (0.004, 0.03)), (second, (0.2, 3.0))):
+        for value in values:
+            registry.observe("latency", value, labels)
+            registry.inc("requests", labels)
+            combined.observe("latency", value, labels)
+            combined.inc("requests", labels)
+
+    merged = MetricsRegistry.from_snapshots([first.snapshot(), second.snapshot()])
+
+    assert merged.render() == combined.render()
+
+
+def test_prometheus_text():
+    """Cumulative buckets with +Inf, _sum/_count and escaped labels"""
+    registry = MetricsRegistry()
+    registry.describe("latency", "Request latency")
+    registry.observe("latency", 0.3, {"route": '/a"b'}, buckets=(0.1, 0.5))
+
+    lines = registry.render({"cache_hit_ratio": [({"cache": "deals"}, 0.75)]}).splitlines()
+
+    assert lines[:2] == ["# HELP latency Request latency", "# TYPE latency histogram"]
+    assert 'latency_bucket{route="/a\\"b",le="0.1"} 0' in lines
+    assert 'latency_bucket{route="/a\\"b",le="0.5"} 1' in lines
+    assert 'latency_bucket{route="/a\\"b",le="+Inf"} 1' in lines
+    assert 'latency_count{route="/a\\"b"} 1' in lines
+    assert 'cache_hit_ratio{cache="deals"} 0.75' in lines
@@ -0,0 +1,168 @@
+"""
+Unit tests for AppMiddleware
+
+Conditional GET, compression, error mapping, streaming pass-through, the
+health short-circuit and rate limit responses, against a small app
+"""
+import sys
+sys.path.append('/app/backend')
+
+import asyncio
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+import middleware
+from config import RATE_LIMITS
+from http_cache import BROTLI_AVAILABLE
+from middleware import AppMiddleware
+from rate_limiter import MemoryRateLimitBackend, RateLimiter
+
+# Over the 1 KB compression threshold
+DEALS = [{"id": f"deal-{i}", "brand": "Toyota", "model": "Camry", "payment": 300 + i} for i in range(100)]
+ROUTE_ETAG = 'W/"deal-1-v3"'
+
+
+def _app(rate_limit=False):
+    app = FastAPI()
+
+    @app.get("/api/deals/list")
+    async def deals_list():
+        return {"deals": DEALS}
+
+    @app.get("/api/deals/{deal_id}")
+    async def deal(deal_id: str):
+        return JSONResponse({"id": deal_id}, headers={"ETag": ROUTE_ETAG})
+
+    @app.get("/api/boom")
+    async def boom():
+        raise RuntimeError("kaboom")
+
+    @app.get("/api/stream")
+    async def stream():
+        async def chunks():
+            for n in range(3):
+                yield f"chunk {n}\n".encode()
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    app.add_middleware(AppMiddleware, rate_limit=rate_limit)
+    return app
+
+
+def _asgi_get(app, path, headers=()):
+    """Raw ASGI GET: the messages the server would receive"""
+    messages = []
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers],
+        "client": ("127.0.0.1", 5000), "server": ("testserver", 80)
+    }
+
+    received = []
+
+    async def receive():
+        if received:
+            # Client stays connected (StreamingResponse listens for a disconnect)
+            await asyncio.Event().wait()
+        received.append(True)
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return messages
+
+
+def test_body_etag_not_modified():
+    """Public reads get a body ETag; a matching If-None-Match is a bodiless 304"""
+    client = TestClient(_app())
+    first = client.get("/api/deals/list")
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and etag
+
+    second = client.get("/api/deals/list", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+    assert second.headers["cache-control"].startswith("public")
+
+
+def test_route_etag_not_modified():
+    """A route's own ETag is honoured without buffering the body"""
+    client = TestClient(_app())
+    assert client.get("/api/deals/deal-1").headers["etag"] == ROUTE_ETAG
+
+    response = client.get("/api/deals/deal-1", headers={"If-None-Match": ROUTE_ETAG})
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_compression_selection():
+    """Best accepted encoding, Vary and Content-Length of the encoded body"""
+    app = _app()
+    for accept, expected in (("gzip", "gzip"), ("br, gzip", "br" if BROTLI_AVAILABLE else "gzip"), ("identity", None)):
+        messages = _asgi_get(app, "/api/deals/list", [("Accept-Encoding", accept)])
+        headers = {k.decode(): v.decode() for k, v in messages[0]["headers"]}
+        body = b"".join(m.get("body", b"") for m in messages[1:])
+
+        assert headers.get("content-encoding") == expected, accept
+        assert "Accept-Encoding" in headers["vary"]
+        assert int(headers["content-length"]) == len(body)
+        if expected == "gzip":
+            assert b"deal-99" in gzip.decompress(body)
+
+
+def test_unhandled_error_is_500_no_store():
+    client = TestClient(_app())
+    response = client.get("/api/boom")
+
+    assert response.status_code == 500
+    assert response.json()["error"] == "Internal server error"
+    assert "no-store" in response.headers["cache-control"]
+    assert "etag" not in response.headers
+
+
+def test_streaming_passes_through():
+    """Streamed chunks are forwarded one by one, not buffered"""
+    messages = _asgi_get(_app(), "/api/stream", [("Accept-Encoding", "gzip")])
+    bodies = [m for m in messages if m["type"] == "http.response.body"]
+    headers = {k.decode(): v.decode() for k, v in messages[0]["headers"]}
+
+    assert [m["body"] for m in bodies if m["body"]] == [b"chunk 0\n", b"chunk 1\n", b"chunk 2\n"]
+    assert any(m.get("more_body") for m in bodies)
+    assert "content-encoding" not in headers and "etag" not in headers
+
+
+def test_health_short_circuit(monkeypatch):
+    """Liveness always answers; readiness is 503 until the first probe"""
+    monkeypatch.setattr(middleware.get_health_checker(), "last_result", None)
+    client = TestClient(_app())
+
+    live = client.get("/health")
+    assert live.status_code == 200 and live.json()["status"] == "healthy"
+
+    ready = client.get("/health/ready")
+    assert ready.status_code == 503
+    assert ready.json()["reason"] == "no probe yet"
+
+
+def test_rate_limited_request(monkeypatch):
+    """Over the path tier: 429 with X-RateLimit-* and Retry-After"""
+    tier = RateLimiter(MemoryRateLimitBackend()).policy_for_path("/api/deals/deal-1")
+    limiter = RateLimiter(MemoryRateLimitBackend(), {**RATE_LIMITS, tier: "2/minute"})
+    monkeypatch.setattr(middleware, "get_rate_limiter", lambda: limiter)
+    client = TestClient(_app(rate_limit=True))
+
+    allowed = client.get("/api/deals/deal-1")
+    assert allowed.status_code == 200
+    assert allowed.headers["x-ratelimit-limit"] == "2"
+    client.get("/api/deals/deal-1")
+
+    denied = client.get("/api/deals/deal-1")
+    assert denied.status_code == 429
+    assert denied.headers["x-ratelimit-remaining"] == "0"
+    assert int(denied.headers["retry-after"]) >= 1
@@ -0,0 +1,109 @@
+"""
+Unit tests for GET /api/lease/payment-matrix
+
+Every grid cell must equal calculate_lease_pro for that term, mileage and
+down payment; the ETag follows program edits and answers If-None-Match
+"""
+import sys
+sys.path.append('/app/backend')
+
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from fastapi.testclient import TestClient
+
+import server
+from db_lease_programs import update_parsed_program
+from lease_calculator_pro import calculate_lease_pro
+from models_lease_programs import LeaseCalculationRequest
+from program_registry import get_program_registry
+from rate_limiter import MemoryRateLimitBackend, get_rate_limiter
+
+PROGRAM = {
+    "id": "camry-2026-01",
+    "brand": "Toyota",
+    "model": "Camry",
+    "region": "California",
+    "mf": {"24": 0.00021, "36": 0.00032},
+    "residual": {
+        "24": {"10000": 68, "12000": 67},
+        "36": {"7500": 76, "12000": 74, "15000": 72},
+        "39": {"10000": 73}
+    },
+    "incentives": {"lease_cash": 500},
+    "created_at": datetime(2026, 1, 5, tzinfo=timezone.utc)
+}
+
+PARAMS = {
+    "brand": "Toyota", "model": "Camry", "region": "California",
+    "msrp": 32000, "selling_price": 30500, "down_payments": "0,2000", "tax_rate": 0.0925
+}
+
+
+@pytest.fixture
+def matrix(monkeypatch):
+    """(client, db) with one program and a fresh registry"""
+    db = mongomock_motor.AsyncMongoMockClient()["matrix_test"]
+    asyncio.run(db.lease_programs_parsed.insert_one(dict(PROGRAM)))
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(get_rate_limiter(), "backend", MemoryRateLimitBackend())
+    get_program_registry().invalidate()
+    return TestClient(server.app), db
+
+
+def test_grid_matches_calculator(matrix):
+    client, _ = matrix
+    response = client.get("/api/lease/payment-matrix", params=PARAMS)
+    assert response.status_code == 200
+    body = response.json()
+
+    assert body["terms"] == [24, 36, 39]
+    assert body["down_payments"] == [0, 2000]
+    checked = 0
+    for t, term in enumerate(body["terms"]):
+        for m, mileage in enumerate(body["mileages"]):
+            for d, down in enumerate(body["down_payments"]):
+                request = LeaseCalculationRequest(
+                    brand="Toyota", model="Camry", region="California",
+                    msrp=PARAMS["msrp"], selling_price=PARAMS["selling_price"],
+                    term_months=term, annual_mileage=mileage,
+                    down_payment=down, tax_rate=PARAMS["tax_rate"]
+                )
+                try:
+                    expected = calculate_lease_pro(request, dict(PROGRAM))
+                except ValueError:
+                    assert body["monthly_payment"][t][m][d] is None, (term, mileage, down)
+                    continue
+                assert body["monthly_payment"][t][m][d] == round(expected.monthly_payment_with_tax, 2), (term, mileage, down)
+                assert body["drive_off"][t][m][d] == round(expected.estimated_drive_off, 2)
+                checked += 1
+    assert checked >= 8
+
+
+def test_etag_conditional_get_and_program_edits(matrix):
+    client, db = matrix
+    first = client.get("/api/lease/payment-matrix", params=PARAMS)
+    etag = first.headers["etag"]
+
+    not_modified = client.get("/api/lease/payment-matrix", params=PARAMS, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+
+    # Same request, different parameters: different tag
+    other = client.get("/api/lease/payment-matrix", params={**PARAMS, "down_payments": "0"})
+    assert other.headers["etag"] != etag
+
+    # Rate edit (new fingerprint) and a fee-only edit (new updated_at)
+    seen = {etag}
+    for update in ({"mf": {"24": 0.00021, "36": 0.00029}}, {"acquisition_fee": 650}):
+        assert asyncio.run(update_parsed_program(db, PROGRAM["id"], update))
+        response = client.get("/api/lease/payment-matrix", params=PARAMS, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] not in seen
+        seen.add(response.headers["etag"])
+        etag = response.headers["etag"]
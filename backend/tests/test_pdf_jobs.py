@@ -0,0 +1,166 @@
+"""
+Unit tests for PDF import jobs
+
+The job state machine with the process pool replaced by threads and the
+extraction functions stubbed: direct text, OCR page order and progress,
+failures, a worker crash and cancellation
+"""
+import sys
+sys.path.append('/app/backend')
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pdf_jobs
+from pdf_jobs import PDFImportJobs
+
+PDF_BYTES = b'%PDF-1.4' + b' ' * 2048
+
+
+class _Collection:
+    """Just enough of a Motor collection for the job manager"""
+
+    def __init__(self):
+        self.docs = []
+
+    async def insert_one(self, doc):
+        self.docs.append(dict(doc))
+
+    async def find_one(self, query, projection=None):
+        for doc in self.docs:
+            if all(doc.get(k) == v for k, v in query.items()):
+                return dict(doc)
+        return None
+
+    async def update_one(self, query, update):
+        for doc in self.docs:
+            if all(doc.get(k) == v for k, v in query.items()):
+                doc.update(update["$set"])
+                return
+
+
+class _DB(dict):
+    def __missing__(self, name):
+        collection = self[name] = _Collection()
+        return collection
+
+    def __getattr__(self, name):
+        return self[name]
+
+
+def _run_job(monkeypatch, extract, ocr=None, executor=None):
+    monkeypatch.setattr(pdf_jobs, "extract_pdf_direct", extract)
+    if ocr:
+        monkeypatch.setattr(pdf_jobs, "ocr_pdf_page", ocr)
+    progress = []
+
+    async def record(job):
+        progress.append((job["status"], job["pages_done"]))
+
+    monkeypatch.setattr("websocket_manager.notify_pdf_job_progress", record, raising=False)
+
+    async def scenario():
+        db = _DB()
+        manager = PDFImportJobs()
+        manager._pool = executor or ThreadPoolExecutor(max_workers=3)
+        job = await manager.submit(db, PDF_BYTES, "program.pdf", "admin@example.com")
+        await asyncio.gather(*manager._tasks)
+        return db, await manager.get_job(db, job["id"])
+
+    db, job = asyncio.run(scenario())
+    return db, job, progress
+
+
+def test_direct_text_job_completes(monkeypatch):
+    """Text-based PDFs skip OCR and save the cleaned text"""
+    text = "Money factor 0.00125  Residual 58%\n" * 10
+    db, job, progress = _run_job(monkeypatch, lambda path: (text, 2))
+
+    assert job["status"] == "completed"
+    assert job["result"]["extraction_method"] == "direct"
+    assert job["result"]["page_count"] == 2
+    saved = db.raw_program_pdfs.docs[0]
+    assert saved["id"] == job["result"]["pdf_id"]
+    assert "Residual 58%" in saved["text"]
+    assert [status for status, _ in progress] == ["extracting", "saving", "completed"]
+
+
+def test_ocr_pages_keep_order_and_report_progress(monkeypatch):
+    """Pages finishing out of order are joined in page order"""
+    import time
+
+    def ocr(path, page_number):
+        time.sleep(0.05 * (4 - page_number))
+        return f"page {page_number} text"
+
+    db, job, progress = _run_job(monkeypatch, lambda path: ("", 3), ocr)
+
+    assert job["status"] == "completed"
+    assert job["result"]["extraction_method"] == "ocr"
+    text = db.raw_program_pdfs.docs[0]["text"]
+    assert text.index("page 1") < text.index("page 2") < text.index("page 3")
+    assert [done for status, done in progress if status == "ocr"] == [0, 1, 2, 3]
+
+
+def test_extraction_error_fails_job(monkeypatch):
+    """An extraction error ends the job as failed with the reason"""
+    def extract(path):
+        raise ValueError("corrupt xref table")
+
+    db, job, _ = _run_job(monkeypatch, extract)
+
+    assert job["status"] == "failed"
+    assert "corrupt xref table" in job["error"]
+    assert not db.raw_program_pdfs.docs
+
+
+def test_broken_pool_is_replaced(monkeypatch):
+    """A crashed worker process does not break later imports"""
+    class _BrokenPool:
+        def submit(self, *args, **kwargs):
+            raise BrokenProcessPool("worker died")
+
+        def shutdown(self, wait=True, cancel_futures=False):
+            pass
+
+    created = []
+
+    def fresh_pool(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=1)
+            created.append(self._pool)
+        return self._pool
+
+    monkeypatch.setattr(PDFImportJobs, "pool", property(fresh_pool))
+    text = "Lease program text " * 10
+    _, job, _ = _run_job(monkeypatch, lambda path: (text, 1), executor=_BrokenPool())
+
+    assert job["status"] == "completed"
+    assert len(created) == 1
+
+
+def test_cancelled_job_is_marked_failed(monkeypatch):
+    """Shutting down mid-extraction leaves no job stuck as active"""
+    import threading
+    release = threading.Event()
+
+    def extract(path):
+        release.wait(5)
+        return "", 1
+
+    monkeypatch.setattr(pdf_jobs, "extract_pdf_direct", extract)
+
+    async def scenario():
+        db = _DB()
+        manager = PDFImportJobs()
+        manager._pool = ThreadPoolExecutor(max_workers=1)
+        job = await manager.submit(db, PDF_BYTES, "program.pdf", "admin@example.com")
+        await asyncio.sleep(0.05)
+        await manager.shutdown()
+        release.set()
+        return await manager.get_job(db, job["id"])
+
+    job = asyncio.run(scenario())
+    assert job["status"] == "failed"
+    assert "interrupted" in job["error"]
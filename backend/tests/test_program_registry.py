@@ -0,0 +1,147 @@
+"""
+Unit tests for the lease program registry
+
+The compiled registry must resolve the same program as
+get_latest_parsed_program_for and the same MF/residual as
+calculate_lease_pro, and a write racing a load must not mark it fresh
+"""
+import sys
+sys.path.append('/app/backend')
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from db_lease_programs import get_latest_parsed_program_for, update_parsed_program
+from lease_calculator_pro import calculate_lease_pro
+from models_lease_programs import LeaseCalculationRequest
+from program_registry import get_program_registry
+
+START = datetime(2026, 1, 5, tzinfo=timezone.utc)
+
+PROGRAMS = [
+    # Older California Camry program, superseded below
+    {"id": "camry-ca-old", "brand": "Toyota", "model": "Camry", "region": "California",
+     "mf": {"36": 0.0011}, "residual": {"36": {"10000": 60, "12000": 59}}},
+    {"id": "camry-ca", "brand": "toyota", "model": "CAMRY", "region": "Southern California",
+     "mf": {"24": 0.0010, "36": 0.00125, "39": 0.0013},
+     "residual": {"24": {"10000": 66, "12000": 65}, "36": {"7500": 61, "12000": 58, "15000": 56}}},
+    {"id": "camry-west", "brand": "Toyota", "model": "Camry", "region": "Western Region",
+     "mf": {"36": 0.0014}, "residual": {"36": {"10000": 57}}},
+    # One MF for every term; residuals missing for 42
+    {"id": "rav4-ca", "brand": "Toyota", "model": "RAV4", "region": "California",
+     "mf": {"36": 0.0019}, "residual": {"36": {"12000": 62, "15000": 60}, "39": {"10000": 61}}},
+    {"id": "civic", "brand": "Honda", "model": "Civic", "region": None,
+     "mf": {"36": 0.0021, "48": "n/a"}, "residual": {"36": {"12000": 58}}},
+]
+
+LOOKUPS = [
+    ("Toyota", "Camry", "California"),
+    ("TOYOTA", "camry", "southern"),
+    ("Toyota", "Camry", "west"),
+    ("Toyota", "Camry", None),
+    ("Toyota", None, "california"),
+    ("Toyota", "RAV4", "Calif"),
+    ("Toyota", "Corolla", None),
+    ("Honda", "Civic", None),
+    ("Honda", "Civic", "California"),
+    ("Kia", None, None),
+]
+
+
+async def _seed():
+    db = mongomock_motor.AsyncMongoMockClient()["registry_test"]
+    for n, program in enumerate(PROGRAMS):
+        await db.lease_programs_parsed.insert_one({**program, "created_at": START + timedelta(days=n)})
+    registry = get_program_registry()
+    registry.invalidate()
+    return db, registry
+
+
+def _calculator_pick(program, term, mileage):
+    request = LeaseCalculationRequest(
+        brand=program["brand"], msrp=35000, selling_price=33000,
+        term_months=term, annual_mileage=mileage
+    )
+    try:
+        result = calculate_lease_pro(request, program)
+    except ValueError:
+        return None
+    return result.mf_used, result.residual_percent_used
+
+
+def test_registry_matches_query_and_calculator():
+    async def scenario():
+        db, registry = await _seed()
+        checked = 0
+        for brand, model, region in LOOKUPS:
+            expected = await get_latest_parsed_program_for(db, brand, model, region)
+            compiled = await registry.get_compiled(db, brand, model, region)
+            assert (compiled.program["id"] if compiled else None) == (expected["id"] if expected else None), (brand, model, region)
+            if compiled is None:
+                continue
+
+            for term in (24, 36, 39, 42, 48):
+                for mileage in (7500, 10000, 11000, 12000, 15000):
+                    mf, residual = compiled.pick_mf(term), compiled.pick_residual(term, mileage)
+                    picked = (mf, residual) if mf is not None and residual is not None else None
+                    assert picked == _calculator_pick(expected, term, mileage), (expected["id"], term, mileage)
+                    checked += 1
+        return checked
+
+    assert asyncio.run(scenario()) > 100
+
+
+class _SlowCollection:
+    """Collection whose find() result arrives only once released"""
+
+    def __init__(self, collection, release):
+        self.collection = collection
+        self.release = release
+
+    def find(self, *args, **kwargs):
+        cursor = self.collection.find(*args, **kwargs)
+        release = self.release
+
+        class _Cursor:
+            async def to_list(self, length=None):
+                rows = await cursor.to_list(length=length)
+                await release.wait()
+                return rows
+
+        return _Cursor()
+
+
+class _SlowDB:
+    def __init__(self, db, release):
+        self.lease_programs_parsed = _SlowCollection(db.lease_programs_parsed, release)
+
+
+@pytest.mark.parametrize("write", ["update", "invalidate"])
+def test_write_during_load_leaves_registry_stale(write):
+    async def scenario():
+        db, registry = await _seed()
+        release = asyncio.Event()
+
+        load = asyncio.create_task(registry.ensure_loaded(_SlowDB(db, release)))
+        await asyncio.sleep(0.01)
+        if write == "update":
+            assert await update_parsed_program(db, "camry-west", {"mf": {"36": 0.0009}})
+        else:
+            registry.invalidate()
+        release.set()
+        await load
+
+        fresh_after_race = registry._is_fresh()
+        compiled = await registry.get_compiled(db, "Toyota", "Camry", "west")
+        return fresh_after_race, compiled, registry._is_fresh()
+
+    fresh_after_race, compiled, fresh_after_reload = asyncio.run(scenario())
+
+    assert not fresh_after_race
+    assert fresh_after_reload
+    if write == "update":
+        assert compiled.pick_mf(36) == 0.0009
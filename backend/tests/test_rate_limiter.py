@@ -0,0 +1,101 @@
+"""
+Unit tests for the GCRA rate limiter
+
+Burst and steady-rate behaviour, penalties, and the shared-memory backend
+"""
+import sys
+sys.path.append('/app/backend')
+
+import asyncio
+import time
+
+from starlette.requests import Request
+
+from rate_limiter import (
+    MemoryRateLimitBackend,
+    RateLimiter,
+    RateLimitPolicy,
+    SharedMemoryRateLimitBackend,
+    gcra_step,
+    get_client_ip
+)
+
+
+def _hits(limiter, policy, identifier, count):
+    async def main():
+        return [await limiter.hit(policy, identifier) for _ in range(count)]
+    return asyncio.run(main())
+
+
+def test_burst_then_steady_rate():
+    """limit requests pass at once, then one per emission interval"""
+    limiter = RateLimiter(MemoryRateLimitBackend(), {"test": "5/second"})
+    results = _hits(limiter, "test", "client", 7)
+
+    assert [r.allowed for r in results] == [True] * 5 + [False] * 2
+    assert [r.remaining for r in results[:5]] == [4, 3, 2, 1, 0]
+    assert "Retry-After" in results[-1].headers()
+    assert "Retry-After" not in results[0].headers()
+
+    time.sleep(0.21)
+    assert [r.allowed for r in _hits(limiter, "test", "client", 2)] == [True, False]
+    assert _hits(limiter, "test", "other", 1)[0].allowed
+
+
+def test_penalty_blocks_after_limit():
+    """Exceeding a penalized tier blocks the client for the penalty"""
+    limiter = RateLimiter(MemoryRateLimitBackend(), {"test": "3/minute"})
+    limiter.policies["test"].penalty = 300
+    results = _hits(limiter, "test", "client", 5)
+
+    assert [r.allowed for r in results] == [True, True, True, False, False]
+    assert results[3].retry_after >= 299
+
+
+def test_full_burst_allowed_at_100_per_minute():
+    """Float emission intervals do not cost the last request of a burst"""
+    limiter = RateLimiter(MemoryRateLimitBackend(), {"test": "100/minute"})
+    results = _hits(limiter, "test", "client", 101)
+
+    assert [r.allowed for r in results] == [True] * 100 + [False]
+
+
+def test_full_burst_restored_after_penalty():
+    """Once the block ends the client starts over with its whole burst"""
+    policy = RateLimitPolicy("api", 100, 60, 300)
+    tat, now = None, 1000.0
+    for _ in range(101):
+        allowed, tat = gcra_step(tat, now, policy)
+    assert not allowed
+
+    allowed, still_blocked = gcra_step(tat, now + 299, policy)
+    assert not allowed and still_blocked == tat
+
+    now += 300.5
+    decisions = []
+    for i in range(100):
+        allowed, tat = gcra_step(tat, now + i * 0.1, policy)
+        decisions.append(allowed)
+    assert all(decisions)
+
+
+def _request(peer, forwarded_for=None):
+    headers = [(b"x-forwarded-for", forwarded_for.encode())] if forwarded_for else []
+    return Request({"type": "http", "headers": headers, "client": (peer, 50000)})
+
+
+def test_client_ip_ignores_untrusted_forwarded_for():
+    """Only a trusted proxy's X-Forwarded-For picks the rate limit key"""
+    assert get_client_ip(_request("203.0.113.7", "198.51.100.1")) == "203.0.113.7"
+    assert get_client_ip(_request("10.0.0.2", "198.51.100.1, 203.0.113.7")) == "203.0.113.7"
+    assert get_client_ip(_request("10.0.0.2", "203.0.113.7, 10.0.0.5")) == "203.0.113.7"
+
+
+def test_shared_backend_between_limiters(tmp_path):
+    """Two workers mapping the same table share each client's budget"""
+    path = str(tmp_path / "ratelimit")
+    first = RateLimiter(SharedMemoryRateLimitBackend(path, slots=256), {"test": "4/minute"})
+    second = RateLimiter(SharedMemoryRateLimitBackend(path, slots=256), {"test": "4/minute"})
+
+    allowed = [r.allowed for r in _hits(first, "test", "client", 2) + _hits(second, "test", "client", 3)]
+    assert allowed == [True, True, True, True, False]
@@ -0,0 +1,85 @@
+"""
+Unit tests for the request coalescer
+
+Concurrent identical requests share one load, results are reused for the
+micro-TTL only, and failures are never cached
+"""
+import sys
+sys.path.append('/app/backend')
+
+import asyncio
+
+import pytest
+
+from request_coalescer import RequestCoalescer
+
+
+class _Loader:
+    """Counts calls; each call yields once so concurrent callers overlap"""
+
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("db down")
+        return {"call": self.calls}
+
+
+def test_concurrent_requests_share_one_load():
+    coalescer = RequestCoalescer("test", ttl_seconds=5)
+    loader = _Loader()
+
+    async def burst():
+        return await asyncio.gather(*(coalescer.run("published", loader) for _ in range(20)))
+
+    results = asyncio.run(burst())
+
+    assert loader.calls == 1
+    assert all(result == {"call": 1} for result in results)
+    stats = coalescer.get_stats()
+    assert (stats["requests"], stats["db_calls"], stats["coalesced"]) == (20, 1, 19)
+    assert stats["saved_ratio"] == 0.95
+
+
+def test_results_reused_within_ttl_only():
+    coalescer = RequestCoalescer("test", ttl_seconds=0.05)
+    loader = _Loader()
+
+    async def scenario():
+        first = await coalescer.run("key", loader)
+        reused = await coalescer.run("key", loader)
+        await asyncio.sleep(0.1)
+        reloaded = await coalescer.run("key", loader)
+        return first, reused, reloaded
+
+    first, reused, reloaded = asyncio.run(scenario())
+
+    assert first == reused == {"call": 1}
+    assert reloaded == {"call": 2}
+    stats = coalescer.get_stats()
+    assert (stats["requests"], stats["db_calls"], stats["reused"]) == (3, 2, 1)
+    assert stats["saved_ratio"] == round(1 - 2 / 3, 4)
+
+
+def test_errors_are_not_cached():
+    coalescer = RequestCoalescer("test", ttl_seconds=5)
+    failing = _Loader(fail=True)
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await coalescer.run("key", failing)
+        return await coalescer.run("key", _Loader())
+
+    assert asyncio.run(scenario()) == {"call": 1}
+    assert failing.calls == 2
+    stats = coalescer.get_stats()
+    assert (stats["errors"], stats["db_calls"]) == (2, 3)
+
+
+def test_stats_before_any_request():
+    assert RequestCoalescer("idle", ttl_seconds=1).get_stats()["saved_ratio"] is None
@@ -0,0 +1,77 @@
+"""
+Unit tests for the sampled request log
+
+Writes, errors and slow requests are always kept; successful reads follow
+the per-route sample rate
+"""
+import sys
+sys.path.append('/app/backend')
+
+import monitoring
+from monitoring import RequestLog
+
+
+def _log(**kwargs):
+    return RequestLog(default_rate=1.0, slow_threshold=1.0, **kwargs)
+
+
+def test_writes_errors_and_slow_requests_always_logged(monkeypatch):
+    """Even on a sampled route with random() always above the rate"""
+    monkeypatch.setattr(monitoring.random, "random", lambda: 0.999)
+    log = _log()
+
+    log.record("POST", "/api/deals/list", 201, 0.02)
+    log.record("DELETE", "/api/deals/abc", 200, 0.02)
+    log.record("GET", "/api/deals/abc", 404, 0.02)
+    log.record("GET", "/api/cars", 500, 0.02)
+    log.record("GET", "/health", 503, 0.02)
+    log.record("GET", "/api/deals/list", 200, 0.02)
+
+    assert (log.logged, log.sampled_out) == (5, 1)
+
+    log.record("GET", "/api/deals/list", 200, 2.5)
+    assert log.slow == 1
+
+
+def test_slow_requests_keep_query_and_db_summary():
+    log = _log(slow_buffer_size=2)
+    db = {"operations": 14, "total_ms": 2210.4, "collscans": 1}
+
+    log.record("GET", "/health", 200, 1.5, "verbose=1", None)
+    log.record("GET", "/api/search", 200, 3.25, "q=camry", db)
+    log.record("GET", "/api/cars", 200, 0.2, "", None)
+
+    slow = log.get_slow_requests()
+    assert [entry["path"] for entry in slow] == ["/api/search", "/health"]
+    assert slow[0]["query"] == "q=camry"
+    assert slow[0]["db"] == db
+    assert slow[0]["duration_ms"] == 3250.0
+    assert log.logged == 0
+
+
+def test_zero_rate_routes_never_logged(monkeypatch):
+    monkeypatch.setattr(monitoring.random, "random", lambda: 0.0)
+    log = _log()
+
+    for path in ("/health", "/metrics", "/uploads/car.jpg"):
+        for method in ("GET", "HEAD"):
+            log.record(method, path, 200, 0.001)
+
+    assert (log.logged, log.sampled_out) == (0, 6)
+
+
+def test_sampled_route_rate(monkeypatch):
+    """A 0.01 route logs exactly the draws below 0.01"""
+    draws = iter([0.0, 0.0099, 0.01, 0.5, 0.999] * 20)
+    monkeypatch.setattr(monitoring.random, "random", lambda: next(draws))
+    log = _log()
+
+    assert log.sample_rate("/api/deals/list") == 0.01
+    for _ in range(100):
+        log.record("GET", "/api/deals/list", 200, 0.01)
+
+    assert (log.logged, log.sampled_out) == (40, 60)
+
+    # Unlisted routes use the default rate
+    log.record("GET", "/api/admin/users", 200, 0.01)
+    assert log.logged == 41
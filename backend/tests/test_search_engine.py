@@ -0,0 +1,163 @@
+"""
+Unit tests for the search engine
+
+Checks that the inverted index ranks exactly like the original linear scan
+"""
+import sys
+sys.path.append('/app/backend')
+
+import os
+import random
+import re
+
+from search_engine import SearchIndex, tokenize
+
+
+BRANDS = ["Toyota", "Honda", "Kia", "BMW", "Mercedes-Benz", "Lexus"]
+MODELS = ["Camry", "RAV4", "Accord", "Civic", "Sportage", "X5", "GLC 300", "RX 350"]
+TRIMS = ["LE", "SE", "XLE", "Sport", "EX-L", "Touring", "xDrive40i", ""]
+BANKS = ["TFS", "AHFC", "KMF", "BMW FS", ""]
+
+
+def _linear_search(deals, query, max_results):
+    """Reference implementation: the pre-index nested-loop scan"""
+    query_tokens = set(tokenize(query))
+    numbers = re.findall(r'\d+', query)
+    payment_filter = int(numbers[0]) if numbers else None
+
+    results = []
+    for ordinal, deal in enumerate(deals):
+        text = ' '.join(str(deal.get(f, '')) for f in ('brand', 'model', 'trim', 'year', 'bank', 'region'))
+        tokens = set(tokenize(text))
+        score = len(query_tokens & tokens)
+        for q in query_tokens:
+            for t in tokens:
+                if q in t or t in q:
+                    score += 0.5
+        if payment_filter and deal['calculated_payment'] > payment_filter + 50:
+            score *= 0.5
+        if score > 0:
+            results.append((score, ordinal))
+    results.sort(key=lambda r: r[0], reverse=True)
+    return results[:max_results]
+
+
+def _deals(count, seed=7):
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"deal-{i}",
+            "brand": rng.choice(BRANDS),
+            "model": rng.choice(MODELS),
+            "trim": rng.choice(TRIMS),
+            "year": rng.choice([2024, 2025, 2026]),
+            "bank": rng.choice(BANKS),
+            "region": "California",
+            "calculated_payment": rng.randint(199, 899),
+        }
+        for i in range(count)
+    ]
+
+
+def test_ranking_matches_linear_scan():
+    """Same deals, same scores, same order (ties by index order)"""
+    deals = _deals(500)
+    index = SearchIndex()
+    index.build(deals)
+
+    queries = [
+        "toyota", "camry under 400", "rav", "x", "bmw x5 xdrive", "2025 honda civic",
+        "gl", "ex l 300", "sportage kia 250", "x5 under 600", "cam ry", "mercedes benz glc", "zzz",
+    ]
+    for query in queries:
+        for limit in (1, 5, 20, 1000):
+            expected = _linear_search(deals, query, limit)
+            actual = index.search(query, max_results=limit)
+            assert [(r["score"], r["deal_id"]) for r in actual] == \
+                [(score, deals[ordinal]["id"]) for score, ordinal in expected], (query, limit)
+
+
+def test_result_shape():
+    """Results carry the score plus the indexed deal fields"""
+    camry = {"id": "deal-camry", "brand": "Toyota", "model": "Camry", "trim": "XLE", "year": 2026,
+             "bank": "TFS", "region": "California", "calculated_payment": 389}
+    index = SearchIndex()
+    index.build(_deals(10) + [camry])
+
+    result = index.search("toyota camry", max_results=1)
+
+    assert result
+    assert {"score", "deal_id", "tokens", "brand", "model", "year", "payment",
+            "driveoff", "image_url", "bank", "trim"} <= set(result[0])
+    assert (result[0]["brand"], result[0]["model"]) == ("Toyota", "Camry")
+    assert index.search("", max_results=5) == []
+
+
+def test_incremental_updates_match_rebuild():
+    """Upserts, partial updates and deletes rank like a fresh build"""
+    deals = _deals(300)
+    index = SearchIndex()
+    index.build(deals)
+
+    rng = random.Random(11)
+    extra = _deals(60, seed=13)
+    for i, deal in enumerate(extra):
+        deal["id"] = f"new-{i}"
+        deals.append(deal)
+        index.upsert(deal)
+    for deal in rng.sample(deals, 80):
+        fields = {"calculated_payment": rng.randint(199, 899), "trim": rng.choice(TRIMS)}
+        deal.update(fields)
+        index.update_fields(deal["id"], fields)
+    for deal in rng.sample(deals, 120):
+        deals.remove(deal)
+        index.delete(deal["id"])
+
+    fresh = SearchIndex()
+    fresh.build(deals)
+
+    assert len(index) == len(deals)
+    for query in ["toyota", "camry under 400", "xle", "sport 300", "bmw x5", "ex"]:
+        assert [(r["score"], r["deal_id"]) for r in index.search(query, max_results=50)] == \
+            [(r["score"], r["deal_id"]) for r in fresh.search(query, max_results=50)], query
+
+
+def test_snapshot_round_trip(tmp_path):
+    """A loaded snapshot ranks like the index it was saved from, and stays mutable"""
+    deals = _deals(200)
+    index = SearchIndex()
+    index.build(deals)
+    index.delete(deals[0]["id"])
+    index.save_snapshot(str(tmp_path))
+
+    loaded = SearchIndex()
+    assert loaded.load_snapshot(str(tmp_path))
+    assert len(loaded) == len(index)
+    for query in ["toyota", "camry under 400", "bmw x5"]:
+        assert [(r["score"], r["deal_id"]) for r in loaded.search(query, max_results=50)] == \
+            [(r["score"], r["deal_id"]) for r in index.search(query, max_results=50)], query
+
+    loaded.update_fields(deals[1]["id"], {"model": "Zephyr"})
+    assert loaded.search("zephyr")[0]["deal_id"] == deals[1]["id"]
+
+
+def test_concurrent_snapshot_saves(tmp_path):
+    """Workers saving at once never leave a meta pointing at deleted arrays"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    first, second = SearchIndex(), SearchIndex()
+    first.build(_deals(120, seed=1))
+    second.build(_deals(80, seed=2))
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        for _ in range(5):
+            list(pool.map(lambda index: index.save_snapshot(str(tmp_path)), [first, second]))
+            loaded = SearchIndex()
+            assert loaded.load_snapshot(str(tmp_path))
+            assert len(loaded) in (120, 80)
+
+    second.save_snapshot(str(tmp_path))
+    loaded = SearchIndex()
+    assert loaded.load_snapshot(str(tmp_path))
+    assert len(loaded) == 80
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".npy")]) == 3
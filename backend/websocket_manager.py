@@ -37,6 +37,13 @@ async def subscribe_to_offer(sid, data):
     await sio.enter_room(sid, f"offer_{offer_id}")
     logger.info(f"Client {sid} subscribed to offer {offer_id}")
 
+@sio.event
+async def subscribe_to_pdf_job(sid, data):
+    """Subscribe to PDF import job progress"""
+    job_id = data.get('job_id')
+    await sio.enter_room(sid, f"pdf_job_{job_id}")
+    logger.info(f"Client {sid} subscribed to PDF job {job_id}")
+
 # Broadcast functions
 async def broadcast_new_offer(offer_data):
     """Broadcast when new offer appears"""
@@ -59,6 +66,10 @@ async def notify_offer_booked(offer_id, location):
         'message': f'Someone from {location} just booked this offer'
     }, room=f"offer_{offer_id}")
 
+async def notify_pdf_job_progress(job):
+    """Push PDF import job status/progress to its subscribers"""
+    await sio.emit('pdf_import_progress', job, room=f"pdf_job_{job['id']}")
+
 # Get Socket.IO app for mounting
 def get_socketio_app():
     """Get Socket.IO ASGI app"""
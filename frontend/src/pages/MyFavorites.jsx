@@ -27,6 +27,9 @@ const MyFavorites = () => {
         : `${BACKEND_URL}/api/cars`;
 
       const response = await fetch(endpoint);
+      if (!response.ok) {
+        throw new Error(`HTTP ${response.status}`);
+      }
       const allCars = await response.json();
 
       // Filter только saved
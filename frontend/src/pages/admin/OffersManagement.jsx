@@ -18,6 +18,9 @@ export default function OffersManagement() {
   const loadOffers = async () => {
     try {
       const response = await fetch(`${BACKEND_URL}/api/cars`);
+      if (!response.ok) {
+        throw new Error(`HTTP ${response.status}`);
+      }
       const data = await response.json();
       setOffers(data || []);
     } catch (err) {
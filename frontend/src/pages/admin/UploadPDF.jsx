@@ -8,12 +8,14 @@ import { Alert, AlertDescription } from '../../components/ui/alert';
 import { Upload, FileText, CheckCircle, AlertCircle } from 'lucide-react';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001';
+const IMPORT_JOB_TIMEOUT_MS = 15 * 60 * 1000;
 
 export default function UploadPDF() {
   const [file, setFile] = useState(null);
   const [brand, setBrand] = useState('Toyota');
   const [model, setModel] = useState('');
   const [uploading, setUploading] = useState(false);
+  const [progress, setProgress] = useState(null);
   const [parsing, setParsing] = useState(false);
   const [uploadResult, setUploadResult] = useState(null);
   const [parseResult, setParseResult] = useState(null);
@@ -51,14 +53,40 @@ export default function UploadPDF() {
         throw new Error(data.detail || 'Upload failed');
       }
 
-      setUploadResult(data);
+      setUploadResult(await waitForImportJob(data.job_id, token));
     } catch (err) {
       setError(err.message);
     } finally {
       setUploading(false);
+      setProgress(null);
     }
   };
 
+  // Extraction runs as a background job; poll until it finishes
+  const waitForImportJob = async (jobId, token) => {
+    const deadline = Date.now() + IMPORT_JOB_TIMEOUT_MS;
+    while (Date.now() < deadline) {
+      const response = await fetch(`${BACKEND_URL}/api/admin/lease-programs/import-jobs/${jobId}`, {
+        headers: { 'Authorization': `Bearer ${token}` }
+      });
+      const job = await response.json();
+
+      if (!response.ok) {
+        throw new Error(job.detail || 'Import job lookup failed');
+      }
+      if (job.status === 'completed') {
+        return job.result;
+      }
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Text extraction failed');
+      }
+
+      setProgress(job);
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+    }
+    throw new Error('Text extraction is taking too long. Check the import later under uploaded PDFs.');
+  };
+
   const handleParse = async () => {
     if (!uploadResult) return;
 
@@ -125,7 +153,11 @@ export default function UploadPDF() {
             disabled={!file || uploading}
             className="w-full"
           >
-            {uploading ? 'Uploading...' : 'Upload & Extract Text'}
+            {uploading
+              ? progress?.status === 'ocr'
+                ? `Running OCR... (${progress.pages_done}/${progress.page_count} pages)`
+                : progress ? 'Extracting text...' : 'Uploading...'
+              : 'Upload & Extract Text'}
           </Button>
 
           {uploadResult && (